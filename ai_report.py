@@ -0,0 +1,358 @@
+# ==================================================================================
+# RAPORT AI - asynchroniczne, buforowane i ograniczone czasowo zapytania do Gemini
+# ==================================================================================
+# Wcześniej generate_report() wywoływał Gemini synchronicznie, bez limitu czasu
+# i bez ponowień: interfejs czekał na odpowiedź, a ta sama analiza była płatna
+# przy każdym kliknięciu "Zatrzymaj Analizę" lub odświeżeniu strony.
+#
+# Ten moduł:
+# - wysyła zapytanie w tle (submit_report() zwraca Future) - statystyki
+#   wyświetlamy od razu, a sekcję AI uzupełniamy, gdy odpowiedź nadejdzie
+# - ogranicza czas każdej próby (timeout przekazywany klientowi w http_options,
+#   więc zapytanie jest naprawdę przerywane) i ponawia nieudane próby
+#   z rosnącym odstępem (backoff)
+# - zapamiętuje odpowiedzi (klucz: tryb + tekst analizy), a identyczne
+#   zapytania wysłane w trakcie oczekiwania dzielą jedno wywołanie API
+# - udostępnia lokalnego klienta zastępczego (LocalReportClient) do pracy
+#   bez sieci i do testów (EMO_AI_CLIENT=local)
+# ==================================================================================
+
+import collections  # OrderedDict - pamięć odpowiedzi (usuwanie najdawniej użytych)
+import concurrent.futures  # Future, pula wątków - zapytania w tle
+import hashlib  # hashlib - klucz pamięci odpowiedzi
+import json  # json - odpowiedź modelu w formacie JSON
+import os  # os - zmienna środowiskowa wybierająca klienta
+import re  # re - odczyt wartości emocji w kliencie lokalnym
+import threading  # threading - blokada pamięci odpowiedzi i zapytań w toku
+import time  # time - odstęp między ponowieniami, opóźnienie klienta lokalnego
+from types import SimpleNamespace  # SimpleNamespace - odpowiedź klienta lokalnego
+
+# Model Gemini używany do analizy behawioralnej
+GEMINI_MODEL = "gemini-2.0-flash"
+
+# Limit czasu jednej próby (sekundy), liczba ponowień i początkowy odstęp między nimi
+DEFAULT_TIMEOUT = 20.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 1.0
+
+# Zmienna środowiskowa wybierająca klienta: "local" = LocalReportClient (bez sieci)
+CLIENT_ENV = "EMO_AI_CLIENT"
+
+# Odpowiedź zastępcza, gdy odpowiedzi modelu nie udało się odczytać
+FALLBACK_REPORT = {
+    "behavior": "Nie można było przeanalizować zachowania z powodu błędu parsowania JSON",
+    "action": "Spróbuj ponownie przeprowadzić analizę",
+}
+
+
+class AIReportError(RuntimeError):
+    """Nie udało się uzyskać odpowiedzi modelu (po wszystkich ponowieniach)."""
+
+
+# SEKCJA 1: TREŚĆ ZAPYTANIA I ODCZYT ODPOWIEDZI
+# ==================================================================================
+
+def build_analysis_text(average_scores, state):
+    """
+    Tworzy tekstowy opis zebranych danych (treść zapytania i klucz pamięci).
+
+    Parametry:
+    ----------
+    average_scores : dict
+        Średnie wartości emocji {emocja: procent}
+    state : dict lub st.session_state
+        Stan analizy z licznikami gestów, spojrzenia i ruchów głowy
+    """
+    lines = [f"{emotion.capitalize()}: {score:.2f}%" for emotion, score in average_scores.items()]
+    lines += [
+        f"Napięte Gesty Dłoni: {state['hand_gesture_count']['tense']}",
+        f"Rozluźnione Gesty Dłoni: {state['hand_gesture_count']['relaxed']}",
+        f"Kierunek Oczu (Lewo): {state['eye_direction_count']['left']}",
+        f"Kierunek Oczu (Prawo): {state['eye_direction_count']['right']}",
+        f"Kierunek Oczu (Centrum): {state['eye_direction_count']['center']}",
+        f"Ruchy Głowy (Góra): {state['head_movement_count']['up']}",
+        f"Ruchy Głowy (Dół): {state['head_movement_count']['down']}",
+        f"Ruchy Głowy (Nieruchomo): {state['head_movement_count']['still']}",
+    ]
+    return "".join(line + "\n" for line in lines)
+
+
+def build_prompt(mode, analysis):
+    """Treść zapytania do modelu dla trybu analizy i opisu danych."""
+    return f"""Na podstawie tej Analizy Emocji i Zachowania dla trybu {mode}: {analysis},
+    użyj formatu JSON do ustrukturyzowania odpowiedzi:
+
+    {{
+        "behavior": "opisz ogólne zachowanie na podstawie analizy",
+        "action": "zasugeruj odpowiednie działanie"
+    }}
+    """
+
+
+def parse_ai_response(text):
+    """
+    Odczytuje odpowiedź modelu: JSON z kluczami "behavior" i "action".
+
+    Odpowiedź bywa opakowana w znaczniki markdown (```json ... ```) - wtedy
+    bierzemy fragment od pierwszego "{" do ostatniego "}".
+
+    Wyjątki:
+    --------
+    ValueError
+        Gdy odpowiedź nie jest poprawnym JSON-em z wymaganymi kluczami
+    """
+    if "```" in text:
+        start, end = text.find("{"), text.rfind("}") + 1
+        if start != -1 and end > start:
+            text = text[start:end]
+        else:
+            text = text.replace("```json", "").replace("```", "").strip()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Nie udało się sparsować odpowiedzi AI: {e}") from e
+    if not isinstance(data, dict) or not {"behavior", "action"} <= data.keys():
+        raise ValueError("Odpowiedź AI nie zawiera pól \"behavior\" i \"action\"")
+    return {"behavior": str(data["behavior"]), "action": str(data["action"])}
+
+
+# SEKCJA 2: KLIENCI
+# ==================================================================================
+
+class LocalReportClient:
+    """
+    Lokalny zastępca klienta Gemini (ten sam interfejs: client.models.generate_content).
+
+    Odpowiedź powstaje z tekstu analizy bez połączenia z siecią - do pracy
+    offline i do testów całej ścieżki raportu.
+
+    Parametry:
+    ----------
+    delay : float
+        Sztuczne opóźnienie każdej odpowiedzi (sekundy)
+    failures : int
+        Liczba pierwszych wywołań kończących się błędem połączenia
+
+    Limit czasu z config["http_options"]["timeout"] (milisekundy, jak
+    w google.genai) jest przestrzegany: dłuższe opóźnienie kończy wywołanie
+    po upływie limitu wyjątkiem TimeoutError.
+
+    Atrybuty:
+    ---------
+    calls : int
+        Liczba wywołań generate_content()
+    """
+
+    def __init__(self, delay=0.0, failures=0):
+        self.delay = delay
+        self.failures = failures
+        self.calls = 0
+        self.models = self  # client.models.generate_content(...) jak w google.genai
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        timeout_ms = ((config or {}).get("http_options") or {}).get("timeout")
+        if timeout_ms is not None and self.delay > timeout_ms / 1000:
+            time.sleep(timeout_ms / 1000)
+            raise TimeoutError("Lokalny klient: przekroczony limit czasu zapytania")
+        if self.delay:
+            time.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise ConnectionError("Lokalny klient: symulowany błąd połączenia")
+
+        scores = {name: float(value) for name, value in
+                  re.findall(r"([A-Za-z]+): (\d+(?:\.\d+)?)%", contents)}
+        if scores:
+            dominant = max(scores, key=scores.get)
+            behavior = f"Przeważa emocja {dominant} ({scores[dominant]:.1f}%)."
+        else:
+            behavior = "Brak danych o emocjach."
+        answer = {"behavior": f"{behavior} (odpowiedź lokalna, bez połączenia z Gemini)",
+                  "action": "Porównaj wynik z nagraniem i w razie potrzeby powtórz analizę."}
+        return SimpleNamespace(text=f"```json\n{json.dumps(answer, ensure_ascii=False)}\n```")
+
+
+def use_local_client():
+    """Czy zmienna EMO_AI_CLIENT wybiera lokalnego klienta zastępczego."""
+    return os.getenv(CLIENT_ENV, "").strip().lower() == "local"
+
+
+def create_client(api_key):
+    """Tworzy klienta Google Gemini (import biblioteki dopiero przy pierwszym użyciu)."""
+    from google import genai
+
+    return genai.Client(api_key=api_key)
+
+
+# SEKCJA 3: ZAPYTANIE Z LIMITEM CZASU I PONOWIENIAMI
+# ==================================================================================
+
+def request_report(client, mode, analysis, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                   backoff=DEFAULT_BACKOFF, sleep=time.sleep):
+    """
+    Wysyła zapytanie do modelu i zwraca odczytaną odpowiedź.
+
+    Parametry:
+    ----------
+    client :
+        Klient Gemini lub LocalReportClient
+    mode, analysis : str
+        Tryb analizy i tekst z build_analysis_text()
+    timeout : float
+        Limit czasu jednej próby (sekundy); przekazywany klientowi
+        w http_options, więc zapytanie po jego upływie jest przerywane, a nie
+        porzucane w tle - ponowienie nigdy nie biegnie równolegle z poprzednią próbą
+    retries : int
+        Liczba ponowień po błędzie lub przekroczeniu czasu
+    backoff : float
+        Odstęp przed pierwszym ponowieniem; każdy kolejny jest dwa razy dłuższy
+    sleep : callable
+        Funkcja czekająca (do testów)
+
+    Zwraca:
+    -------
+    dict
+        {"behavior", "action"}
+
+    Wyjątki:
+    --------
+    AIReportError
+        Gdy żadna próba się nie powiodła (ostatni błąd w __cause__)
+    ValueError
+        Gdy model odpowiedział, ale odpowiedzi nie da się odczytać
+        (bez ponowień - kolejne zapytanie też byłoby płatne)
+    """
+    prompt = build_prompt(mode, analysis)
+    # google.genai podaje limit czasu zapytania HTTP w milisekundach
+    config = {"http_options": {"timeout": int(timeout * 1000)}}
+    last_error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            sleep(backoff * 2 ** (attempt - 1))
+        try:
+            response = client.models.generate_content(model=GEMINI_MODEL, contents=prompt,
+                                                      config=config)
+        except Exception as e:  # Także przekroczenie limitu czasu (httpx / TimeoutError)
+            last_error = e
+            continue
+        return parse_ai_response(response.text)
+    raise AIReportError(f"Nie udało się uzyskać analizy AI: {last_error}") from last_error
+
+
+# SEKCJA 4: PAMIĘĆ ODPOWIEDZI I ZAPYTANIA W TLE
+# ==================================================================================
+
+def cache_key(mode, analysis):
+    """Klucz pamięci odpowiedzi: skrót trybu i tekstu analizy."""
+    return hashlib.sha256(f"{mode}\n{analysis}".encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """
+    Pamięć odpowiedzi modelu z usuwaniem najdawniej użytych wpisów.
+
+    Wspólna dla wszystkich sesji procesu - ta sama analiza w tym samym trybie
+    nie jest wysyłana do API ponownie.
+    """
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Zapamiętana odpowiedź (kopia) albo None."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return dict(self._entries[key])
+
+    def put(self, key, report):
+        """Zapamiętuje odpowiedź; przy braku miejsca usuwa najdawniej użytą."""
+        with self._lock:
+            self._entries[key] = dict(report)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Pamięć odpowiedzi wspólna dla procesu
+REPORT_CACHE = ReportCache()
+
+_job_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="ai-report")
+_pending = {}  # {klucz: Future} - zapytania w toku
+_pending_lock = threading.Lock()
+
+
+def _run_job(key, client, mode, analysis, cache, options):
+    """Zadanie w tle: zapytanie, zapis do pamięci i odpowiedź z informacją o źródle."""
+    try:
+        report = request_report(client, mode, analysis, **options)
+    except ValueError as e:
+        return dict(FALLBACK_REPORT, source="error", error=str(e))
+    except AIReportError as e:
+        return {"behavior": "Analiza AI jest chwilowo niedostępna",
+                "action": "Spróbuj ponownie za chwilę", "source": "error", "error": str(e)}
+    cache.put(key, report)
+    return dict(report, source="api", error=None)
+
+
+def submit_report(client, mode, analysis, cache=REPORT_CACHE, **options):
+    """
+    Zleca analizę AI w tle i od razu zwraca Future.
+
+    Parametry:
+    ----------
+    client :
+        Klient Gemini lub LocalReportClient
+    mode, analysis : str
+        Tryb analizy i tekst z build_analysis_text()
+    cache : ReportCache
+        Pamięć odpowiedzi
+    **options :
+        timeout, retries, backoff, sleep - patrz request_report()
+
+    Zwraca:
+    -------
+    concurrent.futures.Future
+        Wynik: {"behavior", "action", "source", "error"}, gdzie source to
+        "cache", "api" lub "error". Future nigdy nie kończy się wyjątkiem
+        z powodu błędów API - błąd opisuje pole "error".
+
+    Przykład użycia:
+    ----------------
+    future = submit_report(client, "Interview", analysis)
+    ...                                  # wyświetlanie statystyk
+    report = future.result()             # najpóźniej po (retries + 1) * timeout + odstępach
+    """
+    key = cache_key(mode, analysis)
+    cached = cache.get(key)
+    if cached is not None:
+        future = concurrent.futures.Future()
+        future.set_result(dict(cached, source="cache", error=None))
+        return future
+
+    with _pending_lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future  # To samo zapytanie już czeka na odpowiedź
+        future = _job_executor.submit(_run_job, key, client, mode, analysis, cache, options)
+        _pending[key] = future
+    # Poza blokadą - zakończone zadanie wywołuje funkcję od razu w tym wątku
+    future.add_done_callback(lambda done: _forget_pending(key, done))
+    return future
+
+
+def _forget_pending(key, future):
+    """Usuwa zakończone zapytanie z listy zapytań w toku."""
+    with _pending_lock:
+        if _pending.get(key) is future:
+            del _pending[key]
@@ -0,0 +1,1328 @@
+# ==================================================================================
+# RDZEŃ ANALIZY - potok analizy klatek niezależny od Streamlit
+# ==================================================================================
+# Ten moduł zawiera całą logikę analizy pojedynczych klatek wideo (emocje, dłonie,
+# twarz) oraz pętlę przetwarzania strumienia wideo. Nie importuje Streamlit,
+# dzięki czemu może być używany zarówno przez aplikację webową (emo.py), jak i
+# przez narzędzia wsadowe uruchamiane z wiersza poleceń (batch_analysis.py).
+#
+# Stan analizy (sumy emocji, liczniki gestów itd.) jest przekazywany jawnie jako
+# słownik "state". W aplikacji Streamlit przekazujemy st.session_state, który
+# obsługuje ten sam dostęp przez nawiasy kwadratowe (state["frame_count"]).
+# ==================================================================================
+
+import concurrent.futures  # ThreadPoolExecutor - równoległe etapy analizy klatki
+import contextlib  # contextlib - narzędzia do tworzenia menedżerów kontekstu ("with")
+import dataclasses  # dataclasses - proste klasy przechowujące ustawienia
+import datetime  # datetime - znaczniki czasu w raporcie
+import os  # os - liczba rdzeni (rozmiar puli wątków etapów)
+import threading  # threading - blokada przy tworzeniu puli wątków etapów
+import time  # time - pomiar czasu wywołań modelu emocji dla partii
+
+import cv2  # OpenCV - odczyt wideo i rysowanie na klatkach
+
+import model_pool  # Modele wczytywane raz na proces (wspólne dla sesji)
+
+from emotion_cache import EmotionCache, image_signature  # Pamięć podręczna wyników emocji
+from frame_context import FrameContext, as_frame_context  # Klatka + bufory pochodne
+from frame_records import EMOTIONS, FrameRecordStore  # Kolumnowy rejestr wyników klatek
+from frame_sampling import FrameSampler  # Wybór klatek do analizy (próbkowanie)
+from landmark_tracking import LandmarkTracker  # Detektor co K klatek + przepływ optyczny
+from overlay import NO_OVERLAY, as_overlay  # Nakładki na klatkę: przełączane warstwy
+from stage_timing import NULL_TIMER  # Pomiar czasu etapów (domyślnie wyłączony)
+from streaming_stats import StreamingStats  # Średnie, wariancje i trendy na bieżąco
+
+# UWAGA: DeepFace (TensorFlow) i MediaPipe importujemy dopiero przy pierwszym
+# użyciu. Import TensorFlow trwa kilka sekund i zajmuje sporo pamięci, a procesy
+# robocze w trybie wsadowym i tak ładują modele samodzielnie.
+
+
+# SEKCJA 1: STAŁE
+# ==================================================================================
+
+# Nazwy 7 emocji rozpoznawanych przez DeepFace (EMOTIONS) definiuje frame_records.py,
+# bo w tej kolejności zapisywane są kolumny rejestru wyników klatek
+
+# Dostępne tryby analizy i prefiksy wpisów w raporcie dla każdego z nich
+MODES = ("Detective", "Student Behavior", "Interview")
+REPORT_PREFIXES = {
+    "Detective": "Wykrywanie",
+    "Student Behavior": "Śledzenie",
+    "Interview": "Analiza",
+}
+
+# Indeksy punktów charakterystycznych dłoni (zgodne z mp.solutions.hands.HandLandmark)
+THUMB_TIP = 4           # Czubek kciuka
+INDEX_FINGER_TIP = 8    # Czubek palca wskazującego
+
+# Indeksy punktów siatki twarzy MediaPipe Face Mesh
+LEFT_EYE = 33           # Lewe oko
+RIGHT_EYE = 263         # Prawe oko
+NOSE_TIP = 4            # Czubek nosa
+
+# Progi pewności dla MediaPipe (70% - tak jak w aplikacji Streamlit)
+MIN_DETECTION_CONFIDENCE = 0.7
+MIN_TRACKING_CONFIDENCE = 0.7
+
+# Sposoby lokalizacji twarzy dla analizy emocji:
+# - "deepface": DeepFace sam wykrywa twarz własnym detektorem
+# - "facemesh": prostokąt twarzy z punktów Face Mesh (jeden detektor mniej)
+FACE_LOCALIZATIONS = ("deepface", "facemesh")
+
+# Najmniejsza dopuszczalna rozdzielczość analizy (dłuższy bok w pikselach)
+MIN_INFERENCE_RESOLUTION = 64
+
+# Liczba dłoni wykrywanych na jedną osobę (MediaPipe Hands: max_num_hands)
+HANDS_PER_PERSON = 2
+
+
+@dataclasses.dataclass(frozen=True)
+class AnalysisSettings:
+    """
+    Ustawienia modeli, które wpływają na wyniki analizy pojedynczej klatki.
+
+    Atrybuty:
+    ---------
+    face_localization : str
+        "deepface" (domyślnie) - DeepFace.analyze() wykrywa twarz samodzielnie;
+        "facemesh" - wycinek twarzy wyznaczamy z punktów, które Face Mesh i tak
+        oblicza, a detektor DeepFace jest wyłączony. Gdy Face Mesh nie znajdzie
+        twarzy, analiza emocji dla tej klatki jest pomijana.
+    emotion_cache_size : int
+        Liczba twarzy zapamiętywanych w pamięci podręcznej emocji
+        (0 = bez pamięci - model analizuje każdą klatkę). Skrót liczymy
+        z wycinka twarzy, więc pamięć działa przy lokalizacji "facemesh"
+        i w analizie partiami (wycinki z detektora silnika emocji); przy
+        "deepface" w process_frame() twarz znajduje dopiero DeepFace, więc
+        model analizuje każdą klatkę
+    emotion_cache_distance : int
+        Próg odległości skrótów twarzy (0-64 bity), poniżej którego wynik
+        emocji jest brany z pamięci (patrz emotion_cache.py)
+    emotion_resolution, hands_resolution, face_resolution : int
+        Rozdzielczość obrazu podawanego do modelu emocji, MediaPipe Hands
+        i Face Mesh - dłuższy bok w pikselach (0 = pełna rozdzielczość klatki).
+        Koszt analizy przestaje wtedy zależeć od rozdzielczości nagrania,
+        a nakładki nadal rysujemy na pełnej klatce.
+    max_faces : int
+        Największa liczba analizowanych twarzy (Face Mesh: max_num_faces;
+        dłoni: HANDS_PER_PERSON na osobę)
+    detect_every : int
+        Co ile analizowanych klatek uruchamiać detektory MediaPipe; pomiędzy
+        nimi punkty są śledzone przepływem optycznym (landmark_tracking.py).
+        Dla max_faces > 1 lub detect_every > 1 każda osoba dostaje stały
+        identyfikator i własne liczniki w stanie analizy ("people").
+        Wartości domyślne (1, 1) zachowują pierwotne działanie.
+    concurrent_stages : bool
+        Czy uruchamiać model emocji, MediaPipe Hands i Face Mesh na tej samej
+        klatce równolegle (pula wątków), a liczniki i nakładki nanosić po
+        zakończeniu wszystkich trzech - czas klatki zbliża się wtedy do czasu
+        najwolniejszego etapu zamiast ich sumy. Wyniki są identyczne jak przy
+        analizie po kolei. Przy lokalizacji "facemesh" emocje zależą od Face Mesh,
+        więc równolegle działają tylko dłonie i twarz.
+    """
+
+    face_localization: str = "deepface"
+    emotion_cache_size: int = 0
+    emotion_cache_distance: int = 4
+    emotion_resolution: int = 0
+    hands_resolution: int = 0
+    face_resolution: int = 0
+    max_faces: int = 1
+    detect_every: int = 1
+    concurrent_stages: bool = False
+
+    def __post_init__(self):
+        if self.face_localization not in FACE_LOCALIZATIONS:
+            raise ValueError(f"Nieznany sposób lokalizacji twarzy: {self.face_localization}")
+        if self.emotion_cache_size < 0:
+            raise ValueError("Rozmiar pamięci podręcznej emocji nie może być ujemny")
+        for resolution in (self.emotion_resolution, self.hands_resolution, self.face_resolution):
+            if resolution and resolution < MIN_INFERENCE_RESOLUTION:
+                raise ValueError("Rozdzielczość analizy musi wynosić 0 (pełna) "
+                                 f"lub co najmniej {MIN_INFERENCE_RESOLUTION} pikseli")
+        if self.max_faces < 1:
+            raise ValueError("Liczba analizowanych twarzy musi być dodatnia")
+        if self.detect_every < 1:
+            raise ValueError("Detektor musi działać co najmniej co 1 klatkę")
+
+    @property
+    def tracking(self):
+        """Czy śledzimy osoby (stałe identyfikatory, detektor co detect_every klatek)."""
+        return self.max_faces > 1 or self.detect_every > 1
+
+
+def create_emotion_cache(settings=None):
+    """Tworzy pamięć podręczną emocji według ustawień (None, gdy jest wyłączona)."""
+    settings = settings or DEFAULT_SETTINGS
+    if not settings.emotion_cache_size:
+        return None
+    return EmotionCache(settings.emotion_cache_size, settings.emotion_cache_distance)
+
+
+def create_trackers(settings=None, first_id=1):
+    """
+    Tworzy śledzenie twarzy i dłoni według ustawień (None, gdy jest wyłączone).
+
+    Parametry:
+    ----------
+    settings : AnalysisSettings lub None
+        Ustawienia (None = DEFAULT_SETTINGS)
+    first_id : int
+        Identyfikator pierwszej osoby (patrz next_person_id())
+
+    Zwraca:
+    -------
+    dict lub None
+        {"face": LandmarkTracker, "hands": LandmarkTracker} - stan śledzenia
+        przekazywany do kolejnych wywołań process_frame()
+    """
+    settings = settings or DEFAULT_SETTINGS
+    if not settings.tracking:
+        return None
+    return {
+        "face": LandmarkTracker("multi_face_landmarks", settings.detect_every, settings.max_faces,
+                                first_id=first_id),
+        "hands": LandmarkTracker("multi_hand_landmarks", settings.detect_every,
+                                 settings.max_faces * HANDS_PER_PERSON, first_id=first_id),
+    }
+
+
+# Ustawienia domyślne (zachowanie zgodne z pierwotną aplikacją)
+DEFAULT_SETTINGS = AnalysisSettings()
+
+
+# SEKCJA 2: STAN ANALIZY
+# ==================================================================================
+
+def new_analysis_state(record_capacity=None):
+    """
+    Tworzy nowy, pusty stan analizy.
+
+    Parametry:
+    ----------
+    record_capacity : int lub None
+        Limit wierszy rejestru wyników klatek (starsze są nadpisywane);
+        None = bez limitu
+
+    Zwraca:
+    -------
+    dict
+        Słownik z tymi samymi kluczami, które aplikacja Streamlit trzyma
+        w st.session_state:
+        - frame_records: rejestr wyników kolejnych klatek (FrameRecordStore);
+          tekst raportu powstaje z niego funkcją report_lines()
+        - emotion_totals: sumy procentów każdej emocji
+        - emotion_frame_count: liczba klatek (z wagami), dla których zmierzono emocje
+        - frame_count: liczba klatek nagrania objętych analizą (z wagami próbkowania)
+        - analyzed_frame_count: liczba klatek faktycznie przeanalizowanych przez modele
+        - hand_gesture_count, eye_direction_count, head_movement_count: liczniki
+          (wspólne dla wszystkich osób)
+        - people: liczniki każdej śledzonej osoby {identyfikator: new_person_stats()}
+          (wypełniane tylko przy włączonym śledzeniu - patrz AnalysisSettings)
+        - live_stats: statystyki strumieniowe (StreamingStats) - średnie,
+          wariancje, EMA i okno ostatnich klatek, dostępne w trakcie analizy
+    """
+    return {
+        "frame_records": FrameRecordStore(record_capacity),
+        "emotion_totals": {emotion: 0 for emotion in EMOTIONS},
+        "emotion_frame_count": 0,
+        "frame_count": 0,
+        "analyzed_frame_count": 0,
+        "hand_gesture_count": {"tense": 0, "relaxed": 0},
+        "eye_direction_count": {"left": 0, "right": 0, "center": 0},
+        "head_movement_count": {"up": 0, "down": 0, "still": 0},
+        "people": {},
+        "live_stats": StreamingStats(),
+    }
+
+
+def new_person_stats():
+    """
+    Tworzy puste liczniki jednej śledzonej osoby.
+
+    Zwraca:
+    -------
+    dict
+        frame_count (klatki z tą osobą, z wagami), emotion_totals
+        i emotion_frame_count (emocje jej twarzy), eye_direction_count,
+        head_movement_count
+    """
+    return {
+        "frame_count": 0,
+        "emotion_totals": {emotion: 0 for emotion in EMOTIONS},
+        "emotion_frame_count": 0,
+        "eye_direction_count": {"left": 0, "right": 0, "center": 0},
+        "head_movement_count": {"up": 0, "down": 0, "still": 0},
+    }
+
+
+def person_stats(state, person_id):
+    """Zwraca liczniki osoby o podanym identyfikatorze (tworzy je przy pierwszym użyciu)."""
+    people = state["people"]
+    if person_id not in people:
+        people[person_id] = new_person_stats()
+    return people[person_id]
+
+
+def next_person_id(state):
+    """
+    Pierwszy wolny identyfikator osoby w stanie analizy.
+
+    Przy wznowionej analizie (checkpoint.py) nowe osoby nie mogą dostać
+    identyfikatorów osób sprzed przerwy - ich liczniki by się pomieszały.
+    """
+    return max(state.get("people", {}), default=0) + 1
+
+
+def reset_analysis_state(state, record_capacity=None):
+    """Zastępuje wszystkie klucze stanu analizy pustymi wartościami (nowa analiza)."""
+    for key, value in new_analysis_state(record_capacity).items():
+        state[key] = value
+
+
+def init_analysis_state(state, record_capacity=None):
+    """
+    Uzupełnia brakujące klucze stanu analizy (nie nadpisuje istniejących).
+
+    Parametry:
+    ----------
+    state : dict lub st.session_state
+        Obiekt stanu, do którego zostaną dodane brakujące wpisy
+    record_capacity : int lub None
+        Limit wierszy rejestru wyników (patrz new_analysis_state())
+    """
+    for key, value in new_analysis_state(record_capacity).items():
+        if key not in state:
+            state[key] = value
+
+
+def merge_analysis_state(target, source):
+    """
+    Dodaje wyniki ze stanu "source" do stanu "target".
+
+    Używane, gdy analiza działa poza wątkiem aplikacji (lub w osobnym procesie)
+    i zbiera wyniki we własnym stanie, który na końcu trzeba scalić.
+
+    Parametry:
+    ----------
+    target : dict lub st.session_state
+        Stan docelowy (modyfikowany w miejscu)
+    source : dict
+        Stan, którego wyniki dodajemy
+    """
+    init_analysis_state(target)
+    for key in ("frame_count", "analyzed_frame_count", "emotion_frame_count"):
+        target[key] += source[key]
+    for key in ("emotion_totals", "hand_gesture_count", "eye_direction_count", "head_movement_count"):
+        for name, value in source[key].items():
+            target[key][name] += value
+    target["frame_records"].extend(source["frame_records"])
+    target["live_stats"].merge(source["live_stats"])
+    for person_id, stats in source["people"].items():
+        person = person_stats(target, person_id)
+        for key in ("frame_count", "emotion_frame_count"):
+            person[key] += stats[key]
+        for key in ("emotion_totals", "eye_direction_count", "head_movement_count"):
+            for name, value in stats[key].items():
+                person[key][name] += value
+
+
+def neutral_emotion_scores():
+    """Zwraca wyniki emocji używane, gdy analiza się nie powiodła (100% neutral)."""
+    scores = {emotion: 0.0 for emotion in EMOTIONS}
+    scores["neutral"] = 100.0
+    return scores
+
+
+def record_frame(state, mode, frame_index, emotion_scores=None, labels=None, weight=1):
+    """
+    Zapisuje wynik klatki w rejestrze "frame_records" i statystykach "live_stats".
+
+    Parametry:
+    ----------
+    state : dict lub st.session_state
+        Stan analizy zawierający rejestr "frame_records"
+    mode : str
+        Tryb analizy (np. "Detective", "Student Behavior", "Interview")
+    frame_index : int
+        Indeks klatki w strumieniu
+    emotion_scores : dict lub None
+        Wyniki emocji (None, gdy emocji nie mierzono)
+    labels : dict lub None
+        Etykiety "gesture", "gaze" i "head" wypełnione przez analyze_hands()
+        i analyze_face()
+    weight : int
+        Liczba klatek nagrania reprezentowanych przez tę klatkę
+    """
+    labels = labels or {}
+    state["live_stats"].observe(emotion_scores, labels, weight)
+    state["frame_records"].append(frame_index, mode, emotion_scores,
+                                  gesture=labels.get("gesture"), gaze=labels.get("gaze"),
+                                  head=labels.get("head"), weight=weight)
+
+
+def report_lines(state):
+    """
+    Tworzy tekstowe wpisy raportu behawioralnego z rejestru wyników klatek.
+
+    Napisy powstają dopiero tutaj (przy wyświetlaniu lub eksporcie raportu),
+    a nie w każdej klatce.
+
+    Zwraca:
+    -------
+    list[str]
+        Wpisy "RRRR-MM-DD GG:MM:SS - tryb: prefiks: emocja (procent%)" dla
+        klatek, w których zmierzono emocje
+    """
+    lines = []
+    for row in state["frame_records"].iter_rows():
+        prefix = REPORT_PREFIXES.get(row["mode"])
+        if row["emotions"] is None or prefix is None:
+            continue
+        dominant_emotion = max(row["emotions"], key=row["emotions"].get)
+        timestamp = datetime.datetime.fromtimestamp(row["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+        lines.append(f"{timestamp} - {row['mode']}: "
+                     f"{prefix}: {dominant_emotion} ({row['emotions'][dominant_emotion]:.2f}%)")
+    return lines
+
+
+# SEKCJA 3: LENIWE IMPORTY CIĘŻKICH BIBLIOTEK
+# ==================================================================================
+
+def _emotion_backend():
+    """Zwraca backend modelu emocji z puli modeli (DeepFace lub ONNX Runtime, patrz emotion_backends.py)."""
+    return model_pool.get("emotion_backend")
+
+
+def _mediapipe():
+    """Zwraca moduł mediapipe z puli modeli (import przy pierwszym użyciu)."""
+    return model_pool.get("mediapipe")
+
+
+# SEKCJA 4: ANALIZA POJEDYNCZEJ KLATKI
+# ==================================================================================
+
+def analyze_emotion(frame, skip_detection=False):
+    """
+    Analizuje emocje widoczne na twarzy w pojedynczej klatce wideo.
+
+    Parametry:
+    ----------
+    frame : numpy.ndarray lub FrameContext
+        Pojedyncza klatka wideo (obraz) w formacie OpenCV (BGR)
+    skip_detection : bool
+        True, gdy "frame" jest już wycinkiem twarzy - backend nie uruchamia
+        wtedy własnego detektora (w DeepFace: detector_backend="skip")
+
+    Zwraca:
+    -------
+    dict
+        Słownik {emocja: procent 0-100}. Jeśli analiza się nie powiedzie,
+        zwracane są neutralne wartości (patrz neutral_emotion_scores()).
+
+    Uwaga:
+    ------
+    Model wykonuje backend wybrany zmienną EMO_EMOTION_BACKEND (domyślnie
+    DeepFace). Gdy backend nie wykryje twarzy, analizuje całą klatkę
+    (w DeepFace: enforce_detection=False) zamiast zgłaszać błąd.
+    """
+    try:
+        frame = as_frame_context(frame).bgr
+        scores = _emotion_backend().analyze(frame, skip_detection=skip_detection)
+        return scores if scores else neutral_emotion_scores()
+    except Exception as e:
+        print(f"Ostrzeżenie: Błąd analizy emocji: {e}")
+        return neutral_emotion_scores()
+
+
+def analyze_hands(frame, hands, state, draw=True, weight=1, labels=None, resolution=0,
+                  tracker=None):
+    """
+    Analizuje gesty dłoni widoczne w klatce wideo i aktualizuje liczniki.
+
+    Parametry:
+    ----------
+    frame : numpy.ndarray lub FrameContext
+        Klatka w formacie BGR (przy włączonej warstwie "hands" rysujemy na niej punkty dłoni)
+    hands : mediapipe.solutions.hands.Hands
+        Zainicjalizowany obiekt MediaPipe Hands
+    state : dict lub st.session_state
+        Stan analizy z licznikiem "hand_gesture_count"
+    draw : bool lub overlay.OverlayRenderer
+        Czy rysować punkty charakterystyczne dłoni na klatce (warstwa "hands")
+    weight : int
+        Liczba klatek nagrania reprezentowanych przez tę klatkę (próbkowanie)
+    labels : dict lub None
+        Jeśli podano, pod kluczem "gesture" zapisujemy gest pierwszej dłoni
+    resolution : int
+        Dłuższy bok obrazu podawanego do MediaPipe (0 = pełna rozdzielczość);
+        punkty są znormalizowane, więc rysujemy je na pełnej klatce bez przeliczania
+    tracker : landmark_tracking.LandmarkTracker lub None
+        Śledzenie dłoni (patrz create_trackers()) - MediaPipe działa wtedy tylko
+        co kilka klatek, a pomiędzy punkty przesuwa przepływ optyczny
+
+    Działanie:
+    ----------
+    Dla każdej wykrytej dłoni mierzymy odległość kciuk - palec wskazujący:
+    - odległość < 0.1: gest napięty (palce zaciśnięte)
+    - odległość >= 0.1: gest rozluźniony
+    """
+    ctx = as_frame_context(frame)
+    apply_hands(ctx, detect_hands(ctx, hands, resolution, tracker), state, draw, weight, labels)
+
+
+def detect_hands(frame, hands, resolution=0, tracker=None):
+    """
+    Wykrywa dłonie w klatce - bez liczników i rysowania (klatka tylko do odczytu).
+
+    Parametry jak w analyze_hands(). Zwraca listę punktów wykrytych dłoni.
+    """
+    # MediaPipe wymaga obrazu RGB, a OpenCV używa BGR. Kontekst klatki konwertuje
+    # kolory tylko raz - Face Mesh użyje tego samego bufora RGB (przy tej samej
+    # rozdzielczości analizy).
+    ctx = as_frame_context(frame)
+    if tracker is not None:
+        return [track.landmarks for track in tracker.update(ctx, hands, resolution)]
+    return list(hands.process(ctx.scaled(resolution, "rgb")).multi_hand_landmarks or [])
+
+
+def apply_hands(frame, detected, state, draw=True, weight=1, labels=None):
+    """Dolicza gesty wykrytych dłoni do liczników i rysuje ich punkty (patrz analyze_hands())."""
+    ctx = as_frame_context(frame)
+    overlay = as_overlay(draw)
+    for hand_landmarks in detected:
+        thumb_tip = hand_landmarks.landmark[THUMB_TIP]
+        index_tip = hand_landmarks.landmark[INDEX_FINGER_TIP]
+
+        # Odległość "miejska" (suma różnic w poziomie i pionie)
+        distance = abs(thumb_tip.x - index_tip.x) + abs(thumb_tip.y - index_tip.y)
+
+        gesture = "tense" if distance < 0.1 else "relaxed"
+        state["hand_gesture_count"][gesture] += weight
+        if labels is not None:
+            labels.setdefault("gesture", gesture)
+
+        overlay.draw_hands(ctx.bgr, hand_landmarks)
+
+
+def analyze_face(frame, face_mesh, state, draw=True, weight=1, labels=None, resolution=0,
+                 tracker=None):
+    """
+    Analizuje kierunek spojrzenia i pozycję głowy, aktualizuje liczniki.
+
+    Parametry:
+    ----------
+    frame : numpy.ndarray lub FrameContext
+        Klatka w formacie BGR (przy włączonej warstwie "faces" rysujemy na niej kontur twarzy)
+    face_mesh : mediapipe.solutions.face_mesh.FaceMesh
+        Zainicjalizowany obiekt MediaPipe Face Mesh
+    state : dict lub st.session_state
+        Stan analizy z licznikami "eye_direction_count" i "head_movement_count"
+    draw : bool lub overlay.OverlayRenderer
+        Czy rysować kontur twarzy na klatce (warstwa "faces")
+    weight : int
+        Liczba klatek nagrania reprezentowanych przez tę klatkę (próbkowanie)
+    labels : dict lub None
+        Jeśli podano, pod kluczami "gaze" i "head" zapisujemy wynik pierwszej twarzy
+    resolution : int
+        Dłuższy bok obrazu podawanego do Face Mesh (0 = pełna rozdzielczość)
+    tracker : landmark_tracking.LandmarkTracker lub None
+        Śledzenie twarzy (patrz create_trackers()). Każda twarz ma wtedy stały
+        identyfikator: jej spojrzenie i ruchy głowy trafiają również do liczników
+        tej osoby (state["people"]), a przy rysowaniu obok twarzy dodajemy "#id".
+
+    Zwraca:
+    -------
+    list
+        Punkty wykrytych twarzy (pusta lista, gdy nie wykryto twarzy) - można
+        ich użyć do wycięcia twarzy dla analizy emocji. Przy śledzeniu kolejność
+        odpowiada tracker.tracks.
+
+    Uwaga:
+    ------
+    Współrzędne punktów są znormalizowane (0.0 - 1.0) względem rozmiaru klatki.
+    Zmniejszenie obrazu zachowuje proporcje, więc te same współrzędne pasują
+    do pełnej klatki (rysowanie konturów, wycinanie twarzy).
+    """
+    ctx = as_frame_context(frame)
+    faces, person_ids = detect_faces(ctx, face_mesh, resolution, tracker)
+    apply_faces(ctx, faces, state, draw, weight, labels, person_ids)
+    return faces
+
+
+def detect_faces(frame, face_mesh, resolution=0, tracker=None):
+    """
+    Wykrywa twarze w klatce - bez liczników i rysowania (klatka tylko do odczytu).
+
+    Parametry jak w analyze_face().
+
+    Zwraca:
+    -------
+    tuple
+        (punkty twarzy, identyfikatory osób) - identyfikatory tylko przy
+        śledzeniu (w kolejności tracker.tracks), bez niego None
+    """
+    ctx = as_frame_context(frame)
+    if tracker is not None:
+        tracks = tracker.update(ctx, face_mesh, resolution)
+        return [track.landmarks for track in tracks], [track.id for track in tracks]
+    return list(face_mesh.process(ctx.scaled(resolution, "rgb")).multi_face_landmarks or []), None
+
+
+def apply_faces(frame, faces, state, draw=True, weight=1, labels=None, person_ids=None):
+    """Dolicza spojrzenie i ruchy głowy wykrytych twarzy i rysuje ich kontury (patrz analyze_face())."""
+    ctx = as_frame_context(frame)
+    overlay = as_overlay(draw)
+    for position, face_landmarks in enumerate(faces):
+        gaze, head = classify_face(face_landmarks)
+        state["eye_direction_count"][gaze] += weight
+        state["head_movement_count"][head] += weight
+
+        if labels is not None:
+            labels.setdefault("gaze", gaze)
+            labels.setdefault("head", head)
+
+        if person_ids is not None:
+            person = person_stats(state, person_ids[position])
+            person["frame_count"] += weight
+            person["eye_direction_count"][gaze] += weight
+            person["head_movement_count"][head] += weight
+
+        overlay.draw_face(ctx.bgr, face_landmarks, person_ids[position] if person_ids is not None else None)
+
+
+def classify_face(face_landmarks):
+    """
+    Wyznacza kierunek spojrzenia i pozycję głowy z punktów jednej twarzy.
+
+    Zwraca:
+    -------
+    tuple
+        (gaze, head): "left"/"right"/"center" oraz "up"/"down"/"still"
+    """
+    # Kierunek spojrzenia na podstawie pozycji oczu
+    left_eye = face_landmarks.landmark[LEFT_EYE]
+    right_eye = face_landmarks.landmark[RIGHT_EYE]
+
+    if left_eye.x < 0.4:
+        gaze = "left"
+    elif right_eye.x > 0.6:
+        gaze = "right"
+    else:
+        gaze = "center"
+
+    # Pozycja głowy na podstawie współrzędnej y czubka nosa
+    nose_tip = face_landmarks.landmark[NOSE_TIP]
+
+    if nose_tip.y < 0.4:
+        head = "up"
+    elif nose_tip.y > 0.6:
+        head = "down"
+    else:
+        head = "still"
+    return gaze, head
+
+
+def accumulate_emotions(state, emotion_scores, weight=1):
+    """
+    Dodaje wyniki emocji jednej klatki do sum (do obliczenia średniej w raporcie).
+
+    Parametry:
+    ----------
+    state : dict lub st.session_state
+        Stan analizy (albo liczniki jednej osoby - patrz person_stats())
+    emotion_scores : dict
+        Wyniki emocji {emocja: procent}
+    weight : int
+        Liczba klatek nagrania reprezentowanych przez tę klatkę
+    """
+    for emotion, score in emotion_scores.items():
+        state["emotion_totals"][emotion] += score * weight
+    state["emotion_frame_count"] += weight
+
+
+def count_frame(state, weight=1):
+    """Zalicza klatkę (i klatki, które reprezentuje) do liczników analizy."""
+    state["frame_count"] += weight
+    state["analyzed_frame_count"] += 1
+
+
+def facemesh_emotion_crop(ctx, face_landmarks, resolution=0):
+    """
+    Zwraca wycinek twarzy BGR wyznaczony z punktów Face Mesh (albo None).
+
+    Wycinamy z bufora RGB kontekstu klatki w rozdzielczości analizy emocji -
+    powstał on przed narysowaniem czegokolwiek na klatce (patrz
+    prepare_inference_images()), więc kontury i punkty dłoni nie trafiają do
+    wycinka. Konwersja RGB -> BGR dotyczy już tylko małego wycinka.
+    """
+    from emotion_engine import facemesh_face_crop
+
+    crop = facemesh_face_crop(ctx.scaled(resolution, "rgb"), face_landmarks)
+    return None if crop is None else cv2.cvtColor(crop, cv2.COLOR_RGB2BGR)
+
+
+def prepare_inference_images(ctx, settings):
+    """
+    Przygotowuje obrazy dla modeli w ich rozdzielczościach analizy.
+
+    Wywołujemy ją przed rysowaniem nakładek: obrazy są zapamiętane w kontekście
+    klatki do końca jej analizy, więc modele (i wycinki twarzy) widzą czysty
+    obraz. Etapy o tej samej rozdzielczości korzystają z jednego bufora.
+    Po jej wywołaniu modele tylko czytają gotowe bufory - mogą działać
+    równolegle (AnalysisSettings.concurrent_stages).
+    """
+    ctx.scaled(settings.hands_resolution, "rgb")
+    ctx.scaled(settings.face_resolution, "rgb")
+    if settings.face_localization == "facemesh":
+        ctx.scaled(settings.emotion_resolution, "rgb")
+    else:
+        ctx.scaled(settings.emotion_resolution)
+    if settings.detect_every > 1:
+        # Obrazy w odcieniach szarości dla przepływu optycznego (landmark_tracking.py)
+        ctx.scaled(settings.hands_resolution, "gray")
+        ctx.scaled(settings.face_resolution, "gray")
+
+
+# Wątki puli etapów: emocje, dłonie i twarz jednej klatki (co najmniej po jednym na etap)
+STAGE_WORKERS = 3
+
+_stage_pool = None
+_stage_pool_lock = threading.Lock()
+
+
+def _stage_executor():
+    """
+    Pula wątków dla równoległych etapów klatki (tworzona raz na proces).
+
+    Modele zwalniają GIL na czas obliczeń, więc wątki faktycznie działają
+    równolegle. Pula jest wspólna dla sesji aplikacji - ma tyle wątków, ile
+    rdzeni (co najmniej STAGE_WORKERS), aby analizy kilku sesji nie czekały
+    na siebie nawzajem.
+    """
+    global _stage_pool
+    with _stage_pool_lock:
+        if _stage_pool is None:
+            _stage_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(STAGE_WORKERS, os.cpu_count() or 1), thread_name_prefix="stage")
+        return _stage_pool
+
+
+def _timed(timer, stage, function, *args):
+    """Wywołuje function(*args) i zapisuje jej czas jako czas etapu (w wątku puli)."""
+    with timer.measure(stage):
+        return function(*args)
+
+
+def cached_emotion(image, emotion_cache=None, skip_detection=False):
+    """
+    Analizuje emocje obrazu, korzystając z pamięci podręcznej (jeśli podano).
+
+    Gdy twarz wygląda tak samo jak niedawno analizowana, zwracamy zapamiętany
+    wynik bez uruchamiania modelu. "image" musi być wycinkiem twarzy - skrót
+    całej klatki prawie się nie zmienia, gdy zmienia się tylko wyraz twarzy.
+    """
+    if emotion_cache is None:
+        return analyze_emotion(image, skip_detection=skip_detection)
+    return emotion_cache.get_or_compute(
+        image, lambda: analyze_emotion(image, skip_detection=skip_detection))
+
+
+def process_frame(frame, mode, hands, face_mesh, state, draw=True, weight=1, settings=None,
+                  emotion_cache=None, timer=None, trackers=None, emotion_scores=None):
+    """
+    Wykonuje pełną analizę jednej klatki i aktualizuje stan analizy.
+
+    Parametry:
+    ----------
+    frame : numpy.ndarray lub FrameContext
+        Klatka w formacie BGR (w pętli głównej - wielokrotnie używany kontekst)
+    mode : str
+        Tryb analizy (określa treść wpisu w raporcie)
+    hands, face_mesh :
+        Zainicjalizowane obiekty MediaPipe Hands i Face Mesh
+    state : dict lub st.session_state
+        Stan analizy
+    draw : bool lub overlay.OverlayRenderer
+        Czy nanosić wyniki na klatkę: True = wszystkie warstwy, False = bez
+        rysowania, OverlayRenderer = wybrane warstwy (panel emocji, kontury
+        twarzy, dłonie); ten sam obiekt w kolejnych klatkach pozwala rysować
+        panel przyrostowo
+    weight : int
+        Liczba klatek nagrania reprezentowanych przez tę klatkę. Przy próbkowaniu
+        (np. co 3. klatka) wyniki liczymy z wagą 3, aby średnie i liczniki
+        odpowiadały analizie każdej klatki.
+    settings : AnalysisSettings lub None
+        Ustawienia modeli (None = DEFAULT_SETTINGS)
+    emotion_cache : emotion_cache.EmotionCache lub None
+        Pamięć podręczna wyników emocji (patrz create_emotion_cache());
+        używana dla wycinków twarzy - przy lokalizacji "facemesh"
+    timer : stage_timing.StageTimer lub None
+        Pomiar czasu etapów: color, emotion, hands, face, overlay
+    trackers : dict lub None
+        Stan śledzenia z create_trackers() (ten sam obiekt dla kolejnych klatek).
+        Przy lokalizacji "facemesh" emocje liczymy wtedy dla każdej śledzonej
+        twarzy i dodajemy do liczników jej osoby.
+    emotion_scores : dict lub None
+        Emocje tej klatki policzone wcześniej (np. w procesie roboczym, patrz
+        threaded_pipeline.py) - model emocji nie jest wtedy wywoływany.
+        Dotyczy lokalizacji "deepface".
+
+    Zwraca:
+    -------
+    dict lub None
+        Wyniki emocji dla tej klatki (pierwsza twarz); None, gdy analiza emocji
+        została pominięta (lokalizacja "facemesh" i brak twarzy w klatce)
+
+    Uwaga:
+    ------
+    Przy settings.concurrent_stages emocje, dłonie i twarz liczą się równolegle
+    w puli wątków na tej samej, nieruszanej klatce. Liczniki, etykiety i nakładki
+    nanosimy potem w stałej kolejności (emocje, dłonie, twarz) - wynik nie
+    zależy od tego, który etap skończył pierwszy.
+    """
+    settings = settings or DEFAULT_SETTINGS
+    timer = timer or NULL_TIMER
+    overlay = as_overlay(draw)
+    ctx = as_frame_context(frame)
+    count_frame(state, weight)
+    # Przy lokalizacji "deepface" model dostaje całą klatkę, a twarz znajduje
+    # dopiero DeepFace - bez wycinka twarzy pamięć podręczna nie jest używana
+    emotion_needed = emotion_scores is None and settings.face_localization == "deepface"
+
+    # Zmniejszenie i konwersja BGR -> RGB (wspólna dla etapów o tej samej
+    # rozdzielczości) przed narysowaniem czegokolwiek - detektory widzą czysty obraz
+    with timer.measure("color"):
+        prepare_inference_images(ctx, settings)
+    trackers = trackers or {}
+    labels = {}
+    if settings.concurrent_stages:
+        executor = _stage_executor()
+        if emotion_needed:
+            emotion_future = executor.submit(_timed, timer, "emotion", analyze_emotion,
+                                             ctx.scaled(settings.emotion_resolution))
+        hands_future = executor.submit(_timed, timer, "hands", detect_hands, ctx, hands,
+                                       settings.hands_resolution, trackers.get("hands"))
+        face_future = executor.submit(_timed, timer, "face", detect_faces, ctx, face_mesh,
+                                      settings.face_resolution, trackers.get("face"))
+        # Scalenie w stałej kolejności - dopiero teraz modyfikujemy stan i klatkę
+        if emotion_needed:
+            emotion_scores = emotion_future.result()
+        apply_hands(ctx, hands_future.result(), state, overlay, weight, labels)
+        faces, person_ids = face_future.result()
+        apply_faces(ctx, faces, state, overlay, weight, labels, person_ids)
+    else:
+        if emotion_needed:
+            with timer.measure("emotion"):
+                emotion_scores = analyze_emotion(ctx.scaled(settings.emotion_resolution))
+        with timer.measure("hands"):
+            analyze_hands(ctx, hands, state, draw=overlay, weight=weight, labels=labels,
+                          resolution=settings.hands_resolution, tracker=trackers.get("hands"))
+        with timer.measure("face"):
+            faces = analyze_face(ctx, face_mesh, state, draw=overlay, weight=weight, labels=labels,
+                                 resolution=settings.face_resolution, tracker=trackers.get("face"))
+
+    if settings.face_localization == "facemesh" and faces:
+        # Twarz już zlokalizowana przez Face Mesh - DeepFace nie szuka jej ponownie.
+        # Przy śledzeniu analizujemy każdą osobę, bez niego - tylko pierwszą twarz.
+        people = [track.id for track in trackers["face"].tracks] if trackers else []
+        with timer.measure("emotion"):
+            for position, face in enumerate(faces if people else faces[:1]):
+                crop = facemesh_emotion_crop(ctx, face, settings.emotion_resolution)
+                if crop is None:
+                    continue
+                scores = cached_emotion(crop, emotion_cache, skip_detection=True)
+                if emotion_scores is None:
+                    emotion_scores = scores  # Do sum całej analizy - pierwsza oceniona twarz
+                if people:
+                    accumulate_emotions(person_stats(state, people[position]), scores, weight)
+
+    if emotion_scores is not None:
+        accumulate_emotions(state, emotion_scores, weight)
+        if "panel" in overlay.layers:
+            with timer.measure("overlay"):
+                overlay.draw_panel(ctx.bgr, emotion_scores)
+
+    record_frame(state, mode, ctx.index, emotion_scores, labels, weight)
+    return emotion_scores
+
+
+# SEKCJA 5: PĘTLA PRZETWARZANIA WIDEO
+# ==================================================================================
+
+@contextlib.contextmanager
+def open_detectors(settings=None):
+    """
+    Tworzy detektory MediaPipe (Hands i Face Mesh) i zwalnia je po użyciu.
+
+    Parametry:
+    ----------
+    settings : AnalysisSettings lub None
+        Ustawienia modeli - max_faces określa liczbę wykrywanych twarzy
+        i dłoni (None = DEFAULT_SETTINGS: jedna twarz, dwie dłonie)
+
+    Przykład użycia:
+    ----------------
+    with open_detectors() as (hands, face_mesh):
+        process_frame(frame, "Detective", hands, face_mesh, state)
+    """
+    settings = settings or DEFAULT_SETTINGS
+    mp = _mediapipe()
+    with mp.solutions.hands.Hands(max_num_hands=settings.max_faces * HANDS_PER_PERSON,
+                                  min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+                                  min_tracking_confidence=MIN_TRACKING_CONFIDENCE) as hands, \
+            mp.solutions.face_mesh.FaceMesh(max_num_faces=settings.max_faces,
+                                            min_detection_confidence=MIN_DETECTION_CONFIDENCE,
+                                            min_tracking_confidence=MIN_TRACKING_CONFIDENCE) as face_mesh:
+        yield hands, face_mesh
+
+
+def seek_to_frame(cap, frame_index, sampler=None):
+    """
+    Przewija plik wideo do klatki "frame_index" (wznowienie analizy).
+
+    Próbkowanie jest ustawiane tak, jakby klatka poprzedzająca była ostatnią
+    przeanalizowaną - kolejne klatki są wybierane jak w analizie bez przerwy.
+    """
+    if frame_index <= 0:
+        return
+    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+    if sampler is not None:
+        sampler.resume_after(frame_index - 1)
+
+
+def run_analysis_loop(cap, mode, state, hands, face_mesh,
+                      should_continue=None, on_frame=None, draw=True, sampler=None,
+                      settings=None, emotion_cache=None, timer=None, trackers=None,
+                      start_index=0, stop_index=None, checkpoint=None):
+    """
+    Odczytuje kolejne klatki ze źródła wideo i analizuje je aż do końca strumienia.
+
+    Parametry:
+    ----------
+    cap : cv2.VideoCapture
+        Otwarte źródło wideo (kamera lub plik)
+    mode : str
+        Tryb analizy
+    state : dict lub st.session_state
+        Stan analizy aktualizowany po każdej klatce
+    hands, face_mesh :
+        Zainicjalizowane obiekty MediaPipe
+    should_continue : callable lub None
+        Funkcja bez argumentów; gdy zwróci False, pętla się kończy
+        (np. lambda: st.session_state.camera_running)
+    on_frame : callable lub None
+        Funkcja wywoływana po analizie klatki: on_frame(frame, emotion_scores)
+        (emotion_scores może być None - patrz process_frame()). Jeśli zwróci
+        False, pętla się kończy. Tablica "frame" jest buforem używanym ponownie
+        dla następnej klatki - nie należy jej przechowywać.
+    draw : bool lub overlay.OverlayRenderer
+        Czy nanosić wyniki na klatki (patrz process_frame()). Bez on_frame
+        nikt nie zobaczy klatek, więc nic nie jest rysowane.
+    sampler : frame_sampling.FrameSampler lub None
+        Polityka próbkowania klatek; None oznacza analizę każdej klatki.
+        Klatki pominięte są przewijane przez cap.grab() bez dekodowania obrazu.
+    settings : AnalysisSettings lub None
+        Ustawienia modeli (None = DEFAULT_SETTINGS)
+    emotion_cache : emotion_cache.EmotionCache lub None
+        Pamięć podręczna emocji; None = utwórz według ustawień. Przekaż własny
+        obiekt, aby odczytać jego liczniki trafień po zakończeniu pętli.
+    timer : stage_timing.StageTimer lub None
+        Pomiar czasu etapów (dekodowanie, analiza i wyświetlanie - on_frame)
+    trackers : dict lub None
+        Stan śledzenia osób; None = utwórz według ustawień (create_trackers())
+    start_index : int
+        Klatka, od której zacząć (plik jest przewijany - patrz seek_to_frame())
+    stop_index : int lub None
+        Klatka, przed którą skończyć (None = do końca nagrania) - analiza
+        fragmentu nagrania (segment_analysis.py)
+    checkpoint : checkpoint.AnalysisCheckpoint lub None
+        Zapis postępu: partiami w trakcie pętli i na końcu (z oznaczeniem
+        ukończenia, gdy pętla dotarła do końca nagrania)
+
+    Zwraca:
+    -------
+    int
+        Liczba klatek przeanalizowanych w tym wywołaniu
+
+    Uwaga:
+    ------
+    Waga klatki to liczba klatek od poprzedniej analizy (łącznie z bieżącą).
+    Klatki pominięte po ostatniej analizie (na samym końcu nagrania) nie są
+    wliczane - różnica jest mniejsza niż jeden krok próbkowania.
+    """
+    if emotion_cache is None:
+        emotion_cache = create_emotion_cache(settings)
+    if trackers is None:
+        trackers = create_trackers(settings)
+    timer = timer or NULL_TIMER
+    # Jeden obiekt nakładek na całą pętlę - panel emocji rysowany przyrostowo
+    overlay = as_overlay(draw) if on_frame is not None else NO_OVERLAY
+    seek_to_frame(cap, start_index, sampler)
+    processed = 0
+    frame_index = start_index  # Indeks następnej klatki strumienia
+    skipped = 0      # Klatki pominięte od ostatniej analizy
+    finished = False  # Czy dotarliśmy do końca nagrania
+    # Klatka po ostatniej przeanalizowanej - od niej wznawiamy (klatki pominięte
+    # po niej przekażą wagę następnej analizie dopiero po wznowieniu)
+    resume_index = start_index
+    ctx = FrameContext()  # Jeden kontekst (i jeden zestaw buforów) na całą pętlę
+    while ((should_continue is None or should_continue()) and cap.isOpened()
+           and (stop_index is None or frame_index < stop_index)):
+        if sampler is not None and not sampler.should_analyze(frame_index):
+            # Przewiń klatkę bez dekodowania - dużo taniej niż cap.read()
+            if not cap.grab():
+                finished = True
+                break
+            frame_index += 1
+            skipped += 1
+            continue
+
+        with timer.measure("decode"):
+            ok = ctx.read(cap, frame_index)
+        if not ok:
+            finished = True
+            break  # Koniec wideo lub błąd odczytu
+
+        emotion_scores = process_frame(ctx, mode, hands, face_mesh, state,
+                                       draw=overlay, weight=skipped + 1, settings=settings,
+                                       emotion_cache=emotion_cache, timer=timer,
+                                       trackers=trackers)
+        timer.mark_frame(frame_index)
+        processed += 1
+        frame_index += 1
+        skipped = 0
+        resume_index = frame_index
+        if checkpoint is not None:
+            checkpoint.maybe_save(state, frame_index)
+
+        if on_frame is not None:
+            with timer.measure("display"):
+                keep_going = on_frame(ctx.bgr, emotion_scores)
+            if keep_going is False:
+                break
+
+    if checkpoint is not None:
+        checkpoint.save(state, frame_index if finished else resume_index, complete=finished)
+    return processed
+
+
+def run_batched_analysis_loop(cap, mode, state, hands, face_mesh, engine,
+                              should_continue=None, sampler=None, settings=None,
+                              emotion_cache=None, timer=None, trackers=None,
+                              start_index=0, stop_index=None, checkpoint=None):
+    """
+    Analizuje plik wideo, wywołując model emocji raz na wiele klatek (bez podglądu).
+
+    Wersja pętli dla analizy offline: MediaPipe (dłonie, twarz) działa na każdej
+    klatce od razu, a wycinki twarzy są zbierane i przekazywane do modelu emocji
+    partiami po engine.batch_size. Wyniki emocji trafiają do stanu w kolejności
+    klatek, gdy partia zostanie przeanalizowana.
+
+    Parametry:
+    ----------
+    cap, mode, state, hands, face_mesh, should_continue, sampler, settings, emotion_cache, timer,
+    trackers, start_index, stop_index, checkpoint :
+        Jak w run_analysis_loop(). Postęp jest zapisywany tylko wtedy, gdy
+        żadna klatka nie czeka na model emocji (zaraz po przeanalizowaniu partii). Czas wywołania modelu dla partii jest dzielony
+        równo między jej klatki (etap "emotion"). Z pamięci podręcznej korzysta pierwsza twarz
+        klatki (ta, której wynik trafia do sum) - przy trafieniu klatka w ogóle
+        nie trafia do partii modelu (przy śledzeniu trafiają tylko twarze
+        pozostałych osób).
+    engine : emotion_engine.BatchEmotionEngine
+        Silnik emocji z detektorem twarzy i modelem. Przy lokalizacji
+        "facemesh" detektor silnika nie jest używany - wycinki powstają
+        z punktów Face Mesh (wszystkie twarze wykryte w klatce).
+
+    Zwraca:
+    -------
+    int
+        Liczba przeanalizowanych klatek
+
+    Uwaga:
+    ------
+    Ta pętla nie rysuje wyników na klatkach - emocje są znane dopiero po
+    przeanalizowaniu całej partii, gdy bufor klatki zawiera już inny obraz.
+    """
+    from emotion_engine import preprocess_face
+
+    # Dla klatek czekających na model emocji: (indeks, waga, etykiety, liczba
+    # twarzy w partii, skrót pierwszej twarzy, wynik z pamięci podręcznej lub None,
+    # identyfikatory osób kolejnych twarzy - puste bez śledzenia)
+    pending = []
+    prepared = []  # Przygotowane wycinki 48x48 wszystkich oczekujących klatek
+
+    def flush():
+        start = time.perf_counter()
+        scores = engine.predict_prepared(prepared) if prepared else []
+        per_frame = (time.perf_counter() - start) / len(pending)
+        for _ in pending:
+            timer.record("emotion", per_frame)
+        position = 0
+        for index, weight, labels, face_count, signature, cached, people in pending:
+            frame_scores = scores[position:position + face_count]
+            position += face_count
+            if cached is not None:
+                frame_scores = [cached] + frame_scores  # Pierwsza twarz z pamięci
+            elif frame_scores:
+                cached = frame_scores[0]
+                if signature is not None:
+                    emotion_cache.store(signature, cached)
+            # Jak w analyze_emotion(): do sum trafia pierwsza twarz klatki.
+            # Brak twarzy (lokalizacja "facemesh") - emocje pominięte.
+            if cached is not None:
+                accumulate_emotions(state, cached, weight)
+            for person_id, person_scores in zip(people, frame_scores):
+                accumulate_emotions(person_stats(state, person_id), person_scores, weight)
+            record_frame(state, mode, index, cached, labels, weight)
+        pending.clear()
+        prepared.clear()
+
+    settings = settings or DEFAULT_SETTINGS
+    if emotion_cache is None:
+        emotion_cache = create_emotion_cache(settings)
+    if trackers is None:
+        trackers = create_trackers(settings)
+    timer = timer or NULL_TIMER
+    seek_to_frame(cap, start_index, sampler)
+    processed = 0
+    frame_index = start_index
+    skipped = 0
+    finished = False
+    resume_index = start_index
+    ctx = FrameContext()
+    while ((should_continue is None or should_continue()) and cap.isOpened()
+           and (stop_index is None or frame_index < stop_index)):
+        if sampler is not None and not sampler.should_analyze(frame_index):
+            if not cap.grab():
+                finished = True
+                break
+            frame_index += 1
+            skipped += 1
+            continue
+
+        with timer.measure("decode"):
+            ok = ctx.read(cap, frame_index)
+        if not ok:
+            finished = True
+            break
+
+        weight = skipped + 1
+        count_frame(state, weight)
+        with timer.measure("color"):
+            prepare_inference_images(ctx, settings)
+        labels = {}
+        with timer.measure("hands"):
+            analyze_hands(ctx, hands, state, draw=False, weight=weight, labels=labels,
+                          resolution=settings.hands_resolution,
+                          tracker=trackers["hands"] if trackers else None)
+        with timer.measure("face"):
+            landmarks = analyze_face(ctx, face_mesh, state, draw=False, weight=weight, labels=labels,
+                                     resolution=settings.face_resolution,
+                                     tracker=trackers["face"] if trackers else None)
+
+        people = []
+        if settings.face_localization == "facemesh":
+            ids = [track.id for track in trackers["face"].tracks] if trackers else [None] * len(landmarks)
+            pairs = [(person_id, facemesh_emotion_crop(ctx, face, settings.emotion_resolution))
+                     for person_id, face in zip(ids, landmarks)]
+            pairs = [(person_id, crop) for person_id, crop in pairs if crop is not None]
+            crops = [crop for _, crop in pairs]
+            if trackers:
+                people = [person_id for person_id, _ in pairs]
+        else:
+            crops = engine.detector(ctx.scaled(settings.emotion_resolution))
+
+        signature = cached = None
+        if emotion_cache is not None and crops:
+            signature = image_signature(crops[0])
+            cached = emotion_cache.lookup(signature)
+
+        # Wycinki przygotowujemy od razu - bufor klatki zostanie nadpisany
+        if cached is not None:
+            faces = [preprocess_face(crop) for crop in crops[1:]] if people else []
+            pending.append((frame_index, weight, labels, len(faces), None, cached, people))
+        else:
+            faces = [preprocess_face(crop) for crop in crops]
+            pending.append((frame_index, weight, labels, len(faces), signature, None, people))
+        prepared.extend(faces)
+        if len(prepared) >= engine.batch_size:
+            flush()
+
+        timer.mark_frame(frame_index)
+        processed += 1
+        frame_index += 1
+        skipped = 0
+        resume_index = frame_index
+        if checkpoint is not None and not pending:
+            checkpoint.maybe_save(state, frame_index)
+
+    if pending:
+        flush()
+    if checkpoint is not None:
+        checkpoint.save(state, frame_index if finished else resume_index, complete=finished)
+    return processed
+
+
+# SEKCJA 6: PODSUMOWANIE WYNIKÓW
+# ==================================================================================
+
+def average_emotion_scores(state):
+    """
+    Oblicza średnie wartości emocji ze wszystkich przeanalizowanych klatek.
+
+    Zwraca:
+    -------
+    dict
+        {emocja: średni procent}; przy braku klatek wszystkie średnie wynoszą 0
+
+    Uwaga:
+    ------
+    Dzielimy przez liczbę klatek, dla których zmierzono emocje (emotion_frame_count),
+    a nie przez wszystkie klatki - klatki bez twarzy nie zaniżają średnich.
+    Działa również dla liczników jednej osoby (person_stats()).
+    """
+    # Zabezpieczenie przed dzieleniem przez zero
+    emotion_frame_count = state["emotion_frame_count"] or 1
+    return {emotion: score / emotion_frame_count
+            for emotion, score in state["emotion_totals"].items()}
+
+
+def summarize_state(state):
+    """
+    Zwraca podsumowanie analizy w postaci słownika gotowego do zapisu jako JSON.
+
+    Zwraca:
+    -------
+    dict
+        Liczba klatek, średnie emocji, liczniki zachowań, podsumowanie osób
+        (przy śledzeniu), statystyki strumieniowe ("trend" - patrz
+        StreamingStats.snapshot()) i wpisy raportu
+    """
+    return {
+        "frame_count": state["frame_count"],
+        "analyzed_frame_count": state["analyzed_frame_count"],
+        "emotion_frame_count": state["emotion_frame_count"],
+        "average_emotions": average_emotion_scores(state),
+        "hand_gesture_count": dict(state["hand_gesture_count"]),
+        "eye_direction_count": dict(state["eye_direction_count"]),
+        "head_movement_count": dict(state["head_movement_count"]),
+        "people": summarize_people(state),
+        "trend": state["live_stats"].snapshot(),
+        "behavior_report": report_lines(state),
+    }
+
+
+def summarize_people(state):
+    """
+    Podsumowanie każdej śledzonej osoby (pusta lista bez śledzenia).
+
+    Zwraca:
+    -------
+    list[dict]
+        Dla każdej osoby (rosnąco według identyfikatora): id, frame_count,
+        emotion_frame_count, average_emotions i liczniki spojrzenia oraz głowy
+    """
+    return [{
+        "id": person_id,
+        "frame_count": person["frame_count"],
+        "emotion_frame_count": person["emotion_frame_count"],
+        "average_emotions": average_emotion_scores(person),
+        "eye_direction_count": dict(person["eye_direction_count"]),
+        "head_movement_count": dict(person["head_movement_count"]),
+    } for person_id, person in sorted(state.get("people", {}).items())]
+
+
+def analyze_video_file(path, mode="Detective", draw=False,
+                       sampling_policy="all", sampling_value=None, emotion_batch_size=1,
+                       settings=None, timer=None, checkpoint_dir=None):
+    """
+    Analizuje cały plik wideo bez interfejsu użytkownika.
+
+    Parametry:
+    ----------
+    path : str
+        Ścieżka do pliku wideo
+    mode : str
+        Tryb analizy
+    draw : bool
+        Pozostawione dla zgodności - analiza pliku nie wyświetla klatek, więc
+        nakładki nie są rysowane (patrz run_analysis_loop())
+    sampling_policy, sampling_value :
+        Polityka próbkowania klatek (patrz frame_sampling.FrameSampler)
+    emotion_batch_size : int
+        Liczba twarzy analizowanych jednym wywołaniem modelu emocji. Dla
+        wartości > 1 używamy run_batched_analysis_loop() (bez rysowania).
+    settings : AnalysisSettings lub None
+        Ustawienia modeli (None = DEFAULT_SETTINGS)
+    timer : stage_timing.StageTimer lub None
+        Pomiar czasu etapów; gdy podany, podsumowanie zawiera "stage_timings"
+    checkpoint_dir : str, Path lub None
+        Katalog punktów kontrolnych (checkpoint.py). Gdy podany, postęp jest
+        zapisywany partiami, przerwana analiza tego samego pliku jest
+        kontynuowana od zapisanej klatki, a ukończona - tylko wczytywana
+        (bez uruchamiania modeli). None = bez punktów kontrolnych.
+
+    Zwraca:
+    -------
+    dict
+        Podsumowanie analizy (patrz summarize_state()) uzupełnione o ścieżkę
+        pliku, tryb, (gdy włączone) liczniki pamięci podręcznej emocji,
+        śledzenia osób i punktu kontrolnego oraz (gdy podano timer) czasy etapów
+
+    Wyjątki:
+    --------
+    IOError
+        Gdy pliku nie da się otworzyć
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise IOError(f"Nie można otworzyć pliku wideo: {path}")
+
+    sampler = FrameSampler(sampling_policy, sampling_value,
+                           source_fps=cap.get(cv2.CAP_PROP_FPS))
+    state = new_analysis_state()
+    checkpoint = None
+    start_index = 0
+    if checkpoint_dir is not None:
+        from checkpoint import AnalysisCheckpoint
+        checkpoint = AnalysisCheckpoint.for_video(path, mode, settings, sampler, directory=checkpoint_dir)
+        start_index = checkpoint.load(state)
+    emotion_cache = create_emotion_cache(settings)
+    trackers = create_trackers(settings, first_id=next_person_id(state))
+    try:
+        if checkpoint is None or not checkpoint.complete:
+            with open_detectors(settings) as (hands, face_mesh):
+                if emotion_batch_size > 1:
+                    from emotion_engine import BatchEmotionEngine
+                    engine = BatchEmotionEngine(batch_size=emotion_batch_size)
+                    run_batched_analysis_loop(cap, mode, state, hands, face_mesh, engine,
+                                              sampler=sampler, settings=settings,
+                                              emotion_cache=emotion_cache, timer=timer,
+                                              trackers=trackers, start_index=start_index,
+                                              checkpoint=checkpoint)
+                else:
+                    run_analysis_loop(cap, mode, state, hands, face_mesh, draw=draw,
+                                      sampler=sampler, settings=settings,
+                                      emotion_cache=emotion_cache, timer=timer,
+                                      trackers=trackers, start_index=start_index,
+                                      checkpoint=checkpoint)
+    finally:
+        cap.release()
+        if checkpoint is not None:
+            checkpoint.close()
+
+    summary = summarize_state(state)
+    summary["video"] = str(path)
+    summary["mode"] = mode
+    summary["sampling"] = sampler.describe()
+    if emotion_cache is not None:
+        summary["emotion_cache"] = dict(emotion_cache.stats, hit_rate=emotion_cache.hit_rate)
+    if trackers is not None:
+        summary["tracking"] = {name: dict(tracker.stats) for name, tracker in trackers.items()}
+    if checkpoint is not None:
+        summary["checkpoint"] = {"path": str(checkpoint.path), "resumed_from": start_index,
+                                 "complete": checkpoint.complete}
+    if timer is not None:
+        summary["stage_timings"] = timer.summary()
+    return summary
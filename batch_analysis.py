@@ -0,0 +1,342 @@
+# ==================================================================================
+# ANALIZA WSADOWA - przetwarzanie wielu plików wideo bez interfejsu Streamlit
+# ==================================================================================
+# Ten moduł pozwala przeanalizować wiele nagrań naraz (np. w nocy na serwerze).
+# Pliki są rozdzielane między procesy robocze (multiprocessing), dzięki czemu
+# wykorzystujemy wszystkie rdzenie procesora. Dla każdego nagrania zapisywany
+# jest osobny plik JSON z wynikami.
+#
+# Użycie z wiersza poleceń:
+#   python batch_analysis.py nagrania/ --output wyniki/ --mode Interview --workers 4
+#
+# Użycie z poziomu Pythona:
+#   from batch_analysis import analyze_files
+#   analyze_files(["nagrania/"], "wyniki/", mode="Interview")
+# ==================================================================================
+
+import argparse  # argparse - obsługa argumentów wiersza poleceń
+import json  # json - zapis wyników do plików
+import multiprocessing  # multiprocessing - kontekst "spawn" dla procesów roboczych
+import os  # os - liczba rdzeni, zmienne środowiskowe
+import sys  # sys - kod wyjścia programu
+from concurrent.futures import ProcessPoolExecutor, as_completed  # Pula procesów
+from pathlib import Path  # Path - wygodna praca ze ścieżkami
+
+import analysis_core  # Rdzeń analizy (bez Streamlit)
+from emotion_backends import BACKEND_ENV, BACKENDS, ONNX_MODEL_ENV
+from frame_sampling import SAMPLING_POLICIES, FrameSampler  # Próbkowanie klatek
+from stage_timing import StageTimer  # Czasy etapów analizy (--profile)
+from worker_threads import init_worker  # Podział wątków bibliotek między procesy
+
+# Rozszerzenia plików wideo akceptowane przez aplikację
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov")
+
+
+# SEKCJA 1: WYSZUKIWANIE PLIKÓW
+# ==================================================================================
+
+def collect_video_files(inputs, recursive=False):
+    """
+    Zamienia listę plików i katalogów na listę plików wideo.
+
+    Parametry:
+    ----------
+    inputs : list
+        Ścieżki do plików wideo lub katalogów z nagraniami
+    recursive : bool
+        Czy przeszukiwać katalogi rekurencyjnie
+
+    Zwraca:
+    -------
+    list[Path]
+        Posortowana lista plików wideo (bez duplikatów)
+
+    Wyjątki:
+    --------
+    FileNotFoundError
+        Gdy któraś ze ścieżek nie istnieje
+    """
+    found = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pattern = "**/*" if recursive else "*"
+            found.extend(p for p in path.glob(pattern)
+                         if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS)
+        elif path.is_file():
+            found.append(path)
+        else:
+            raise FileNotFoundError(f"Nie znaleziono pliku ani katalogu: {item}")
+
+    # Usuń duplikaty zachowując stabilną kolejność
+    return sorted(set(p.resolve() for p in found))
+
+
+def plan_output_paths(videos, output_dir):
+    """
+    Przypisuje każdemu nagraniu ścieżkę pliku wynikowego "<nazwa>.json".
+
+    Jeśli dwa nagrania mają tę samą nazwę (w różnych katalogach), kolejne
+    otrzymują przyrostek _2, _3 itd., aby wyniki się nie nadpisywały.
+    """
+    output_dir = Path(output_dir)
+    used = {}
+    plan = []
+    for video in videos:
+        stem = video.stem
+        used[stem] = used.get(stem, 0) + 1
+        name = stem if used[stem] == 1 else f"{stem}_{used[stem]}"
+        plan.append((video, output_dir / f"{name}.json"))
+    return plan
+
+
+# SEKCJA 2: PRACA POJEDYNCZEGO PROCESU
+# ==================================================================================
+
+def _analyze_one(video, output_path, mode, options):
+    """Analizuje jedno nagranie i zapisuje wynik do pliku JSON."""
+    options = dict(options)
+    segments = options.pop("segments", 1)
+    if segments > 1:
+        # Jedno nagranie na wielu procesach (bez pomiaru etapów i punktów kontrolnych)
+        from segment_analysis import analyze_video_segments
+        options.pop("profile", None)
+        options.pop("checkpoint_dir", None)
+        summary = analyze_video_segments(video, mode=mode, segments=segments, workers=segments, **options)
+    else:
+        if options.pop("profile", False):
+            options["timer"] = StageTimer()  # Osobny pomiar dla każdego nagrania
+        summary = analysis_core.analyze_video_file(video, mode=mode, **options)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary["frame_count"]
+
+
+# SEKCJA 3: GŁÓWNA FUNKCJA
+# ==================================================================================
+
+def analyze_files(inputs, output_dir, mode="Detective", workers=None,
+                  recursive=False, skip_existing=False,
+                  sampling_policy="all", sampling_value=None, emotion_batch_size=1,
+                  face_localization="deepface", emotion_cache_size=0, emotion_cache_distance=4,
+                  emotion_resolution=0, hands_resolution=0, face_resolution=0,
+                  max_faces=1, detect_every=1, concurrent_stages=False, profile=False,
+                  checkpoint_dir=None, segments=1):
+    """
+    Analizuje wiele plików wideo równolegle i zapisuje jeden plik JSON na nagranie.
+
+    Parametry:
+    ----------
+    inputs : list
+        Pliki wideo lub katalogi z nagraniami
+    output_dir : str lub Path
+        Katalog na pliki wynikowe
+    mode : str
+        Tryb analizy ("Detective", "Student Behavior", "Interview")
+    workers : int lub None
+        Liczba procesów roboczych (domyślnie liczba rdzeni).
+        Dla workers=1 analiza odbywa się w bieżącym procesie.
+    recursive : bool
+        Czy przeszukiwać katalogi rekurencyjnie
+    skip_existing : bool
+        Czy pomijać nagrania, dla których plik wynikowy już istnieje
+    sampling_policy, sampling_value :
+        Polityka próbkowania klatek (patrz frame_sampling.FrameSampler)
+    emotion_batch_size : int
+        Liczba twarzy analizowanych jednym wywołaniem modelu emocji
+    face_localization : str
+        Sposób lokalizacji twarzy dla analizy emocji ("deepface" lub "facemesh")
+    emotion_cache_size, emotion_cache_distance :
+        Pamięć podręczna emocji (patrz analysis_core.AnalysisSettings)
+    emotion_resolution, hands_resolution, face_resolution : int
+        Rozdzielczość analizy poszczególnych modeli - dłuższy bok w pikselach
+        (0 = pełna rozdzielczość nagrania)
+    max_faces, detect_every : int
+        Liczba analizowanych osób i co ile klatek uruchamiać detektory MediaPipe
+        (patrz analysis_core.AnalysisSettings); przy śledzeniu plik JSON zawiera
+        podsumowanie każdej osoby ("people")
+    concurrent_stages : bool
+        Czy analizować emocje, dłonie i twarz jednej klatki równolegle (patrz
+        analysis_core.AnalysisSettings); przy emotion_batch_size > 1 model emocji
+        działa partiami, więc opcja nie ma wpływu
+    profile : bool
+        Czy mierzyć czasy etapów analizy (klucz "stage_timings" w pliku JSON)
+    checkpoint_dir : str, Path lub None
+        Katalog punktów kontrolnych - przerwana analiza nagrania jest przy
+        ponownym uruchomieniu kontynuowana od zapisanej klatki (patrz checkpoint.py)
+    segments : int
+        Liczba segmentów, na które dzielone jest każde nagranie (segment_analysis.py).
+        Dla wartości > 1 segmenty jednego nagrania analizują osobne procesy,
+        a nagrania są przetwarzane po kolei (workers jest pomijane).
+
+    Zwraca:
+    -------
+    list[dict]
+        Status każdego nagrania: {"video", "output", "status", "frames", "error"},
+        gdzie status to "ok", "skipped" lub "error"
+    """
+    if mode not in analysis_core.MODES:
+        raise ValueError(f"Nieznany tryb analizy: {mode}")
+    # Sprawdź poprawność polityki przed uruchomieniem procesów
+    FrameSampler(sampling_policy, sampling_value)
+    settings = analysis_core.AnalysisSettings(face_localization=face_localization,
+                                              emotion_cache_size=emotion_cache_size,
+                                              emotion_cache_distance=emotion_cache_distance,
+                                              emotion_resolution=emotion_resolution,
+                                              hands_resolution=hands_resolution,
+                                              face_resolution=face_resolution,
+                                              max_faces=max_faces,
+                                              detect_every=detect_every,
+                                              concurrent_stages=concurrent_stages)
+    # Ustawienia przekazywane do analysis_core.analyze_video_file() w każdym procesie
+    options = {"sampling_policy": sampling_policy, "sampling_value": sampling_value,
+               "emotion_batch_size": emotion_batch_size, "settings": settings,
+               "profile": profile, "checkpoint_dir": checkpoint_dir, "segments": segments}
+
+    plan = plan_output_paths(collect_video_files(inputs, recursive), output_dir)
+    results = {}
+    todo = []
+    for video, output_path in plan:
+        if skip_existing and output_path.exists():
+            results[video] = {"video": str(video), "output": str(output_path),
+                              "status": "skipped", "frames": None, "error": None}
+        else:
+            todo.append((video, output_path))
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, len(todo) or 1))
+    if segments > 1:
+        workers = 1  # Procesy robocze tworzy analiza segmentów każdego nagrania
+
+    def record(video, output_path, frames=None, error=None):
+        results[video] = {"video": str(video), "output": str(output_path),
+                          "status": "error" if error else "ok",
+                          "frames": frames, "error": error}
+
+    if workers == 1:
+        for video, output_path in todo:
+            try:
+                record(video, output_path, frames=_analyze_one(video, output_path, mode, options))
+            except Exception as e:
+                record(video, output_path, error=str(e))
+    else:
+        # Wątki bibliotek dzielimy równo między procesy
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        # "spawn" - każdy proces startuje od zera (bezpieczne z TensorFlow na każdym systemie)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=init_worker,
+                                 initargs=(threads_per_worker,)) as executor:
+            futures = {executor.submit(_analyze_one, video, output_path, mode, options): (video, output_path)
+                       for video, output_path in todo}
+            for future in as_completed(futures):
+                video, output_path = futures[future]
+                try:
+                    record(video, output_path, frames=future.result())
+                except Exception as e:
+                    record(video, output_path, error=str(e))
+
+    return [results[video] for video, _ in plan]
+
+
+# SEKCJA 4: INTERFEJS WIERSZA POLECEŃ
+# ==================================================================================
+
+def main(argv=None):
+    """Punkt wejścia CLI. Zwraca kod wyjścia (0 = sukces, 1 = błędy analizy)."""
+    parser = argparse.ArgumentParser(
+        description="Wsadowa analiza emocji i zachowania w plikach wideo.")
+    parser.add_argument("inputs", nargs="+", help="Pliki wideo lub katalogi z nagraniami")
+    parser.add_argument("-o", "--output", default="wyniki", help="Katalog na pliki JSON z wynikami")
+    parser.add_argument("-m", "--mode", default="Detective", choices=analysis_core.MODES,
+                        help="Tryb analizy")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Liczba procesów roboczych (domyślnie: liczba rdzeni)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Przeszukuj katalogi rekurencyjnie")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="Pomiń nagrania, które mają już plik wynikowy")
+    parser.add_argument("--sampling", default="all", choices=SAMPLING_POLICIES,
+                        help="Polityka próbkowania klatek")
+    parser.add_argument("--sampling-value", type=float, default=None,
+                        help="Parametr próbkowania: krok (stride), analiz/s (fps) lub sekundy (interval)")
+    parser.add_argument("--emotion-batch", type=int, default=1,
+                        help="Liczba twarzy analizowanych jednym wywołaniem modelu emocji")
+    parser.add_argument("--face-localization", default="deepface",
+                        choices=analysis_core.FACE_LOCALIZATIONS,
+                        help="Lokalizacja twarzy dla emocji: detektor DeepFace lub punkty Face Mesh")
+    parser.add_argument("--emotion-cache", type=int, default=0,
+                        help="Liczba twarzy w pamięci podręcznej emocji (0 = wyłączona); działa na "
+                             "wycinkach twarzy: przy --face-localization facemesh lub --emotion-batch > 1")
+    parser.add_argument("--emotion-cache-distance", type=int, default=4,
+                        help="Próg podobieństwa twarzy w bitach skrótu (0-64)")
+    parser.add_argument("--emotion-resolution", type=int, default=0,
+                        help="Dłuższy bok obrazu dla modelu emocji w pikselach (0 = pełna rozdzielczość)")
+    parser.add_argument("--hands-resolution", type=int, default=0,
+                        help="Dłuższy bok obrazu dla MediaPipe Hands (0 = pełna rozdzielczość)")
+    parser.add_argument("--face-resolution", type=int, default=0,
+                        help="Dłuższy bok obrazu dla Face Mesh (0 = pełna rozdzielczość)")
+    parser.add_argument("--max-faces", type=int, default=1,
+                        help="Największa liczba analizowanych osób (każda ze stałym identyfikatorem)")
+    parser.add_argument("--detect-every", type=int, default=1,
+                        help="Uruchamiaj detektory MediaPipe co N klatek, pomiędzy śledź punkty")
+    parser.add_argument("--concurrent-stages", action="store_true",
+                        help="Analizuj emocje, dłonie i twarz jednej klatki równolegle (pula wątków)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Zapisz czasy etapów analizy (p50/p95, fps) w plikach JSON")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="Katalog punktów kontrolnych - przerwaną analizę wznawiaj od zapisanej klatki")
+    parser.add_argument("--segments", type=int, default=1,
+                        help="Dziel każde nagranie na N segmentów analizowanych równolegle (długie pliki)")
+    parser.add_argument("--emotion-backend", default=None, choices=BACKENDS,
+                        help="Backend modelu emocji (domyślnie: zmienna EMO_EMOTION_BACKEND lub deepface)")
+    parser.add_argument("--onnx-model", default=None,
+                        help="Plik .onnx sieci emocji dla backendu onnx (patrz emotion_backends.py)")
+    args = parser.parse_args(argv)
+
+    # Procesy robocze ("spawn") dziedziczą zmienne środowiskowe - przez nie
+    # przekazujemy wybór backendu do puli modeli każdego procesu
+    if args.emotion_backend:
+        os.environ[BACKEND_ENV] = args.emotion_backend
+    if args.onnx_model:
+        os.environ[ONNX_MODEL_ENV] = args.onnx_model
+
+    sampling_value = args.sampling_value
+    if args.sampling == "stride" and sampling_value is not None:
+        sampling_value = int(sampling_value)
+
+    results = analyze_files(args.inputs, args.output, mode=args.mode, workers=args.workers,
+                            recursive=args.recursive, skip_existing=args.skip_existing,
+                            sampling_policy=args.sampling, sampling_value=sampling_value,
+                            emotion_batch_size=args.emotion_batch,
+                            face_localization=args.face_localization,
+                            emotion_cache_size=args.emotion_cache,
+                            emotion_cache_distance=args.emotion_cache_distance,
+                            emotion_resolution=args.emotion_resolution,
+                            hands_resolution=args.hands_resolution,
+                            face_resolution=args.face_resolution,
+                            max_faces=args.max_faces,
+                            detect_every=args.detect_every,
+                            concurrent_stages=args.concurrent_stages,
+                            profile=args.profile,
+                            checkpoint_dir=args.checkpoint_dir,
+                            segments=args.segments)
+
+    failed = 0
+    for item in results:
+        if item["status"] == "ok":
+            print(f"✅ {item['video']} -> {item['output']} ({item['frames']} klatek)")
+        elif item["status"] == "skipped":
+            print(f"⏭️  {item['video']} (pominięto - wynik już istnieje)")
+        else:
+            failed += 1
+            print(f"❌ {item['video']}: {item['error']}")
+
+    print(f"Przeanalizowano {len(results) - failed}/{len(results)} nagrań.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,460 @@
+# ==================================================================================
+# TESTY WYDAJNOŚCI - pomiar przepustowości analizy na syntetycznych nagraniach
+# ==================================================================================
+# Ten moduł generuje syntetyczne nagrania w kilku rozdzielczościach i długościach
+# i przepuszcza je przez tę samą ścieżkę, której używa aplikacja przy analizie
+# pliku (start_analysis w emo.py): próbkowanie klatek, rozgrzewka modeli,
+# detektory MediaPipe i potok wielowątkowy z polityką "block" i domyślnym
+# podglądem - tylko bez przeglądarki (wyświetlenie to samo kodowanie podglądu).
+#
+# Dla każdego przypadku zapisywane są: liczba klatek na sekundę, czasy etapów
+# (p50/p95 - patrz stage_timing.py) i szczytowe zużycie pamięci. Wyniki trafiają
+# do pliku JSON, który można porównać z wcześniejszym przebiegiem - program
+# kończy się błędem, gdy przepustowość spadła bardziej niż o zadany próg.
+#
+# Gdy DeepFace lub MediaPipe nie są zainstalowane (np. w CI), używane są
+# deterministyczne atrapy modeli. Mierzą one narzut samego potoku (odczyt,
+# konwersje, rysowanie, kolejki) - wyniki z atrapami porównujemy tylko
+# z wynikami z atrapami.
+#
+# Użycie z wiersza poleceń:
+#   python benchmark.py --output wyniki_wydajnosci.json
+#   python benchmark.py --baseline poprzednie.json --tolerance 0.15
+# ==================================================================================
+
+import argparse  # argparse - obsługa argumentów wiersza poleceń
+import dataclasses  # dataclasses - opis przypadku testowego
+import datetime  # datetime - znacznik czasu wyników
+import importlib.util  # importlib.util - sprawdzenie, czy modele są zainstalowane
+import json  # json - zapis i odczyt wyników
+import platform  # platform - opis maszyny w wynikach
+import sys  # sys - kod wyjścia programu
+import tempfile  # tempfile - domyślny katalog na nagrania
+import time  # time - pomiar czasu analizy
+import tracemalloc  # tracemalloc - szczytowe zużycie pamięci
+from pathlib import Path  # Path - wygodna praca ze ścieżkami
+from types import SimpleNamespace  # SimpleNamespace - atrapy modułów i wyników
+
+import cv2  # OpenCV - zapis i odczyt nagrań
+import numpy as np  # NumPy - generowanie klatek
+
+import analysis_core  # Rdzeń analizy (bez Streamlit)
+import model_pool  # Pula modeli - podmiana modeli na atrapy
+from emotion_backends import DeepFaceBackend  # Backend emocji korzystający z atrapy DeepFace
+from frame_records import EMOTIONS  # Kolejność emocji
+from frame_sampling import FrameSampler  # Próbkowanie klatek (jak w aplikacji)
+from preview import FramePreview  # Podgląd z domyślnymi ustawieniami aplikacji
+from stage_timing import StageTimer, summary_lines  # Czasy etapów
+from threaded_pipeline import ThreadedAnalysisPipeline  # Potok używany przez aplikację
+
+# Domyślny dopuszczalny spadek liczby klatek na sekundę względem poprzednich wyników
+DEFAULT_TOLERANCE = 0.15
+
+
+@dataclasses.dataclass(frozen=True)
+class BenchmarkCase:
+    """
+    Jeden przypadek testu wydajności: syntetyczne nagranie o zadanym rozmiarze.
+
+    Atrybuty:
+    ---------
+    name : str
+        Nazwa przypadku (klucz przy porównywaniu wyników)
+    width, height : int
+        Rozdzielczość nagrania w pikselach
+    frames : int
+        Liczba klatek nagrania
+    fps : float
+        Liczba klatek na sekundę zapisana w pliku
+    """
+
+    name: str
+    width: int
+    height: int
+    frames: int
+    fps: float = 25.0
+
+
+# Domyślne przypadki: rosnąca rozdzielczość oraz krótkie i dłuższe nagranie
+DEFAULT_CASES = (
+    BenchmarkCase("480p-short", 640, 480, 50),
+    BenchmarkCase("480p-long", 640, 480, 250),
+    BenchmarkCase("720p", 1280, 720, 50),
+    BenchmarkCase("1080p", 1920, 1080, 50),
+)
+
+
+# SEKCJA 1: SYNTETYCZNE NAGRANIA
+# ==================================================================================
+
+def make_synthetic_video(path, case):
+    """
+    Zapisuje syntetyczne nagranie: gradient tła i jasna elipsa ("twarz") w ruchu.
+
+    Treść zależy tylko od numeru klatki, więc każdy przebieg analizuje te same
+    obrazy. Ruch elipsy sprawia, że kolejne klatki się różnią (np. pamięć
+    podręczna emocji nie trafia za każdym razem).
+
+    Parametry:
+    ----------
+    path : str lub Path
+        Ścieżka pliku (.avi, kodek MJPG)
+    case : BenchmarkCase
+        Rozmiar i długość nagrania
+
+    Zwraca:
+    -------
+    Path
+        Ścieżka zapisanego pliku
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), case.fps,
+                             (case.width, case.height))
+    if not writer.isOpened():
+        raise IOError(f"Nie można zapisać nagrania: {path}")
+
+    gradient = np.linspace(40, 120, case.width, dtype=np.uint8)
+    background = np.empty((case.height, case.width, 3), dtype=np.uint8)
+    background[:] = gradient[None, :, None]
+    axes = (case.width // 8, case.height // 5)
+    try:
+        for i in range(case.frames):
+            frame = background.copy()
+            phase = 2 * np.pi * i / max(case.frames, 1)
+            center = (int(case.width * (0.5 + 0.2 * np.sin(phase))),
+                      int(case.height * (0.5 + 0.1 * np.cos(phase))))
+            cv2.ellipse(frame, center, axes, 0, 0, 360, (180, 190, 220), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def ensure_video(video_dir, case):
+    """Zwraca ścieżkę nagrania dla przypadku, generując je, jeśli jeszcze nie istnieje."""
+    path = Path(video_dir) / f"{case.name}_{case.width}x{case.height}_{case.frames}.avi"
+    if not path.exists():
+        make_synthetic_video(path, case)
+    return path
+
+
+# SEKCJA 2: ATRAPY MODELI
+# ==================================================================================
+# Atrapy mają ten sam interfejs co DeepFace i MediaPipe i zwracają wyniki zależne
+# wyłącznie od obrazu, więc przebiegi są powtarzalne.
+
+def _landmarks(points, count):
+    """Lista "count" punktów (x=0.5, y=0.5) z nadpisanymi wybranymi punktami."""
+    landmarks = [SimpleNamespace(x=0.5, y=0.5, z=0.0) for _ in range(count)]
+    for index, (x, y) in points.items():
+        landmarks[index] = SimpleNamespace(x=x, y=y, z=0.0)
+    return SimpleNamespace(landmark=landmarks)
+
+
+class StubDeepFace:
+    """Atrapa DeepFace: emocje wyliczane z jasności obrazu."""
+
+    @staticmethod
+    def analyze(img_path, actions=("emotion",), enforce_detection=True, **kwargs):
+        brightness = cv2.mean(img_path)[0] / 255.0
+        raw = 1.0 + np.abs(np.sin(brightness * np.arange(1, len(EMOTIONS) + 1)))
+        scores = raw / raw.sum() * 100.0
+        return [{"emotion": {emotion: float(score) for emotion, score in zip(EMOTIONS, scores)}}]
+
+
+class _StubDetector:
+    """Wspólna część atrap detektorów MediaPipe (obsługa "with" i close())."""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        pass
+
+
+class StubHands(_StubDetector):
+    """Atrapa MediaPipe Hands: jedna rozluźniona dłoń w każdej klatce."""
+
+    _result = SimpleNamespace(multi_hand_landmarks=[_landmarks({4: (0.2, 0.2), 8: (0.6, 0.6)}, 21)])
+
+    def process(self, image):
+        return self._result
+
+
+class StubFaceMesh(_StubDetector):
+    """Atrapa MediaPipe Face Mesh: jedna twarz patrząca prosto w każdej klatce."""
+
+    _result = SimpleNamespace(multi_face_landmarks=[
+        _landmarks({33: (0.45, 0.5), 263: (0.55, 0.5), 4: (0.5, 0.5)}, 468)])
+
+    def process(self, image):
+        return self._result
+
+
+def _stub_draw_landmarks(image, landmark_list, connections=None):
+    """Atrapa mp.solutions.drawing_utils.draw_landmarks: kropka w każdym punkcie."""
+    height, width = image.shape[:2]
+    for point in landmark_list.landmark:
+        cv2.circle(image, (int(point.x * width), int(point.y * height)), 2, (0, 255, 0), -1)
+
+
+def _stub_mediapipe():
+    """Atrapa modułu mediapipe z częściami używanymi przez analysis_core."""
+    return SimpleNamespace(solutions=SimpleNamespace(
+        hands=SimpleNamespace(Hands=StubHands, HAND_CONNECTIONS=frozenset()),
+        face_mesh=SimpleNamespace(FaceMesh=StubFaceMesh, FACEMESH_CONTOURS=frozenset()),
+        drawing_utils=SimpleNamespace(draw_landmarks=_stub_draw_landmarks),
+    ))
+
+
+# Atrapy rejestrowane w puli modeli zamiast prawdziwych składników
+STUB_LOADERS = {
+    "deepface": StubDeepFace,
+    "emotion_backend": DeepFaceBackend,  # Backend DeepFace korzysta z atrapy powyżej
+    "mediapipe": _stub_mediapipe,
+}
+
+
+def real_models_available():
+    """Czy DeepFace i MediaPipe są zainstalowane (wtedy mierzymy prawdziwe modele)."""
+    return all(importlib.util.find_spec(name) is not None for name in ("deepface", "mediapipe"))
+
+
+# SEKCJA 3: POMIAR
+# ==================================================================================
+
+def _analyze(path, mode, settings, timer=None):
+    """
+    Analizuje nagranie tak jak start_analysis() dla pliku (bez Streamlit).
+
+    Zwraca:
+    -------
+    tuple
+        (liczba przeanalizowanych klatek, czas analizy w sekundach)
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise IOError(f"Nie można otworzyć pliku wideo: {path}")
+    sampler = FrameSampler("all", source_fps=cap.get(cv2.CAP_PROP_FPS))
+    preview = FramePreview()
+    state = analysis_core.new_analysis_state()
+    try:
+        with analysis_core.open_detectors(settings) as (hands, face_mesh):
+            pipeline = ThreadedAnalysisPipeline(cap, mode, hands, face_mesh, drop_policy="block",
+                                                sampler=sampler, settings=settings, timer=timer,
+                                                preview=preview)
+            start = time.perf_counter()
+            # Wyświetlenie w przeglądarce zastępuje samo przygotowanie podglądu
+            analyzed = pipeline.run(state, on_frame=lambda frame, scores: preview.encode(frame))
+            elapsed = time.perf_counter() - start
+    finally:
+        cap.release()
+    return analyzed, elapsed
+
+
+def run_case(case, video_dir, mode="Detective", settings=None, trace_memory=True):
+    """
+    Mierzy jeden przypadek: przepustowość, czasy etapów i (opcjonalnie) pamięć.
+
+    Pamięć mierzymy w osobnym, drugim przebiegu - śledzenie alokacji
+    (tracemalloc) spowalnia analizę i zafałszowałoby liczbę klatek na sekundę.
+
+    Zwraca:
+    -------
+    dict
+        {"case", "width", "height", "frames", "analyzed", "elapsed_s", "fps",
+         "stage_timings", "peak_memory_mb"} (peak_memory_mb = None bez pomiaru)
+    """
+    path = ensure_video(video_dir, case)
+    timer = StageTimer()
+    analyzed, elapsed = _analyze(path, mode, settings, timer=timer)
+
+    peak_memory_mb = None
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            _analyze(path, mode, settings)
+            peak_memory_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "case": case.name,
+        "width": case.width,
+        "height": case.height,
+        "frames": case.frames,
+        "analyzed": analyzed,
+        "elapsed_s": elapsed,
+        "fps": analyzed / elapsed if elapsed > 0 else 0.0,
+        "stage_timings": timer.summary(),
+        "peak_memory_mb": peak_memory_mb,
+    }
+
+
+def run_benchmark(cases=DEFAULT_CASES, video_dir=None, mode="Detective", settings=None,
+                  use_stubs=None, trace_memory=True):
+    """
+    Uruchamia wszystkie przypadki i zwraca wyniki gotowe do zapisu w JSON.
+
+    Parametry:
+    ----------
+    cases : sekwencja BenchmarkCase
+        Przypadki do zmierzenia
+    video_dir : str, Path lub None
+        Katalog na syntetyczne nagrania (None = katalog tymczasowy systemu);
+        istniejące nagrania są używane ponownie
+    mode : str
+        Tryb analizy
+    settings : analysis_core.AnalysisSettings lub None
+        Ustawienia modeli
+    use_stubs : bool lub None
+        True - atrapy modeli, False - prawdziwe modele,
+        None - atrapy tylko wtedy, gdy modeli nie zainstalowano
+    trace_memory : bool
+        Czy mierzyć szczytowe zużycie pamięci (dodatkowy przebieg na przypadek)
+
+    Zwraca:
+    -------
+    dict
+        {"created", "platform", "python", "stub_models", "settings", "cases": [...]}
+    """
+    if use_stubs is None:
+        use_stubs = not real_models_available()
+    video_dir = Path(video_dir) if video_dir is not None else Path(tempfile.gettempdir()) / "emo_benchmark"
+    settings = settings or analysis_core.DEFAULT_SETTINGS
+
+    loaders = STUB_LOADERS if use_stubs else {}
+    with model_pool.overridden(loaders):
+        model_pool.warm_up()  # Czas wczytania modeli nie wlicza się do przepustowości
+        results = [run_case(case, video_dir, mode, settings, trace_memory) for case in cases]
+
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "stub_models": use_stubs,
+        "settings": dataclasses.asdict(settings),
+        "cases": results,
+    }
+
+
+# SEKCJA 4: PORÓWNANIE Z POPRZEDNIMI WYNIKAMI
+# ==================================================================================
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Porównuje przepustowość z poprzednimi wynikami.
+
+    Parametry:
+    ----------
+    results, baseline : dict
+        Wyniki run_benchmark() (bieżące i poprzednie)
+    tolerance : float
+        Dopuszczalny względny spadek liczby klatek na sekundę (0.15 = 15%)
+
+    Zwraca:
+    -------
+    list[dict]
+        {"case", "baseline_fps", "fps", "change"} dla przypadków, w których
+        przepustowość spadła bardziej niż o "tolerance"; przypadki nieobecne
+        w jednym z wyników są pomijane
+
+    Wyjątki:
+    --------
+    ValueError
+        Gdy jeden przebieg używał atrap, a drugi prawdziwych modeli
+    """
+    if results.get("stub_models") != baseline.get("stub_models"):
+        raise ValueError("Nie można porównać wyników z atrapami i z prawdziwymi modelami")
+
+    previous = {item["case"]: item for item in baseline.get("cases", [])}
+    regressions = []
+    for item in results["cases"]:
+        reference = previous.get(item["case"])
+        if reference is None or not reference["fps"]:
+            continue
+        change = item["fps"] / reference["fps"] - 1.0
+        if change < -tolerance:
+            regressions.append({"case": item["case"], "baseline_fps": reference["fps"],
+                                "fps": item["fps"], "change": change})
+    return regressions
+
+
+# SEKCJA 5: INTERFEJS WIERSZA POLECEŃ
+# ==================================================================================
+
+def main(argv=None):
+    """Punkt wejścia CLI. Zwraca kod wyjścia (0 = sukces, 1 = spadek wydajności)."""
+    parser = argparse.ArgumentParser(
+        description="Pomiar wydajności analizy na syntetycznych nagraniach.")
+    parser.add_argument("-o", "--output", default="benchmark_results.json",
+                        help="Plik JSON z wynikami")
+    parser.add_argument("--baseline", default=None,
+                        help="Plik JSON z poprzednimi wynikami do porównania")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Dopuszczalny spadek liczby klatek na sekundę (0.15 = 15%%)")
+    parser.add_argument("--video-dir", default=None,
+                        help="Katalog na syntetyczne nagrania (domyślnie katalog tymczasowy)")
+    parser.add_argument("--cases", nargs="+", default=None,
+                        choices=[case.name for case in DEFAULT_CASES],
+                        help="Wybrane przypadki (domyślnie wszystkie)")
+    parser.add_argument("-m", "--mode", default="Detective", choices=analysis_core.MODES,
+                        help="Tryb analizy")
+    models = parser.add_mutually_exclusive_group()
+    models.add_argument("--stub-models", dest="use_stubs", action="store_const", const=True,
+                        help="Użyj atrap modeli nawet gdy prawdziwe są zainstalowane")
+    models.add_argument("--real-models", dest="use_stubs", action="store_const", const=False,
+                        help="Wymagaj prawdziwych modeli (DeepFace, MediaPipe)")
+    parser.add_argument("--inference-resolution", type=int, default=0,
+                        help="Rozdzielczość analizy wszystkich modeli - dłuższy bok w pikselach "
+                             "(0 = pełna rozdzielczość nagrania)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Pomiń pomiar pamięci (jeden przebieg na przypadek)")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in DEFAULT_CASES if args.cases is None or case.name in args.cases]
+    resolution = args.inference_resolution
+    settings = analysis_core.AnalysisSettings(emotion_resolution=resolution,
+                                              hands_resolution=resolution,
+                                              face_resolution=resolution)
+    results = run_benchmark(cases, video_dir=args.video_dir, mode=args.mode, settings=settings,
+                            use_stubs=args.use_stubs, trace_memory=not args.no_memory)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    models_label = "atrapy modeli" if results["stub_models"] else "prawdziwe modele"
+    print(f"Wyniki ({models_label}) zapisano w {output}")
+    for item in results["cases"]:
+        memory = (f", pamięć {item['peak_memory_mb']:.1f} MB"
+                  if item["peak_memory_mb"] is not None else "")
+        print(f"\n{item['case']} ({item['width']}x{item['height']}, {item['frames']} klatek): "
+              f"{item['fps']:.1f} fps{memory}")
+        for line in summary_lines(item["stage_timings"])[:-1]:
+            print(f"  {line}")
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for item in regressions:
+        print(f"❌ {item['case']}: {item['baseline_fps']:.1f} -> {item['fps']:.1f} fps "
+              f"({item['change']:+.0%})")
+    if not regressions:
+        print(f"✅ Brak spadku przepustowości powyżej {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,480 @@
+# ==================================================================================
+# PUNKTY KONTROLNE - wznawianie analizy długich nagrań
+# ==================================================================================
+# Analiza kilkugodzinnego nagrania trwa długo, a wyniki istniały tylko w pamięci:
+# przerwanie (zamknięcie karty, błąd, restart serwera) oznaczało liczenie
+# wszystkiego od początku.
+#
+# AnalysisCheckpoint zapisuje postęp w pliku SQLite (biblioteka standardowa):
+# - tabela "frames" - wiersze rejestru wyników klatek (kolumny jak RECORD_DTYPE
+#   w frame_records.py), dopisywane partiami, nigdy przepisywane
+# - tabela "progress" - indeks następnej klatki do analizy, znacznik ukończenia
+#   i stan zbiorczy analizy (sumy emocji, liczniki, osoby, statystyki
+#   strumieniowe) zapisany jako JSON - odczyt pliku nie wykonuje żadnego kodu
+# Oba zapisy odbywają się w jednej transakcji, więc plik zawsze opisuje spójny
+# stan - również po przerwaniu w połowie zapisu.
+#
+# Ponowna analiza tego samego pliku (ta sama treść, tryb, ustawienia
+# i próbkowanie - patrz checkpoint_key()) wczytuje stan, przewija wideo do
+# zapisanej klatki (cv2.CAP_PROP_POS_FRAMES) i kontynuuje. Ukończonej analizy
+# nie liczymy ponownie.
+#
+# Domyślny katalog punktów kontrolnych jest prywatny (uprawnienia 0700,
+# w katalogu podręcznym użytkownika) - inni użytkownicy nie mogą podłożyć
+# w nim plików. Łączny rozmiar katalogu jest ograniczony (EMO_CHECKPOINT_MB) -
+# for_video() usuwa najdawniej używane punkty kontrolne ponad limit.
+# ==================================================================================
+
+import dataclasses  # dataclasses - ustawienia analizy jako słownik (klucz punktu)
+import hashlib  # hashlib - skróty treści pliku i klucze punktów kontrolnych
+import json  # json - stabilny zapis składników klucza
+import os  # os - rozmiar pliku, właściciel katalogu i zmienne środowiskowe
+import sqlite3  # sqlite3 - plik punktu kontrolnego (bez dodatkowych zależności)
+import time  # time - zapis co określony czas
+from pathlib import Path  # Path - wygodna praca ze ścieżkami
+
+import cv2  # OpenCV - liczba klatek i czas trwania zapisane w kontenerze (skrót nagrania)
+import numpy as np  # NumPy - konwersja wierszy rejestru
+
+from analysis_core import DEFAULT_SETTINGS, new_analysis_state
+from emotion_backends import backend_config
+from frame_records import EMOTIONS, RECORD_DTYPE
+from streaming_stats import StreamingStats
+
+# SEKCJA 1: STAŁE
+# ==================================================================================
+
+# Zmienna środowiskowa z katalogiem punktów kontrolnych
+CHECKPOINT_DIR_ENV = "EMO_CHECKPOINT_DIR"
+
+# Limit łącznego rozmiaru punktów kontrolnych w katalogu (MB); zmienna
+# środowiskowa EMO_CHECKPOINT_MB (0 = bez limitu)
+DEFAULT_CHECKPOINT_MB = 1000
+CHECKPOINT_MB_ENV = "EMO_CHECKPOINT_MB"
+
+# Zapis po tylu nowych wierszach albo po tylu sekundach od poprzedniego zapisu
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_SAVE_INTERVAL = 30.0
+
+# Do skrótu pliku czytamy początek, koniec i bloki rozłożone równo pomiędzy nimi
+# (nie cały plik - bywa wielogigabajtowy)
+FINGERPRINT_CHUNK = 1024 * 1024
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_SAMPLE_SIZE = 64 * 1024
+
+# Wersja układu pliku - zmiana unieważnia stare punkty kontrolne (inny klucz)
+SCHEMA_VERSION = 2
+
+# Klucze stanu analizy zapisywane zbiorczo (rejestr klatek trafia do tabeli "frames")
+AGGREGATE_KEYS = tuple(key for key in new_analysis_state() if key != "frame_records")
+
+# Kolumny tabeli "frames": indeks, czas, waga, emocje, etykiety i tryb (tekst)
+_EMOTION_COLUMNS = tuple(f"emotion_{emotion}" for emotion in EMOTIONS)
+_FRAME_COLUMNS = ("frame_index", "timestamp", "weight") + _EMOTION_COLUMNS + ("gesture", "gaze", "head", "mode")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS frames (
+    frame_index INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    weight INTEGER NOT NULL,
+    {", ".join(f"{column} REAL" for column in _EMOTION_COLUMNS)},
+    gesture INTEGER NOT NULL,
+    gaze INTEGER NOT NULL,
+    head INTEGER NOT NULL,
+    mode TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS progress (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    next_frame INTEGER NOT NULL,
+    complete INTEGER NOT NULL,
+    aggregates TEXT NOT NULL,
+    saved_at REAL NOT NULL
+);
+"""
+
+
+# SEKCJA 2: KLUCZ PUNKTU KONTROLNEGO
+# ==================================================================================
+
+def user_cache_dir():
+    """Katalog podręczny aplikacji w katalogu użytkownika (XDG_CACHE_HOME albo ~/.cache)."""
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "emo"
+
+
+def private_directory(path):
+    """
+    Tworzy (jeśli trzeba) katalog dostępny tylko dla bieżącego użytkownika.
+
+    Nowy katalog dostaje uprawnienia 0700. Istniejący musi należeć do
+    bieżącego użytkownika - wtedy odbieramy innym dostęp do niego.
+
+    Wyjątki:
+    --------
+    PermissionError
+        Gdy katalog należy do innego użytkownika (ktoś mógł w nim podłożyć pliki)
+    """
+    path = Path(path)
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if os.name == "posix":
+        info = path.stat()
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"Katalog {path} należy do innego użytkownika")
+        if info.st_mode & 0o077:
+            path.chmod(0o700)
+    return path
+
+
+def default_checkpoint_dir():
+    """Prywatny katalog punktów kontrolnych: EMO_CHECKPOINT_DIR albo ~/.cache/emo/checkpoints."""
+    return private_directory(os.environ.get(CHECKPOINT_DIR_ENV) or user_cache_dir() / "checkpoints")
+
+
+def checkpoint_mb():
+    """Limit rozmiaru katalogu punktów kontrolnych w MB (EMO_CHECKPOINT_MB albo DEFAULT_CHECKPOINT_MB)."""
+    try:
+        value = float(os.environ.get(CHECKPOINT_MB_ENV, DEFAULT_CHECKPOINT_MB))
+    except ValueError:
+        return DEFAULT_CHECKPOINT_MB
+    return value if value >= 0 else DEFAULT_CHECKPOINT_MB
+
+
+def evict_least_recently_used(directory, max_bytes, keep=()):
+    """
+    Usuwa najdawniej używane pliki *.sqlite, dopóki ich łączny rozmiar przekracza limit.
+
+    Parametry:
+    ----------
+    directory : Path
+        Katalog plików (punkty kontrolne lub pamięć wyników)
+    max_bytes : int
+        Limit łącznego rozmiaru w bajtach
+    keep : iterable of Path
+        Pliki, których nie usuwamy (np. właśnie otwarty punkt kontrolny)
+
+    Zwraca:
+    -------
+    int
+        Liczba usuniętych plików
+
+    Uwaga:
+    ------
+    "Używany" oznacza czas modyfikacji pliku - zapisy go odświeżają, a odczyty
+    muszą odświeżyć go same (os.utime).
+    """
+    directory = Path(directory)
+    if not directory.exists():
+        return 0
+    keep = {Path(path) for path in keep}
+    entries = sorted(directory.glob("*.sqlite"), key=lambda path: path.stat().st_mtime)
+    total = sum(path.stat().st_size for path in entries)
+    removed = 0
+    for path in entries:
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        total -= path.stat().st_size
+        path.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def container_info(path):
+    """Liczba klatek i czas trwania (sekundy) zapisane w kontenerze wideo; (0, 0.0), gdy nieznane."""
+    cap = cv2.VideoCapture(str(path))
+    try:
+        frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+        fps = cap.get(cv2.CAP_PROP_FPS) if cap.isOpened() else 0.0
+    finally:
+        cap.release()
+    return max(frames, 0), round(frames / fps, 3) if fps > 0 and frames > 0 else 0.0
+
+
+def video_fingerprint(path, chunk_size=FINGERPRINT_CHUNK, samples=FINGERPRINT_SAMPLES):
+    """
+    Szybki skrót treści pliku wideo (SHA-256).
+
+    Obejmuje rozmiar pliku, liczbę klatek i czas trwania z kontenera, początek
+    i koniec pliku oraz "samples" bloków rozłożonych równo pomiędzy nimi -
+    dwa nagrania o tym samym nagłówku, zakończeniu i rozmiarze nie dostaną
+    tego samego skrótu. Nazwa pliku nie ma znaczenia - ten sam film przesłany
+    ponownie (inna ścieżka tymczasowa) ma ten sam skrót.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(json.dumps([size, *container_info(path)]).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(chunk_size))
+        middle = size - 2 * chunk_size  # Część pliku między początkiem a końcem
+        for sample in range(1, samples + 1 if middle > 0 else 1):
+            f.seek(chunk_size + middle * sample // (samples + 1))
+            digest.update(f.read(FINGERPRINT_SAMPLE_SIZE))
+        if size > chunk_size:
+            f.seek(max(size - chunk_size, chunk_size))
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()
+
+
+def analysis_config(settings=None, sampler=None):
+    """
+    Konfiguracja wpływająca na wyniki analizy: ustawienia modeli, próbkowanie i backend emocji.
+
+    Równoległe etapy klatki (concurrent_stages) nie zmieniają wyników, więc
+    ich nie ma. Słownik nadaje się do json.dumps() (składnik kluczy).
+    """
+    analysis_settings = dataclasses.asdict(settings or DEFAULT_SETTINGS)
+    analysis_settings.pop("concurrent_stages")
+    return {
+        "settings": analysis_settings,
+        "sampling": [sampler.policy, sampler.value] if sampler is not None else ["all", None],
+        "emotion_backend": backend_config(),
+    }
+
+
+def checkpoint_key(path, mode, settings=None, sampler=None):
+    """
+    Klucz punktu kontrolnego: treść pliku, tryb, ustawienia, próbkowanie i backend emocji.
+
+    Wyniki zapisane przy innych ustawieniach (np. innej rozdzielczości modeli,
+    innym próbkowaniu albo innym backendzie emocji) nie mogą być kontynuowane
+    - dostają inny klucz (patrz analysis_config()).
+    """
+    parts = {
+        "schema": SCHEMA_VERSION,
+        "video": video_fingerprint(path),
+        "mode": mode,
+        **analysis_config(settings, sampler),
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+# SEKCJA 3: PLIK PUNKTU KONTROLNEGO
+# ==================================================================================
+
+class AnalysisCheckpoint:
+    """
+    Przyrostowy zapis postępu analizy jednego nagrania w pliku SQLite.
+
+    Parametry:
+    ----------
+    path : str lub Path
+        Plik bazy (tworzony, gdy nie istnieje)
+    batch_size : int
+        Liczba nowych wierszy rejestru, po której maybe_save() zapisuje postęp
+    save_interval : float
+        Czas (sekundy), po którym maybe_save() zapisuje postęp niezależnie od
+        liczby wierszy
+    clock : callable
+        Źródło czasu (do testów)
+
+    Atrybuty:
+    ---------
+    next_frame : int
+        Indeks klatki, od której trzeba kontynuować (0 = analiza od początku)
+    complete : bool
+        Czy analiza dotarła do końca nagrania
+    saves : int
+        Liczba zapisów wykonanych przez ten obiekt
+
+    Przykład użycia:
+    ----------------
+    checkpoint = AnalysisCheckpoint.for_video("film.mp4", "Interview", settings, sampler)
+    state = new_analysis_state()
+    start = checkpoint.load(state)          # wyniki sprzed przerwy
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    ...                                     # po każdej klatce:
+    checkpoint.maybe_save(state, frame_index + 1)
+    checkpoint.save(state, frame_index + 1, complete=True)
+
+    Uwaga:
+    ------
+    Obiekt może być używany z innego wątku niż ten, który go utworzył (wątek
+    analizy potoku), ale nie z kilku wątków jednocześnie.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, save_interval=DEFAULT_SAVE_INTERVAL,
+                 clock=time.monotonic):
+        if batch_size < 1:
+            raise ValueError("Rozmiar partii zapisu musi być dodatni")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.save_interval = save_interval
+        self._clock = clock
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self.saves = 0
+        self._saved_rows = 0  # Wartość records.total w chwili ostatniego zapisu
+        self._saved_at = clock()
+        row = self._connection.execute("SELECT next_frame, complete FROM progress").fetchone()
+        self.next_frame, self.complete = (row[0], bool(row[1])) if row else (0, False)
+
+    @classmethod
+    def for_video(cls, video, mode, settings=None, sampler=None, directory=None, **options):
+        """
+        Punkt kontrolny nagrania w katalogu "directory" (None = default_checkpoint_dir()).
+
+        Otwarty plik jest oznaczany jako ostatnio używany, a pozostałe punkty
+        kontrolne ponad limit checkpoint_mb() są usuwane (od najdawniej używanych).
+        """
+        directory = Path(directory) if directory is not None else default_checkpoint_dir()
+        key = checkpoint_key(video, mode, settings, sampler)
+        checkpoint = cls(directory / f"{key}.sqlite", **options)
+        os.utime(checkpoint.path)
+        max_bytes = int(checkpoint_mb() * 1024 * 1024)
+        if max_bytes > 0:
+            evict_least_recently_used(directory, max_bytes, keep=[checkpoint.path])
+        return checkpoint
+
+    # ------------------------------------------------------------------------------
+    # Odczyt
+    # ------------------------------------------------------------------------------
+
+    def load(self, state):
+        """
+        Wczytuje zapisane wyniki do stanu analizy.
+
+        Stan zbiorczy zastępuje odpowiednie klucze "state", a do rejestru
+        "frame_records" trafiają zapisane wiersze (przy limicie rejestru -
+        tylko ostatnie, ale licznik total obejmuje wszystkie).
+
+        Zwraca:
+        -------
+        int
+            Indeks klatki, od której należy kontynuować analizę
+        """
+        row = self._connection.execute("SELECT aggregates FROM progress").fetchone()
+        if row is None:
+            return 0
+        for key, value in _aggregates_from_json(row[0]).items():
+            state[key] = value
+
+        records = state["frame_records"]
+        (stored,) = self._connection.execute("SELECT COUNT(*) FROM frames").fetchone()
+        limit = stored if records.capacity is None else min(stored, records.capacity)
+        rows = self._connection.execute(
+            f"SELECT {', '.join(_FRAME_COLUMNS)} FROM frames ORDER BY rowid DESC LIMIT ?",
+            (limit,)).fetchall()[::-1]
+        table, modes = _rows_to_records(rows)
+        records.extend_rows(table, modes, skipped=stored - limit)
+        self._saved_rows = records.total
+        return self.next_frame
+
+    def frame_count(self):
+        """Liczba wierszy rejestru zapisanych na dysku (całe nagranie, bez limitu pamięci)."""
+        return self._connection.execute("SELECT COUNT(*) FROM frames").fetchone()[0]
+
+    # ------------------------------------------------------------------------------
+    # Zapis
+    # ------------------------------------------------------------------------------
+
+    def maybe_save(self, state, next_frame):
+        """Zapisuje postęp, gdy zebrało się batch_size wierszy lub minął save_interval."""
+        pending = state["frame_records"].total - self._saved_rows
+        if pending >= self.batch_size or (pending and self._clock() - self._saved_at >= self.save_interval):
+            self.save(state, next_frame)
+            return True
+        return False
+
+    def save(self, state, next_frame, complete=False):
+        """
+        Dopisuje nowe wiersze rejestru i zapisuje stan zbiorczy (jedna transakcja).
+
+        Parametry:
+        ----------
+        state : dict
+            Stan analizy - wszystkie klatki przed "next_frame" muszą być już
+            w nim uwzględnione
+        next_frame : int
+            Indeks pierwszej klatki, której stan jeszcze nie obejmuje
+        complete : bool
+            Czy analiza dotarła do końca nagrania
+        """
+        records = state["frame_records"]
+        new_rows = records.tail(records.total - self._saved_rows)
+        aggregates = _aggregates_to_json(state)
+        with self._connection:
+            self._connection.executemany(
+                f"INSERT INTO frames ({', '.join(_FRAME_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_FRAME_COLUMNS))})",
+                _records_to_rows(new_rows, records.modes))
+            self._connection.execute(
+                "INSERT OR REPLACE INTO progress (id, next_frame, complete, aggregates, saved_at) "
+                "VALUES (1, ?, ?, ?, ?)", (next_frame, int(complete), aggregates, time.time()))
+        self._saved_rows = records.total
+        self._saved_at = self._clock()
+        self.next_frame, self.complete = next_frame, complete
+        self.saves += 1
+
+    def close(self):
+        """Zamyka połączenie z plikiem (zapisane dane zostają)."""
+        self._connection.close()
+
+    def discard(self):
+        """Zamyka i usuwa plik punktu kontrolnego (np. by policzyć nagranie od nowa)."""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# SEKCJA 4: KONWERSJA WIERSZY I STANU ZBIORCZEGO
+# ==================================================================================
+
+def _aggregates_to_json(state):
+    """Stan zbiorczy analizy (AGGREGATE_KEYS) jako tekst JSON."""
+    aggregates = {key: state[key] for key in AGGREGATE_KEYS}
+    # Identyfikatory osób to liczby - klucze obiektu JSON byłyby napisami
+    aggregates["people"] = [[person_id, stats] for person_id, stats in state["people"].items()]
+    aggregates["live_stats"] = state["live_stats"].to_dict()
+    return json.dumps(aggregates, default=_json_number)
+
+
+def _aggregates_from_json(text):
+    """Stan zbiorczy zapisany przez _aggregates_to_json()."""
+    aggregates = json.loads(text)
+    aggregates["people"] = {person_id: stats for person_id, stats in aggregates["people"]}
+    aggregates["live_stats"] = StreamingStats.from_dict(aggregates["live_stats"])
+    return aggregates
+
+
+def _json_number(value):
+    """Liczby NumPy (np. sumy emocji float32) jako zwykłe liczby JSON."""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Nie można zapisać jako JSON: {type(value).__name__}")
+
+
+def _records_to_rows(table, modes):
+    """Wiersze tablicy RECORD_DTYPE jako krotki dla SQLite (NaN emocji -> NULL)."""
+    emotions = table["emotions"].astype(object)
+    emotions[np.isnan(table["emotions"])] = None
+    return [(int(index), float(timestamp), int(weight), *scores, int(gesture), int(gaze), int(head),
+             modes[mode])
+            for index, timestamp, weight, scores, gesture, gaze, head, mode
+            in zip(table["frame_index"], table["timestamp"], table["weight"], emotions.tolist(),
+                   table["gesture"], table["gaze"], table["head"], table["mode"])]
+
+
+def _rows_to_records(rows):
+    """Krotki z tabeli "frames" jako tablica RECORD_DTYPE i lista trybów."""
+    table = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    modes = []
+    if not rows:
+        return table, modes
+    emotion_end = 3 + len(EMOTIONS)
+    columns = list(zip(*rows))
+    table["frame_index"] = columns[0]
+    table["timestamp"] = columns[1]
+    table["weight"] = columns[2]
+    table["emotions"] = np.array([[np.nan if value is None else value for value in row[3:emotion_end]]
+                                  for row in rows], dtype=np.float32)
+    table["gesture"], table["gaze"], table["head"] = columns[emotion_end:emotion_end + 3]
+    for name in columns[-1]:
+        if name not in modes:
+            modes.append(name)
+    table["mode"] = [modes.index(name) for name in columns[-1]]
+    return table, modes
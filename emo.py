@@ -22,91 +22,64 @@ import numpy as np  # NumPy - biblioteka do operacji na tablicach numerycznych
 import streamlit as st  # Streamlit - framework do tworzenia aplikacji webowych
                         # st pozwala na szybkie stworzenie interfejsu użytkownika
 
-from deepface import DeepFace  # DeepFace - biblioteka do rozpoznawania emocji na twarzy
-                                # DeepFace wykorzystuje głębokie sieci neuronowe
-
-import mediapipe as mp  # MediaPipe - biblioteka Google do analizy multimedialnej
-                        # mp dostarcza gotowe rozwiązania do wykrywania twarzy i dłoni
-
-import datetime  # datetime - wbudowana biblioteka do pracy z datą i czasem
-                # Używamy jej do oznaczania czasu w raportach
-
-import json  # json - wbudowana biblioteka do pracy z formatem JSON
-            # JSON to format przechowywania danych, używamy go do komunikacji z API
-
-import tempfile  # tempfile - wbudowana biblioteka do tworzenia plików tymczasowych
-                # Używamy jej do zapisywania przesłanych plików wideo
-
 import os  # os - wbudowana biblioteka do operacji systemowych
           # Używamy jej do pracy ze ścieżkami plików i usuwania plików
 
-from google import genai  # Google Generative AI - API do generowania analiz przez AI
-                          # genai pozwala nam używać modeli AI Google (np. Gemini)
-
-# SEKCJA 2: INICJALIZACJA NARZĘDZI MEDIAPIPE
-# ==================================================================================
-# MediaPipe oferuje gotowe rozwiązania (solutions) do różnych zadań.
-# Musimy je zainicjalizować przed użyciem.
-
-mp_hands = mp.solutions.hands  # Rozwiązanie do wykrywania dłoni
-                               # Wykrywa 21 punktów charakterystycznych na dłoni
+import time  # time - pomiar czasu wczytywania modeli i odświeżanie panelu wydajności
 
-mp_face_mesh = mp.solutions.face_mesh  # Rozwiązanie do wykrywania siatki twarzy
-                                       # Wykrywa 468 punktów charakterystycznych na twarzy
+# Google Generative AI (genai) importujemy dopiero w generate_report() - jest
+# potrzebny tylko do raportu, a jego import spowalniałby każdy przebieg skryptu.
+# Z tego samego powodu DeepFace (TensorFlow) i MediaPipe wczytuje pula modeli
+# (model_pool.py) - raz na proces, wspólnie dla wszystkich sesji.
 
-mp_drawing = mp.solutions.drawing_utils  # Narzędzia do rysowania punktów na obrazie
-                                         # Używamy tego do wizualizacji wykrytych punktów
+# SEKCJA 2: RDZEŃ ANALIZY
+# ==================================================================================
+# Funkcje analizujące klatki (DeepFace + MediaPipe) znajdują się w osobnym module
+# analysis_core.py, który nie zależy od Streamlit. Dzięki temu ten sam kod
+# wykorzystuje narzędzie wsadowe batch_analysis.py (analiza wielu plików naraz).
+
+from analysis_core import (
+    AnalysisSettings,        # Ustawienia modeli (np. sposób lokalizacji twarzy)
+    average_emotion_scores,  # Średnie wartości emocji ze wszystkich klatek
+    init_analysis_state,     # Inicjalizacja liczników analizy
+    merge_analysis_state,    # Dodanie wyników analizy segmentami do sesji
+    new_analysis_state,      # Pusty stan na wyniki wczytane z pamięci wyników
+    open_detectors,          # Tworzenie detektorów MediaPipe (Hands i Face Mesh)
+    reset_analysis_state,    # Wyzerowanie liczników przed wznowieniem analizy
+    summarize_people,        # Statystyki każdej śledzonej osoby
+)
+from checkpoint import AnalysisCheckpoint  # Punkty kontrolne - wznawianie analizy plików
+from result_cache import ResultCache, result_key  # Wyniki nagrań wspólne dla wszystkich trybów
+from source_pacing import SourcePacing  # Tempo odczytu: plik bez czekania, kamera na żywo
+from segment_analysis import analyze_segments  # Jedno nagranie analizowane na wielu procesach
+from frame_sampling import FrameSampler  # Wybór klatek do analizy (próbkowanie)
+import ai_report  # Raport AI: zapytania w tle, limit czasu, pamięć odpowiedzi
+import model_pool  # Pula modeli wczytywanych raz na proces
+from overlay import OverlayRenderer  # Nakładki na podglądzie (przełączane warstwy)
+from preview import FramePreview  # Podgląd: ograniczona częstotliwość, rozmiar i jakość
+from stage_timing import StageTimer, summary_lines  # Czasy etapów analizy (profilowanie)
+from streaming_stats import trend_lines  # Trendy emocji i zachowań na żywo
+from threaded_pipeline import ThreadedAnalysisPipeline  # Potok: odczyt -> analiza -> wyświetlanie
+from video_upload import UploadTooLargeError, max_upload_mb, spool_to_temp_file  # Zapis przesłanego pliku
 
 # SEKCJA 3: ZMIENNE GLOBALNE - PRZECHOWYWANIE DANYCH ANALIZY
 # ==================================================================================
 # Streamlit używa "session_state" do przechowywania danych między kolejnymi
 # odświeżeniami strony. To jak "pamięć" aplikacji.
-# Wszystkie dane zbierane podczas analizy są tutaj zapisywane.
-
-# Raport z analizy behawioralnej - lista wszystkich zdarzeń podczas analizy
-if "behavior_report" not in st.session_state:
-    st.session_state.behavior_report = []  # Pusta lista na rozpoczęcie
-
-# Sumy procentowe wszystkich emocji wykrytych w każdej klatce
-# Kluczami są nazwy emocji, wartościami - suma procentów ze wszystkich klatek
-if "emotion_totals" not in st.session_state:
-    st.session_state.emotion_totals = {
-        "happy": 0,      # Radość
-        "sad": 0,        # Smutek
-        "angry": 0,      # Złość
-        "surprise": 0,   # Zaskoczenie
-        "fear": 0,       # Strach
-        "disgust": 0,    # Wstręt
-        "neutral": 0     # Neutralność
-    }
-
-# Licznik przeanalizowanych klatek wideo
-# Potrzebny do obliczenia średniej wartości emocji
-if "frame_count" not in st.session_state:
-    st.session_state.frame_count = 0
-
-# Liczniki gestów dłoni wykrytych podczas analizy
-if "hand_gesture_count" not in st.session_state:
-    st.session_state.hand_gesture_count = {
-        "tense": 0,      # Napięte gesty (palce zaciśnięte)
-        "relaxed": 0     # Rozluźnione gesty (palce rozluźnione)
-    }
-
-# Liczniki kierunku spojrzenia wykrytego podczas analizy
-if "eye_direction_count" not in st.session_state:
-    st.session_state.eye_direction_count = {
-        "left": 0,       # Spojrzenie w lewo
-        "right": 0,      # Spojrzenie w prawo
-        "center": 0      # Spojrzenie prosto
-    }
-
-# Liczniki ruchów głowy wykrytych podczas analizy
-if "head_movement_count" not in st.session_state:
-    st.session_state.head_movement_count = {
-        "up": 0,         # Głowa w górę
-        "down": 0,       # Głowa w dół
-        "still": 0       # Głowa nieruchomo
-    }
+# Wszystkie dane zbierane podczas analizy są tutaj zapisywane:
+# - frame_records: zwarty rejestr wyników kolejnych klatek (emocje, gest,
+#   spojrzenie, głowa); tekst raportu powstaje z niego dopiero przy eksporcie
+# - emotion_totals: sumy procentowe każdej emocji ze wszystkich klatek
+# - frame_count: licznik przeanalizowanych klatek (do obliczenia średniej)
+# - hand_gesture_count: liczniki gestów dłoni (napięte / rozluźnione)
+# - eye_direction_count: liczniki kierunku spojrzenia (lewo / prawo / centrum)
+# - head_movement_count: liczniki ruchów głowy (góra / dół / nieruchomo)
+# - people: te same liczniki osobno dla każdej śledzonej osoby
+# Rejestr przechowuje najwyżej MAX_FRAME_RECORDS ostatnich klatek - przy długiej
+# pracy kamery najstarsze wiersze są nadpisywane, więc pamięć sesji nie rośnie.
+# Średnie i liczniki obejmują mimo to całą analizę.
+MAX_FRAME_RECORDS = 50_000
+init_analysis_state(st.session_state, record_capacity=MAX_FRAME_RECORDS)
 
 # Flaga kontrolująca czy kamera/analiza jest aktywna
 # True = analiza trwa, False = analiza zatrzymana
@@ -114,259 +87,37 @@ if "camera_running" not in st.session_state:
     st.session_state.camera_running = False
 
 
-# SEKCJA 4: FUNKCJE POMOCNICZE
+# SEKCJA 4: FUNKCJE APLIKACJI
 # ==================================================================================
 # W tej sekcji definiujemy funkcje, które wykonują konkretne zadania.
 # Podział na funkcje sprawia, że kod jest bardziej czytelny i łatwiejszy w utrzymaniu.
 
-# FUNKCJA 1: Logowanie danych do raportu
+# FUNKCJA 0: Wczytanie modeli (raz na proces)
 # ==================================================================================
-def log_to_report(mode, analysis):
-    """
-    Zapisuje dane do raportu behawioralnego z aktualnym znacznikiem czasu.
-    
-    Parametry:
-    ----------
-    mode : str
-        Tryb analizy (np. "Detective", "Student Behavior", "Interview")
-    analysis : str
-        Tekst z wynikiem analizy do zapisania w raporcie
-        
-    Działanie:
-    ----------
-    1. Pobiera aktualny czas
-    2. Formatuje go do czytelnej postaci (RRRR-MM-DD GG:MM:SS)
-    3. Dodaje wpis do listy raportów w pamięci aplikacji
-    
-    Przykład użycia:
-    ----------------
-    log_to_report("Detective", "Wykryto emocję: radość (85%)")
+@st.cache_resource(show_spinner="Wczytywanie modeli (DeepFace, MediaPipe)...")
+def warm_models():
     """
-    # Pobierz aktualną datę i czas
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Dodaj sformatowany wpis do listy raportów
-    # Format: "2024-01-15 14:30:45 - Detective: Wykryto emocję: radość (85%)"
-    st.session_state.behavior_report.append(f"{timestamp} - {mode}: {analysis}")
+    Wczytuje i rozgrzewa modele przed pierwszą analizą.
 
+    st.cache_resource sprawia, że funkcja wykonuje się raz na proces serwera
+    Streamlit - kolejne sesje i przebiegi skryptu dostają gotowy wynik.
 
-# FUNKCJA 2: Analiza emocji za pomocą DeepFace
-# ==================================================================================
-def analyze_emotion(frame):
-    """
-    Analizuje emocje widoczne na twarzy w pojedynczej klatce wideo.
-    
-    Parametry:
-    ----------
-    frame : numpy.ndarray
-        Pojedyncza klatka wideo (obraz) w formacie OpenCV (BGR)
-        
     Zwraca:
     -------
     dict
-        Słownik z wynikami analizy, gdzie:
-        - klucze to nazwy emocji (np. "happy", "sad")
-        - wartości to procentowe prawdopodobieństwo dla każdej emocji (0-100)
-        
-    Działanie:
-    ----------
-    1. DeepFace.analyze() przetwarza obraz
-    2. Wykrywa twarz na obrazie (jeśli jest)
-    3. Analizuje cechy twarzy (kształt ust, oczu, brwi)
-    4. Porównuje z wytrenowanym modelem sieci neuronowej
-    5. Zwraca prawdopodobieństwa dla każdej z 7 emocji
-    
-    Uwaga:
-    ------
-    enforce_detection=False sprawia, że funkcja nie zgłasza błędu,
-    jeśli nie wykryje twarzy - zamiast tego zwraca neutralne wyniki
-    """
-    try:
-        # Wywołaj analizę DeepFace na bieżącej klatce
-        # actions=['emotion'] - analizujemy tylko emocje (nie wiek, płeć, rasę)
-        result = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False)
-        
-        # Sprawdź czy wynik jest prawidłowy i niepusty
-        if result and len(result) > 0 and 'emotion' in result[0]:
-            # Wyciągnij słownik z wynikami emocji z wyniku analizy
-            # result[0] bo DeepFace może zwracać listę wyników (dla wielu twarzy)
-            emotion_scores = result[0]['emotion']
-            return emotion_scores
-        else:
-            # Jeśli wynik jest pusty, zwróć neutralne wartości
-            return {
-                "happy": 0.0,
-                "sad": 0.0,
-                "angry": 0.0,
-                "surprise": 0.0,
-                "fear": 0.0,
-                "disgust": 0.0,
-                "neutral": 100.0
-            }
-    except Exception as e:
-        # W przypadku błędu (np. problem z modelem, uszkodzony obraz)
-        # Zwróć neutralne wartości i zaloguj ostrzeżenie
-        print(f"Ostrzeżenie: Błąd analizy emocji: {e}")
-        return {
-            "happy": 0.0,
-            "sad": 0.0,
-            "angry": 0.0,
-            "surprise": 0.0,
-            "fear": 0.0,
-            "disgust": 0.0,
-            "neutral": 100.0
-        }
-
-
-# FUNKCJA 3: Analiza gestów dłoni za pomocą MediaPipe
-# ==================================================================================
-def analyze_hands(frame, hands):
-    """
-    Analizuje gesty dłoni widoczne w klatce wideo.
-    
-    Parametry:
-    ----------
-    frame : numpy.ndarray
-        Pojedyncza klatka wideo (obraz) w formacie OpenCV (BGR)
-    hands : mediapipe.solutions.hands.Hands
-        Zainicjalizowany obiekt MediaPipe Hands do wykrywania dłoni
-        
-    Działanie:
-    ----------
-    1. Konwertuje obraz z BGR (OpenCV) do RGB (MediaPipe)
-    2. Wykrywa dłonie i ich punkty charakterystyczne (21 punktów na dłoń)
-    3. Dla każdej wykrytej dłoni:
-       - Mierzy odległość między kciukiem a palcem wskazującym
-       - Jeśli odległość < 0.1: gest napięty (palce zaciśnięte)
-       - Jeśli odległość >= 0.1: gest rozluźniony (palce rozluźnione)
-    4. Rysuje punkty i połączenia na obrazie (wizualizacja)
-    5. Aktualizuje liczniki gestów w pamięci aplikacji
-    
-    Uwaga:
-    ------
-    MediaPipe wymaga obrazu w formacie RGB, a OpenCV używa BGR,
-    dlatego konwertujemy kolory przed przetwarzaniem
+        Czasy wczytania w sekundach: "total" oraz osobno dla każdego modelu
     """
-    # Konwersja z BGR (format OpenCV) na RGB (format MediaPipe)
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    
-    # Przetwórz klatkę przez MediaPipe Hands
-    results = hands.process(frame_rgb)
-
-    # Sprawdź czy wykryto jakiekolwiek dłonie
-    if results.multi_hand_landmarks:
-        # Iteruj przez wszystkie wykryte dłonie
-        for hand_landmarks in results.multi_hand_landmarks:
-            # Pobierz współrzędne kciuka (punkt 4 z 21 punktów dłoni)
-            # HandLandmark.THUMB_TIP to stała określająca czubek kciuka
-            thumb_tip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP]
-            
-            # Pobierz współrzędne czubka palca wskazującego (punkt 8)
-            index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-            
-            # Oblicz odległość między kciukiem a palcem wskazującym
-            # Używamy zarówno odległości w poziomie (x) jak i pionie (y)
-            distance = abs(thumb_tip.x - index_tip.x) + abs(thumb_tip.y - index_tip.y)
+    start = time.perf_counter()
+    timings = model_pool.warm_up()
+    timings["total"] = time.perf_counter() - start
+    return timings
 
-            # Klasyfikacja gestu na podstawie odległości
-            if distance < 0.1:
-                # Mała odległość = palce blisko siebie = gest napięty
-                st.session_state.hand_gesture_count["tense"] += 1
-            else:
-                # Duża odległość = palce daleko od siebie = gest rozluźniony
-                st.session_state.hand_gesture_count["relaxed"] += 1
 
-            # Narysuj punkty charakterystyczne dłoni i połączenia między nimi
-            # HAND_CONNECTIONS to predefiniowana lista połączeń między punktami
-            mp_drawing.draw_landmarks(frame, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-
-
-# FUNKCJA 4: Analiza kierunku spojrzenia i ruchów głowy
+# FUNKCJA 1: Rozpoczęcie analizy wideo (główna pętla programu)
 # ==================================================================================
-def analyze_face(frame, face_mesh):
-    """
-    Analizuje kierunek spojrzenia oczu i ruchy głowy w klatce wideo.
-    
-    Parametry:
-    ----------
-    frame : numpy.ndarray
-        Pojedyncza klatka wideo (obraz) w formacie OpenCV (BGR)
-    face_mesh : mediapipe.solutions.face_mesh.FaceMesh
-        Zainicjalizowany obiekt MediaPipe Face Mesh do wykrywania twarzy
-        
-    Działanie:
-    ----------
-    1. Konwertuje obraz z BGR na RGB
-    2. Wykrywa twarz i jej punkty charakterystyczne (468 punktów)
-    3. Analizuje kierunek oczu:
-       - Punkt 33: lewe oko
-       - Punkt 263: prawe oko
-       - Na podstawie pozycji x określa kierunek spojrzenia
-    4. Analizuje pozycję głowy:
-       - Punkt 4: czubek nosa
-       - Na podstawie pozycji y określa ruch głowy (góra/dół/nieruchomo)
-    5. Rysuje siatkę twarzy na obrazie (wizualizacja)
-    6. Aktualizuje liczniki w pamięci aplikacji
-    
-    Uwaga:
-    ------
-    Współrzędne są znormalizowane (0.0 - 1.0):
-    - x=0.0 to lewa krawędź obrazu, x=1.0 to prawa krawędź
-    - y=0.0 to górna krawędź obrazu, y=1.0 to dolna krawędź
-    """
-    # Konwersja z BGR (format OpenCV) na RGB (format MediaPipe)
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    
-    # Przetwórz klatkę przez MediaPipe Face Mesh
-    results = face_mesh.process(frame_rgb)
-
-    # Sprawdź czy wykryto jakąkolwiek twarz
-    if results.multi_face_landmarks:
-        # Iteruj przez wszystkie wykryte twarze (zazwyczaj jedna)
-        for face_landmarks in results.multi_face_landmarks:
-            # ANALIZA KIERUNKU SPOJRZENIA
-            # ----------------------------
-            # Pobierz współrzędne lewego oka (punkt 33 z 468 punktów siatki)
-            left_eye = face_landmarks.landmark[33]
-            
-            # Pobierz współrzędne prawego oka (punkt 263)
-            right_eye = face_landmarks.landmark[263]
-
-            # Określ kierunek spojrzenia na podstawie pozycji oczu
-            if left_eye.x < 0.4:
-                # Lewe oko jest bardzo na lewo -> osoba patrzy w lewo
-                st.session_state.eye_direction_count["left"] += 1
-            elif right_eye.x > 0.6:
-                # Prawe oko jest bardzo na prawo -> osoba patrzy w prawo
-                st.session_state.eye_direction_count["right"] += 1
-            else:
-                # Oczy są mniej więcej centralnie -> osoba patrzy prosto
-                st.session_state.eye_direction_count["center"] += 1
-
-            # ANALIZA RUCHÓW GŁOWY
-            # ---------------------
-            # Pobierz współrzędne czubka nosa (punkt 4) - środkowy punkt twarzy
-            nose_tip = face_landmarks.landmark[4]
-            
-            # Określ pozycję głowy na podstawie współrzędnej y nosa
-            if nose_tip.y < 0.4:
-                # Nos jest wysoko -> głowa podniesiona w górę
-                st.session_state.head_movement_count["up"] += 1
-            elif nose_tip.y > 0.6:
-                # Nos jest nisko -> głowa opuszczona w dół
-                st.session_state.head_movement_count["down"] += 1
-            else:
-                # Nos jest mniej więcej centralnie -> głowa w pozycji neutralnej
-                st.session_state.head_movement_count["still"] += 1
-
-            # Narysuj siatkę twarzy na obrazie
-            # FACEMESH_CONTOURS to zestaw linii tworzących kontur twarzy
-            mp_drawing.draw_landmarks(frame, face_landmarks, mp_face_mesh.FACEMESH_CONTOURS)
-
-
-# FUNKCJA 5: Rozpoczęcie analizy wideo (główna pętla programu)
-# ==================================================================================
-def start_analysis(mode, input_source):
+def start_analysis(mode, input_source, sampling_policy="all", sampling_value=None,
+                   settings=None, preview=None, resume=True, segments=1, emotion_processes=0,
+                   overlay=None):
     """
     Uruchamia główną pętlę analizy wideo z kamery lub pliku.
     
@@ -376,6 +127,30 @@ def start_analysis(mode, input_source):
         Tryb analizy: "Detective", "Student Behavior" lub "Interview"
     input_source : str
         Źródło wideo: "camera" (kamera) lub "video" (plik)
+    sampling_policy : str
+        Polityka próbkowania klatek: "all", "stride", "fps" lub "interval"
+        (patrz frame_sampling.py)
+    sampling_value : int lub float lub None
+        Parametr polityki próbkowania (krok, docelowe fps lub odstęp w sekundach)
+    settings : AnalysisSettings lub None
+        Ustawienia modeli (np. lokalizacja twarzy przez Face Mesh)
+    preview : FramePreview lub None
+        Ustawienia podglądu (częstotliwość, szerokość, jakość JPEG);
+        None = każda klatka w pełnej rozdzielczości
+    resume : bool
+        Czy zapisywać postęp analizy pliku i wznawiać przerwaną analizę tego
+        samego nagrania (patrz checkpoint.py); ukończona analiza jest tylko
+        wczytywana, bez ponownego liczenia
+    segments : int
+        Liczba segmentów pliku analizowanych równolegle w osobnych procesach
+        (segment_analysis.py); dla wartości > 1 analiza działa bez podglądu
+        i bez punktów kontrolnych
+    emotion_processes : int
+        Liczba procesów roboczych modelu emocji (0 = model w wątku analizy);
+        klatki trafiają do nich przez pamięć współdzieloną (shared_frames.py)
+    overlay : OverlayRenderer lub None
+        Warstwy nakładek na podglądzie (panel emocji, kontury twarzy, dłonie);
+        None = wszystkie, OverlayRenderer(layers=()) = analiza bez rysowania
         
     Działanie:
     ----------
@@ -393,7 +168,12 @@ def start_analysis(mode, input_source):
     Uwaga:
     ------
     Pętla działa dopóki st.session_state.camera_running == True
-    Użytkownik zatrzymuje analizę przyciskiem "Stop Analysis"
+    Użytkownik zatrzymuje analizę przyciskiem "Zatrzymaj Analizę" - kliknięcie
+    przerywa bieżący przebieg skryptu (wyjątek ponownego uruchomienia Streamlit),
+    a potok zatrzymuje wtedy swoje wątki i scala zebrane wyniki
+    Wyniki ukończonej analizy pliku trafiają do pamięci wyników (result_cache.py) -
+    ponowne przesłanie tego samego nagrania, także w innym trybie, od razu
+    pokazuje raport
     """
     # KROK 1: Otwórz źródło wideo
     # ----------------------------
@@ -417,12 +197,12 @@ def start_analysis(mode, input_source):
             st.warning("Proszę przesłać plik wideo.")
             return
         
-        # Walidacja rozmiaru pliku (max 200 MB)
-        max_size_mb = 200
+        # Walidacja rozmiaru pliku (domyślnie max 200 MB, zmienna EMO_MAX_UPLOAD_MB)
+        max_size_mb = max_upload_mb()
         file_size_mb = file_path.size / (1024 * 1024)  # Konwersja na MB
         
         if file_size_mb > max_size_mb:
-            st.error(f"❌ Plik jest za duży ({file_size_mb:.1f} MB). Maksymalny rozmiar: {max_size_mb} MB.")
+            st.error(f"❌ Plik jest za duży ({file_size_mb:.1f} MB). Maksymalny rozmiar: {max_size_mb:.0f} MB.")
             st.info("💡 Tip: Skompresuj wideo lub użyj krótszego fragmentu.")
             return
         
@@ -437,11 +217,11 @@ def start_analysis(mode, input_source):
         temp_video_file = None
         
         try:
-            # Utwórz tymczasowy plik z odpowiednim rozszerzeniem
-            tfile = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file_path.name)[1])
-            tfile.write(file_path.read())
-            tfile.close()
-            temp_video_file = tfile.name  # Zapisz ścieżkę do późniejszego usunięcia
+            # Zapisz plik tymczasowy z odpowiednim rozszerzeniem fragmentami po 1 MB
+            # (file_path.read() utworzyłby w pamięci kopię całego nagrania)
+            temp_video_file = spool_to_temp_file(
+                file_path, suffix=os.path.splitext(file_path.name)[1],
+                max_bytes=int(max_size_mb * 1024 * 1024))
             temp_file_path = temp_video_file
             
             # Otwórz tymczasowy plik
@@ -453,115 +233,176 @@ def start_analysis(mode, input_source):
                 if temp_video_file and os.path.exists(temp_video_file):
                     os.unlink(temp_video_file)
                 return
+        except UploadTooLargeError as e:
+            st.error(f"❌ {e}")
+            return
         except Exception as e:
             st.error(f"❌ Błąd podczas przetwarzania pliku: {e}")
             if temp_video_file and os.path.exists(temp_video_file):
                 os.unlink(temp_video_file)
             return
 
+    # Utwórz obiekt decydujący, które klatki analizujemy
+    # Dla pliku znamy liczbę klatek na sekundę, dla kamery próbkujemy według zegara
+    source_fps = None if input_source == "camera" else cap.get(cv2.CAP_PROP_FPS)
+    sampler = FrameSampler(sampling_policy, sampling_value, source_fps=source_fps)
+
+    # Pamięć wyników: to samo nagranie z tymi samymi ustawieniami zostało już
+    # przeanalizowane (w dowolnym trybie) - tryb zmienia tylko etykiety raportu,
+    # więc od razu przechodzimy do raportu
+    result_cache = ResultCache()
+    cache_key = None
+    if input_source != "camera" and result_cache.enabled:
+        cache_key = result_key(temp_file_path, settings, sampler)
+        cached = new_analysis_state(MAX_FRAME_RECORDS)
+        if result_cache.load(cache_key, cached, mode):
+            cap.release()
+            os.remove(temp_file_path)
+            merge_analysis_state(st.session_state, cached)
+            st.success("✅ To nagranie zostało już przeanalizowane z tymi ustawieniami - "
+                       f"wczytano zapisane wyniki (tryb: {mode}).")
+            generate_report(mode)
+            return
+
+    # Analiza segmentami: każdy proces analizuje swój fragment pliku, a wyniki
+    # scalamy w stan sesji - raport powstaje tak samo jak po zwykłej analizie
+    if segments > 1 and input_source != "camera":
+        cap.release()
+        with st.spinner(f"Analiza równoległa ({segments} segmenty)..."):
+            state, info = analyze_segments(temp_file_path, mode, segments=segments, workers=segments,
+                                           sampling_policy=sampling_policy,
+                                           sampling_value=sampling_value, settings=settings,
+                                           record_capacity=MAX_FRAME_RECORDS)
+        os.remove(temp_file_path)
+        if cache_key is not None:
+            result_cache.store(cache_key, state)
+        merge_analysis_state(st.session_state, state)
+        st.caption("Segmenty (klatki): " + ", ".join(
+            f"{start}-{stop if stop is not None else 'koniec'}" for start, stop in info["segments"]))
+        generate_report(mode)
+        return
+
+    # Punkt kontrolny pliku: ten sam film z tymi samymi ustawieniami był już
+    # (częściowo) analizowany - kontynuujemy od zapisanej klatki
+    checkpoint = None
+    if resume and input_source != "camera":
+        checkpoint = AnalysisCheckpoint.for_video(temp_file_path, mode, settings, sampler)
+        if checkpoint.next_frame > 0:
+            # Stan sesji mógł już zawierać część tych wyników - zaczynamy od
+            # zapisanych w punkcie kontrolnym, aby nie liczyć klatek dwa razy
+            reset_analysis_state(st.session_state, record_capacity=MAX_FRAME_RECORDS)
+        if checkpoint.complete:
+            checkpoint.load(st.session_state)
+            checkpoint.close()
+            cap.release()
+            os.remove(temp_file_path)
+            st.success("✅ To nagranie zostało już przeanalizowane z tymi ustawieniami - "
+                       "wczytano zapisane wyniki.")
+            generate_report(mode)
+            return
+        if checkpoint.next_frame > 0:
+            st.info(f"⏩ Wznawianie analizy od klatki {checkpoint.next_frame}.")
+
+    # Wczytaj modele przed pierwszą klatką (przy kolejnych analizach - natychmiast)
+    model_timings = warm_models()
+
     # Utwórz pusty kontener Streamlit do wyświetlania wideo
     stframe = st.empty()
 
+    # Pomiar czasu etapów (dekodowanie, kolory, emocje, dłonie, twarz, nakładki,
+    # wyświetlanie) - p50/p95 i fps pokazujemy na bieżąco w panelu bocznym,
+    # a surowe pomiary można pobrać z raportu
+    timer = StageTimer(keep_raw=True)
+    st.session_state.stage_timer = timer
+    profile_panel = st.sidebar.empty()
+    # Trend na żywo: średnie z okna ostatnich klatek i średnie wykładnicze
+    # (statystyki strumieniowe - odczyt nie przegląda historii klatek)
+    trend_panel = st.sidebar.empty()
+    last_profile_update = [0.0]  # Lista - zmienna modyfikowana w funkcji wewnętrznej
+
+    def show_frame(frame, emotion_scores):
+        """Wyświetla przeanalizowaną klatkę; zwraca False, aby przerwać pętlę."""
+        # Wyświetl przetworzoną klatkę z nałożonymi adnotacjami
+        # Podgląd jest zmniejszany i kodowany do JPEG przed wysłaniem do przeglądarki
+        # channels="BGR" - OpenCV używa BGR zamiast RGB
+        # use_container_width=True - dostosuj szerokość do kontenera
+        if preview is not None:
+            stframe.image(preview.encode(frame), use_container_width=True)
+        else:
+            stframe.image(frame, channels="BGR", use_container_width=True)
+
+        # Odśwież panel wydajności najwyżej raz na sekundę
+        now = time.monotonic()
+        if now - last_profile_update[0] >= 1.0:
+            last_profile_update[0] = now
+            profile_panel.text("Wydajność (p50 / p95):\n" + "\n".join(summary_lines(timer.summary()))
+                               + f"\nEfektywnie: {pipeline.pacing.fps:.1f} klatek/s")
+            trend = trend_lines(pipeline.live_stats.snapshot())
+            if trend:
+                trend_panel.text(f"Trend (ostatnie {pipeline.live_stats.window} klatek):\n"
+                                 + "\n".join(trend))
+        return True  # Zatrzymanie przerywa skrypt Streamlit (przycisk), nie z klawiatury
+
     # KROK 2: Zainicjalizuj narzędzia MediaPipe
     # ------------------------------------------
-    # Używamy kontekstu "with" aby automatycznie zwolnić zasoby po zakończeniu
-    with mp_hands.Hands(min_detection_confidence=0.7, min_tracking_confidence=0.7) as hands, \
-            mp_face_mesh.FaceMesh(min_detection_confidence=0.7, min_tracking_confidence=0.7) as face_mesh:
-        
-        # min_detection_confidence=0.7 oznacza, że wykrywanie musi mieć
-        # pewność co najmniej 70%, aby uznać coś za dłoń/twarz
-        
-        # min_tracking_confidence=0.7 oznacza, że śledzenie musi mieć
-        # pewność co najmniej 70%, aby kontynuować śledzenie tego samego obiektu
+    # open_detectors() tworzy MediaPipe Hands i Face Mesh z progiem pewności 70%
+    # i automatycznie zwalnia zasoby po wyjściu z bloku "with"
+    with open_detectors(settings) as (hands, face_mesh):
 
         # KROK 3: Główna pętla przetwarzania klatek
         # ------------------------------------------
-        while st.session_state.camera_running and cap.isOpened():
-            # Odczytaj kolejną klatkę z wideo
-            # ret = True jeśli klatka została odczytana poprawnie
-            # frame = tablica NumPy zawierająca obraz (klatkę)
-            ret, frame = cap.read()
-            
-            # Jeśli nie udało się odczytać klatki (koniec wideo), przerwij pętlę
-            if not ret:
-                break
-
-            # ANALIZA EMOCJI
-            # --------------
-            # Analizuj emocje widoczne na twarzy w bieżącej klatce
-            emotion_scores = analyze_emotion(frame)
-
-            # Dodaj wyniki emocji do sum całkowitych (do obliczenia średniej później)
-            for emotion, score in emotion_scores.items():
-                st.session_state.emotion_totals[emotion] += score
-            
-            # Zwiększ licznik przeanalizowanych klatek
-            st.session_state.frame_count += 1
-
-            # ANALIZA GESTÓW DŁONI
-            # ---------------------
-            analyze_hands(frame, hands)
-
-            # ANALIZA TWARZY (oczy i głowa)
-            # ------------------------------
-            analyze_face(frame, face_mesh)
-
-            # OKREŚLENIE DOMINUJĄCEJ EMOCJI
-            # ------------------------------
-            # Znajdź emocję z najwyższym wynikiem w bieżącej klatce
-            dominant_emotion = max(emotion_scores, key=emotion_scores.get)
-            dominant_emotion_score = emotion_scores[dominant_emotion]
-
-            # WIZUALIZACJA WYNIKÓW NA OBRAZIE
-            # --------------------------------
-            # Wyświetl dominującą emocję na górze obrazu
-            emotion_text = f"{dominant_emotion}: {dominant_emotion_score:.2f}%"
-            frame = cv2.putText(frame, emotion_text, (50, 50), 
-                              cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            # cv2.putText() parametry:
-            # - frame: obraz na którym rysujemy
-            # - emotion_text: tekst do wyświetlenia
-            # - (50, 50): pozycja x, y tekstu
-            # - cv2.FONT_HERSHEY_SIMPLEX: typ czcionki
-            # - 1: rozmiar czcionki
-            # - (0, 255, 0): kolor BGR (zielony)
-            # - 2: grubość linii
-
-            # Wyświetl wszystkie emocje z ich procentami
-            y_offset = 100  # Początkowa pozycja y dla pierwszej emocji
-            for emotion, score in emotion_scores.items():
-                frame = cv2.putText(frame, f"{emotion}: {score:.2f}%", 
-                                  (50, y_offset), cv2.FONT_HERSHEY_SIMPLEX, 
-                                  0.7, (0, 255, 0), 2)
-                y_offset += 30  # Przesuń pozycję y o 30 pikseli dla kolejnej emocji
-
-            # LOGOWANIE DO RAPORTU
-            # --------------------
-            # Zapisz wynik analizy do raportu (w zależności od trybu)
-            if mode == "Detective":
-                log_to_report(mode, f"Wykrywanie: {dominant_emotion} ({dominant_emotion_score:.2f}%)")
-            elif mode == "Student Behavior":
-                log_to_report(mode, f"Śledzenie: {dominant_emotion} ({dominant_emotion_score:.2f}%)")
-            elif mode == "Interview":
-                log_to_report(mode, f"Analiza: {dominant_emotion} ({dominant_emotion_score:.2f}%)")
-
-            # WYŚWIETLENIE KLATKI W APLIKACJI STREAMLIT
-            # ------------------------------------------
-            # Wyświetl przetworzoną klatkę z nałożonymi adnotacjami
-            stframe.image(frame, channels="BGR", use_container_width=True)
-            
-            # channels="BGR" - OpenCV używa BGR zamiast RGB
-            # use_container_width=True - dostosuj szerokość do kontenera
-
-            # Sprawdź czy naciśnięto klawisz 'q' (opcjonalne zatrzymanie)
-            if cv2.waitKey(10) & 0xFF == ord('q'):
-                break
+        # Potok działa na trzech etapach naraz:
+        # - wątek przechwytywania odczytuje klatki z kamery/pliku
+        # - wątek analizy bada emocje (DeepFace), gesty dłoni i twarz (MediaPipe),
+        #   nanosi wyniki na obraz i loguje wpis do raportu
+        # - bieżący wątek wywołuje show_frame() aby pokazać klatkę w aplikacji
+        # Dla kamery wolna analiza nie blokuje odczytu: najnowsza klatka wypiera
+        # starsze (polityka "latest"), a zaległe klatki z bufora sterownika są
+        # pomijane przy odczycie, więc obraz nie zostaje w tyle.
+        # Plik czytamy bez czekania i żadna klatka nie jest pomijana (polityka "block").
+        # Klatki pominięte przez sampler są tylko przewijane (bez dekodowania),
+        # a wyniki przeanalizowanych klatek liczone są z odpowiednią wagą.
+        # Pętla działa dopóki użytkownik nie zatrzyma analizy lub nie skończy się wideo
+        pacing = SourcePacing.for_source(input_source)
+        pipeline = ThreadedAnalysisPipeline(
+            cap, mode, hands, face_mesh,
+            drop_policy=pacing.drop_policy, pacing=pacing,
+            sampler=sampler, settings=settings, timer=timer, preview=preview,
+            checkpoint=checkpoint, emotion_processes=emotion_processes,
+            draw=overlay if overlay is not None else True)
+        try:
+            pipeline.run(st.session_state, on_frame=show_frame,
+                         should_continue=lambda: st.session_state.camera_running)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        # Całe nagranie przeanalizowane - wyniki posłużą też innym trybom, a punkt
+        # kontrolny (te same wiersze klatek) nie jest już potrzebny
+        if cache_key is not None and pipeline.finished:
+            result_cache.store(cache_key, pipeline.results)
+            if checkpoint is not None and cache_key in result_cache:
+                checkpoint.discard()
+
+    # Pokaż statystyki potoku (ile klatek odrzucono, jakie było opóźnienie obrazu)
+    stats = pipeline.stats
+    st.caption(f"Klatki: odczytane {stats['captured']}, przeanalizowane {stats['analyzed']}, "
+               f"odrzucone {stats['dropped']}, poza podglądem {stats['preview_skipped']} | "
+               f"opóźnienie: średnie {stats['mean_latency_s'] * 1000:.0f} ms, "
+               f"maks. {stats['max_latency_s'] * 1000:.0f} ms")
+    st.caption(f"Efektywnie: {stats['effective_fps']:.1f} klatek/s"
+               + (f" | pominięte zaległe klatki kamery: {pacing.stats['drained']}" if pacing.live else ""))
+    if pipeline.emotion_cache is not None:
+        cache_stats = pipeline.emotion_cache.stats
+        st.caption(f"Pamięć emocji: trafienia {cache_stats['hits']}, chybienia {cache_stats['misses']} "
+                   f"({pipeline.emotion_cache.hit_rate:.0%})")
+    # Zimny start: czas wczytania modeli (raz na proces) i czas do pierwszej klatki
+    first_frame = stats["first_frame_s"]
+    st.caption(f"Wczytanie modeli: {model_timings['total']:.1f} s | pierwsza klatka po "
+               + (f"{first_frame:.2f} s" if first_frame is not None else "-"))
 
     # KROK 4: Zwolnij zasoby
     # -----------------------
     cap.release()  # Zamknij strumień wideo
-    cv2.destroyAllWindows()  # Zamknij wszystkie okna OpenCV
     
     # Usuń tymczasowy plik wideo jeśli został utworzony
     if temp_file_path is not None:
@@ -576,7 +417,7 @@ def start_analysis(mode, input_source):
     generate_report(mode)
 
 
-# FUNKCJA 6: Generowanie i wyświetlanie raportu końcowego
+# FUNKCJA 2: Generowanie i wyświetlanie raportu końcowego
 # ==================================================================================
 def generate_report(mode):
     """
@@ -591,28 +432,27 @@ def generate_report(mode):
     ----------
     1. Oblicza średnie wartości emocji ze wszystkich klatek
     2. Wyświetla statystyki emocji
-    3. Wyświetla statystyki gestów, kierunku oczu i ruchów głowy
-    4. Wysyła dane do Google Gemini AI w celu uzyskania analizy behawioralnej
-    5. Wyświetla sugestie AI dotyczące zachowania
+    3. Wyświetla statystyki gestów, kierunku oczu i ruchów głowy (także dla każdej osoby)
+    4. Wyświetla czasy etapów analizy (p50/p95, fps) i udostępnia surowe pomiary w CSV
+    5. Zleca w tle analizę behawioralną Google Gemini AI (ai_report.py)
+       i zapisuje zlecenie w st.session_state.ai_report
+    6. Sugestie AI wyświetla show_ai_report() - bez czekania na odpowiedź
     
     Uwaga:
     ------
-    Ta funkcja używa API Google Gemini, które wymaga klucza API.
-    Klucz jest zakodowany na stałe w kodzie (nie zalecane w produkcji!)
+    Ta funkcja używa API Google Gemini, które wymaga klucza API
+    (GEMINI_API_KEY lub Streamlit secrets). Statystyki pojawiają się od razu,
+    a skrypt nie czeka na odpowiedź AI - pojawia się ona przy kolejnym
+    przebiegu skryptu. Zapytanie ma limit czasu i ponowienia, a odpowiedzi
+    dla tej samej analizy są zapamiętywane. EMO_AI_CLIENT=local zastępuje API
+    lokalną atrapą.
     """
-    # KROK 1: Zabezpieczenie przed dzieleniem przez zero
-    # ---------------------------------------------------
-    if st.session_state.frame_count == 0:
-        st.session_state.frame_count = 1
-
-    # KROK 2: Oblicz średnie wartości emocji
-    # ---------------------------------------
+    # KROK 1-2: Oblicz średnie wartości emocji
+    # ----------------------------------------
     # Dla każdej emocji, podziel sumę przez liczbę klatek
     # Otrzymujemy średnią wartość procentową dla każdej emocji w całym wideo
-    average_emotion_scores = {
-        emotion: score / st.session_state.frame_count 
-        for emotion, score in st.session_state.emotion_totals.items()
-    }
+    # (average_emotion_scores zabezpiecza przed dzieleniem przez zero)
+    average_scores = average_emotion_scores(st.session_state)
 
     # KROK 3: Wyświetl nagłówek raportu
     # ----------------------------------
@@ -623,7 +463,7 @@ def generate_report(mode):
     # ---------------------------------------
     st.write(f"Tryb analizy: {mode}\n")
     st.write("ŚREDNIE WARTOŚCI EMOCJI:")
-    for emotion, score in average_emotion_scores.items():
+    for emotion, score in average_scores.items():
         # Wyświetl nazwę emocji z wielkiej litery i jej średni procent
         st.write(f"{emotion.capitalize()}: {score:.2f}%")
 
@@ -639,106 +479,136 @@ def generate_report(mode):
     st.write(f"Ruchy Głowy (Dół): {st.session_state.head_movement_count['down']}")
     st.write(f"Ruchy Głowy (Nieruchomo): {st.session_state.head_movement_count['still']}")
 
+    # KROK 5b: Wyświetl statystyki każdej osoby (tylko przy śledzeniu osób)
+    # ----------------------------------------------------------------------
+    people = summarize_people(st.session_state)
+    if people:
+        st.write("\nStatystyki Osób:")
+        rows = []
+        for person in people:
+            averages = person["average_emotions"]
+            dominant = max(averages, key=averages.get) if person["emotion_frame_count"] else "-"
+            rows.append({"Osoba": f"#{person['id']}", "Klatki": person["frame_count"],
+                         "Dominująca emocja": dominant,
+                         **{f"Oczy: {name}": count for name, count in person["eye_direction_count"].items()},
+                         **{f"Głowa: {name}": count for name, count in person["head_movement_count"].items()}})
+        st.dataframe(rows, hide_index=True)
+
+    # KROK 5a: Wyświetl czasy etapów analizy (jeśli analiza była mierzona)
+    # ---------------------------------------------------------------------
+    timer = st.session_state.get("stage_timer")
+    if timer is not None and timer.frames:
+        st.write("\nWydajność Analizy (czasy etapów):")
+        for line in summary_lines(timer.summary()):
+            st.write(line)
+        st.download_button("Pobierz surowe czasy etapów (CSV)", timer.raw_csv(),
+                           file_name="stage_timings.csv", mime="text/csv")
+
     # KROK 6: Przygotuj dane do analizy AI
     # -------------------------------------
-    # Utwórz tekstowy opis wszystkich zebranych danych
-    analysis = ""
-    for emotion, score in average_emotion_scores.items():
-        analysis += f"{emotion.capitalize()}: {score:.2f}%\n"
-
-    analysis += f"Napięte Gesty Dłoni: {st.session_state.hand_gesture_count['tense']}\n"
-    analysis += f"Rozluźnione Gesty Dłoni: {st.session_state.hand_gesture_count['relaxed']}\n"
-    analysis += f"Kierunek Oczu (Lewo): {st.session_state.eye_direction_count['left']}\n"
-    analysis += f"Kierunek Oczu (Prawo): {st.session_state.eye_direction_count['right']}\n"
-    analysis += f"Kierunek Oczu (Centrum): {st.session_state.eye_direction_count['center']}\n"
-    analysis += f"Ruchy Głowy (Góra): {st.session_state.head_movement_count['up']}\n"
-    analysis += f"Ruchy Głowy (Dół): {st.session_state.head_movement_count['down']}\n"
-    analysis += f"Ruchy Głowy (Nieruchomo): {st.session_state.head_movement_count['still']}\n"
-
-    # KROK 7: Wywołaj Google Gemini AI do analizy
-    # --------------------------------------------
-    # ✅ BEZPIECZNE ROZWIĄZANIE - Użycie zmiennych środowiskowych lub Streamlit secrets
-    # Próbuje załadować klucz API w kolejności:
+    # Analiza AI poprzedniego raportu nie dotyczy już tych wyników
+    st.session_state.ai_report = None
+    # Tekstowy opis wszystkich zebranych danych - treść zapytania i zarazem
+    # klucz pamięci odpowiedzi (ta sama analiza w tym samym trybie = bez opłaty)
+    analysis = ai_report.build_analysis_text(average_scores, st.session_state)
+
+    # KROK 7: Wybierz klienta Google Gemini
+    # --------------------------------------
+    # EMO_AI_CLIENT=local - lokalny zastępca bez sieci (praca offline, testy).
+    # W przeciwnym razie klucz API ładujemy w kolejności:
     # 1. Ze zmiennych środowiskowych (GEMINI_API_KEY)
     # 2. Z Streamlit secrets (dla aplikacji wdrożonych na Streamlit Cloud)
     # 3. W przypadku braku klucza - wyświetla ostrzeżenie
-    
-    api_key = None
-    
-    # Próba 1: Zmienne środowiskowe
-    api_key = os.getenv('GEMINI_API_KEY')
-    
-    # Próba 2: Streamlit secrets (jeśli aplikacja jest wdrożona)
-    if not api_key:
+    if ai_report.use_local_client():
+        client = ai_report.LocalReportClient()
+    else:
+        api_key = os.getenv('GEMINI_API_KEY')
+
+        # Streamlit secrets (jeśli aplikacja jest wdrożona)
+        if not api_key:
+            try:
+                api_key = st.secrets.get("gemini_api_key")
+            except (KeyError, FileNotFoundError, AttributeError):
+                pass
+
+        # Sprawdź czy klucz API został znaleziony
+        if not api_key:
+            st.error("❌ Brak klucza API Google Gemini! Ustaw zmienną środowiskową GEMINI_API_KEY lub dodaj klucz do Streamlit secrets.")
+            st.info("ℹ️ Jak uzyskać klucz API: https://makersuite.google.com/app/apikey")
+            return "Brak konfiguracji API - nie można wygenerować analizy AI."
+
+        # Inicjalizuj klienta z bezpiecznie pobranym kluczem
+        # (import dopiero tutaj - biblioteka potrzebna jest tylko do raportu)
         try:
-            api_key = st.secrets.get("gemini_api_key")
-        except (KeyError, FileNotFoundError, AttributeError):
-            pass
-    
-    # Sprawdź czy klucz API został znaleziony
-    if not api_key:
-        st.error("❌ Brak klucza API Google Gemini! Ustaw zmienną środowiskową GEMINI_API_KEY lub dodaj klucz do Streamlit secrets.")
-        st.info("ℹ️ Jak uzyskać klucz API: https://makersuite.google.com/app/apikey")
-        return "Brak konfiguracji API - nie można wygenerować analizy AI."
-    
-    # Inicjalizuj klienta z bezpiecznie pobranym kluczem
-    try:
-        client = genai.Client(api_key=api_key)
-    except Exception as e:
-        st.error(f"❌ Błąd inicjalizacji klienta Google Gemini: {e}")
-        return "Błąd konfiguracji API - nie można wygenerować analizy AI."
-    
-    # Wyślij prompt do modelu Gemini
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",  # Model AI do użycia
-        contents=f"""Na podstawie tej Analizy Emocji i Zachowania dla trybu {mode}: {analysis}, 
-    użyj formatu JSON do ustrukturyzowania odpowiedzi:
-
-    {{
-        "behavior": "opisz ogólne zachowanie na podstawie analizy",
-        "action": "zasugeruj odpowiednie działanie"
-    }}
+            client = ai_report.create_client(api_key)
+        except Exception as e:
+            st.error(f"❌ Błąd inicjalizacji klienta Google Gemini: {e}")
+            return "Błąd konfiguracji API - nie można wygenerować analizy AI."
+
+    # KROK 8: Zleć analizę AI w tle
+    # ------------------------------
+    # Statystyki powyżej są już widoczne. Zapytanie działa w osobnym wątku
+    # z limitem czasu i ponowieniami; odpowiedź z pamięci wraca natychmiast,
+    # a ponowne kliknięcie w trakcie oczekiwania nie wysyła drugiego zapytania.
+    # Future trafia do stanu sesji - skrypt nie czeka na odpowiedź, wyświetla
+    # ją show_ai_report() na końcu tego lub kolejnego przebiegu skryptu.
+    st.session_state.ai_report = ai_report.submit_report(client, mode, analysis)
+
+
+# FUNKCJA 3: Wyświetlanie analizy AI zleconej w generate_report()
+# ==================================================================================
+AI_POLL_SECONDS = 2  # Co ile sekund sprawdzamy, czy odpowiedź AI jest gotowa
+
+
+def wait_for_ai_report():
     """
-    )
+    Informacja o oczekiwaniu na odpowiedź AI (zapytanie jeszcze trwa).
 
-    # KROK 8: Przetwórz odpowiedź AI
-    # -------------------------------
-    # Odpowiedź AI jest w formacie JSON, ale często opakowana w znaczniki markdown
-    # Bezpiecznie wyodrębnij JSON z odpowiedzi
-    ans = response.text
-    
-    # Usuń znaczniki markdown jeśli są obecne (np. ```json ... ```)
-    # Sprawdź czy odpowiedź zawiera znaczniki kodu
-    if "```" in ans:
-        # Znajdź początek JSON (pierwszy nawias klamrowy)
-        start = ans.find("{")
-        # Znajdź koniec JSON (ostatni nawias klamrowy)
-        end = ans.rfind("}") + 1
-        
-        # Sprawdź czy znaleziono prawidłowe granice JSON
-        if start != -1 and end > start:
-            ans = ans[start:end]
-        else:
-            # Jeśli nie znaleziono prawidłowych granic, spróbuj usunąć tylko znaczniki ```
-            ans = ans.replace("```json", "").replace("```", "").strip()
-    
-    # Spróbuj sparsować JSON
-    try:
-        ans = json.loads(ans)  # Parsuj JSON na słownik Python
-    except json.JSONDecodeError as e:
-        # Jeśli parsowanie nie powiedzie się, wyświetl błąd i użyj domyślnych wartości
-        st.error(f"Nie udało się sparsować odpowiedzi AI: {e}")
-        st.info(f"Otrzymana odpowiedź: {response.text[:200]}...")  # Pokaż fragment odpowiedzi
-        ans = {
-            "behavior": "Nie można było przeanalizować zachowania z powodu błędu parsowania JSON",
-            "action": "Spróbuj ponownie przeprowadzić analizę"
-        }
-    
-    # KROK 9: Wyświetl analizę behawioralną AI
-    # -----------------------------------------
+    W Streamlit z st.fragment funkcja działa jako fragment odświeżany co
+    AI_POLL_SECONDS sekund: gdy odpowiedź nadejdzie, wywołuje ponowny przebieg
+    całego skryptu - raport rysuje wtedy show_ai_report() poza fragmentem, więc
+    odpytywanie się kończy. W starszych wersjach odpowiedź pojawia się po
+    kliknięciu przycisku "Sprawdź analizę AI" (lub dowolnej innej interakcji).
+    """
+    future = st.session_state.get("ai_report")
+    if future is None or future.done():
+        st.rerun()  # Odpowiedź gotowa - raport narysuje pełny przebieg skryptu
+    st.info("⏳ Analiza AI w toku - statystyki są już gotowe.")
+    if not hasattr(st, "fragment"):
+        st.button("Sprawdź analizę AI")  # Kliknięcie = ponowny przebieg skryptu
+
+
+if hasattr(st, "fragment"):
+    # Odpytywanie tylko na czas oczekiwania, bez ponownego uruchamiania całego skryptu
+    wait_for_ai_report = st.fragment(run_every=AI_POLL_SECONDS)(wait_for_ai_report)
+
+
+def show_ai_report():
+    """
+    Wyświetla analizę behawioralną AI zapisaną w st.session_state.ai_report.
+
+    Działanie:
+    ----------
+    Sprawdza future.done() zamiast czekać na wynik: dopóki zapytanie trwa,
+    wyświetla wait_for_ai_report(), a gotową odpowiedź rysuje bezpośrednio
+    (poza odświeżanym fragmentem).
+    """
+    future = st.session_state.get("ai_report")
+    if future is None:
+        return
+    if not future.done():
+        wait_for_ai_report()
+        return
+
+    # Wyświetl analizę behawioralną AI
+    ans = future.result()  # Gotowy - nie blokuje
+    if ans["error"]:
+        st.warning(f"⚠️ {ans['error']}")
     st.write("\nAnaliza Behawioralna (wygenerowana przez AI):")
     st.write(f"Zachowanie: {ans['behavior']}")
     st.write(f"Sugerowane działanie: {ans['action']}")
+    if ans["source"] == "cache":
+        st.caption("Odpowiedź z pamięci - ta sama analiza była już wysłana do AI.")
 
     st.write("\nAnaliza Zakończona.")
     st.write("=" * 40)
@@ -787,7 +657,101 @@ input_source = st.sidebar.radio(
 # - camera: Użyj kamery internetowej w czasie rzeczywistym
 # - video: Prześlij plik wideo z dysku
 
-# Element 3: Przycisk rozpoczęcia analizy
+# Element 3: Próbkowanie klatek
+# ------------------------------
+# Analiza każdej klatki jest kosztowna (30 fps = 30 analiz DeepFace na sekundę).
+# Emocje zmieniają się wolniej, więc zwykle wystarczy analizować część klatek.
+sampling_options = {
+    "Każda klatka": "all",
+    "Co N-ta klatka": "stride",
+    "Docelowa liczba analiz na sekundę": "fps",
+    "Jedna analiza co T sekund": "interval",
+}
+sampling_label = st.sidebar.selectbox("Próbkowanie Klatek", list(sampling_options))
+sampling_policy = sampling_options[sampling_label]
+sampling_value = None
+if sampling_policy == "stride":
+    sampling_value = st.sidebar.number_input("Krok (N)", min_value=1, value=3, step=1)
+elif sampling_policy == "fps":
+    sampling_value = st.sidebar.number_input("Analiz na sekundę", min_value=0.1, value=5.0, step=0.5)
+elif sampling_policy == "interval":
+    sampling_value = st.sidebar.number_input("Odstęp (sekundy)", min_value=0.05, value=0.5, step=0.05)
+# number_input tworzy pole liczbowe z ograniczeniem wartości minimalnej
+
+# Face Mesh i tak wyznacza punkty twarzy - można z nich wyciąć twarz dla DeepFace
+# zamiast uruchamiać jego własny detektor. Klatki bez twarzy nie są wtedy
+# liczone do średnich emocji (zamiast wpisywać 100% "neutral").
+use_facemesh = st.sidebar.checkbox("Lokalizuj twarz przez Face Mesh (szybciej)", value=False)
+
+# Gdy twarz prawie się nie zmienia (rozmowa, zajęcia), wynik emocji można wziąć
+# z pamięci zamiast ponownie uruchamiać sieć. Większy próg = więcej trafień,
+# ale łatwiej przeoczyć subtelną zmianę wyrazu twarzy. Skrót liczymy z wycinka
+# twarzy, który daje tylko lokalizacja przez Face Mesh.
+use_emotion_cache = st.sidebar.checkbox("Pamięć podręczna emocji", value=False, disabled=not use_facemesh,
+                                        help="Wymaga lokalizacji twarzy przez Face Mesh") and use_facemesh
+emotion_cache_distance = 4
+if use_emotion_cache:
+    emotion_cache_distance = st.sidebar.slider("Próg podobieństwa twarzy (bity)", 0, 16, 4)
+
+# Rozdzielczość analizy: modele dostają klatkę zmniejszoną tak, aby dłuższy bok
+# nie przekraczał wybranej wartości - nagrania 1080p i 4K są analizowane niemal
+# tak szybko jak 640x480. Nakładki nadal rysujemy na pełnej klatce.
+resolution_options = {"Pełna": 0, "320 px": 320, "480 px": 480, "640 px": 640,
+                      "960 px": 960, "1280 px": 1280}
+with st.sidebar.expander("Rozdzielczość analizy"):
+    emotion_resolution = st.select_slider("Emocje", list(resolution_options), "640 px")
+    hands_resolution = st.select_slider("Dłonie", list(resolution_options), "640 px")
+    face_resolution = st.select_slider("Twarz (Face Mesh)", list(resolution_options), "640 px")
+
+# Śledzenie osób: detektory MediaPipe działają co kilka klatek, a pomiędzy nimi
+# punkty przesuwa przepływ optyczny. Przy kilku osobach każda dostaje stały
+# numer i osobne statystyki w raporcie (emocje osób - przy lokalizacji Face Mesh).
+with st.sidebar.expander("Śledzenie osób"):
+    max_faces = st.slider("Liczba osób", 1, 6, 1)
+    detect_every = st.slider("Detektor co N klatek", 1, 15, 1)
+
+# Równoległe etapy: model emocji, dłonie i Face Mesh analizują tę samą klatkę
+# jednocześnie, a nakładki i liczniki są nanoszone potem w stałej kolejności -
+# czas klatki zbliża się do najwolniejszego etapu zamiast do sumy wszystkich.
+concurrent_stages = st.sidebar.checkbox("Równoległe etapy klatki (emocje, dłonie, twarz)", value=False)
+
+settings = AnalysisSettings(face_localization="facemesh" if use_facemesh else "deepface",
+                            emotion_cache_size=32 if use_emotion_cache else 0,
+                            emotion_cache_distance=emotion_cache_distance,
+                            emotion_resolution=resolution_options[emotion_resolution],
+                            hands_resolution=resolution_options[hands_resolution],
+                            face_resolution=resolution_options[face_resolution],
+                            max_faces=max_faces,
+                            detect_every=detect_every,
+                            concurrent_stages=concurrent_stages)
+
+# Punkty kontrolne: postęp analizy pliku jest zapisywany na dysku - przerwaną
+# analizę tego samego nagrania można kontynuować zamiast liczyć od nowa
+resume_analysis = st.sidebar.checkbox("Wznawiaj przerwaną analizę pliku", value=True)
+
+# Długie nagrania: plik dzielony na segmenty analizowane równolegle w osobnych
+# procesach (każdy z własnymi modelami) - bez podglądu na żywo
+segment_count = st.sidebar.slider("Równoległe segmenty pliku (procesy)", 1, os.cpu_count() or 1, 1)
+
+# Model emocji w osobnych procesach: nie rywalizuje z MediaPipe o GIL, a klatki
+# trafiają do procesów przez pamięć współdzieloną (bez kopiowania obrazu)
+emotion_processes = st.sidebar.slider("Procesy modelu emocji (0 = w wątku analizy)", 0,
+                                      max(1, (os.cpu_count() or 1) - 1), 0)
+
+# Podgląd: wysyłanie pełnych klatek do przeglądarki spowalnia pracę przy
+# połączeniu zdalnym. Analiza działa z pełną szybkością niezależnie od podglądu.
+with st.sidebar.expander("Podgląd"):
+    preview_fps = st.slider("Odświeżenia podglądu na sekundę", 1, 30, 10)
+    preview_width = st.select_slider("Szerokość podglądu (px)", [320, 480, 640, 960, 1280, 1920], 640)
+    preview_quality = st.slider("Jakość JPEG", 30, 95, 70)
+    # Nakładki rysujemy tylko na klatkach wysyłanych do podglądu; bez żadnej
+    # warstwy podgląd pokazuje surowy obraz, a analiza nic nie rysuje
+    overlay_names = {"Panel emocji": "panel", "Kontury twarzy": "faces", "Dłonie": "hands"}
+    overlay_layers = st.multiselect("Nakładki", list(overlay_names), list(overlay_names))
+preview = FramePreview(max_fps=preview_fps, max_width=preview_width, jpeg_quality=preview_quality)
+overlay = OverlayRenderer(layers=[overlay_names[name] for name in overlay_layers])
+
+# Element 4: Przycisk rozpoczęcia analizy
 # ----------------------------------------
 if st.sidebar.button("Rozpocznij Analizę"):
     # button tworzy przycisk klikalny
@@ -797,9 +761,10 @@ if st.sidebar.button("Rozpocznij Analizę"):
     st.session_state.camera_running = True
     
     # Wywołaj funkcję główną rozpoczynającą przetwarzanie wideo
-    start_analysis(mode, input_source)
+    start_analysis(mode, input_source, sampling_policy, sampling_value, settings, preview,
+                   resume_analysis, segment_count, emotion_processes, overlay)
 
-# Element 4: Przycisk zatrzymania analizy
+# Element 5: Przycisk zatrzymania analizy
 # ----------------------------------------
 if st.sidebar.button("Zatrzymaj Analizę"):
     # Ten przycisk zatrzymuje przetwarzanie wideo
@@ -813,6 +778,12 @@ if st.sidebar.button("Zatrzymaj Analizę"):
     # Wygeneruj i wyświetl raport końcowy
     generate_report(mode)
 
+# Element 6: Analiza AI ostatniego raportu
+# -----------------------------------------
+# Odpowiedź AI przychodzi w tle - sekcja pokazuje ją, gdy tylko będzie gotowa
+# (także przy kolejnych przebiegach skryptu, gdy statystyk już nie ma na ekranie)
+show_ai_report()
+
 # ==================================================================================
 # KONIEC PROGRAMU
 # ==================================================================================
@@ -843,7 +814,7 @@ if st.sidebar.button("Zatrzymaj Analizę"):
 #
 # WSKAZÓWKI DLA STUDENTÓW:
 # -------------------------
-# - Spróbuj zmienić progi w funkcjach analyze_hands() i analyze_face()
+# - Spróbuj zmienić progi w funkcjach analyze_hands() i analyze_face() (plik analysis_core.py)
 # - Dodaj własne emocje lub gesty do wykrywania
 # - Zmień kolory tekstu na obrazie (wartości BGR)
 # - Dodaj nowe tryby analizy
@@ -0,0 +1,466 @@
+# ==================================================================================
+# BACKENDY MODELU EMOCJI - DeepFace (TensorFlow) lub ONNX Runtime
+# ==================================================================================
+# Sieć emocji DeepFace działa przez TensorFlow/Keras - na serwerach bez karty
+# graficznej to najdroższy krok analizy każdej klatki. Ta sama sieć wyeksportowana
+# do formatu ONNX i uruchamiana przez ONNX Runtime jest zwykle kilkukrotnie
+# szybsza na procesorze, a po kwantyzacji int8 - jeszcze szybsza i mniejsza.
+#
+# analysis_core.analyze_emotion() i BatchEmotionEngine korzystają z backendu
+# z puli modeli (model_pool, składnik "emotion_backend"). Backend wybiera
+# zmienna środowiskowa EMO_EMOTION_BACKEND:
+# - "deepface" (domyślnie) - DeepFace.analyze() jak dotąd
+# - "onnx" - model z pliku EMO_ONNX_MODEL, wątki: EMO_ONNX_INTRA_THREADS
+#   (obliczenia jednej operacji) i EMO_ONNX_INTER_THREADS (równoległe operacje)
+#
+# Narzędzia (wiersz poleceń):
+#   python emotion_backends.py export emotion.onnx --quantize emotion.int8.onnx
+#   python emotion_backends.py parity nagrania/ --onnx-model emotion.int8.onnx
+# "parity" porównuje wyniki z DeepFace na próbce twarzy i wypisuje dryf wyników
+# (punkty procentowe) oraz zgodność dominującej emocji.
+# ==================================================================================
+
+import argparse  # argparse - obsługa argumentów wiersza poleceń
+import functools  # lru_cache - skrót pliku modelu liczony raz na wersję pliku
+import hashlib  # hashlib - skrót treści pliku modelu (klucze wyników)
+import json  # json - zapis raportu zgodności
+import os  # os - zmienne środowiskowe z wyborem backendu
+import sys  # sys - kod wyjścia programu
+import time  # time - czas wywołań modeli w raporcie zgodności
+from pathlib import Path  # Path - wygodna praca ze ścieżkami
+
+import cv2  # OpenCV - detektor twarzy (kaskada Haara), odczyt próbek
+import numpy as np  # NumPy - partie wycinków i porównanie wyników
+
+import model_pool  # Modele DeepFace wczytywane raz na proces
+from emotion_engine import DEEPFACE_EMOTION_LABELS, preprocess_face, probabilities_to_scores
+from worker_threads import ONNX_INTRA_THREADS_ENV  # Limit wątków ONNX (także procesów roboczych)
+
+# SEKCJA 1: STAŁE
+# ==================================================================================
+
+# Dostępne backendy i zmienne środowiskowe wybierające backend
+BACKENDS = ("deepface", "onnx")
+BACKEND_ENV = "EMO_EMOTION_BACKEND"
+ONNX_MODEL_ENV = "EMO_ONNX_MODEL"
+ONNX_INTER_THREADS_ENV = "EMO_ONNX_INTER_THREADS"
+
+# Kaskada Haara z OpenCV - ten sam detektor, którego DeepFace używa domyślnie
+# (detector_backend="opencv"), ale bez importu TensorFlow
+HAAR_CASCADE = "haarcascade_frontalface_default.xml"
+
+# Wersja opsetu ONNX przy eksporcie (obsługiwana przez ONNX Runtime >= 1.10)
+ONNX_OPSET = 13
+
+# Domyślna liczba próbek (twarzy) w raporcie zgodności i co ile klatek nagrania ją pobieramy
+DEFAULT_PARITY_SAMPLES = 200
+DEFAULT_PARITY_FRAME_STEP = 15
+
+
+# SEKCJA 2: BACKENDY
+# ==================================================================================
+
+class DeepFaceBackend:
+    """
+    Backend DeepFace (TensorFlow/Keras) - zachowanie sprzed wprowadzenia backendów.
+
+    analyze() wywołuje DeepFace.analyze() (detektor twarzy + sieć), predict()
+    - samą sieć emocji na przygotowanych wycinkach (silnik wsadowy).
+    """
+
+    name = "deepface"
+
+    def describe(self):
+        """Opis backendu (do raportów i kluczy wyników)."""
+        return {"backend": self.name}
+
+    def warm_up(self):
+        """Wczytuje DeepFace z góry (model_pool - raz na proces)."""
+        model_pool.get("deepface")
+
+    def analyze(self, frame, skip_detection=False):
+        """
+        Emocje pierwszej twarzy klatki BGR.
+
+        Zwraca:
+        -------
+        dict lub None
+            {emocja: procent 0-100}; None, gdy model nie zwrócił wyniku
+        """
+        options = {"detector_backend": "skip"} if skip_detection else {}
+        result = model_pool.get("deepface").analyze(frame, actions=["emotion"],
+                                                    enforce_detection=False, **options)
+        # result[0] bo DeepFace może zwracać listę wyników (dla wielu twarzy)
+        if result and "emotion" in result[0]:
+            return result[0]["emotion"]
+        return None
+
+    def predict(self, batch, verbose=0):
+        """Prawdopodobieństwa (N, 7) dla tablicy (N, 48, 48, 1) - interfejs modeli Keras."""
+        return model_pool.get("emotion_model").predict(batch, verbose=verbose)
+
+
+class OnnxEmotionBackend:
+    """
+    Sieć emocji DeepFace wyeksportowana do ONNX i uruchamiana przez ONNX Runtime.
+
+    Parametry:
+    ----------
+    model_path : str lub Path
+        Plik .onnx (patrz export_onnx() i quantize_onnx())
+    intra_op_threads : int
+        Wątki jednej operacji (0 = domyślnie ONNX Runtime - wszystkie rdzenie)
+    inter_op_threads : int
+        Wątki wykonujące niezależne operacje równolegle (0 = domyślnie)
+    session :
+        Gotowa sesja (obiekt z get_inputs() i run()); None = utwórz z pliku
+    detector : callable lub None
+        detector(frame_bgr) -> lista wycinków twarzy; None = kaskada Haara
+
+    Przykład użycia:
+    ----------------
+    backend = OnnxEmotionBackend("emotion.int8.onnx", intra_op_threads=2)
+    backend.analyze(frame)                 # {"angry": 1.2, ..., "neutral": 80.3}
+    BatchEmotionEngine(model=backend)      # ten sam model w trybie wsadowym
+
+    Uwaga:
+    ------
+    Wyniki różnią się od DeepFace.analyze() detektorem twarzy (kaskada Haara
+    bez wyrównania) i - po kwantyzacji - samą siecią. Dryf sprawdza
+    compare_backends() / "python emotion_backends.py parity".
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path=None, intra_op_threads=0, inter_op_threads=0, session=None,
+                 detector=None):
+        if session is None and model_path is None:
+            raise ValueError(f"Backend ONNX wymaga pliku modelu (zmienna {ONNX_MODEL_ENV})")
+        self.model_path = str(model_path) if model_path is not None else None
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.session = session or self._create_session()
+        self._input_name = self.session.get_inputs()[0].name
+        self.detector = detector or haar_face_crops
+
+    def _create_session(self):
+        """Tworzy sesję ONNX Runtime na procesorze z zadaną liczbą wątków."""
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise ImportError("Backend ONNX wymaga pakietu onnxruntime (pip install onnxruntime)") from e
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        return onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+
+    def describe(self):
+        """Opis backendu (do raportów i kluczy wyników)."""
+        return {"backend": self.name, "model": self.model_path,
+                "intra_op_threads": self.intra_op_threads, "inter_op_threads": self.inter_op_threads}
+
+    def warm_up(self):
+        """Jedno wywołanie próbne (ONNX Runtime przygotowuje bufory przy pierwszym run())."""
+        self.predict(np.zeros((1, 48, 48, 1), dtype=np.float32))
+
+    def analyze(self, frame, skip_detection=False):
+        """Emocje pierwszej twarzy klatki BGR (jak DeepFaceBackend.analyze())."""
+        crops = [frame] if skip_detection else self.detector(frame)
+        probabilities = self.predict(preprocess_face(crops[0])[np.newaxis])
+        return probabilities_to_scores(probabilities[0])
+
+    def predict(self, batch, verbose=0):
+        """Prawdopodobieństwa (N, 7) dla tablicy (N, 48, 48, 1) - interfejs modeli Keras."""
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+def haar_face_crops(frame):
+    """
+    Wycinki twarzy BGR wykryte kaskadą Haara (od największej).
+
+    Gdy twarzy nie znaleziono (albo OpenCV nie zawiera kaskad Haara - od
+    wersji 5 są w pakiecie contrib), zwraca całą klatkę - tak jak
+    DeepFace.analyze(..., enforce_detection=False).
+    """
+    cascade = _haar_cascade()
+    if cascade is None:
+        return [frame]
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    boxes = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=10)
+    boxes = sorted(boxes, key=lambda box: box[2] * box[3], reverse=True)
+    return [frame[y:y + h, x:x + w] for x, y, w, h in boxes] or [frame]
+
+
+_cascade = None
+
+
+def _haar_cascade():
+    """Kaskada Haara wczytywana raz na proces (None, gdy OpenCV jej nie zawiera)."""
+    global _cascade
+    if _cascade is None:
+        if not hasattr(cv2, "CascadeClassifier") or not hasattr(cv2, "data"):
+            print("Ostrzeżenie: OpenCV bez kaskad Haara - emocje z całej klatki")
+            _cascade = False
+        else:
+            _cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, HAAR_CASCADE))
+    return _cascade or None
+
+
+def _env_int(name, default=0):
+    """Liczba całkowita ze zmiennej środowiskowej (niepoprawna wartość = domyślna)."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def model_file_digest(path):
+    """
+    Skrót SHA-256 treści pliku modelu (None, gdy pliku nie ma).
+
+    Eksport i kwantyzacja nadpisują model pod tą samą ścieżką - sama ścieżka
+    nie odróżnia starego modelu od nowego. Skrót jest zapamiętywany dla
+    rozmiaru i czasu modyfikacji pliku, więc liczymy go raz na wersję pliku.
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return _file_digest(os.path.abspath(path), info.st_size, info.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=16)
+def _file_digest(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def backend_config():
+    """
+    Ustawienia backendu ze zmiennych środowiskowych (bez wczytywania modelu).
+
+    Wchodzą do kluczy wyników zapisywanych na dysku (checkpoint.py) - wyniki
+    policzone innym backendem lub modelem nie mogą być użyte ponownie. Model
+    ONNX rozpoznaje skrót treści pliku ("model_sha256"), nie tylko ścieżka.
+
+    Wyjątki:
+    --------
+    ValueError
+        Gdy EMO_EMOTION_BACKEND ma nieznaną wartość
+    """
+    name = os.environ.get(BACKEND_ENV, "deepface").strip().lower() or "deepface"
+    if name not in BACKENDS:
+        raise ValueError(f"Nieznany backend emocji: {name} (dostępne: {', '.join(BACKENDS)})")
+    if name == "deepface":
+        return {"backend": name}
+    model = os.environ.get(ONNX_MODEL_ENV)
+    return {"backend": name, "model": model,
+            "model_sha256": model_file_digest(model) if model else None,
+            "intra_op_threads": _env_int(ONNX_INTRA_THREADS_ENV),
+            "inter_op_threads": _env_int(ONNX_INTER_THREADS_ENV)}
+
+
+def create_backend(config=None):
+    """Tworzy backend według backend_config() (lub podanego słownika w tym formacie)."""
+    config = config or backend_config()
+    if config["backend"] == "deepface":
+        return DeepFaceBackend()
+    return OnnxEmotionBackend(config.get("model"), config.get("intra_op_threads", 0),
+                              config.get("inter_op_threads", 0))
+
+
+# SEKCJA 3: EKSPORT I KWANTYZACJA
+# ==================================================================================
+
+def export_onnx(output_path, model=None, opset=ONNX_OPSET):
+    """
+    Eksportuje sieć emocji DeepFace (Keras) do pliku ONNX.
+
+    Parametry:
+    ----------
+    output_path : str lub Path
+        Plik wynikowy .onnx
+    model :
+        Model Keras; None = sieć emocji z puli modeli (DeepFace)
+    opset : int
+        Wersja zestawu operacji ONNX
+
+    Wyjątki:
+    --------
+    ImportError
+        Gdy brak pakietów tf2onnx / TensorFlow
+    """
+    try:
+        import tensorflow as tf
+        import tf2onnx
+    except ImportError as e:
+        raise ImportError("Eksport wymaga pakietów tensorflow i tf2onnx (pip install tf2onnx)") from e
+    model = model or model_pool.get("emotion_model")
+    signature = (tf.TensorSpec((None, 48, 48, 1), tf.float32, name="face"),)
+    tf2onnx.convert.from_keras(model, input_signature=signature, opset=opset,
+                               output_path=str(output_path))
+    return Path(output_path)
+
+
+def quantize_onnx(input_path, output_path):
+    """
+    Kwantyzacja dynamiczna int8 wag modelu ONNX (mniejszy plik, szybsze splot i mnożenia).
+
+    Aktywacje pozostają float32 i są kwantyzowane w locie - nie jest potrzebny
+    zbiór kalibracyjny. Dryf wyników sprawdź poleceniem "parity".
+    """
+    try:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+    except ImportError as e:
+        raise ImportError("Kwantyzacja wymaga pakietu onnxruntime (pip install onnxruntime)") from e
+    quantize_dynamic(str(input_path), str(output_path), weight_type=QuantType.QInt8)
+    return Path(output_path)
+
+
+# SEKCJA 4: ZGODNOŚĆ WYNIKÓW
+# ==================================================================================
+
+def compare_backends(reference, candidate, faces, batch_size=32):
+    """
+    Porównuje wyniki dwóch backendów na tych samych wycinkach twarzy.
+
+    Parametry:
+    ----------
+    reference, candidate :
+        Backendy (lub modele) z metodą predict(batch) - wzorzec i sprawdzany
+    faces : list[numpy.ndarray]
+        Wycinki po preprocess_face() (48x48x1)
+    batch_size : int
+        Liczba wycinków w jednym wywołaniu modeli
+
+    Zwraca:
+    -------
+    dict
+        samples, per_emotion ({emocja: {"mean_abs", "max_abs"}} w punktach
+        procentowych), max_abs_drift, mean_abs_drift, top1_agreement (odsetek
+        twarzy z tą samą dominującą emocją) oraz ms_per_face obu backendów
+    """
+    if not faces:
+        raise ValueError("Brak próbek do porównania")
+    timings = {"reference": 0.0, "candidate": 0.0}
+    outputs = {"reference": [], "candidate": []}
+    for start in range(0, len(faces), batch_size):
+        batch = np.stack(faces[start:start + batch_size]).astype(np.float32)
+        for key, backend in (("reference", reference), ("candidate", candidate)):
+            began = time.perf_counter()
+            probabilities = np.asarray(backend.predict(batch), dtype=np.float64)
+            timings[key] += time.perf_counter() - began
+            outputs[key].append(100.0 * probabilities / probabilities.sum(axis=1, keepdims=True))
+
+    expected, actual = np.concatenate(outputs["reference"]), np.concatenate(outputs["candidate"])
+    drift = np.abs(actual - expected)
+    return {
+        "samples": len(faces),
+        "per_emotion": {label: {"mean_abs": float(drift[:, i].mean()), "max_abs": float(drift[:, i].max())}
+                        for i, label in enumerate(DEEPFACE_EMOTION_LABELS)},
+        "max_abs_drift": float(drift.max()),
+        "mean_abs_drift": float(drift.mean()),
+        "top1_agreement": float((actual.argmax(axis=1) == expected.argmax(axis=1)).mean()),
+        "ms_per_face": {key: 1000.0 * value / len(faces) for key, value in timings.items()},
+    }
+
+
+def collect_sample_faces(inputs, limit=DEFAULT_PARITY_SAMPLES, frame_step=DEFAULT_PARITY_FRAME_STEP,
+                         detector=None):
+    """
+    Zbiera próbkę wycinków twarzy (po preprocess_face()) z obrazów i nagrań.
+
+    Parametry:
+    ----------
+    inputs : list
+        Pliki obrazów, pliki wideo lub katalogi z nimi
+    limit : int
+        Największa liczba próbek
+    frame_step : int
+        Co ile klatek nagrania pobierać próbkę
+    detector : callable lub None
+        Detektor twarzy (None = kaskada Haara); bierzemy największą twarz
+    """
+    detector = detector or haar_face_crops
+    files = []
+    for item in map(Path, inputs):
+        files.extend(sorted(p for p in item.rglob("*") if p.is_file()) if item.is_dir() else [item])
+
+    faces = []
+    for path in files:
+        image = cv2.imread(str(path))
+        if image is not None:
+            faces.append(preprocess_face(detector(image)[0]))
+        else:
+            cap = cv2.VideoCapture(str(path))
+            index = 0
+            while len(faces) < limit and cap.isOpened():
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if index % frame_step == 0:
+                    faces.append(preprocess_face(detector(frame)[0]))
+                index += 1
+            cap.release()
+        if len(faces) >= limit:
+            break
+    return faces[:limit]
+
+
+# SEKCJA 5: INTERFEJS WIERSZA POLECEŃ
+# ==================================================================================
+
+def main(argv=None):
+    """Punkt wejścia: export (z opcjonalną kwantyzacją) i parity (raport dryfu)."""
+    parser = argparse.ArgumentParser(description="Backend ONNX sieci emocji: eksport i zgodność z DeepFace")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="Eksportuj sieć emocji DeepFace do ONNX")
+    export.add_argument("output", help="Plik wynikowy .onnx")
+    export.add_argument("--quantize", default=None, metavar="PLIK",
+                        help="Zapisz też wersję po kwantyzacji int8")
+
+    parity = commands.add_parser("parity", help="Porównaj model ONNX z DeepFace na próbce twarzy")
+    parity.add_argument("inputs", nargs="+", help="Obrazy, nagrania lub katalogi z próbkami")
+    parity.add_argument("--onnx-model", required=True, help="Sprawdzany plik .onnx")
+    parity.add_argument("--samples", type=int, default=DEFAULT_PARITY_SAMPLES,
+                        help="Największa liczba twarzy w próbce")
+    parity.add_argument("--intra-threads", type=int, default=0, help="Wątki jednej operacji ONNX Runtime")
+    parity.add_argument("--inter-threads", type=int, default=0, help="Wątki równoległych operacji")
+    parity.add_argument("--max-drift", type=float, default=None,
+                        help="Kod wyjścia 1, gdy największy dryf (punkty procentowe) przekroczy próg")
+    parity.add_argument("--output", default=None, help="Zapisz raport jako JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        path = export_onnx(args.output)
+        print(f"✅ Zapisano model ONNX: {path}")
+        if args.quantize:
+            print(f"✅ Zapisano model int8: {quantize_onnx(path, args.quantize)}")
+        return 0
+
+    faces = collect_sample_faces(args.inputs, limit=args.samples)
+    candidate = OnnxEmotionBackend(args.onnx_model, args.intra_threads, args.inter_threads)
+    report = compare_backends(DeepFaceBackend(), candidate, faces)
+    report["model"] = args.onnx_model
+    print(f"Próbki: {report['samples']}, zgodność dominującej emocji: {report['top1_agreement']:.1%}")
+    print(f"Dryf: średni {report['mean_abs_drift']:.2f} pp, maksymalny {report['max_abs_drift']:.2f} pp")
+    for label, drift in report["per_emotion"].items():
+        print(f"  {label:>8}: średni {drift['mean_abs']:.2f} pp, maks. {drift['max_abs']:.2f} pp")
+    print(f"Czas na twarz: DeepFace {report['ms_per_face']['reference']:.2f} ms, "
+          f"ONNX {report['ms_per_face']['candidate']:.2f} ms")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.max_drift is not None and report["max_abs_drift"] > args.max_drift:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
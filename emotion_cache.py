@@ -0,0 +1,148 @@
+# ==================================================================================
+# PAMIĘĆ PODRĘCZNA EMOCJI - ponowne użycie wyniku dla niezmienionej twarzy
+# ==================================================================================
+# Na nagraniach rozmów i zajęć twarz przez długi czas prawie się nie zmienia,
+# a mimo to sieć emocji analizuje ją od nowa w każdej klatce.
+#
+# EmotionCache zapamiętuje wyniki emocji dla ostatnio widzianych twarzy.
+# Kluczem jest "podpis" obrazu twarzy - 64-bitowy skrót percepcyjny (dHash):
+# obraz zmniejszony do 9x8 w skali szarości, każdy bit mówi, czy piksel jest
+# jaśniejszy od sąsiada po prawej. Podobne obrazy mają podobne skróty, więc
+# twarz uznajemy za niezmienioną, gdy skróty różnią się na co najwyżej
+# "max_distance" bitach (odległość Hamminga).
+#
+# Liczniki trafień i chybień pozwalają dobrać próg: większy próg to więcej
+# trafień (szybciej), ale też większe ryzyko przeoczenia zmiany wyrazu twarzy.
+# ==================================================================================
+
+import collections  # OrderedDict - kolejność użycia wpisów (usuwanie najdawniej użytych)
+
+import cv2  # OpenCV - skala szarości i zmniejszanie obrazu
+import numpy as np  # NumPy - porównanie sąsiednich pikseli
+
+# Rozmiar obrazu, z którego liczony jest skrót (szerokość, wysokość): 8x8 = 64 bity
+_HASH_SIZE = (9, 8)
+
+
+def image_signature(image):
+    """
+    Liczy 64-bitowy skrót percepcyjny (dHash) obrazu.
+
+    Parametry:
+    ----------
+    image : numpy.ndarray
+        Obraz BGR lub w skali szarości (np. wycinek twarzy)
+
+    Zwraca:
+    -------
+    int
+        Skrót - podobne obrazy mają skróty różniące się na niewielu bitach
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, _HASH_SIZE, interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a, b):
+    """Liczba bitów, na których różnią się dwa skróty."""
+    return bin(a ^ b).count("1")  # int.bit_count() dopiero od Pythona 3.10
+
+
+class EmotionCache:
+    """
+    Pamięć podręczna wyników emocji z usuwaniem najdawniej użytych wpisów (LRU).
+
+    Parametry:
+    ----------
+    max_entries : int
+        Maksymalna liczba zapamiętanych twarzy
+    max_distance : int
+        Największa odległość Hamminga (0-64), przy której twarz uznajemy za
+        niezmienioną; 0 = tylko identyczne skróty
+
+    Atrybuty:
+    ---------
+    stats : dict
+        "hits" - wyniki wzięte z pamięci, "misses" - wywołania modelu,
+        "evictions" - wpisy usunięte z powodu braku miejsca
+
+    Przykład użycia:
+    ----------------
+    cache = EmotionCache(max_entries=32, max_distance=4)
+    scores = cache.get_or_compute(face_crop, lambda: analyze_emotion(face_crop))
+    cache.hit_rate   # np. 0.85
+    """
+
+    def __init__(self, max_entries=32, max_distance=4):
+        if max_entries < 1:
+            raise ValueError("Pojemność pamięci podręcznej musi być dodatnia")
+        if not 0 <= max_distance <= 64:
+            raise ValueError("Próg odległości musi mieścić się w zakresie 0-64")
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        self._entries = collections.OrderedDict()  # {skrót: wyniki emocji}
+
+    def lookup(self, signature):
+        """
+        Szuka wyników dla twarzy o podobnym skrócie.
+
+        Zwraca:
+        -------
+        dict lub None
+            Kopia zapamiętanych wyników albo None (chybienie)
+        """
+        best, best_distance = None, self.max_distance + 1
+        for key in self._entries:
+            distance = hamming_distance(signature, key)
+            if distance < best_distance:
+                best, best_distance = key, distance
+                if distance == 0:
+                    break
+
+        if best is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        self._entries.move_to_end(best)
+        return dict(self._entries[best])
+
+    def store(self, signature, scores):
+        """Zapamiętuje wyniki; przy braku miejsca usuwa najdawniej użyty wpis."""
+        self._entries[signature] = dict(scores)
+        self._entries.move_to_end(signature)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_or_compute(self, image, compute):
+        """
+        Zwraca wyniki z pamięci albo wywołuje compute() i zapamiętuje wynik.
+
+        Parametry:
+        ----------
+        image : numpy.ndarray
+            Obraz twarzy, z którego liczony jest skrót
+        compute : callable
+            Funkcja bez argumentów zwracająca wyniki emocji (wywołanie modelu)
+        """
+        signature = image_signature(image)
+        scores = self.lookup(signature)
+        if scores is None:
+            scores = compute()
+            self.store(signature, scores)
+        return scores
+
+    def clear(self):
+        """Usuwa wszystkie wpisy (liczniki pozostają bez zmian)."""
+        self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        """Odsetek trafień (0.0 - 1.0); 0.0 przed pierwszym zapytaniem."""
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def __len__(self):
+        return len(self._entries)
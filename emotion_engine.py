@@ -0,0 +1,287 @@
+# ==================================================================================
+# SILNIK EMOCJI - wsadowa (batch) analiza wielu twarzy jednym wywołaniem modelu
+# ==================================================================================
+# DeepFace.analyze() przetwarza jedną klatkę na raz: wykrywa twarz, przygotowuje
+# wycinek 48x48 w skali szarości i wywołuje sieć neuronową dla jednego obrazu.
+# Sieci neuronowe na procesorze działają znacznie wydajniej, gdy dostają wiele
+# obrazów naraz (lepsza wektoryzacja obliczeń).
+#
+# BatchEmotionEngine zbiera wycinki twarzy - z kolejnych klatek lub kilku twarzy
+# w jednej klatce - i przepuszcza je przez model emocji jednym wywołaniem.
+# Zwraca wyniki w tym samym formacie co analyze_emotion(): {emocja: procent}.
+# ==================================================================================
+
+import cv2  # OpenCV - skala szarości, skalowanie wycinków twarzy
+import numpy as np  # NumPy - składanie wycinków w jedną tablicę (batch)
+
+import model_pool  # Sieć emocji wczytywana raz na proces
+
+# Kolejność wyjść modelu emocji DeepFace (tak samo zwraca je DeepFace.analyze)
+DEEPFACE_EMOTION_LABELS = ("angry", "disgust", "fear", "happy", "sad", "surprise", "neutral")
+
+# Rozmiar wejścia modelu emocji (szerokość, wysokość)
+MODEL_INPUT_SIZE = (48, 48)
+
+# Domyślny detektor twarzy DeepFace (taki sam jak w DeepFace.analyze)
+DEFAULT_DETECTOR_BACKEND = "opencv"
+
+
+# SEKCJA 1: PRZYGOTOWANIE DANYCH
+# ==================================================================================
+
+def _pad_to_square(image):
+    """Dopełnia obraz czarnymi pasami do kwadratu (jak DeepFace przed skalowaniem)."""
+    height, width = image.shape[:2]
+    if height == width:
+        return image
+    size = max(height, width)
+    top = (size - height) // 2
+    left = (size - width) // 2
+    return cv2.copyMakeBorder(image, top, size - height - top, left, size - width - left,
+                              cv2.BORDER_CONSTANT, value=0)
+
+
+def preprocess_face(crop):
+    """
+    Przygotowuje wycinek twarzy do modelu emocji.
+
+    Parametry:
+    ----------
+    crop : numpy.ndarray
+        Wycinek twarzy BGR (uint8) lub w skali szarości
+
+    Zwraca:
+    -------
+    numpy.ndarray
+        Tablica float32 o kształcie (48, 48, 1) z wartościami 0-1
+    """
+    gray = crop if crop.ndim == 2 else cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    gray = cv2.resize(_pad_to_square(gray), MODEL_INPUT_SIZE, interpolation=cv2.INTER_AREA)
+    return (gray.astype(np.float32) / 255.0)[..., np.newaxis]
+
+
+def probabilities_to_scores(probabilities):
+    """
+    Zamienia wyjście modelu (7 prawdopodobieństw) na słownik procentów.
+
+    Zwraca:
+    -------
+    dict
+        {emocja: procent 0-100} w kolejności DEEPFACE_EMOTION_LABELS
+    """
+    total = float(np.sum(probabilities)) or 1.0
+    return {label: 100.0 * float(p) / total
+            for label, p in zip(DEEPFACE_EMOTION_LABELS, probabilities)}
+
+
+# SEKCJA 2: MODEL I DETEKTOR TWARZY (DOMYŚLNE - DEEPFACE)
+# ==================================================================================
+
+def load_deepface_emotion_model():
+    """Wczytuje sieć emocji DeepFace (Keras) - tę samą, której używa DeepFace.analyze."""
+    from deepface import DeepFace
+    return DeepFace.build_model("Emotion").model
+
+
+def deepface_face_crops(frame):
+    """
+    Wykrywa twarze detektorem DeepFace i zwraca ich wycinki BGR (uint8).
+
+    Gdy twarzy nie znaleziono, zwraca całą klatkę - tak samo zachowuje się
+    DeepFace.analyze(..., enforce_detection=False).
+    """
+    from deepface import DeepFace
+
+    try:
+        faces = DeepFace.extract_faces(frame, detector_backend=DEFAULT_DETECTOR_BACKEND,
+                                       enforce_detection=False)
+    except Exception as e:
+        print(f"Ostrzeżenie: Błąd wykrywania twarzy: {e}")
+        return [frame]
+
+    # extract_faces zwraca twarze RGB znormalizowane do 0-1
+    crops = [(face["face"][:, :, ::-1] * 255).astype(np.uint8) for face in faces]
+    return crops or [frame]
+
+
+# Indeksy punktów siatki twarzy MediaPipe używane do wyrównania wycinka
+_LEFT_EYE = 33
+_RIGHT_EYE = 263
+
+
+def facemesh_face_crop(frame, face_landmarks, margin=0.15, align=True):
+    """
+    Wycina twarz na podstawie punktów MediaPipe Face Mesh (bez osobnego detektora).
+
+    Parametry:
+    ----------
+    frame : numpy.ndarray
+        Obraz, z którego wycinamy twarz (np. klatka RGB z kontekstu klatki)
+    face_landmarks :
+        Punkty twarzy z face_mesh.process() (współrzędne znormalizowane 0-1)
+    margin : float
+        Margines dodawany z każdej strony prostokąta (ułamek jego rozmiaru)
+    align : bool
+        Czy obrócić wycinek tak, aby linia oczu była pozioma
+
+    Zwraca:
+    -------
+    numpy.ndarray lub None
+        Wycinek twarzy (ten sam format kolorów co "frame") albo None, gdy
+        prostokąt twarzy leży poza obrazem
+    """
+    height, width = frame.shape[:2]
+    xs = np.fromiter((p.x for p in face_landmarks.landmark), dtype=np.float32)
+    ys = np.fromiter((p.y for p in face_landmarks.landmark), dtype=np.float32)
+
+    # Prostokąt obejmujący wszystkie punkty twarzy + margines
+    x0, x1 = xs.min() * width, xs.max() * width
+    y0, y1 = ys.min() * height, ys.max() * height
+    pad_x, pad_y = (x1 - x0) * margin, (y1 - y0) * margin
+    left, right = max(int(x0 - pad_x), 0), min(int(x1 + pad_x), width)
+    top, bottom = max(int(y0 - pad_y), 0), min(int(y1 + pad_y), height)
+    if right - left < 2 or bottom - top < 2:
+        return None
+
+    crop = frame[top:bottom, left:right]
+    if not align:
+        return crop
+
+    # Kąt linii oczu - obracamy wycinek (nie całą klatkę), aby oczy były w poziomie
+    left_eye, right_eye = face_landmarks.landmark[_LEFT_EYE], face_landmarks.landmark[_RIGHT_EYE]
+    angle = np.degrees(np.arctan2((right_eye.y - left_eye.y) * height,
+                                  (right_eye.x - left_eye.x) * width))
+    if abs(angle) < 1.0:
+        return crop
+    center = (crop.shape[1] / 2, crop.shape[0] / 2)
+    rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+    return cv2.warpAffine(crop, rotation, (crop.shape[1], crop.shape[0]),
+                          borderMode=cv2.BORDER_REPLICATE)
+
+
+# SEKCJA 3: SILNIK WSADOWY
+# ==================================================================================
+
+class BatchEmotionEngine:
+    """
+    Analizuje emocje na wielu wycinkach twarzy jednym wywołaniem modelu.
+
+    Parametry:
+    ----------
+    model : obiekt z metodą predict(batch, verbose=0) lub None
+        Model przyjmujący tablicę (N, 48, 48, 1) i zwracający (N, 7)
+        prawdopodobieństw (interfejs modeli Keras). None = backend emocji
+        z puli modeli (model_pool, "emotion_backend" - DeepFace lub ONNX Runtime,
+        patrz emotion_backends.py).
+    batch_size : int
+        Maksymalna liczba wycinków w jednym wywołaniu modelu
+    detector : callable lub None
+        detector(frame_bgr) -> lista wycinków twarzy BGR.
+        None = detektor backendu (atrybut "detector" modelu, np. kaskada Haara
+        backendu ONNX), a gdy go nie ma - detektor DeepFace (deepface_face_crops).
+
+    Atrybuty:
+    ---------
+    stats : dict
+        "batches" - liczba wywołań modelu, "items" - liczba przeanalizowanych twarzy
+
+    Przykład użycia:
+    ----------------
+    engine = BatchEmotionEngine(batch_size=32)
+    per_frame = engine.analyze_frames([frame1, frame2, frame3])
+    per_frame[0][0]   # {"angry": 1.2, ..., "neutral": 80.3} - pierwsza twarz klatki 1
+    """
+
+    def __init__(self, model=None, batch_size=32, detector=None):
+        if batch_size < 1:
+            raise ValueError("Rozmiar partii (batch_size) musi być dodatni")
+        self._model = model
+        self.batch_size = batch_size
+        self._detector = detector
+        self.stats = {"batches": 0, "items": 0}
+
+    @property
+    def model(self):
+        """Model emocji (wczytywany przy pierwszym użyciu)."""
+        if self._model is None:
+            self._model = model_pool.get("emotion_backend")
+        return self._model
+
+    @property
+    def detector(self):
+        """Detektor twarzy (domyślnie ten, którego używa backend modelu)."""
+        if self._detector is None:
+            self._detector = getattr(self.model, "detector", None) or deepface_face_crops
+        return self._detector
+
+    def predict(self, crops):
+        """
+        Analizuje listę wycinków twarzy.
+
+        Parametry:
+        ----------
+        crops : list[numpy.ndarray]
+            Wycinki twarzy BGR dowolnego rozmiaru
+
+        Zwraca:
+        -------
+        list[dict]
+            Wyniki emocji dla każdego wycinka (w tej samej kolejności)
+        """
+        return self.predict_prepared([preprocess_face(crop) for crop in crops])
+
+    def predict_prepared(self, faces):
+        """
+        Analizuje wycinki już przygotowane przez preprocess_face().
+
+        Przygotowane wycinki (48x48) są małe i niezależne od bufora klatki,
+        więc można je zbierać przez wiele klatek i przeanalizować naraz.
+        """
+        results = []
+        for start in range(0, len(faces), self.batch_size):
+            chunk = faces[start:start + self.batch_size]
+            probabilities = np.asarray(self._predict_batch(np.stack(chunk)))
+            self.stats["batches"] += 1
+            self.stats["items"] += len(chunk)
+            results.extend(probabilities_to_scores(p) for p in probabilities)
+        return results
+
+    def _predict_batch(self, batch):
+        """Wywołuje model na przygotowanej tablicy (N, 48, 48, 1)."""
+        # verbose=0 wyłącza pasek postępu, który Keras wypisuje przy każdym wywołaniu
+        return self.model.predict(batch, verbose=0)
+
+    def analyze_frames(self, frames):
+        """
+        Wykrywa twarze na kilku klatkach i analizuje je wszystkie naraz.
+
+        Zwraca:
+        -------
+        list[list[dict]]
+            Dla każdej klatki lista wyników (po jednym na wykrytą twarz)
+        """
+        crops_per_frame = [self.detector(frame) for frame in frames]
+        return self.predict_grouped(crops_per_frame)
+
+    def predict_grouped(self, crops_per_frame):
+        """
+        Analizuje wycinki pogrupowane według klatek jednym (lub kilkoma) wywołaniami modelu.
+
+        Parametry:
+        ----------
+        crops_per_frame : list[list[numpy.ndarray]]
+            Dla każdej klatki lista jej wycinków twarzy
+
+        Zwraca:
+        -------
+        list[list[dict]]
+            Wyniki pogrupowane tak samo jak dane wejściowe
+        """
+        flat = [crop for crops in crops_per_frame for crop in crops]
+        scores = self.predict(flat)
+        grouped = []
+        position = 0
+        for crops in crops_per_frame:
+            grouped.append(scores[position:position + len(crops)])
+            position += len(crops)
+        return grouped
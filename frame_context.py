@@ -0,0 +1,194 @@
+# ==================================================================================
+# KONTEKST KLATKI - jedna konwersja kolorów i wielokrotnie używane bufory
+# ==================================================================================
+# Każdy etap analizy potrzebuje tej samej klatki w nieco innej postaci:
+# DeepFace pracuje na obrazie BGR, a MediaPipe (Hands i Face Mesh) na RGB.
+# Wcześniej każda funkcja sama wywoływała cv2.cvtColor(), co oznaczało dwie
+# pełne konwersje i dwie nowe tablice na każdą klatkę.
+#
+# FrameContext przechowuje klatkę BGR oraz leniwie liczone wersje pochodne
+# (RGB, pomniejszone kopie - np. w rozdzielczości analizy danego modelu). Każda konwersja wykonywana jest najwyżej raz na
+# klatkę, a wynik zapisywany jest do bufora przydzielonego raz i używanego
+# ponownie w kolejnych klatkach - w pętli nie tworzymy nowych tablic.
+# ==================================================================================
+
+import cv2  # OpenCV - konwersja kolorów i skalowanie obrazu
+import numpy as np  # NumPy - bufory na obrazy
+
+
+class FrameContext:
+    """
+    Klatka wideo wraz z buforami na jej przekształcone wersje.
+
+    Jeden obiekt FrameContext tworzymy na całą pętlę i wypełniamy go kolejnymi
+    klatkami (read() lub reset()). Bufory są przydzielane ponownie tylko wtedy,
+    gdy zmieni się rozmiar klatki.
+
+    Atrybuty:
+    ---------
+    bgr : numpy.ndarray
+        Bieżąca klatka w formacie OpenCV (BGR)
+    index : int
+        Indeks klatki w strumieniu
+    allocations : int
+        Liczba przydzielonych buforów (do kontroli, czy pętla nie alokuje pamięci)
+
+    Przykład użycia:
+    ----------------
+    ctx = FrameContext()
+    while ctx.read(cap):
+        hands.process(ctx.rgb)       # konwersja BGR -> RGB
+        face_mesh.process(ctx.rgb)   # ten sam bufor, bez ponownej konwersji
+    """
+
+    def __init__(self):
+        self.bgr = None
+        self.index = -1
+        self.allocations = 0
+        self._decode_buffer = None   # Bufor, do którego cap.read() dekoduje klatkę
+        self._rgb_buffer = None      # Bufor na wersję RGB
+        self._rgb_valid = False      # Czy bufor RGB odpowiada bieżącej klatce
+        self._resized = {}           # {(szerokość, wysokość, "bgr"/"rgb"/"gray"): bufor}
+        self._resized_valid = set()  # Klucze buforów aktualnych dla bieżącej klatki
+
+    # ------------------------------------------------------------------------------
+    # Wypełnianie kontekstu klatką
+    # ------------------------------------------------------------------------------
+
+    def reset(self, frame, index=None):
+        """
+        Ustawia nową klatkę BGR i unieważnia wszystkie wersje pochodne.
+
+        Parametry:
+        ----------
+        frame : numpy.ndarray
+            Klatka w formacie BGR
+        index : int lub None
+            Indeks klatki; domyślnie poprzedni indeks + 1
+        """
+        self.bgr = frame
+        self.index = self.index + 1 if index is None else index
+        self._rgb_valid = False
+        self._resized_valid.clear()
+        return self
+
+    def read(self, cap, index=None):
+        """
+        Odczytuje kolejną klatkę ze źródła wideo do wielokrotnie używanego bufora.
+
+        Zwraca:
+        -------
+        bool
+            True jeśli klatkę udało się odczytać (jak "ret" z cap.read())
+
+        Uwaga:
+        ------
+        Klatka jest dekodowana do tego samego bufora co poprzednia, więc po
+        następnym read() poprzednia zawartość ctx.bgr zostanie nadpisana.
+        Kto chce zachować klatkę na dłużej, musi zrobić jej kopię.
+        """
+        ret, frame = cap.read(self._decode_buffer)
+        if not ret:
+            return False
+        if frame is not self._decode_buffer:
+            # Pierwsza klatka lub zmiana rozmiaru - OpenCV przydzielił nową tablicę
+            self._decode_buffer = frame
+            self.allocations += 1
+        self.reset(frame, index)
+        return True
+
+    # ------------------------------------------------------------------------------
+    # Wersje pochodne (liczone leniwie, najwyżej raz na klatkę)
+    # ------------------------------------------------------------------------------
+
+    def _buffer(self, current, shape):
+        """Zwraca bufor o podanym kształcie, przydzielając nowy tylko w razie potrzeby."""
+        if current is None or current.shape != shape:
+            current = np.empty(shape, dtype=np.uint8)
+            self.allocations += 1
+        return current
+
+    @property
+    def rgb(self):
+        """Klatka w formacie RGB (dla MediaPipe), konwertowana najwyżej raz."""
+        if not self._rgb_valid:
+            self._rgb_buffer = self._buffer(self._rgb_buffer, self.bgr.shape)
+            cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB, dst=self._rgb_buffer)
+            self._rgb_valid = True
+        return self._rgb_buffer
+
+    def resized(self, size, color="bgr"):
+        """
+        Zwraca pomniejszoną kopię klatki (liczoną najwyżej raz na klatkę).
+
+        Parametry:
+        ----------
+        size : tuple
+            Docelowy rozmiar (szerokość, wysokość)
+        color : str
+            "bgr", "rgb" lub "gray" (odcienie szarości - śledzenie punktów)
+
+        Uwaga:
+        ------
+        Wersje RGB i szara powstają z pomniejszonej wersji BGR, więc konwersja
+        kolorów dotyczy już mniejszego obrazu.
+        """
+        width, height = size
+        if (width, height) == (self.bgr.shape[1], self.bgr.shape[0]) and color != "gray":
+            return self.bgr if color == "bgr" else self.rgb
+
+        key = (width, height, color)
+        if key not in self._resized_valid:
+            shape = (height, width) if color == "gray" else (height, width) + self.bgr.shape[2:]
+            buffer = self._buffer(self._resized.get(key), shape)
+            if color == "bgr":
+                cv2.resize(self.bgr, (width, height), dst=buffer, interpolation=cv2.INTER_AREA)
+            elif color == "gray":
+                cv2.cvtColor(self.resized(size, "bgr"), cv2.COLOR_BGR2GRAY, dst=buffer)
+            else:
+                cv2.cvtColor(self.resized(size, "bgr"), cv2.COLOR_BGR2RGB, dst=buffer)
+            self._resized[key] = buffer
+            self._resized_valid.add(key)
+        return self._resized[key]
+
+    def scaled(self, max_side, color="bgr"):
+        """
+        Zwraca klatkę w rozdzielczości analizy: dłuższy bok najwyżej max_side.
+
+        Proporcje są zachowane, więc znormalizowane współrzędne (0-1) wyznaczone
+        na zmniejszonym obrazie (punkty MediaPipe) wskazują te same miejsca na
+        pełnej klatce. Etapy o tym samym rozmiarze dzielą jeden bufor.
+
+        Parametry:
+        ----------
+        max_side : int lub None
+            Największy dłuższy bok w pikselach (0/None = pełna rozdzielczość)
+        color : str
+            "bgr", "rgb" lub "gray"
+        """
+        height, width = self.bgr.shape[:2]
+        return self.resized(fit_size(width, height, max_side), color)
+
+
+def fit_size(width, height, max_side):
+    """
+    Rozmiar (szerokość, wysokość) obrazu zmniejszonego tak, aby dłuższy bok
+    nie przekraczał max_side (proporcje zachowane; 0/None = bez zmian).
+    """
+    longest = max(width, height)
+    if not max_side or longest <= max_side:
+        return width, height
+    scale = max_side / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def as_frame_context(frame):
+    """
+    Zwraca FrameContext dla podanej klatki.
+
+    Funkcje analizy przyjmują zarówno gotowy FrameContext (z pętli głównej),
+    jak i zwykłą tablicę NumPy (wygodne w testach i prostych skryptach).
+    """
+    if isinstance(frame, FrameContext):
+        return frame
+    return FrameContext().reset(frame, index=0)
@@ -0,0 +1,258 @@
+# ==================================================================================
+# REJESTR WYNIKÓW KLATEK - zwarte, kolumnowe przechowywanie wyników analizy
+# ==================================================================================
+# Wcześniej każda przeanalizowana klatka dopisywała do raportu gotowy tekst
+# "2024-01-01 12:00:00 - Interview: Analiza: happy (70.00%)". Godzina pracy
+# kamery to około 100 tysięcy napisów w pamięci każdej sesji, a formatowanie
+# daty odbywało się w każdej klatce.
+#
+# FrameRecordStore trzyma wyniki w jednej tablicy strukturalnej NumPy
+# (kolumny: indeks klatki, czas, waga, 7 emocji, gest, spojrzenie, głowa, tryb).
+# Jeden wiersz zajmuje kilkadziesiąt bajtów, a tablica jest przydzielana z góry.
+# Opcjonalny limit "capacity" zamienia rejestr w bufor cykliczny - po jego
+# przekroczeniu najstarsze wiersze są nadpisywane. Tekst powstaje dopiero przy
+# wyświetlaniu lub eksporcie raportu.
+# ==================================================================================
+
+import time  # time - znacznik czasu wiersza
+
+import numpy as np  # NumPy - tablice strukturalne (kolumnowe)
+
+# Kolejność emocji w rejestrze (i w całej aplikacji)
+EMOTIONS = ("happy", "sad", "angry", "surprise", "fear", "disgust", "neutral")
+
+# Słowniki etykiet - w tablicy zapisujemy numer etykiety (0 = brak wyniku)
+GESTURE_LABELS = (None, "tense", "relaxed")
+GAZE_LABELS = (None, "left", "right", "center")
+HEAD_LABELS = (None, "up", "down", "still")
+
+# Układ jednego wiersza rejestru
+RECORD_DTYPE = np.dtype([
+    ("frame_index", np.int64),               # Indeks klatki w strumieniu
+    ("timestamp", np.float64),               # Czas analizy (sekundy od epoki, time.time())
+    ("weight", np.int32),                    # Liczba klatek źródła reprezentowanych przez wiersz
+    ("emotions", np.float32, len(EMOTIONS)),  # Procenty emocji (NaN = emocji nie mierzono)
+    ("gesture", np.int8),                    # Numer etykiety z GESTURE_LABELS
+    ("gaze", np.int8),                       # Numer etykiety z GAZE_LABELS
+    ("head", np.int8),                       # Numer etykiety z HEAD_LABELS
+    ("mode", np.int8),                       # Numer trybu analizy na liście FrameRecordStore.modes
+])
+
+# Początkowy rozmiar tablicy rejestru bez limitu (potem podwajany)
+_INITIAL_SIZE = 1024
+
+
+def _label_code(labels, label):
+    """Zamienia etykietę na jej numer (None -> 0)."""
+    return labels.index(label) if label is not None else 0
+
+
+class FrameRecordStore:
+    """
+    Kolumnowy rejestr wyników kolejnych klatek.
+
+    Parametry:
+    ----------
+    capacity : int lub None
+        Maksymalna liczba przechowywanych wierszy. Po jej przekroczeniu
+        najstarsze wiersze są nadpisywane (bufor cykliczny).
+        None = bez limitu (tablica rośnie, podwajając rozmiar).
+
+    Atrybuty:
+    ---------
+    total : int
+        Liczba wszystkich dopisanych wierszy (również tych już nadpisanych)
+    modes : list[str]
+        Tryby analizy występujące w rejestrze (kolumna "mode" to indeks na tej liście)
+
+    Przykład użycia:
+    ----------------
+    records = FrameRecordStore(capacity=50_000)
+    records.append(frame_index=10, mode="Interview", emotion_scores=scores, gesture="relaxed")
+    table = records.records()          # tablica strukturalna w kolejności czasu
+    table["emotions"][:, 0]            # kolumna "happy"
+    """
+
+    def __init__(self, capacity=None):
+        if capacity is not None and capacity < 1:
+            raise ValueError("Pojemność rejestru musi być dodatnia")
+        self.capacity = capacity
+        self.total = 0
+        self.modes = []
+        self._data = np.zeros(capacity or _INITIAL_SIZE, dtype=RECORD_DTYPE)
+
+    # ------------------------------------------------------------------------------
+    # Dopisywanie wierszy
+    # ------------------------------------------------------------------------------
+
+    def _mode_code(self, mode):
+        """Numer trybu analizy (nowe tryby dopisujemy do listy)."""
+        if mode not in self.modes:
+            self.modes.append(mode)
+        return self.modes.index(mode)
+
+    def _next_slot(self):
+        """Zwraca pozycję kolejnego wiersza (powiększa tablicę lub zawija bufor)."""
+        if self.capacity is not None:
+            return self.total % self.capacity
+        if self.total == len(self._data):
+            grown = np.zeros(2 * len(self._data), dtype=RECORD_DTYPE)
+            grown[:self.total] = self._data
+            self._data = grown
+        return self.total
+
+    def append(self, frame_index, mode, emotion_scores=None, gesture=None, gaze=None,
+               head=None, weight=1, timestamp=None):
+        """
+        Dopisuje wynik jednej klatki.
+
+        Parametry:
+        ----------
+        frame_index : int
+            Indeks klatki w strumieniu
+        mode : str
+            Tryb analizy
+        emotion_scores : dict lub None
+            {emocja: procent}; None, gdy emocji nie mierzono (np. brak twarzy)
+        gesture, gaze, head : str lub None
+            Etykiety z GESTURE_LABELS, GAZE_LABELS i HEAD_LABELS (None = brak)
+        weight : int
+            Liczba klatek źródła reprezentowanych przez ten wiersz
+        timestamp : float lub None
+            Czas analizy (time.time()); None = teraz
+        """
+        slot = self._next_slot()  # Może podmienić self._data (powiększenie tablicy)
+        row = self._data[slot]
+        row["frame_index"] = frame_index
+        row["timestamp"] = timestamp if timestamp is not None else time.time()
+        row["weight"] = weight
+        if emotion_scores is None:
+            row["emotions"] = np.nan
+        else:
+            row["emotions"] = [emotion_scores.get(emotion, 0.0) for emotion in EMOTIONS]
+        row["gesture"] = _label_code(GESTURE_LABELS, gesture)
+        row["gaze"] = _label_code(GAZE_LABELS, gaze)
+        row["head"] = _label_code(HEAD_LABELS, head)
+        row["mode"] = self._mode_code(mode)
+        self.total += 1
+
+    def extend(self, other):
+        """Dopisuje wszystkie wiersze innego rejestru (np. stanu wątku analizy)."""
+        self.extend_rows(other.records(), other.modes)
+
+    def extend_rows(self, rows, modes, skipped=0):
+        """
+        Dopisuje wiersze tablicy strukturalnej (RECORD_DTYPE).
+
+        Parametry:
+        ----------
+        rows : numpy.ndarray
+            Wiersze w kolejności czasu (tablica jest modyfikowana - kolumna "mode")
+        modes : list[str]
+            Tryby analizy, na które wskazuje kolumna "mode" tych wierszy
+        skipped : int
+            Liczba wcześniejszych wierszy, których nie przekazano (np. odczyt
+            tylko ostatnich "capacity" wierszy z dysku) - liczą się do "total"
+        """
+        self.total += skipped
+        if not len(rows):
+            return
+        # Numery trybów w przekazanych wierszach mogą oznaczać inne tryby niż tutaj
+        remap = np.array([self._mode_code(mode) for mode in modes], dtype=np.int8)
+        rows["mode"] = remap[rows["mode"]]
+
+        if self.capacity is None:
+            while len(self._data) < self.total + len(rows):
+                grown = np.zeros(2 * len(self._data), dtype=RECORD_DTYPE)
+                grown[:self.total] = self._data[:self.total]
+                self._data = grown
+            self._data[self.total:self.total + len(rows)] = rows
+            self.total += len(rows)
+            return
+
+        # Bufor cykliczny: liczą się tylko ostatnie "capacity" wiersze
+        skipped = max(0, len(rows) - self.capacity)
+        self.total += skipped
+        for row in rows[skipped:]:
+            slot = self._next_slot()
+            self._data[slot] = row
+            self.total += 1
+
+    def relabel(self, mode):
+        """
+        Przypisuje wszystkim wierszom jeden tryb analizy.
+
+        Wyniki modeli nie zależą od trybu (tryb to tylko etykieta w raporcie),
+        więc wyniki zapisane w jednym trybie można pokazać w innym
+        (patrz result_cache.py).
+        """
+        if not self.total:
+            return
+        self._data["mode"] = 0
+        self.modes = [mode]
+
+    def clear(self):
+        """Usuwa wszystkie wiersze (pojemność pozostaje bez zmian)."""
+        self.total = 0
+        self.modes = []
+
+    # ------------------------------------------------------------------------------
+    # Odczyt
+    # ------------------------------------------------------------------------------
+
+    def __len__(self):
+        """Liczba wierszy dostępnych w rejestrze."""
+        return self.total if self.capacity is None else min(self.total, self.capacity)
+
+    @property
+    def dropped(self):
+        """Liczba wierszy nadpisanych w buforze cyklicznym."""
+        return self.total - len(self)
+
+    def records(self):
+        """
+        Zwraca kopię wierszy w kolejności dopisywania (od najstarszego).
+
+        Zwraca:
+        -------
+        numpy.ndarray
+            Tablica strukturalna o typie RECORD_DTYPE
+        """
+        if self.capacity is None or self.total <= self.capacity:
+            return self._data[:len(self)].copy()
+        start = self.total % self.capacity
+        return np.concatenate((self._data[start:], self._data[:start]))
+
+    def tail(self, count):
+        """
+        Zwraca kopię ostatnich "count" wierszy (bez kopiowania całego rejestru).
+
+        Używane przy zapisie przyrostowym (checkpoint.py) - na dysk trafiają
+        tylko wiersze dopisane od poprzedniego zapisu.
+        """
+        count = max(0, min(count, len(self)))
+        if self.capacity is None:
+            return self._data[self.total - count:self.total].copy()
+        return self._data[np.arange(self.total - count, self.total) % self.capacity]
+
+    def iter_rows(self):
+        """
+        Zwraca kolejne wiersze w czytelnej postaci (do raportów i eksportu).
+
+        Każdy wiersz to słownik: frame_index, timestamp, weight, mode,
+        emotions ({emocja: procent} lub None), gesture, gaze, head.
+        """
+        for row in self.records():
+            emotions = None
+            if not np.isnan(row["emotions"][0]):
+                emotions = {emotion: float(score) for emotion, score in zip(EMOTIONS, row["emotions"])}
+            yield {
+                "frame_index": int(row["frame_index"]),
+                "timestamp": float(row["timestamp"]),
+                "weight": int(row["weight"]),
+                "mode": self.modes[row["mode"]],
+                "emotions": emotions,
+                "gesture": GESTURE_LABELS[row["gesture"]],
+                "gaze": GAZE_LABELS[row["gaze"]],
+                "head": HEAD_LABELS[row["head"]],
+            }
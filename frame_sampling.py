@@ -0,0 +1,131 @@
+# ==================================================================================
+# PRÓBKOWANIE KLATEK - wybór klatek, które faktycznie analizujemy
+# ==================================================================================
+# Analiza emocji (DeepFace) i MediaPipe na każdej klatce jest bardzo kosztowna:
+# plik 30 fps oznacza 30 pełnych analiz na każdą sekundę nagrania. Emocje i
+# postawa zmieniają się jednak znacznie wolniej, więc zwykle wystarczy
+# analizować np. 5 klatek na sekundę.
+#
+# Klatki pominięte są tylko "przewijane" metodą cap.grab() (bez dekodowania do
+# obrazu), a każda przeanalizowana klatka dostaje wagę równą liczbie klatek,
+# które reprezentuje. Dzięki temu średnie i liczniki w raporcie są porównywalne
+# z analizą każdej klatki.
+# ==================================================================================
+
+import time  # time - zegar dla źródeł bez znanej liczby klatek na sekundę (kamera)
+
+# Dostępne polityki próbkowania:
+# - "all": każda klatka (zachowanie domyślne)
+# - "stride": co N-ta klatka (value = N)
+# - "fps": docelowa liczba analiz na sekundę nagrania (value = fps)
+# - "interval": jedna analiza co T sekund (value = T)
+SAMPLING_POLICIES = ("all", "stride", "fps", "interval")
+
+
+class FrameSampler:
+    """
+    Decyduje, które klatki strumienia wideo mają zostać przeanalizowane.
+
+    Parametry:
+    ----------
+    policy : str
+        Jedna z SAMPLING_POLICIES
+    value : int lub float lub None
+        Parametr polityki (N dla "stride", fps dla "fps", sekundy dla "interval")
+    source_fps : float lub None
+        Liczba klatek na sekundę źródła. Dla plików czas klatki liczymy jako
+        indeks / source_fps (deterministycznie); gdy brak (kamera) - używamy
+        zegara systemowego.
+
+    Przykład użycia:
+    ----------------
+    sampler = FrameSampler("fps", 5, source_fps=30)
+    sampler.should_analyze(0)   # True
+    sampler.should_analyze(1)   # False
+    sampler.should_analyze(6)   # True
+    """
+
+    def __init__(self, policy="all", value=None, source_fps=None):
+        if policy not in SAMPLING_POLICIES:
+            raise ValueError(f"Nieznana polityka próbkowania: {policy}")
+        if policy != "all" and (value is None or value <= 0):
+            raise ValueError(f"Polityka '{policy}' wymaga dodatniej wartości parametru")
+        if policy == "stride" and int(value) != value:
+            raise ValueError("Krok próbkowania (stride) musi być liczbą całkowitą")
+
+        self.policy = policy
+        self.value = value
+        # Niektóre kamery i pliki zgłaszają fps = 0 - traktujemy to jak brak informacji
+        self.source_fps = source_fps if source_fps and source_fps > 0 else None
+        self._last_time = None  # Czas ostatniej przeanalizowanej klatki
+        self._last_slot = None  # Numer "przedziału" ostatniej klatki (polityka "fps")
+
+    def _frame_time(self, frame_index):
+        """Zwraca czas klatki w sekundach (z indeksu lub zegara systemowego)."""
+        if self.source_fps:
+            return frame_index / self.source_fps
+        return time.monotonic()
+
+    def should_analyze(self, frame_index):
+        """
+        Sprawdza, czy klatkę o danym indeksie należy przeanalizować.
+
+        Parametry:
+        ----------
+        frame_index : int
+            Indeks klatki w strumieniu (od 0)
+
+        Zwraca:
+        -------
+        bool
+            True - klatkę należy zdekodować i przeanalizować,
+            False - klatkę można pominąć (cap.grab())
+        """
+        if self.policy == "all":
+            return True
+
+        if self.policy == "stride":
+            return frame_index % int(self.value) == 0
+
+        if self.policy == "fps" and self.source_fps:
+            # Dzielimy oś czasu na przedziały długości 1/fps i bierzemy
+            # pierwszą klatkę z każdego przedziału
+            slot = int(frame_index * self.value / self.source_fps)
+            if slot != self._last_slot:
+                self._last_slot = slot
+                return True
+            return False
+
+        # Polityka "interval" (oraz "fps" bez znanej liczby klatek źródła)
+        interval = self.value if self.policy == "interval" else 1.0 / self.value
+        now = self._frame_time(frame_index)
+        if self._last_time is None or now - self._last_time >= interval:
+            self._last_time = now
+            return True
+        return False
+
+    def resume_after(self, frame_index):
+        """
+        Ustawia próbkowanie tak, jakby ostatnią przeanalizowaną klatką była "frame_index".
+
+        Używane przy wznawianiu analizy pliku od zapisanego miejsca
+        (checkpoint.py) - kolejne klatki są wybierane tak samo jak w analizie
+        bez przerwy. Dla źródeł bez znanej liczby klatek na sekundę (kamera)
+        nie zmienia niczego.
+        """
+        if self.source_fps is None or frame_index < 0:
+            return
+        if self.policy == "fps":
+            self._last_slot = int(frame_index * self.value / self.source_fps)
+        elif self.policy == "interval":
+            self._last_time = self._frame_time(frame_index)
+
+    def describe(self):
+        """Zwraca czytelny opis polityki (do raportów i logów)."""
+        if self.policy == "all":
+            return "każda klatka"
+        if self.policy == "stride":
+            return f"co {int(self.value)}. klatka"
+        if self.policy == "fps":
+            return f"{self.value:g} analiz na sekundę"
+        return f"jedna analiza co {self.value:g} s"
@@ -0,0 +1,269 @@
+# ==================================================================================
+# ŚLEDZENIE PUNKTÓW - detektor co K klatek, przepływ optyczny pomiędzy
+# ==================================================================================
+# MediaPipe Face Mesh i Hands uruchamiają pełny graf sieci neuronowych dla każdej
+# klatki, a Face Mesh domyślnie szuka tylko jednej twarzy - w scenach z kilkoma
+# osobami analizowana była jedna z nich, za każdym razem potencjalnie inna.
+#
+# LandmarkTracker uruchamia detektor tylko co "detect_every" klatek albo wtedy,
+# gdy śledzenie traci pewność. W klatkach pomiędzy punkty charakterystyczne są
+# przesuwane przepływem optycznym Lucasa-Kanade (cv2.calcOpticalFlowPyrLK) na
+# małym obrazie w odcieniach szarości - to ułamek kosztu sieci.
+#
+# Każdy śledzony obiekt (twarz, dłoń) dostaje stały identyfikator: wykrycia są
+# przypisywane do istniejących ścieżek według odległości środków punktów.
+# Dzięki temu analysis_core może zbierać emocje, spojrzenie i ruchy głowy
+# osobno dla każdej osoby.
+# ==================================================================================
+
+import copy  # copy - własna kopia punktów (detektor może zwracać wspólny obiekt)
+
+import cv2  # OpenCV - przepływ optyczny Lucasa-Kanade
+import numpy as np  # NumPy - współrzędne punktów
+
+# Parametry przepływu optycznego: okno 15x15, 2 poziomy piramidy (ruch do ~60 px
+# między klatkami), najwyżej 10 iteracji na punkt
+LK_PARAMS = {
+    "winSize": (15, 15),
+    "maxLevel": 2,
+    "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+}
+
+# Najmniejszy odsetek punktów śledzonych poprawnie - poniżej uruchamiamy detektor
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+# Największy błąd "tam i z powrotem" (piksele): punkt przesunięty do bieżącej
+# klatki i z powrotem musi wrócić w pobliże miejsca startu. Sam status z
+# calcOpticalFlowPyrLK nie wystarcza - zgłasza sukces nawet wtedy, gdy obiekt
+# zniknął z obrazu.
+MAX_FORWARD_BACKWARD_ERROR = 1.0
+
+# Największa odległość środków (współrzędne znormalizowane 0-1), przy której
+# wykrycie zostaje przypisane do istniejącej ścieżki
+DEFAULT_MATCH_DISTANCE = 0.15
+
+
+class Track:
+    """
+    Jeden śledzony obiekt (twarz lub dłoń).
+
+    Atrybuty:
+    ---------
+    id : int
+        Stały identyfikator (kolejne liczby, nie są używane ponownie)
+    landmarks :
+        Punkty w formacie MediaPipe (.landmark[i].x/.y, współrzędne 0-1)
+    confidence : float
+        Odsetek punktów poprawnie przesuniętych w ostatniej klatce (1.0 po wykryciu)
+    detected : bool
+        Czy punkty w bieżącej klatce pochodzą z detektora (a nie ze śledzenia)
+    """
+
+    __slots__ = ("id", "landmarks", "points", "confidence", "detected")
+
+    def __init__(self, track_id, landmarks):
+        self.id = track_id
+        self.confidence = 1.0
+        self.set_landmarks(landmarks)
+
+    def set_landmarks(self, landmarks):
+        """Przyjmuje nowe punkty z detektora (we własnej kopii)."""
+        self.landmarks = copy.deepcopy(landmarks)
+        self.points = np.array([(point.x, point.y) for point in self.landmarks.landmark],
+                               dtype=np.float32)
+        self.confidence = 1.0
+        self.detected = True
+
+    def move_to(self, points):
+        """Ustawia przesunięte punkty (współrzędne znormalizowane, tablica Nx2)."""
+        self.points = points
+        for point, (x, y) in zip(self.landmarks.landmark, points.tolist()):
+            point.x, point.y = x, y
+        self.detected = False
+
+    @property
+    def center(self):
+        """Środek punktów (x, y) we współrzędnych znormalizowanych."""
+        return self.points.mean(axis=0)
+
+
+class LandmarkTracker:
+    """
+    Śledzenie punktów MediaPipe z detektorem uruchamianym co kilka klatek.
+
+    Parametry:
+    ----------
+    result_field : str
+        Pole wyniku detektora z listą obiektów: "multi_face_landmarks" (Face Mesh)
+        lub "multi_hand_landmarks" (Hands)
+    detect_every : int
+        Co ile analizowanych klatek uruchamiać detektor (1 = każda klatka,
+        śledzenie służy wtedy tylko nadawaniu stałych identyfikatorów)
+    max_objects : int
+        Największa liczba śledzonych obiektów
+    min_confidence : float
+        Odsetek poprawnie śledzonych punktów, poniżej którego detektor
+        uruchamiany jest od razu (w tej samej klatce)
+    match_distance : float
+        Próg odległości środków przy przypisywaniu wykryć do ścieżek
+    first_id : int
+        Identyfikator pierwszego obiektu (przy wznowionej analizie - kolejny
+        po identyfikatorach nadanych przed przerwą)
+
+    Atrybuty:
+    ---------
+    tracks : list[Track]
+        Obiekty widoczne w ostatniej klatce (w kolejności wykrycia)
+    stats : dict
+        Liczniki: "detections" (klatki z detektorem), "tracked" (klatki tylko
+        ze śledzeniem), "recoveries" (wykrycia wymuszone utratą pewności)
+
+    Przykład użycia:
+    ----------------
+    tracker = LandmarkTracker("multi_face_landmarks", detect_every=5, max_objects=4)
+    for track in tracker.update(ctx, face_mesh, resolution=640):
+        print(track.id, track.landmarks.landmark[NOSE_TIP].y)
+
+    Uwaga:
+    ------
+    Obiekt, którego detektor nie znalazł ponownie, znika z listy; gdy wróci,
+    dostaje nowy identyfikator.
+    """
+
+    def __init__(self, result_field, detect_every=5, max_objects=1,
+                 min_confidence=DEFAULT_MIN_CONFIDENCE, match_distance=DEFAULT_MATCH_DISTANCE,
+                 first_id=1):
+        if detect_every < 1:
+            raise ValueError("Detektor musi działać co najmniej co 1 klatkę")
+        if max_objects < 1:
+            raise ValueError("Liczba śledzonych obiektów musi być dodatnia")
+        self.result_field = result_field
+        self.detect_every = detect_every
+        self.max_objects = max_objects
+        self.min_confidence = min_confidence
+        self.match_distance = match_distance
+        self.tracks = []
+        self.stats = {"detections": 0, "tracked": 0, "recoveries": 0}
+        self._next_id = first_id
+        self._since_detection = 0  # Klatki od ostatniego uruchomienia detektora
+        self._previous_gray = None  # Poprzednia klatka (własny bufor) dla przepływu optycznego
+
+    def update(self, ctx, detector, resolution=0):
+        """
+        Wyznacza punkty obiektów w bieżącej klatce.
+
+        Parametry:
+        ----------
+        ctx : frame_context.FrameContext
+            Bieżąca klatka
+        detector :
+            Obiekt MediaPipe (Face Mesh lub Hands) z metodą process(obraz_rgb)
+        resolution : int
+            Dłuższy bok obrazu dla detektora i śledzenia (0 = pełna rozdzielczość)
+
+        Zwraca:
+        -------
+        list[Track]
+            Obiekty widoczne w tej klatce
+        """
+        gray = ctx.scaled(resolution, "gray") if self.detect_every > 1 else None
+        due = self._since_detection % self.detect_every == 0
+        if not due and self.tracks and not self._propagate(gray):
+            self.stats["recoveries"] += 1
+            due = True
+        if due or self._previous_gray is None:
+            self._detect(detector, ctx.scaled(resolution, "rgb"))
+        else:
+            self.stats["tracked"] += 1
+            self._since_detection += 1
+        self._remember(gray)
+        return self.tracks
+
+    def _detect(self, detector, image):
+        """Uruchamia detektor i przypisuje wykrycia do ścieżek."""
+        results = detector.process(image)
+        detections = list(getattr(results, self.result_field, None) or [])[:self.max_objects]
+        self.stats["detections"] += 1
+        self._since_detection = 1
+        self.tracks = self._match(detections)
+
+    def _match(self, detections):
+        """
+        Przypisuje wykrycia do istniejących ścieżek (zachłannie, od najbliższych par).
+
+        Wykrycia bez pary dostają nowe identyfikatory; ścieżki bez pary znikają.
+        """
+        centers = [np.array([(p.x, p.y) for p in landmarks.landmark], dtype=np.float32).mean(axis=0)
+                   for landmarks in detections]
+        pairs = sorted((float(np.abs(center - track.center).sum()), d, t)
+                       for d, center in enumerate(centers)
+                       for t, track in enumerate(self.tracks))
+        assigned = {}
+        used_tracks = set()
+        for distance, d, t in pairs:
+            if distance > self.match_distance:
+                break
+            if d in assigned or t in used_tracks:
+                continue
+            assigned[d] = self.tracks[t]
+            used_tracks.add(t)
+
+        tracks = []
+        for d, landmarks in enumerate(detections):
+            track = assigned.get(d)
+            if track is None:
+                track = Track(self._next_id, landmarks)
+                self._next_id += 1
+            else:
+                track.set_landmarks(landmarks)
+            tracks.append(track)
+        return tracks
+
+    def _propagate(self, gray):
+        """
+        Przesuwa punkty wszystkich ścieżek przepływem optycznym.
+
+        Punkt uznajemy za śledzony poprawnie, gdy przepływ w przód i z powrotem
+        się zgadza (MAX_FORWARD_BACKWARD_ERROR). Pozostałe punkty przesuwamy
+        o medianę ruchu poprawnych punktów tej ścieżki.
+
+        Zwraca:
+        -------
+        bool
+            False, gdy pewność którejś ścieżki spadła poniżej min_confidence
+            (albo zmienił się rozmiar obrazu) - trzeba uruchomić detektor
+        """
+        if self._previous_gray is None or self._previous_gray.shape != gray.shape:
+            return False
+        height, width = gray.shape
+        scale = np.array([width, height], dtype=np.float32)
+        confident = True
+        for track in self.tracks:
+            start = (track.points * scale).reshape(-1, 1, 2)
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self._previous_gray, gray, start, None,
+                                                        **LK_PARAMS)
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self._previous_gray, moved, None,
+                                                            **LK_PARAMS)
+            error = np.abs(back - start).reshape(-1, 2).max(axis=1)
+            start, moved = start.reshape(-1, 2), moved.reshape(-1, 2)
+            ok = (status.ravel() == 1) & (back_status.ravel() == 1)
+            ok &= error <= MAX_FORWARD_BACKWARD_ERROR
+            ok &= (moved[:, 0] >= 0) & (moved[:, 0] < width) & (moved[:, 1] >= 0) & (moved[:, 1] < height)
+            track.confidence = float(ok.mean())
+            if not ok.any():
+                confident = False
+                continue
+            shifted = start + np.median(moved[ok] - start[ok], axis=0)
+            shifted[ok] = moved[ok]
+            track.move_to(shifted / scale)
+            confident &= track.confidence >= self.min_confidence
+        return confident
+
+    def _remember(self, gray):
+        """Zachowuje obraz klatki dla przepływu optycznego (bufor kontekstu zostanie nadpisany)."""
+        if gray is None:
+            return
+        if self._previous_gray is None or self._previous_gray.shape != gray.shape:
+            self._previous_gray = gray.copy()
+        else:
+            np.copyto(self._previous_gray, gray)
@@ -0,0 +1,200 @@
+# ==================================================================================
+# PULA MODELI - jednorazowe wczytanie modeli i rozgrzewka przed analizą
+# ==================================================================================
+# Import DeepFace pociąga za sobą TensorFlow (kilka sekund), a sieć emocji jest
+# wczytywana dopiero przy pierwszym wywołaniu DeepFace.analyze(). Bez puli
+# pierwsza klatka każdej analizy czeka na te operacje.
+#
+# Ten moduł przechowuje wczytane modele w pamięci procesu - są wspólne dla
+# wszystkich sesji i kolejnych przebiegów skryptu Streamlit (oraz dla kolejnych
+# nagrań w procesie roboczym analizy wsadowej). warm_up() wczytuje je z góry
+# i mierzy czas każdego kroku, dzięki czemu można śledzić "zimny start".
+#
+# Składniki puli:
+# - "deepface": moduł DeepFace rozgrzany jednym wywołaniem analyze() na pustej
+#   klatce (wczytuje detektor twarzy, sieć emocji i inicjalizuje TensorFlow)
+# - "emotion_model": sama sieć emocji (Keras) dla backendu DeepFace
+# - "emotion_backend": backend modelu emocji wybrany zmienną EMO_EMOTION_BACKEND
+#   (DeepFace lub ONNX Runtime, patrz emotion_backends.py) - z niego korzystają
+#   analyze_emotion() i silnik wsadowy
+# - "mediapipe": moduł MediaPipe z jednorazowo utworzonymi Hands i Face Mesh
+#   (wczytanie plików modeli do pamięci podręcznej biblioteki)
+# ==================================================================================
+
+import contextlib  # contextlib - tymczasowa podmiana składników (overridden)
+import threading  # threading - blokada chroniąca przed równoległym wczytaniem modelu
+import time  # time - pomiar czasu wczytywania
+
+import numpy as np  # NumPy - pusta klatka do rozgrzewki
+
+# Składniki wczytywane domyślnie przez warm_up()
+DEFAULT_WARM_UP = ("emotion_backend", "mediapipe")
+
+
+# SEKCJA 1: FUNKCJE WCZYTUJĄCE
+# ==================================================================================
+
+def _load_deepface():
+    """Importuje DeepFace i wykonuje jedną analizę emocji na pustej klatce."""
+    from deepface import DeepFace
+
+    blank = np.zeros((64, 64, 3), dtype=np.uint8)
+    DeepFace.analyze(blank, actions=["emotion"], enforce_detection=False)
+    return DeepFace
+
+
+def _load_emotion_model():
+    """Wczytuje sieć emocji DeepFace (Keras) i wykonuje jedno wywołanie próbne."""
+    from emotion_engine import MODEL_INPUT_SIZE, load_deepface_emotion_model
+
+    model = load_deepface_emotion_model()
+    model.predict(np.zeros((1,) + MODEL_INPUT_SIZE + (1,), dtype=np.float32), verbose=0)
+    return model
+
+
+def _load_emotion_backend():
+    """Tworzy backend emocji według zmiennych środowiskowych i rozgrzewa go."""
+    from emotion_backends import create_backend
+
+    backend = create_backend()
+    backend.warm_up()
+    return backend
+
+
+def _load_mediapipe():
+    """Importuje MediaPipe i jednorazowo tworzy detektory dłoni i siatki twarzy."""
+    import mediapipe as mp
+
+    # Obiekty Hands/FaceMesh śledzą stan między klatkami, więc każda analiza
+    # tworzy własne - tutaj tylko wczytujemy pliki modeli
+    mp.solutions.hands.Hands().close()
+    mp.solutions.face_mesh.FaceMesh().close()
+    return mp
+
+
+# Zarejestrowane składniki: {nazwa: funkcja wczytująca}
+_LOADERS = {
+    "deepface": _load_deepface,
+    "emotion_model": _load_emotion_model,
+    "emotion_backend": _load_emotion_backend,
+    "mediapipe": _load_mediapipe,
+}
+
+
+# SEKCJA 2: PULA
+# ==================================================================================
+
+# RLock: funkcja wczytująca może pobrać z puli inny składnik (np. backend emocji - DeepFace)
+_lock = threading.RLock()
+_models = {}      # {nazwa: wczytany obiekt}
+_load_times = {}  # {nazwa: czas wczytania w sekundach}
+
+
+def register(name, loader):
+    """
+    Rejestruje (lub podmienia) funkcję wczytującą składnik puli.
+
+    Parametry:
+    ----------
+    name : str
+        Nazwa składnika
+    loader : callable
+        Funkcja bez argumentów zwracająca wczytany obiekt
+    """
+    with _lock:
+        _LOADERS[name] = loader
+        _models.pop(name, None)
+        _load_times.pop(name, None)
+
+
+@contextlib.contextmanager
+def overridden(loaders):
+    """
+    Tymczasowo podmienia funkcje wczytujące wybranych składników.
+
+    Po wyjściu z bloku "with" przywracane są poprzednie funkcje i wczytane
+    wcześniej obiekty (np. prawdziwe modele po przebiegu z atrapami).
+
+    Parametry:
+    ----------
+    loaders : dict
+        {nazwa: funkcja bez argumentów zwracająca obiekt}
+
+    Przykład użycia:
+    ----------------
+    with model_pool.overridden({"deepface": lambda: StubDeepFace()}):
+        analyze_video_file("nagranie.mp4")
+    """
+    with _lock:
+        saved = {name: (_LOADERS.get(name), _models.get(name), _load_times.get(name))
+                 for name in loaders}
+    for name, loader in loaders.items():
+        register(name, loader)
+    try:
+        yield
+    finally:
+        with _lock:
+            for name, (loader, model, load_time) in saved.items():
+                _models.pop(name, None)
+                _load_times.pop(name, None)
+                if loader is None:
+                    _LOADERS.pop(name, None)
+                    continue
+                _LOADERS[name] = loader
+                if model is not None:
+                    _models[name] = model
+                    _load_times[name] = load_time
+
+
+def get(name):
+    """
+    Zwraca składnik puli, wczytując go przy pierwszym użyciu w procesie.
+
+    Wywołania z wielu wątków naraz wczytują model tylko raz.
+
+    Wyjątki:
+    --------
+    KeyError
+        Gdy nie zarejestrowano składnika o tej nazwie
+    """
+    if name in _models:
+        return _models[name]
+    with _lock:
+        if name not in _models:
+            loader = _LOADERS[name]
+            start = time.perf_counter()
+            _models[name] = loader()
+            _load_times[name] = time.perf_counter() - start
+        return _models[name]
+
+
+def warm_up(names=DEFAULT_WARM_UP):
+    """
+    Wczytuje podane składniki z góry (przed pierwszą klatką analizy).
+
+    Zwraca:
+    -------
+    dict
+        {nazwa: czas wczytania w sekundach}; składniki wczytane wcześniej
+        mają czas z pierwszego wczytania
+    """
+    for name in names:
+        get(name)
+    return {name: _load_times[name] for name in names}
+
+
+def is_loaded(name):
+    """Czy składnik jest już wczytany w tym procesie."""
+    return name in _models
+
+
+def load_times():
+    """Zwraca czasy wczytania wszystkich wczytanych składników {nazwa: sekundy}."""
+    return dict(_load_times)
+
+
+def clear():
+    """Usuwa wczytane składniki z puli (np. w testach)."""
+    with _lock:
+        _models.clear()
+        _load_times.clear()
@@ -0,0 +1,279 @@
+# ==================================================================================
+# NAKŁADKI NA KLATKĘ - przełączane warstwy i panel emocji rysowany przyrostowo
+# ==================================================================================
+# Wyniki analizy nanosimy na klatkę w trzech niezależnych warstwach:
+# - "panel": dominująca emocja i lista wszystkich emocji (tekst),
+# - "faces": kontury twarzy z Face Mesh (oraz numery osób przy śledzeniu),
+# - "hands": punkty i połączenia dłoni.
+# Każdą warstwę można wyłączyć; bez żadnej warstwy (NO_OVERLAY) analiza nie
+# rysuje nic - liczniki i raport są takie same.
+#
+# Panel emocji to 8 wywołań cv2.putText() na klatkę. EmotionPanel rysuje tekst
+# do własnej maski: nazwy emocji powstają raz, a w kolejnych klatkach
+# przerysowujemy tylko wartości, które się zmieniły. Na klatkę nakładamy potem
+# gotową maskę jednym wywołaniem - wynik jest piksel w piksel taki sam jak
+# przy rysowaniu tekstu wprost na klatce (draw_emotion_panel()).
+# ==================================================================================
+
+import cv2  # OpenCV - rysowanie tekstu
+import numpy as np  # NumPy - maska panelu
+
+import model_pool  # Pula modeli - moduł mediapipe (narzędzia rysowania)
+
+# Warstwy nakładek w kolejności rysowania
+LAYERS = ("panel", "faces", "hands")
+
+# Wygląd panelu emocji: dominująca emocja w (50, 50), lista od y=100 co 30 pikseli
+PANEL_COLOR = (0, 255, 0)
+PANEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+PANEL_THICKNESS = 2
+# Linie bez wygładzania: piksel tekstu ma pełny kolor, więc gotowe fragmenty
+# można nakładać bez mieszania z tłem
+PANEL_LINE_TYPE = cv2.LINE_8
+PANEL_X = 50
+DOMINANT_Y = 50
+DOMINANT_SCALE = 1
+LIST_Y = 100
+LIST_STEP = 30
+LIST_SCALE = 0.7
+
+
+def draw_emotion_panel(frame, emotion_scores):
+    """
+    Rysuje na klatce dominującą emocję oraz listę wszystkich emocji.
+
+    Parametry:
+    ----------
+    frame : numpy.ndarray
+        Klatka w formacie BGR (modyfikowana w miejscu)
+    emotion_scores : dict
+        Wyniki emocji {emocja: procent}
+
+    Uwaga:
+    ------
+    Wersja bez pamięci - każde wywołanie rysuje cały tekst. W pętli analizy
+    używamy EmotionPanel (ten sam obraz, mniej rysowania).
+    """
+    dominant_emotion = max(emotion_scores, key=emotion_scores.get)
+    emotion_text = f"{dominant_emotion}: {emotion_scores[dominant_emotion]:.2f}%"
+    cv2.putText(frame, emotion_text, (PANEL_X, DOMINANT_Y),
+                PANEL_FONT, DOMINANT_SCALE, PANEL_COLOR, PANEL_THICKNESS, PANEL_LINE_TYPE)
+
+    y_offset = LIST_Y
+    for emotion, score in emotion_scores.items():
+        cv2.putText(frame, f"{emotion}: {score:.2f}%", (PANEL_X, y_offset),
+                    PANEL_FONT, LIST_SCALE, PANEL_COLOR, PANEL_THICKNESS, PANEL_LINE_TYPE)
+        y_offset += LIST_STEP
+
+
+def draw_person_label(frame, face_landmarks, person_id):
+    """Rysuje identyfikator osoby ("#id") nad najwyższym punktem jej twarzy."""
+    height, width = frame.shape[:2]
+    top = min(face_landmarks.landmark, key=lambda point: point.y)
+    position = (int(top.x * width) - 15, max(15, int(top.y * height) - 10))
+    cv2.putText(frame, f"#{person_id}", position, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
+
+
+def _text_advance(text, scale):
+    """Przesunięcie w poziomie po narysowaniu tekstu (tam zaczyna się tekst dopisany za nim)."""
+    # getTextSize() wlicza grubość linii - różnica dwóch pomiarów daje samo przesunięcie
+    with_text = cv2.getTextSize(text + "0", PANEL_FONT, scale, PANEL_THICKNESS)[0][0]
+    return with_text - cv2.getTextSize("0", PANEL_FONT, scale, PANEL_THICKNESS)[0][0]
+
+
+class EmotionPanel:
+    """
+    Panel emocji rysowany przyrostowo do maski i nakładany na klatkę.
+
+    Każdy wiersz panelu składa się z nazwy ("happy: ") i wartości ("70.00%").
+    Nazwy listy emocji rysujemy raz (dopóki nie zmieni się zestaw emocji),
+    nazwę dominującej emocji - gdy zmieni się dominująca emocja, a wartości -
+    tylko gdy zmieni się ich tekst. Gotową maskę nakładamy na klatkę jednym
+    wywołaniem cv2.copyTo().
+
+    Parametry:
+    ----------
+    composite : bool lub None
+        Czy nakładać gotową maskę. None = tylko gdy OpenCV rysuje tekst bez
+        wygładzania (OpenCV 4.x); część wydań OpenCV 5 zawsze wygładza
+        krawędzie tekstu - maska dałaby wtedy inny obraz, więc panel jest
+        rysowany wprost (draw_emotion_panel()). True = zawsze maska (krawędzie
+        tekstu bez wygładzania).
+
+    Atrybuty:
+    ---------
+    stats : dict
+        "frames" - liczba narysowanych paneli, "texts" - liczba wywołań
+        cv2.putText() (przy rysowaniu wprost byłoby to 8 na klatkę)
+    composite : bool lub None
+        Sposób rysowania (None do pierwszej klatki przy wyborze automatycznym)
+
+    Przykład użycia:
+    ----------------
+    panel = EmotionPanel()
+    for frame, scores in frames:
+        panel.draw(frame, scores)
+
+    Uwaga:
+    ------
+    Obiekt przechowuje stan poprzedniej klatki - jeden panel na wątek rysujący.
+    """
+
+    def __init__(self, composite=None):
+        self.composite = composite
+        self.stats = {"frames": 0, "texts": 0}
+        self._labels = None   # Zestaw emocji, dla którego zbudowano maskę
+        self._mask = None     # Maska panelu (255 = piksel tekstu)
+        self._color = None    # Obraz w kolorze panelu o rozmiarze maski
+        self._lines = []      # Wiersze: [x wartości, y, skala, nazwa, wartość]
+
+    def _build(self, labels):
+        """Tworzy maskę z nazwami emocji i układ wierszy dla zestawu "labels"."""
+        widest_value = f"{100:.2f}%"  # Wyniki emocji to procenty 0-100
+        width = max(_text_advance(f"{label}: ", DOMINANT_SCALE) for label in labels)
+        width += cv2.getTextSize(widest_value, PANEL_FONT, DOMINANT_SCALE, PANEL_THICKNESS)[0][0]
+        last_y = LIST_Y + LIST_STEP * (len(labels) - 1)
+        baseline = cv2.getTextSize("gjpy", PANEL_FONT, LIST_SCALE, PANEL_THICKNESS)[1]
+        shape = (last_y + baseline + 2 * PANEL_THICKNESS, PANEL_X + width + 2 * PANEL_THICKNESS)
+        self._labels = labels
+        self._mask = np.zeros(shape, dtype=np.uint8)
+        self._color = np.empty(shape + (3,), dtype=np.uint8)
+        self._color[:] = PANEL_COLOR
+        self._lines = [[None, DOMINANT_Y, DOMINANT_SCALE, None, None]]
+        for position, label in enumerate(labels):
+            line = [None, LIST_Y + LIST_STEP * position, LIST_SCALE, None, None]
+            self._update(line, f"{label}: ", None)
+            self._lines.append(line)
+        if self.composite is None:
+            # Maska z samymi wartościami 0 i 255 = tekst bez wygładzania
+            self.composite = not np.any((self._mask > 0) & (self._mask < 255))
+
+    def _put_text(self, line, text, x):
+        cv2.putText(self._mask, text, (x, line[1]), PANEL_FONT, line[2], 255, PANEL_THICKNESS,
+                    PANEL_LINE_TYPE)
+        self.stats["texts"] += 1
+
+    def _clear(self, line, x):
+        """Czyści pas wiersza od x do prawej krawędzi maski."""
+        # Wzorzec z wydłużeniami w górę i w dół - pas obejmuje każdy glif
+        (_, height), baseline = cv2.getTextSize("Ahgjpy0%", PANEL_FONT, line[2], PANEL_THICKNESS)
+        top = max(0, line[1] - height - PANEL_THICKNESS)
+        self._mask[top:line[1] + baseline + PANEL_THICKNESS, max(0, x):] = 0
+
+    def _update(self, line, name, value):
+        """Przerysowuje część wiersza, która zmieniła się od poprzedniej klatki."""
+        if name != line[3]:
+            # Nowa nazwa (dominująca emocja) - przesuwa też wartość
+            self._clear(line, 0)
+            self._put_text(line, name, PANEL_X)
+            line[0] = PANEL_X + _text_advance(name, line[2])
+            line[3], line[4] = name, None
+        if value is not None and value != line[4]:
+            # Glify wartości mogą sięgać odrobinę w lewo od punktu startu
+            self._clear(line, line[0] - PANEL_THICKNESS)
+            self._put_text(line, value, line[0])
+            line[4] = value
+
+    def draw(self, frame, emotion_scores):
+        """
+        Nanosi panel emocji na klatkę (jak draw_emotion_panel()).
+
+        Parametry:
+        ----------
+        frame : numpy.ndarray
+            Klatka w formacie BGR (modyfikowana w miejscu)
+        emotion_scores : dict
+            Wyniki emocji {emocja: procent}
+        """
+        labels = tuple(emotion_scores)
+        if labels != self._labels:
+            self._build(labels)
+        self.stats["frames"] += 1
+        if not self.composite:
+            draw_emotion_panel(frame, emotion_scores)
+            self.stats["texts"] += len(labels) + 1
+            return
+        dominant_emotion = max(emotion_scores, key=emotion_scores.get)
+        self._update(self._lines[0], f"{dominant_emotion}: ", f"{emotion_scores[dominant_emotion]:.2f}%")
+        for line, label in zip(self._lines[1:], labels):
+            self._update(line, line[3], f"{emotion_scores[label]:.2f}%")
+
+        # Nałożenie maski - tylko część mieszcząca się w klatce
+        height = min(frame.shape[0], self._mask.shape[0])
+        width = min(frame.shape[1], self._mask.shape[1])
+        cv2.copyTo(self._color[:height, :width], self._mask[:height, :width], frame[:height, :width])
+
+
+class OverlayRenderer:
+    """
+    Zestaw włączonych warstw nakładek i stan ich rysowania.
+
+    Parametry:
+    ----------
+    layers : iterable
+        Włączone warstwy (podzbiór LAYERS); pusty zbiór = analiza bez rysowania
+    composite : bool lub None
+        Sposób rysowania panelu emocji (patrz EmotionPanel)
+
+    Wyjątki:
+    --------
+    ValueError
+        Gdy podano nieznaną warstwę
+
+    Przykład użycia:
+    ----------------
+    overlay = OverlayRenderer(layers=("panel", "hands"))  # bez konturów twarzy
+    process_frame(frame, mode, hands, face_mesh, state, draw=overlay)
+
+    Uwaga:
+    ------
+    Panel emocji pamięta poprzednią klatkę - jeden obiekt na pętlę analizy
+    (rysowanie odbywa się zawsze w jednym wątku: patrz process_frame()).
+    """
+
+    def __init__(self, layers=LAYERS, composite=None):
+        self.layers = frozenset(layers)
+        unknown = self.layers - set(LAYERS)
+        if unknown:
+            raise ValueError(f"Nieznane warstwy nakładek: {sorted(unknown)}; dostępne: {LAYERS}")
+        self.panel = EmotionPanel(composite)
+
+    def __bool__(self):
+        """Czy rysowana jest jakakolwiek warstwa."""
+        return bool(self.layers)
+
+    def draw_hands(self, frame, hand_landmarks):
+        """Rysuje punkty i połączenia jednej dłoni (warstwa "hands")."""
+        if "hands" in self.layers:
+            mp = model_pool.get("mediapipe")
+            mp.solutions.drawing_utils.draw_landmarks(frame, hand_landmarks, mp.solutions.hands.HAND_CONNECTIONS)
+
+    def draw_face(self, frame, face_landmarks, person_id=None):
+        """Rysuje kontur jednej twarzy i numer osoby, jeśli podano (warstwa "faces")."""
+        if "faces" in self.layers:
+            mp = model_pool.get("mediapipe")
+            mp.solutions.drawing_utils.draw_landmarks(
+                frame, face_landmarks, mp.solutions.face_mesh.FACEMESH_CONTOURS)
+            if person_id is not None:
+                draw_person_label(frame, face_landmarks, person_id)
+
+    def draw_panel(self, frame, emotion_scores):
+        """Nanosi panel emocji (warstwa "panel")."""
+        if "panel" in self.layers:
+            self.panel.draw(frame, emotion_scores)
+
+
+# Brak nakładek - analiza bez rysowania (np. klatki, których nikt nie zobaczy)
+NO_OVERLAY = OverlayRenderer(layers=())
+
+
+def as_overlay(draw):
+    """
+    Zamienia parametr "draw" funkcji analizy na OverlayRenderer.
+
+    True = wszystkie warstwy (nowy obiekt), False/None = NO_OVERLAY,
+    OverlayRenderer - bez zmian (zachowuje stan panelu między klatkami).
+    """
+    if isinstance(draw, OverlayRenderer):
+        return draw
+    return OverlayRenderer() if draw else NO_OVERLAY
@@ -0,0 +1,97 @@
+# ==================================================================================
+# PODGLĄD NA ŻYWO - ograniczenie częstotliwości, rozmiaru i jakości podglądu
+# ==================================================================================
+# Streamlit wysyła każdy obraz do przeglądarki przez websocket. Pełna klatka
+# 1080p po każdej analizie to kilka MB na sekundę - przy połączeniu zdalnym
+# wysyłanie staje się wąskim gardłem i spowalnia również analizę.
+#
+# FramePreview decyduje, które klatki trafią do podglądu (najwyżej "max_fps"
+# na sekundę), zmniejsza je do "max_width" pikseli szerokości i koduje do JPEG
+# o zadanej jakości. Analiza działa dalej z pełną szybkością - potok
+# wielowątkowy przekazuje do wyświetlenia tylko klatki wybrane do podglądu
+# i nigdy na nie nie czeka (patrz threaded_pipeline.py).
+# ==================================================================================
+
+import threading  # threading - blokada (due() wołane z wątku analizy)
+import time  # time - zegar ograniczający częstotliwość podglądu
+
+import cv2  # OpenCV - zmniejszanie i kodowanie JPEG
+
+
+class FramePreview:
+    """
+    Ustawienia i obsługa podglądu klatek w przeglądarce.
+
+    Parametry:
+    ----------
+    max_fps : float lub None
+        Największa liczba odświeżeń podglądu na sekundę (None = każda klatka)
+    max_width : int lub None
+        Największa szerokość podglądu w pikselach (None = pełna rozdzielczość)
+    jpeg_quality : int
+        Jakość kodowania JPEG (1-100)
+    clock : callable
+        Zegar zwracający sekundy (do testów); domyślnie time.monotonic
+
+    Przykład użycia:
+    ----------------
+    preview = FramePreview(max_fps=10, max_width=640, jpeg_quality=70)
+    if preview.due():
+        stframe.image(preview.encode(frame))
+    """
+
+    def __init__(self, max_fps=10.0, max_width=640, jpeg_quality=70, clock=time.monotonic):
+        if max_fps is not None and max_fps <= 0:
+            raise ValueError("Częstotliwość podglądu musi być dodatnia")
+        if max_width is not None and max_width < 16:
+            raise ValueError("Szerokość podglądu musi wynosić co najmniej 16 pikseli")
+        if not 1 <= jpeg_quality <= 100:
+            raise ValueError("Jakość JPEG musi mieścić się w zakresie 1-100")
+        self.max_fps = max_fps
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self._clock = clock
+        self._interval = 1.0 / max_fps if max_fps else 0.0
+        self._next_at = None  # Najwcześniejsza chwila kolejnego odświeżenia
+        self._lock = threading.Lock()
+
+    def due(self):
+        """
+        Czy bieżąca klatka powinna trafić do podglądu.
+
+        Zwraca True najwyżej "max_fps" razy na sekundę; wywołanie, które zwróciło
+        True, rezerwuje to odświeżenie.
+        """
+        now = self._clock()
+        with self._lock:
+            if self._next_at is not None and now < self._next_at:
+                return False
+            # Kolejny termin liczymy od poprzedniego, aby zachować średnią
+            # częstotliwość; po dłuższej przerwie zaczynamy od "teraz"
+            base = self._next_at if self._next_at is not None and now - self._next_at < self._interval else now
+            self._next_at = base + self._interval
+            return True
+
+    def resize(self, frame):
+        """Zmniejsza klatkę do max_width (proporcjonalnie); mniejszych nie powiększa."""
+        height, width = frame.shape[:2]
+        if self.max_width is None or width <= self.max_width:
+            return frame
+        scale = self.max_width / width
+        return cv2.resize(frame, (self.max_width, max(1, round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame):
+        """
+        Przygotowuje klatkę BGR do wysłania: zmniejsza ją i koduje do JPEG.
+
+        Zwraca:
+        -------
+        bytes
+            Obraz JPEG (st.image przyjmuje go bezpośrednio)
+        """
+        ok, data = cv2.imencode(".jpg", self.resize(frame),
+                                (cv2.IMWRITE_JPEG_QUALITY, int(self.jpeg_quality)))
+        if not ok:
+            raise ValueError("Nie udało się zakodować klatki podglądu")
+        return data.tobytes()
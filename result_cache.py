@@ -0,0 +1,215 @@
+# ==================================================================================
+# PAMIĘĆ WYNIKÓW ANALIZY - to samo nagranie w innym trybie bez ponownej analizy
+# ==================================================================================
+# Tryb analizy ("Detective", "Student Behavior", "Interview") zmienia tylko
+# etykietę wpisów raportu i treść zapytania do Gemini - wyniki modeli dla
+# każdej klatki są takie same. Użytkownicy często przesyłają ten sam film kilka
+# razy, aby porównać tryby, a każda taka próba liczyła całe nagranie od nowa.
+#
+# ResultCache zapisuje na dysku wyniki ukończonych analiz plików. Klucz
+# (result_key()) to skrót nagrania (ten sam co w punktach kontrolnych -
+# checkpoint.video_fingerprint(): rozmiar, liczba klatek i czas trwania oraz
+# próbki treści z całego pliku, bez czytania go w całości) i konfiguracji
+# analizy (ustawienia modeli, próbkowanie, backend emocji) - bez trybu. Ponowne
+# przesłanie tego samego filmu wczytuje wyniki, nadaje wierszom rejestru nowy
+# tryb i od razu przechodzi do raportu.
+#
+# Wpis to plik SQLite w formacie punktu kontrolnego (checkpoint.py) oznaczony
+# jako ukończony - stan zbiorczy jest w nim zapisany jako JSON, a domyślny
+# katalog jest prywatny (0700, ~/.cache/emo/results). Łączny rozmiar katalogu jest ograniczony - po przekroczeniu
+# limitu usuwamy najdawniej używane wpisy (czas modyfikacji pliku jest
+# odświeżany przy każdym trafieniu).
+# ==================================================================================
+
+import hashlib  # hashlib - klucz wpisu
+import json  # json - stabilny zapis składników klucza
+import os  # os - zmienne środowiskowe, rozmiary i czasy plików
+import tempfile  # mkstemp - unikalny plik tymczasowy wpisu
+from pathlib import Path  # Path - wygodna praca ze ścieżkami
+
+from checkpoint import (AnalysisCheckpoint, analysis_config, evict_least_recently_used, private_directory,
+                        user_cache_dir, video_fingerprint)
+
+# SEKCJA 1: STAŁE I KLUCZ WPISU
+# ==================================================================================
+
+# Zmienna środowiskowa z katalogiem pamięci wyników
+RESULT_CACHE_DIR_ENV = "EMO_RESULT_CACHE_DIR"
+
+# Limit łącznego rozmiaru wpisów (MB); zmienna środowiskowa EMO_RESULT_CACHE_MB
+# (0 = pamięć wyłączona)
+DEFAULT_RESULT_CACHE_MB = 500
+RESULT_CACHE_MB_ENV = "EMO_RESULT_CACHE_MB"
+
+# Wersja układu wpisu - zmiana unieważnia stare wpisy (inny klucz)
+SCHEMA_VERSION = 3
+
+
+def default_result_cache_dir():
+    """Prywatny katalog pamięci wyników: EMO_RESULT_CACHE_DIR albo ~/.cache/emo/results."""
+    return private_directory(os.environ.get(RESULT_CACHE_DIR_ENV) or user_cache_dir() / "results")
+
+
+def result_cache_mb():
+    """
+    Zwraca limit rozmiaru pamięci wyników w MB.
+
+    Wartość pochodzi ze zmiennej środowiskowej EMO_RESULT_CACHE_MB, a gdy jej
+    nie ustawiono (lub jest niepoprawna) - z DEFAULT_RESULT_CACHE_MB.
+    """
+    try:
+        value = float(os.environ.get(RESULT_CACHE_MB_ENV, DEFAULT_RESULT_CACHE_MB))
+    except ValueError:
+        return DEFAULT_RESULT_CACHE_MB
+    return value if value >= 0 else DEFAULT_RESULT_CACHE_MB
+
+
+def result_key(path, settings=None, sampler=None):
+    """
+    Klucz wpisu: treść nagrania i konfiguracja analizy (bez trybu).
+
+    Parametry:
+    ----------
+    path : str lub Path
+        Plik wideo
+    settings : AnalysisSettings lub None
+        Ustawienia modeli (None = DEFAULT_SETTINGS)
+    sampler : FrameSampler lub None
+        Próbkowanie klatek (None = każda klatka)
+    """
+    parts = {
+        "schema": SCHEMA_VERSION,
+        "video": video_fingerprint(path),  # Nazwa pliku nie ma znaczenia
+        **analysis_config(settings, sampler),
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+# SEKCJA 2: PAMIĘĆ WYNIKÓW
+# ==================================================================================
+
+class ResultCache:
+    """
+    Wyniki ukończonych analiz plików na dysku, z limitem łącznego rozmiaru.
+
+    Parametry:
+    ----------
+    directory : str lub Path lub None
+        Katalog wpisów (None = default_result_cache_dir(); gdy domyślny katalog
+        należy do innego użytkownika, pamięć jest wyłączona)
+    max_bytes : int lub None
+        Limit łącznego rozmiaru wpisów (None = result_cache_mb());
+        0 = pamięć wyłączona (nic nie jest zapisywane ani wczytywane)
+
+    Atrybuty:
+    ---------
+    stats : dict
+        "hits", "misses", "stores", "evictions" - liczniki operacji
+
+    Przykład użycia:
+    ----------------
+    cache = ResultCache()
+    key = result_key("film.mp4", settings, sampler)
+    state = new_analysis_state()
+    if not cache.load(key, state, "Interview"):
+        ...                                 # pełna analiza do "state"
+        cache.store(key, state)
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(result_cache_mb() * 1024 * 1024)
+        if directory is None:
+            try:
+                directory = default_result_cache_dir()
+            except PermissionError:
+                # Cudzy katalog - nie czytamy z niego wpisów ani nic w nim nie zapisujemy
+                directory = os.environ.get(RESULT_CACHE_DIR_ENV) or user_cache_dir() / "results"
+                max_bytes = 0
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @property
+    def enabled(self):
+        """Czy wpisy są zapisywane i wczytywane (limit rozmiaru większy od zera)."""
+        return self.max_bytes > 0
+
+    def path_for(self, key):
+        """Plik wpisu o danym kluczu."""
+        return self.directory / f"{key}.sqlite"
+
+    def __contains__(self, key):
+        return self.path_for(key).exists()
+
+    def load(self, key, state, mode):
+        """
+        Wczytuje zapisane wyniki do stanu analizy i nadaje im tryb "mode".
+
+        Parametry:
+        ----------
+        key : str
+            Klucz z result_key()
+        state : dict
+            Pusty stan analizy (new_analysis_state()) - wypełniany w miejscu
+        mode : str
+            Tryb, w którym pokazujemy wyniki (wpisy raportu dostają jego etykietę)
+
+        Zwraca:
+        -------
+        bool
+            True, gdy wpis istniał i został wczytany
+        """
+        path = self.path_for(key)
+        if not self.enabled or not path.exists():
+            self.stats["misses"] += 1
+            return False
+        with AnalysisCheckpoint(path) as entry:
+            if not entry.complete:
+                self.stats["misses"] += 1
+                return False
+            entry.load(state)
+        state["frame_records"].relabel(mode)
+        os.utime(path)  # Wpis używany - usuwany jako ostatni
+        self.stats["hits"] += 1
+        return True
+
+    def store(self, key, state):
+        """
+        Zapisuje wyniki ukończonej analizy i usuwa najdawniej używane wpisy ponad limit.
+
+        Wpis powstaje w osobnym pliku tymczasowym (każde wywołanie ma własny -
+        sesje Streamlit działają w jednym procesie) i jest podmieniany w całości
+        (os.replace), więc równoległy odczyt nie widzi niepełnych danych.
+        Gdy ten sam wpis zapisuje równocześnie inna sesja, wygrywa jeden
+        z identycznych zapisów. Wpis większy niż cały limit nie zostaje zachowany.
+        """
+        if not self.enabled:
+            return
+        path = self.path_for(key)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, partial = tempfile.mkstemp(prefix=f"{key}.", suffix=".tmp", dir=self.directory)
+        os.close(fd)
+        try:
+            with AnalysisCheckpoint(partial) as entry:
+                entry.save(state, state["frame_count"], complete=True)
+            os.replace(partial, path)
+        except OSError:
+            return  # Wpis nie powstał - wyniki i tak są już w pamięci sesji
+        finally:
+            Path(partial).unlink(missing_ok=True)
+        self.stats["stores"] += 1
+        self.evict()
+
+    def size(self):
+        """Łączny rozmiar wpisów w bajtach."""
+        return sum(path.stat().st_size for path in self.directory.glob("*.sqlite"))
+
+    def evict(self):
+        """Usuwa najdawniej używane wpisy, dopóki łączny rozmiar przekracza limit."""
+        self.stats["evictions"] += evict_least_recently_used(self.directory, self.max_bytes)
+
+    def clear(self):
+        """Usuwa wszystkie wpisy."""
+        for path in self.directory.glob("*.sqlite"):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,333 @@
+# ==================================================================================
+# ANALIZA SEGMENTAMI - jedno długie nagranie na wielu rdzeniach
+# ==================================================================================
+# batch_analysis.py rozdziela między procesy całe pliki. Jedno długie nagranie
+# (np. 90-minutowy wykład) było jednak analizowane klatka po klatce w jednej
+# pętli - jeden rdzeń pracował, pozostałe czekały.
+#
+# Tutaj nagranie jest dzielone na segmenty czasowe. Każdy proces roboczy
+# przewija plik do początku swojego segmentu (cv2.CAP_PROP_POS_FRAMES), tworzy
+# własne detektory MediaPipe i model emocji i analizuje tylko swój fragment.
+# Wyniki segmentów (sumy, liczniki, rejestr klatek, statystyki strumieniowe)
+# są scalane w kolejności czasu w jeden stan analizy - ten sam, z którego
+# generate_report() w aplikacji i summarize_state() tworzą raport.
+#
+# Granice segmentów:
+# - segment zaczyna się zaraz po ostatniej klatce, którą próbkowanie wybrałoby
+#   w poprzednim segmencie - wybór klatek i ich wagi są takie same jak przy
+#   analizie jednym przebiegiem (tak samo jak przy wznawianiu - checkpoint.py)
+# - każdy segment numeruje osoby we własnym zakresie identyfikatorów; przy
+#   scalaniu osoba widoczna w ostatniej klatce segmentu i w pierwszej klatce
+#   następnego (w tym samym miejscu obrazu) dostaje jeden identyfikator
+# ==================================================================================
+
+import multiprocessing  # multiprocessing - kontekst "spawn" dla procesów roboczych
+import os  # os - liczba rdzeni
+from concurrent.futures import ProcessPoolExecutor  # Pula procesów
+
+import cv2  # OpenCV - liczba klatek i fps nagrania
+
+import analysis_core  # Rdzeń analizy (pętle, stan, scalanie)
+from frame_sampling import FrameSampler  # Próbkowanie klatek (także przy planowaniu granic)
+from landmark_tracking import DEFAULT_MATCH_DISTANCE  # Próg łączenia osób na granicach
+from worker_threads import init_worker  # Podział wątków bibliotek między procesy
+
+# SEKCJA 1: STAŁE
+# ==================================================================================
+
+# Najkrótszy sensowny segment (sekundy nagrania) - każdy proces wczytuje własne
+# modele (kilka sekund), więc krótsze fragmenty nie przyspieszają analizy
+DEFAULT_MIN_SEGMENT_SECONDS = 30.0
+
+# Rozmiar zakresu identyfikatorów osób jednego segmentu (segment k numeruje
+# osoby od k * PERSON_ID_BLOCK + 1; po scaleniu numeracja jest ciągła od 1)
+PERSON_ID_BLOCK = 100_000
+
+
+# SEKCJA 2: PLANOWANIE SEGMENTÓW
+# ==================================================================================
+
+def plan_segments(frame_count, segments, sampler=None):
+    """
+    Dzieli nagranie na segmenty o zbliżonej długości.
+
+    Parametry:
+    ----------
+    frame_count : int
+        Liczba klatek nagrania
+    segments : int
+        Żądana liczba segmentów
+    sampler : frame_sampling.FrameSampler lub None
+        Próbkowanie analizy (nie jest modyfikowane); granica segmentu trafia
+        zaraz za ostatnią klatkę wybraną przed granicą nominalną
+
+    Zwraca:
+    -------
+    list[tuple[int, int | None]]
+        Pary (pierwsza klatka, klatka końcowa - wyłącznie); ostatni segment
+        kończy się na None (do końca pliku - liczba klatek z nagłówka bywa
+        niedokładna)
+    """
+    if segments < 1:
+        raise ValueError("Liczba segmentów musi być dodatnia")
+    targets = [frame_count * k // segments for k in range(1, segments)]
+    # Symulacja wyboru klatek na świeżej kopii próbkowania (tanie - same indeksy)
+    probe = FrameSampler(sampler.policy, sampler.value, sampler.source_fps) if sampler else None
+    starts = [0]
+    last_selected = -1
+    position = 0
+    for index in range(frame_count):
+        while position < len(targets) and targets[position] <= index:
+            if last_selected + 1 > starts[-1]:
+                starts.append(last_selected + 1)
+            position += 1
+        if position == len(targets):
+            break
+        if probe is None or probe.should_analyze(index):
+            last_selected = index
+    return [(start, stop) for start, stop in zip(starts, starts[1:] + [None])]
+
+
+# SEKCJA 3: PRACA POJEDYNCZEGO PROCESU
+# ==================================================================================
+
+def _describe_faces(trackers):
+    """Identyfikatory i środki twarzy śledzonych w ostatniej klatce: [(id, (x, y))]."""
+    if not trackers:
+        return []
+    return [(track.id, tuple(float(v) for v in track.center)) for track in trackers["face"].tracks]
+
+
+def analyze_segment(path, mode, segment_index, start, stop, options):
+    """
+    Analizuje jeden segment nagrania (wywoływane w procesie roboczym).
+
+    Parametry:
+    ----------
+    path : str
+        Ścieżka do pliku wideo
+    mode : str
+        Tryb analizy
+    segment_index : int
+        Numer segmentu (wyznacza zakres identyfikatorów osób)
+    start, stop : int, int lub None
+        Zakres klatek segmentu (patrz plan_segments())
+    options : dict
+        sampling_policy, sampling_value, emotion_batch_size i settings
+        (jak w analysis_core.analyze_video_file())
+
+    Zwraca:
+    -------
+    dict
+        "state" - stan analizy segmentu, "first_faces" i "last_faces" -
+        twarze w pierwszej i ostatniej przeanalizowanej klatce (do łączenia
+        osób na granicach), "tracking" - liczniki śledzenia
+    """
+    settings = options.get("settings")
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise IOError(f"Nie można otworzyć pliku wideo: {path}")
+    sampler = FrameSampler(options.get("sampling_policy", "all"), options.get("sampling_value"),
+                           source_fps=cap.get(cv2.CAP_PROP_FPS))
+    state = analysis_core.new_analysis_state()
+    trackers = analysis_core.create_trackers(settings,
+                                             first_id=segment_index * PERSON_ID_BLOCK + 1)
+    first_faces = []
+
+    def remember_first_faces():
+        # Wywoływane przed każdą klatką - po pierwszej analizie zapamiętujemy twarze
+        if trackers and not first_faces and sum(trackers["face"].stats.values()) == 1:
+            first_faces.append(_describe_faces(trackers))
+        return True
+
+    loop_options = {"sampler": sampler, "settings": settings, "trackers": trackers,
+                    "start_index": start, "stop_index": stop,
+                    "should_continue": remember_first_faces}
+    try:
+        with analysis_core.open_detectors(settings) as (hands, face_mesh):
+            batch_size = options.get("emotion_batch_size", 1)
+            if batch_size > 1:
+                from emotion_engine import BatchEmotionEngine
+                engine = BatchEmotionEngine(batch_size=batch_size)
+                analysis_core.run_batched_analysis_loop(cap, mode, state, hands, face_mesh, engine,
+                                                        **loop_options)
+            else:
+                analysis_core.run_analysis_loop(cap, mode, state, hands, face_mesh, draw=False,
+                                                **loop_options)
+    finally:
+        cap.release()
+    remember_first_faces()  # Segment z jedną przeanalizowaną klatką
+    return {
+        "state": state,
+        "first_faces": first_faces[0] if first_faces else [],
+        "last_faces": _describe_faces(trackers),
+        "tracking": {name: dict(tracker.stats) for name, tracker in trackers.items()} if trackers else None,
+    }
+
+
+# SEKCJA 4: SCALANIE WYNIKÓW
+# ==================================================================================
+
+def _link_people(previous_faces, first_faces, match_distance):
+    """
+    Łączy twarze z końca poprzedniego segmentu z twarzami z początku bieżącego.
+
+    Zachłannie, od najbliższych par (odległość środków jak w LandmarkTracker).
+
+    Zwraca:
+    -------
+    dict
+        {identyfikator w segmencie: identyfikator po scaleniu}
+    """
+    pairs = sorted((abs(x - px) + abs(y - py), person_id, previous_id)
+                   for person_id, (x, y) in first_faces
+                   for previous_id, (px, py) in previous_faces)
+    linked, used = {}, set()
+    for distance, person_id, previous_id in pairs:
+        if distance > match_distance:
+            break
+        if person_id in linked or previous_id in used:
+            continue
+        linked[person_id] = previous_id
+        used.add(previous_id)
+    return linked
+
+
+def merge_segment_results(results, match_distance=DEFAULT_MATCH_DISTANCE, record_capacity=None):
+    """
+    Scala wyniki segmentów (w kolejności czasu) w jeden stan analizy.
+
+    Osoby dostają ciągłą numerację od 1 w kolejności pojawienia się; osoba
+    widoczna na granicy dwóch segmentów zachowuje jeden identyfikator.
+
+    Zwraca:
+    -------
+    tuple[dict, dict | None]
+        Stan analizy całego nagrania i zsumowane liczniki śledzenia
+        (None bez śledzenia)
+    """
+    state = analysis_core.new_analysis_state(record_capacity)
+    tracking = None
+    next_id = 1
+    previous_faces = []
+    for result in results:
+        segment_state = result["state"]
+        mapping = _link_people(previous_faces, result["first_faces"], match_distance)
+        seen = sorted(set(segment_state["people"]) | {person_id for person_id, _ in result["first_faces"]}
+                      | {person_id for person_id, _ in result["last_faces"]})
+        for person_id in seen:
+            if person_id not in mapping:
+                mapping[person_id] = next_id
+                next_id += 1
+        segment_state["people"] = {mapping[person_id]: stats
+                                   for person_id, stats in segment_state["people"].items()}
+        analysis_core.merge_analysis_state(state, segment_state)
+        previous_faces = [(mapping[person_id], center) for person_id, center in result["last_faces"]]
+
+        if result["tracking"] is not None:
+            tracking = tracking or {name: dict.fromkeys(stats, 0) for name, stats in result["tracking"].items()}
+            for name, stats in result["tracking"].items():
+                for key, value in stats.items():
+                    tracking[name][key] += value
+    return state, tracking
+
+
+# SEKCJA 5: GŁÓWNA FUNKCJA
+# ==================================================================================
+
+def analyze_segments(path, mode="Detective", segments=None, workers=None,
+                     sampling_policy="all", sampling_value=None, emotion_batch_size=1,
+                     settings=None, min_segment_seconds=DEFAULT_MIN_SEGMENT_SECONDS,
+                     record_capacity=None):
+    """
+    Analizuje jedno nagranie równolegle w segmentach i scala wyniki.
+
+    Parametry:
+    ----------
+    path : str lub Path
+        Ścieżka do pliku wideo
+    mode : str
+        Tryb analizy
+    segments : int lub None
+        Liczba segmentów (None = liczba procesów). Segmenty krótsze niż
+        min_segment_seconds są łączone - krótkie nagranie to jeden segment.
+    workers : int lub None
+        Liczba procesów roboczych (domyślnie liczba rdzeni); dla workers=1
+        segmenty są analizowane po kolei w bieżącym procesie
+    sampling_policy, sampling_value, emotion_batch_size, settings :
+        Jak w analysis_core.analyze_video_file()
+    min_segment_seconds : float
+        Najkrótszy segment (sekundy nagrania)
+    record_capacity : int lub None
+        Limit wierszy rejestru wyników scalonego stanu
+
+    Zwraca:
+    -------
+    tuple[dict, dict]
+        Stan analizy całego nagrania (jak po analysis_core.run_analysis_loop())
+        oraz informacje o podziale: {"segments": [(start, stop), ...],
+        "tracking": liczniki śledzenia lub None}
+
+    Wyjątki:
+    --------
+    IOError
+        Gdy pliku nie da się otworzyć
+
+    Uwaga:
+    ------
+    Przy śledzeniu (detect_every > 1) każdy segment zaczyna od uruchomienia
+    detektora, a pamięć podręczna emocji i średnia wykładnicza (EMA) startują
+    w każdym segmencie od nowa - wyniki mogą się minimalnie różnić od analizy
+    jednym przebiegiem. Sumy, liczniki i rejestr klatek są takie same.
+    """
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise IOError(f"Nie można otworzyć pliku wideo: {path}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+
+    workers = workers or os.cpu_count() or 1
+    segments = segments or workers
+    if fps > 0 and min_segment_seconds > 0:
+        segments = min(segments, max(1, int(frame_count / fps // min_segment_seconds)))
+    sampler = FrameSampler(sampling_policy, sampling_value, source_fps=fps)
+    plan = plan_segments(max(frame_count, 0), max(segments, 1), sampler)
+
+    options = {"sampling_policy": sampling_policy, "sampling_value": sampling_value,
+               "emotion_batch_size": emotion_batch_size, "settings": settings}
+    workers = max(1, min(workers, len(plan)))
+    if workers == 1:
+        results = [analyze_segment(str(path), mode, index, start, stop, options)
+                   for index, (start, stop) in enumerate(plan)]
+    else:
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=init_worker,
+                                 initargs=(threads_per_worker,)) as executor:
+            futures = [executor.submit(analyze_segment, str(path), mode, index, start, stop, options)
+                       for index, (start, stop) in enumerate(plan)]
+            results = [future.result() for future in futures]
+
+    state, tracking = merge_segment_results(results, record_capacity=record_capacity)
+    return state, {"segments": plan, "tracking": tracking}
+
+
+def analyze_video_segments(path, mode="Detective", **options):
+    """
+    Jak analysis_core.analyze_video_file(), ale równolegle w segmentach.
+
+    Parametry jak w analyze_segments(). Podsumowanie zawiera dodatkowo
+    "segments" - zakresy klatek kolejnych segmentów.
+    """
+    state, info = analyze_segments(path, mode, **options)
+    summary = analysis_core.summarize_state(state)
+    summary["video"] = str(path)
+    summary["mode"] = mode
+    summary["sampling"] = FrameSampler(options.get("sampling_policy", "all"),
+                                       options.get("sampling_value")).describe()
+    summary["segments"] = [[start, stop] for start, stop in info["segments"]]
+    if info["tracking"] is not None:
+        summary["tracking"] = info["tracking"]
+    return summary
@@ -0,0 +1,371 @@
+# ==================================================================================
+# KLATKI W PAMIĘCI WSPÓŁDZIELONEJ - transport klatek do procesów roboczych
+# ==================================================================================
+# DeepFace (TensorFlow) w wątku analizy konkuruje z MediaPipe o GIL i rdzenie.
+# Osobne procesy robocze omijają ten problem, ale przesłanie klatki 1080p
+# (6 MB) przez multiprocessing.Queue oznacza serializację i dwie kopie na każdą
+# klatkę - zjadłoby to większość zysku.
+#
+# Tutaj klatki leżą w pierścieniu gotowych miejsc (slotów) w jednym bloku
+# multiprocessing.shared_memory:
+#   odczyt (dekodowanie wprost do slotu) -> numer slotu przez kolejkę ->
+#   proces roboczy czyta klatkę bez kopiowania -> mały rekord wyniku z powrotem
+# Między procesami przechodzą tylko krotki (slot, indeks klatki, rozmiar)
+# i małe wyniki (np. słownik 7 emocji), nigdy same obrazy.
+#
+# Własność slotów:
+# - slot zajmuje acquire() (właściciel: strona odczytu), retain() dodaje kolejnego
+#   posiadacza (np. zadanie w procesie roboczym), release() go zdejmuje
+# - slot wraca do puli wolnych dopiero, gdy zwolnią go wszyscy posiadacze -
+#   proces roboczy nigdy nie czyta slotu nadpisywanego nową klatką
+# - cała księgowość działa w procesie głównym (procesy robocze tylko czytają),
+#   więc awaria procesu roboczego nie psuje stanu pierścienia
+# Przeciwciśnienie: gdy wszystkie sloty są zajęte, acquire() czeka - odczyt
+# zwalnia do tempa analizy zamiast gromadzić klatki w pamięci.
+# ==================================================================================
+
+import collections  # deque - kolejka wolnych slotów
+import multiprocessing  # multiprocessing - procesy robocze ("spawn") i kolejki między nimi
+import queue  # queue.Empty - wyjątek zgłaszany po upływie czasu oczekiwania
+import threading  # threading - blokady księgowości slotów (wątki procesu głównego)
+import time  # time - limit czasu oczekiwania na wynik
+from multiprocessing import shared_memory  # Blok pamięci widoczny dla wielu procesów
+
+import numpy as np  # NumPy - widoki klatek w pamięci współdzielonej
+
+# Co ile sekund oczekujący sprawdzają, czy procesy robocze nadal działają
+_POLL_INTERVAL = 0.05
+
+# Czas na zakończenie procesu roboczego przy close(), potem terminate()
+_JOIN_TIMEOUT = 5.0
+
+# Opis pierścienia przekazywany procesom roboczym (nazwa bloku i układ slotów)
+FrameRingSpec = collections.namedtuple("FrameRingSpec", "name slots frame_shape dtype")
+
+
+# SEKCJA 1: PIERŚCIEŃ SLOTÓW
+# ==================================================================================
+
+class SharedFrameRing:
+    """
+    Pierścień slotów na klatki w pamięci współdzielonej (strona procesu głównego).
+
+    Parametry:
+    ----------
+    slots : int
+        Liczba slotów (ile klatek może być naraz w drodze)
+    frame_shape : tuple
+        Największy rozmiar klatki, np. (1080, 1920, 3)
+    dtype : numpy.dtype
+        Typ pikseli (domyślnie uint8 - klatki OpenCV)
+
+    Atrybuty:
+    ---------
+    stats : dict
+        "acquired" - zajęte sloty, "waits" - ile razy acquire() czekał na wolny
+        slot (przeciwciśnienie), "peak_in_use" - największa liczba zajętych slotów
+
+    Przykład użycia:
+    ----------------
+    with SharedFrameRing(slots=6, frame_shape=(480, 640, 3)) as ring:
+        slot = ring.acquire()
+        ret, frame = cap.read(ring.view(slot))  # Dekodowanie wprost do slotu
+        pool.submit(slot, index)                # Proces roboczy też trzyma slot
+        ...
+        ring.release(slot)                      # Slot wolny, gdy zwolnią go wszyscy
+
+    Uwaga:
+    ------
+    Metody nie są przeznaczone do wywoływania w procesach roboczych - te
+    korzystają z FrameRingReader (tylko odczyt, bez księgowości).
+    """
+
+    def __init__(self, slots, frame_shape, dtype=np.uint8):
+        if slots < 1:
+            raise ValueError("Liczba slotów musi być dodatnia")
+        self.slots = slots
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = np.dtype(dtype)
+        size = slots * int(np.prod(self.frame_shape)) * self.dtype.itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self.frames = np.ndarray((slots,) + self.frame_shape, self.dtype, buffer=self._shm.buf)
+        self.stats = {"acquired": 0, "waits": 0, "peak_in_use": 0}
+
+        self._holders = [0] * slots  # Liczba posiadaczy każdego slotu
+        self._free = collections.deque(range(slots))
+        self._cond = threading.Condition()
+        self._closed = False
+
+    @property
+    def spec(self):
+        """Opis pierścienia dla procesów roboczych (FrameRingReader)."""
+        return FrameRingSpec(self._shm.name, self.slots, self.frame_shape, self.dtype.str)
+
+    @property
+    def in_use(self):
+        """Liczba zajętych slotów."""
+        with self._cond:
+            return self.slots - len(self._free)
+
+    def acquire(self, timeout=None):
+        """
+        Zajmuje wolny slot (jeden posiadacz - wywołujący).
+
+        Parametry:
+        ----------
+        timeout : float lub None
+            Najdłuższy czas oczekiwania na wolny slot (None = bez limitu)
+
+        Zwraca:
+        -------
+        int lub None
+            Numer slotu; None, gdy w podanym czasie żaden slot się nie zwolnił
+            albo pierścień zamknięto
+        """
+        with self._cond:
+            if not self._free:
+                self.stats["waits"] += 1
+            if not self._cond.wait_for(lambda: self._free or self._closed, timeout) or self._closed:
+                return None
+            slot = self._free.popleft()
+            self._holders[slot] = 1
+            self.stats["acquired"] += 1
+            self.stats["peak_in_use"] = max(self.stats["peak_in_use"], self.slots - len(self._free))
+            return slot
+
+    def retain(self, slot):
+        """Dodaje posiadacza zajętego slotu (np. zadanie przekazane procesowi roboczemu)."""
+        with self._cond:
+            if self._holders[slot] < 1:
+                raise RuntimeError(f"Slot {slot} nie jest zajęty")
+            self._holders[slot] += 1
+
+    def release(self, slot):
+        """
+        Zdejmuje jednego posiadacza slotu; ostatni zwalnia slot do ponownego użycia.
+
+        Wyjątki:
+        --------
+        RuntimeError
+            Gdy slot nie jest zajęty (podwójne zwolnienie)
+        """
+        with self._cond:
+            if self._holders[slot] < 1:
+                raise RuntimeError(f"Slot {slot} nie jest zajęty")
+            self._holders[slot] -= 1
+            if self._holders[slot] == 0:
+                self._free.append(slot)
+                self._cond.notify_all()
+
+    def view(self, slot, shape=None):
+        """
+        Widok klatki w slocie (bez kopiowania).
+
+        shape - rozmiar mniejszej klatki zapisanej na początku slotu (None =
+        pełny rozmiar slotu).
+        """
+        return _slot_view(self.frames, slot, shape)
+
+    def close(self):
+        """Budzi oczekujących, zwalnia i usuwa blok pamięci współdzielonej."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._shm is None:
+            return
+        shm, self._shm = self._shm, None
+        self.frames = None
+        shm.unlink()  # Nazwa znika od razu, pamięć - po odłączeniu wszystkich procesów
+        try:
+            shm.close()
+        except BufferError:
+            # Ktoś nadal trzyma widok klatki - blok zostanie odłączony razem z nim
+            self._unclosed = shm
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class FrameRingReader:
+    """
+    Dostęp do slotów pierścienia z procesu roboczego (tylko odczyt).
+
+    Parametry:
+    ----------
+    spec : FrameRingSpec
+        Opis pierścienia (SharedFrameRing.spec)
+    """
+
+    def __init__(self, spec):
+        self._shm = shared_memory.SharedMemory(name=spec.name)
+        self.frames = np.ndarray((spec.slots,) + tuple(spec.frame_shape), np.dtype(spec.dtype),
+                                 buffer=self._shm.buf)
+        self.frames.flags.writeable = False  # Klatkę zapisuje wyłącznie proces główny
+
+    def view(self, slot, shape=None):
+        """Widok klatki w slocie (bez kopiowania, tylko do odczytu)."""
+        return _slot_view(self.frames, slot, shape)
+
+    def close(self):
+        """Odłącza blok pamięci (nie usuwa go - to zadanie procesu głównego)."""
+        self.frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            pass
+
+
+def _slot_view(frames, slot, shape):
+    """Widok klatki o rozmiarze "shape" zapisanej na początku slotu."""
+    frame = frames[slot]
+    if shape is None or tuple(shape) == frame.shape:
+        return frame
+    size = int(np.prod(shape))
+    return frame.reshape(-1)[:size].reshape(shape)
+
+
+# SEKCJA 2: PROCESY ROBOCZE
+# ==================================================================================
+
+def _worker_main(spec, task, tasks, results, initializer, initargs):
+    """Pętla procesu roboczego: numer slotu -> task(klatka) -> mały rekord wyniku."""
+    if initializer is not None:
+        initializer(*initargs)
+    reader = FrameRingReader(spec)
+    try:
+        while True:
+            job = tasks.get()
+            if job is None:
+                break
+            slot, index, shape = job
+            try:
+                results.put((index, task(reader.view(slot, shape)), None))
+            except Exception as e:
+                results.put((index, None, f"{type(e).__name__}: {e}"))
+    finally:
+        reader.close()
+
+
+class ProcessFramePool:
+    """
+    Procesy robocze analizujące klatki z pierścienia pamięci współdzielonej.
+
+    Parametry:
+    ----------
+    ring : SharedFrameRing
+        Pierścień, do którego strona odczytu zapisuje klatki
+    task : callable
+        task(klatka) -> mały wynik (musi dać się zapisać pickle); funkcja
+        zdefiniowana na poziomie modułu (procesy "spawn" importują ją po nazwie).
+        Klatka jest widokiem tylko do odczytu - nie wolno jej zapamiętywać.
+    processes : int
+        Liczba procesów roboczych
+    initializer, initargs :
+        Funkcja wywoływana raz na starcie każdego procesu (np. limit wątków)
+
+    Przykład użycia:
+    ----------------
+    pool = ProcessFramePool(ring, emotion_task, processes=2)
+    pool.submit(slot, frame_index)   # Slot ma teraz dodatkowego posiadacza
+    scores = pool.result(frame_index)  # Wynik; posiadacz-zadanie zwolniony
+    pool.close()
+
+    Uwaga:
+    ------
+    Wyniki mogą przychodzić w dowolnej kolejności - result() czeka na wynik
+    konkretnej klatki i przechowuje pozostałe. Wynik klatki, której już nie
+    potrzebujemy (np. odrzuconej przez kolejkę "latest"), oznacza discard().
+    """
+
+    def __init__(self, ring, task, processes=2, initializer=None, initargs=()):
+        if processes < 1:
+            raise ValueError("Liczba procesów roboczych musi być dodatnia")
+        self.ring = ring
+        context = multiprocessing.get_context("spawn")
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._lock = threading.Lock()
+        self._pending = {}      # {indeks klatki: slot} - zadania w procesach roboczych
+        self._done = {}         # {indeks klatki: wynik} - wyniki czekające na odbiór
+        self._discarded = set()  # Klatki, których wyniki odrzucamy po nadejściu
+        self._processes = [context.Process(target=_worker_main, name=f"frame-worker-{i}", daemon=True,
+                                           args=(ring.spec, task, self._tasks, self._results,
+                                                 initializer, initargs))
+                           for i in range(processes)]
+        for process in self._processes:
+            process.start()
+
+    def submit(self, slot, index, shape=None):
+        """Przekazuje klatkę ze slotu procesom roboczym (slot dostaje posiadacza-zadanie)."""
+        self.ring.retain(slot)
+        with self._lock:
+            self._pending[index] = slot
+        self._tasks.put((slot, index, shape))
+
+    def discard(self, index):
+        """Wynik tej klatki nie jest potrzebny - zostanie odrzucony po nadejściu."""
+        with self._lock:
+            if self._done.pop(index, None) is None and index in self._pending:
+                self._discarded.add(index)
+
+    def result(self, index, timeout=None):
+        """
+        Czeka na wynik klatki "index".
+
+        Wyjątki:
+        --------
+        RuntimeError
+            Gdy zadanie zgłosiło wyjątek albo proces roboczy przestał działać
+        TimeoutError
+            Gdy wynik nie nadszedł w podanym czasie
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                done = self._done.pop(index, None)
+            if done is not None:
+                record, error = done
+                if error is not None:
+                    raise RuntimeError(f"Błąd procesu roboczego (klatka {index}): {error}")
+                return record
+            try:
+                received, record, error = self._results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    raise RuntimeError("Proces roboczy analizy klatek przestał działać")
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Brak wyniku klatki {index}")
+                continue
+            self._complete(received, record, error)
+
+    def _complete(self, index, record, error):
+        """Zwalnia slot zadania i zapamiętuje wynik (chyba że klatkę odrzucono)."""
+        with self._lock:
+            slot = self._pending.pop(index)
+            if index in self._discarded:
+                self._discarded.discard(index)
+            else:
+                self._done[index] = (record, error)
+        self.ring.release(slot)
+
+    def close(self):
+        """Kończy procesy robocze i zwalnia sloty zadań, które nie wróciły."""
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._done.clear()
+            self._discarded.clear()
+        for slot in pending.values():
+            self.ring.release(slot)
+        for channel in (self._tasks, self._results):
+            channel.cancel_join_thread()  # Procesy już zakończone - nie czekamy na opróżnienie
+            channel.close()
@@ -0,0 +1,127 @@
+# ==================================================================================
+# TEMPO ODCZYTU KLATEK - zależne od rodzaju źródła (plik lub kamera)
+# ==================================================================================
+# Plik wideo analizujemy tak szybko, jak pozwala sprzęt: kolejne klatki są
+# dekodowane bez żadnego czekania, a żadna z nich nie ginie.
+#
+# Kamera dostarcza klatki w swoim tempie, a sterownik trzyma kilka ostatnich
+# w buforze. Gdy analiza na chwilę zwolni, w buforze czekają klatki sprzed
+# kilkuset milisekund - zwykłe cap.read() zwróciłoby najstarszą z nich.
+# SourcePacing przed odczytem opróżnia bufor: cap.grab() zwraca zaległą klatkę
+# natychmiast, a na świeżą musi poczekać - pierwsza klatka, na którą trzeba
+# było czekać, jest najnowsza i tylko ją dekodujemy (cap.retrieve()).
+#
+# Pomijane zaległe klatki są liczone - ich waga przechodzi na analizowaną
+# klatkę (jak przy odrzucaniu klatek w potoku), a efektywną liczbę klatek
+# analizowanych na sekundę mierzymy w oknie ostatnich klatek.
+# ==================================================================================
+
+import collections  # deque - znaczniki czasu ostatnich klatek
+import time  # time - zegar odczytów i pomiaru fps
+
+import cv2  # OpenCV - rozmiar bufora kamery
+
+# Rodzaje źródeł wideo (jak w aplikacji: kamera lub przesłany plik)
+SOURCE_KINDS = ("camera", "video")
+
+# cap.grab() krótszy niż ten czas oznacza klatkę, która czekała w buforze
+STALE_GRAB_SECONDS = 0.002
+
+
+class SourcePacing:
+    """
+    Sposób odczytu klatek dopasowany do źródła: plik bez czekania, kamera na żywo.
+
+    Parametry:
+    ----------
+    live : bool
+        True dla kamery (opróżnianie bufora, najnowsza klatka), False dla pliku
+    max_drain : int
+        Największa liczba zaległych klatek pomijanych przy jednym odczycie
+    window : int
+        Liczba ostatnich klatek, z których liczymy efektywne fps
+    clock : callable
+        Zegar zwracający sekundy (do testów); domyślnie time.monotonic
+
+    Atrybuty:
+    ---------
+    stats : dict
+        "drained" - liczba pominiętych zaległych klatek kamery
+
+    Przykład użycia:
+    ----------------
+    pacing = SourcePacing.for_source("camera")
+    pacing.prepare(cap)
+    ret, frame, drained = pacing.read(cap)
+    pacing.tick()          # po analizie klatki
+    print(pacing.fps)      # efektywne klatki na sekundę
+    """
+
+    def __init__(self, live=False, max_drain=30, window=30, clock=time.monotonic):
+        if window < 2:
+            raise ValueError("Okno pomiaru fps musi obejmować co najmniej 2 klatki")
+        self.live = live
+        self.max_drain = max_drain
+        self._clock = clock
+        self._ticks = collections.deque(maxlen=window)
+        self.stats = {"drained": 0}
+
+    @classmethod
+    def for_source(cls, input_source, **options):
+        """Tworzy tempo odczytu dla źródła "camera" lub "video" (patrz SOURCE_KINDS)."""
+        if input_source not in SOURCE_KINDS:
+            raise ValueError(f"Nieznane źródło wideo: {input_source}; dostępne: {SOURCE_KINDS}")
+        return cls(live=input_source == "camera", **options)
+
+    @property
+    def drop_policy(self):
+        """Polityka kolejek potoku: kamera - najnowsza klatka, plik - bez strat."""
+        return "latest" if self.live else "block"
+
+    def prepare(self, cap):
+        """Zmniejsza bufor kamery do jednej klatki (jeśli sterownik na to pozwala)."""
+        if self.live:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def read(self, cap, buffer=None):
+        """
+        Odczytuje kolejną klatkę (z kamery - najnowszą).
+
+        Parametry:
+        ----------
+        cap : cv2.VideoCapture
+            Otwarte źródło wideo
+        buffer : numpy.ndarray lub None
+            Tablica na obraz używana ponownie (jak w cap.read())
+
+        Zwraca:
+        -------
+        tuple
+            (ret, frame, drained) - drained to liczba pominiętych zaległych klatek
+        """
+        if not self.live:
+            ret, frame = cap.read(buffer)
+            return ret, frame, 0
+
+        drained = 0
+        while True:
+            started = self._clock()
+            if not cap.grab():
+                return False, None, drained
+            if self._clock() - started >= STALE_GRAB_SECONDS or drained >= self.max_drain:
+                break  # Na tę klatkę trzeba było poczekać - jest najnowsza
+            drained += 1
+        self.stats["drained"] += drained
+        ret, frame = cap.retrieve(buffer)
+        return ret, frame, drained
+
+    def tick(self):
+        """Zapisuje chwilę zakończenia analizy klatki (do pomiaru fps)."""
+        self._ticks.append(self._clock())
+
+    @property
+    def fps(self):
+        """Efektywna liczba klatek analizowanych na sekundę (okno ostatnich klatek)."""
+        if len(self._ticks) < 2 or self._ticks[-1] <= self._ticks[0]:
+            return 0.0
+        return (len(self._ticks) - 1) / (self._ticks[-1] - self._ticks[0])
@@ -0,0 +1,271 @@
+# ==================================================================================
+# POMIAR CZASU ETAPÓW - histogramy opóźnień dla każdego etapu analizy klatki
+# ==================================================================================
+# Gdy analiza działa wolno, trzeba wiedzieć, który etap jest winny: dekodowanie
+# wideo, konwersja kolorów, DeepFace, MediaPipe Hands, Face Mesh, rysowanie
+# nakładek czy wysyłanie obrazu do przeglądarki.
+#
+# StageTimer mierzy czas każdego etapu w każdej klatce i zapisuje go do
+# histogramu o stałych, logarytmicznie rozłożonych przedziałach (od 10 µs do
+# ok. 100 s). Zapis to jedno wyszukiwanie binarne i zwiększenie licznika, więc
+# pomiar nie spowalnia analizy, a pamięć nie rośnie z długością nagrania.
+# Z histogramu odczytujemy percentyle (p50, p95). Opcjonalnie (keep_raw=True)
+# zapisywane są też surowe czasy do późniejszej analizy (eksport CSV).
+# ==================================================================================
+
+import array  # array - zwarte kolumny surowych pomiarów
+import bisect  # bisect - wyszukiwanie przedziału histogramu
+import csv  # csv - eksport surowych pomiarów
+import io  # io - eksport CSV do napisu
+import math  # math - granice przedziałów histogramu
+import time  # time - zegar o wysokiej rozdzielczości
+
+# Etapy analizy klatki (w kolejności wykonywania)
+STAGES = ("decode", "color", "emotion", "hands", "face", "overlay", "display")
+
+# Granice przedziałów histogramu: 10 µs * 10^(i/10) - 71 granic od 10 µs do 100 s
+_BUCKET_EDGES = tuple(1e-5 * 10 ** (i / 10) for i in range(71))
+
+
+class LatencyHistogram:
+    """
+    Histogram czasów trwania o stałych przedziałach logarytmicznych.
+
+    Atrybuty:
+    ---------
+    count : int
+        Liczba pomiarów
+    total : float
+        Suma czasów (sekundy)
+    max : float
+        Najdłuższy pomiar (sekundy)
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKET_EDGES) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        """Dodaje pomiar (w sekundach)."""
+        self.counts[bisect.bisect_right(_BUCKET_EDGES, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        """Dodaje pomiary z innego histogramu."""
+        for i, value in enumerate(other.counts):
+            self.counts[i] += value
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p):
+        """
+        Przybliżony percentyl (0-100) w sekundach.
+
+        Zwracamy środek geometryczny przedziału, w którym leży percentyl - błąd
+        względny nie przekracza ok. 12% (szerokość przedziału to 10^0.1).
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for i, value in enumerate(self.counts):
+            seen += value
+            if seen >= rank:
+                low = _BUCKET_EDGES[i - 1] if i > 0 else 0.0
+                high = _BUCKET_EDGES[i] if i < len(_BUCKET_EDGES) else self.max
+                value = math.sqrt(low * high) if low > 0 else high / 2
+                return min(value, self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        """Średni czas (sekundy); 0.0 bez pomiarów."""
+        return self.total / self.count if self.count else 0.0
+
+
+class _StageMeasure:
+    """Wielokrotnie używany menedżer kontekstu mierzący jeden etap."""
+
+    __slots__ = ("_timer", "_stage", "_start")
+
+    def __init__(self, timer, stage):
+        self._timer = timer
+        self._stage = stage
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._timer.record(self._stage, time.perf_counter() - self._start)
+        return False
+
+
+class StageTimer:
+    """
+    Zbiera czasy etapów analizy klatek.
+
+    Parametry:
+    ----------
+    keep_raw : bool
+        Czy zapisywać surowe pomiary (do eksportu dump_raw()/raw_csv())
+
+    Przykład użycia:
+    ----------------
+    timer = StageTimer()
+    with timer.measure("emotion"):
+        scores = analyze_emotion(frame)
+    timer.mark_frame()
+    timer.summary()["emotion"]["p95_ms"]
+
+    Uwaga:
+    ------
+    Każdy etap powinien być mierzony tylko w jednym wątku (tak jest w potoku
+    wielowątkowym: dekodowanie w wątku odczytu, wyświetlanie w wątku skryptu).
+    Pomiar tego samego etapu z wielu wątków naraz mógłby zgubić pojedyncze zapisy.
+    """
+
+    def __init__(self, keep_raw=False):
+        self.keep_raw = keep_raw
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.frames = 0
+        # Indeks klatki zapisywany przy surowych pomiarach (w potoku wielowątkowym
+        # wątek odczytu może być o kilka klatek przed wątkiem analizy)
+        self.frame_index = 0
+        self._first_frame_at = None   # Czas pierwszej i ostatniej klatki (do fps)
+        self._last_frame_at = None
+        self._measures = {stage: _StageMeasure(self, stage) for stage in STAGES}
+        # Surowe pomiary: {etap: (indeksy klatek, czasy w sekundach)}
+        self._raw = {stage: (array.array("q"), array.array("d")) for stage in STAGES}
+
+    def measure(self, stage):
+        """Zwraca menedżer kontekstu mierzący czas bloku "with" dla etapu."""
+        return self._measures[stage]
+
+    def record(self, stage, seconds):
+        """Zapisuje czas etapu (w sekundach)."""
+        self.histograms[stage].record(seconds)
+        if self.keep_raw:
+            indices, values = self._raw[stage]
+            indices.append(self.frame_index)
+            values.append(seconds)
+
+    def mark_frame(self, frame_index=None):
+        """Oznacza koniec analizy klatki (do obliczenia liczby klatek na sekundę)."""
+        now = time.perf_counter()
+        if self._first_frame_at is None:
+            self._first_frame_at = now
+        self._last_frame_at = now
+        self.frames += 1
+        self.frame_index = self.frame_index + 1 if frame_index is None else frame_index + 1
+
+    @property
+    def fps(self):
+        """Liczba analizowanych klatek na sekundę (między pierwszą a ostatnią klatką)."""
+        if self.frames < 2:
+            return 0.0
+        elapsed = self._last_frame_at - self._first_frame_at
+        return (self.frames - 1) / elapsed if elapsed > 0 else 0.0
+
+    def merge(self, other):
+        """Dodaje pomiary innego obiektu StageTimer (np. z innego procesu)."""
+        for stage in STAGES:
+            self.histograms[stage].merge(other.histograms[stage])
+            if self.keep_raw and other.keep_raw:
+                self._raw[stage][0].extend(other._raw[stage][0])
+                self._raw[stage][1].extend(other._raw[stage][1])
+        self.frames += other.frames
+
+    def summary(self):
+        """
+        Zwraca podsumowanie etapów, które mają pomiary.
+
+        Zwraca:
+        -------
+        dict
+            {etap: {"count", "mean_ms", "p50_ms", "p95_ms", "max_ms"}} oraz
+            "frames" i "fps" dla całej analizy
+        """
+        result = {}
+        for stage, histogram in self.histograms.items():
+            if not histogram.count:
+                continue
+            result[stage] = {
+                "count": histogram.count,
+                "mean_ms": histogram.mean * 1000,
+                "p50_ms": histogram.percentile(50) * 1000,
+                "p95_ms": histogram.percentile(95) * 1000,
+                "max_ms": histogram.max * 1000,
+            }
+        result["frames"] = self.frames
+        result["fps"] = self.fps
+        return result
+
+    def raw_csv(self):
+        """Zwraca surowe pomiary jako tekst CSV (stage, frame_index, seconds)."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(("stage", "frame_index", "seconds"))
+        for stage in STAGES:
+            indices, values = self._raw[stage]
+            writer.writerows((stage, index, f"{value:.9f}") for index, value in zip(indices, values))
+        return buffer.getvalue()
+
+    def dump_raw(self, path):
+        """Zapisuje surowe pomiary do pliku CSV (wymaga keep_raw=True)."""
+        if not self.keep_raw:
+            raise ValueError("Surowe pomiary nie były zapisywane (keep_raw=False)")
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(self.raw_csv())
+
+
+class _NullMeasure:
+    """Menedżer kontekstu, który niczego nie mierzy."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullStageTimer:
+    """Atrapa StageTimer - używana, gdy pomiar jest wyłączony (bez narzutu)."""
+
+    _measure = _NullMeasure()
+
+    def measure(self, stage):
+        return self._measure
+
+    def record(self, stage, seconds):
+        pass
+
+    def mark_frame(self, frame_index=None):
+        pass
+
+
+# Wspólna atrapa używana domyślnie przez funkcje analizy
+NULL_TIMER = NullStageTimer()
+
+
+def summary_lines(summary):
+    """
+    Zamienia wynik StageTimer.summary() na czytelne wiersze tekstu.
+
+    Przykład:
+    ---------
+    ["emotion: p50 41.2 ms, p95 58.0 ms", ..., "Klatki: 120 (9.8 fps)"]
+    """
+    lines = [f"{stage}: p50 {summary[stage]['p50_ms']:.1f} ms, p95 {summary[stage]['p95_ms']:.1f} ms"
+             for stage in STAGES if stage in summary]
+    lines.append(f"Klatki: {summary['frames']} ({summary['fps']:.1f} fps)")
+    return lines
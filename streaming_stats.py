@@ -0,0 +1,307 @@
+# ==================================================================================
+# STATYSTYKI STRUMIENIOWE - średnie, wariancje i trendy bez przechowywania historii
+# ==================================================================================
+# Stan analizy zbierał dotąd tylko sumy (emotion_totals, liczniki zachowań),
+# a średnie powstawały raz, na końcu sesji. Długa sesja nie pokazywała trendu,
+# a każdy wykres w czasie wymagałby przejrzenia wyników wszystkich klatek.
+#
+# StreamingStats aktualizuje po każdej klatce, dla każdej emocji i każdego
+# zachowania (gest, spojrzenie, głowa - jako odsetek klatek):
+# - średnią i wariancję całej sesji (algorytm Welforda, z wagami klatek)
+# - średnią wykładniczą (EMA) - bieżący trend
+# - średnią i odchylenie w oknie ostatnich "window" klatek (bufor cykliczny
+#   o stałym rozmiarze z sumami aktualizowanymi przyrostowo)
+#
+# Pamięć i koszt aktualizacji nie zależą od długości sesji, a wyniki można
+# odczytać w dowolnej chwili (snapshot()) - również z innego wątku niż ten,
+# który dopisuje klatki (np. wykres na żywo w aplikacji).
+# ==================================================================================
+
+import threading  # threading - odczyt z wątku aplikacji podczas analizy
+
+import numpy as np  # NumPy - jednoczesna aktualizacja wszystkich kanałów
+
+from frame_records import EMOTIONS  # Kolejność emocji w całej aplikacji
+
+# Zachowania jako kanały 0/1 (średnia = odsetek klatek z danym zachowaniem)
+BEHAVIOUR_LABELS = {
+    "gesture": ("tense", "relaxed"),
+    "gaze": ("left", "right", "center"),
+    "head": ("up", "down", "still"),
+}
+BEHAVIOUR_CHANNELS = tuple(f"{kind}_{label}" for kind, labels in BEHAVIOUR_LABELS.items()
+                           for label in labels)
+
+# Wszystkie kanały w kolejności kolumn
+CHANNELS = EMOTIONS + BEHAVIOUR_CHANNELS
+
+# Domyślne okno (przeanalizowane klatki - ok. 10 s przy 30 fps) i współczynnik EMA
+# (ok. 20 ostatnich klatek ma największy wpływ na średnią wykładniczą)
+DEFAULT_WINDOW = 300
+DEFAULT_EMA_ALPHA = 0.05
+
+# Statystyki zwracane przez snapshot() dla każdego kanału
+STATISTICS = ("count", "mean", "std", "ema", "window_mean", "window_std")
+
+# Tablice stanu zapisywane przez StreamingStats.to_dict()
+_STATE_ARRAYS = ("_weight", "_mean", "_m2", "_ema", "_window_values", "_window_weights",
+                 "_window_sum", "_window_squares", "_window_weight")
+
+
+class StreamingStats:
+    """
+    Strumieniowe statystyki emocji i zachowań o stałym zużyciu pamięci.
+
+    Parametry:
+    ----------
+    window : int
+        Liczba ostatnich przeanalizowanych klatek w oknie przesuwnym
+    ema_alpha : float
+        Współczynnik średniej wykładniczej (0-1) dla klatki o wadze 1;
+        klatka o wadze w działa jak w kolejnych klatek o tej samej wartości
+
+    Atrybuty:
+    ---------
+    samples : int
+        Liczba dopisanych klatek
+
+    Przykład użycia:
+    ----------------
+    stats = StreamingStats(window=300)
+    stats.observe(emotion_scores, {"gaze": "left"}, weight=1)
+    stats.value("happy", "window_mean")       # średnia z ostatnich 300 klatek
+    stats.snapshot()["gaze_left"]["ema"]      # bieżący trend patrzenia w lewo
+
+    Uwaga:
+    ------
+    Klatki bez pomiaru emocji (None) nie wpływają na kanały emocji, ale są
+    liczone w kanałach zachowań (brak etykiety = 0).
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, ema_alpha=DEFAULT_EMA_ALPHA):
+        if window < 1:
+            raise ValueError("Okno musi obejmować co najmniej jedną klatkę")
+        if not 0 < ema_alpha <= 1:
+            raise ValueError("Współczynnik EMA musi mieścić się w zakresie (0, 1]")
+        channels = len(CHANNELS)
+        self.window = window
+        self.ema_alpha = ema_alpha
+        self.samples = 0
+        # Cała sesja (Welford): suma wag, średnia, suma kwadratów odchyleń
+        self._weight = np.zeros(channels)
+        self._mean = np.zeros(channels)
+        self._m2 = np.zeros(channels)
+        self._ema = np.full(channels, np.nan)
+        # Okno przesuwne: wartości i wagi ostatnich klatek oraz ich sumy
+        self._window_values = np.zeros((window, channels))
+        self._window_weights = np.zeros((window, channels))
+        self._window_sum = np.zeros(channels)
+        self._window_squares = np.zeros(channels)
+        self._window_weight = np.zeros(channels)
+        self._window_position = 0  # Liczba klatek, które przeszły przez okno
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------------------
+    # Dopisywanie klatek
+    # ------------------------------------------------------------------------------
+
+    def observe(self, emotion_scores=None, labels=None, weight=1):
+        """
+        Dopisuje wynik jednej klatki.
+
+        Parametry:
+        ----------
+        emotion_scores : dict lub None
+            {emocja: procent}; None, gdy emocji nie mierzono
+        labels : dict lub None
+            Etykiety "gesture", "gaze" i "head" (jak w analysis_core.record_frame())
+        weight : int
+            Liczba klatek nagrania reprezentowanych przez tę klatkę
+        """
+        values = np.zeros(len(CHANNELS))
+        weights = np.full(len(CHANNELS), float(weight))
+        if emotion_scores is None:
+            weights[:len(EMOTIONS)] = 0.0
+        else:
+            values[:len(EMOTIONS)] = [emotion_scores.get(emotion, 0.0) for emotion in EMOTIONS]
+        for kind, label in (labels or {}).items():
+            channel = f"{kind}_{label}"
+            if channel in BEHAVIOUR_CHANNELS:
+                values[CHANNELS.index(channel)] = 1.0
+        with self._lock:
+            self._update(values, weights)
+
+    def _update(self, values, weights):
+        """Aktualizuje wszystkie statystyki (waga 0 = kanał bez pomiaru w tej klatce)."""
+        observed = weights > 0
+
+        # Średnia i wariancja ważona (Welford / West)
+        self._weight += weights
+        delta = values - self._mean
+        share = np.divide(weights, self._weight, out=np.zeros_like(weights), where=observed)
+        self._mean += share * delta
+        self._m2 += weights * delta * (values - self._mean)
+
+        # Średnia wykładnicza; pierwszy pomiar kanału ją rozpoczyna
+        alpha = 1.0 - (1.0 - self.ema_alpha) ** weights
+        first = observed & np.isnan(self._ema)
+        self._ema[first] = values[first]
+        later = observed & ~first
+        self._ema[later] += alpha[later] * (values[later] - self._ema[later])
+
+        self._push_window(values, weights)
+        self.samples += 1
+
+    def _push_window(self, values, weights):
+        """Wstawia klatkę do okna w miejsce najstarszej i poprawia sumy."""
+        slot = self._window_position % self.window
+        old_values, old_weights = self._window_values[slot], self._window_weights[slot]
+        self._window_sum += weights * values - old_weights * old_values
+        self._window_squares += weights * values ** 2 - old_weights * old_values ** 2
+        self._window_weight += weights - old_weights
+        self._window_values[slot] = values
+        self._window_weights[slot] = weights
+        self._window_position += 1
+        if self._window_position % self.window == 0:
+            # Raz na pełny obieg okna liczymy sumy od nowa - odejmowanie
+            # w kolejnych klatkach nie kumuluje błędów zaokrągleń
+            self._window_sum = (self._window_weights * self._window_values).sum(axis=0)
+            self._window_squares = (self._window_weights * self._window_values ** 2).sum(axis=0)
+            self._window_weight = self._window_weights.sum(axis=0)
+
+    def merge(self, other):
+        """
+        Dołącza statystyki "other" - klatki późniejsze niż dotychczasowe.
+
+        Średnia i wariancja sesji łączą się dokładnie (wzór Chana), okno
+        przesuwne dostaje ostatnie klatki "other" w ich kolejności, a średnia
+        wykładnicza przyjmuje wartość z "other" (bieżący trend).
+        """
+        with other._lock:
+            weight, mean, m2 = other._weight.copy(), other._mean.copy(), other._m2.copy()
+            ema = other._ema.copy()
+            count = min(other._window_position, other.window)
+            order = (other._window_position - count + np.arange(count)) % other.window
+            window_rows = list(zip(other._window_values[order], other._window_weights[order]))
+            samples = other.samples
+
+        with self._lock:
+            total = self._weight + weight
+            delta = mean - self._mean
+            share = np.divide(weight, total, out=np.zeros_like(weight), where=total > 0)
+            self._m2 += m2 + delta ** 2 * self._weight * share
+            self._mean += delta * share
+            self._weight = total
+            self._ema = np.where(np.isnan(ema), self._ema, ema)
+            for values, weights in window_rows:
+                self._push_window(values, weights)
+            self.samples += samples
+
+    # ------------------------------------------------------------------------------
+    # Odczyt
+    # ------------------------------------------------------------------------------
+
+    def snapshot(self):
+        """
+        Zwraca bieżące statystyki wszystkich kanałów (koszt zależy tylko od liczby kanałów).
+
+        Zwraca:
+        -------
+        dict
+            {kanał: {"count", "mean", "std", "ema", "window_mean", "window_std"}},
+            gdzie kanał to emocja z EMOTIONS lub zachowanie z BEHAVIOUR_CHANNELS.
+            Emocje są w procentach, zachowania jako odsetek klatek (0-1).
+            Statystyki kanału bez pomiarów mają wartość None.
+        """
+        with self._lock:
+            weight, window_weight = self._weight.copy(), self._window_weight.copy()
+            mean, m2, ema = self._mean.copy(), self._m2.copy(), self._ema.copy()
+            window_sum, window_squares = self._window_sum.copy(), self._window_squares.copy()
+
+        result = {}
+        for i, channel in enumerate(CHANNELS):
+            entry = {"count": float(weight[i]), "mean": None, "std": None, "ema": None,
+                     "window_mean": None, "window_std": None}
+            if weight[i] > 0:
+                entry["mean"] = float(mean[i])
+                entry["std"] = float(np.sqrt(max(m2[i] / weight[i], 0.0)))
+                entry["ema"] = float(ema[i])
+            if window_weight[i] > 1e-9:
+                window_mean = window_sum[i] / window_weight[i]
+                entry["window_mean"] = float(window_mean)
+                entry["window_std"] = float(np.sqrt(max(window_squares[i] / window_weight[i]
+                                                        - window_mean ** 2, 0.0)))
+            result[channel] = entry
+        return result
+
+    def value(self, channel, statistic="window_mean"):
+        """Jedna statystyka jednego kanału (np. value("happy", "ema")); None bez pomiarów."""
+        if channel not in CHANNELS:
+            raise KeyError(f"Nieznany kanał statystyk: {channel}")
+        if statistic not in STATISTICS:
+            raise KeyError(f"Nieznana statystyka: {statistic}")
+        return self.snapshot()[channel][statistic]
+
+    # ------------------------------------------------------------------------------
+    # Zapis jako JSON (punkty kontrolne i pamięć wyników - checkpoint.py)
+    # ------------------------------------------------------------------------------
+
+    def to_dict(self):
+        """Stan statystyk jako słownik liczb i list (do zapisu jako JSON)."""
+        with self._lock:
+            data = {"window": self.window, "ema_alpha": self.ema_alpha, "samples": self.samples,
+                    "window_position": self._window_position}
+            data.update({name.lstrip("_"): getattr(self, name).tolist() for name in _STATE_ARRAYS})
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Odtwarza statystyki zapisane przez to_dict().
+
+        Wyjątki:
+        --------
+        ValueError
+            Gdy zapisane tablice nie pasują do okna i liczby kanałów
+        """
+        stats = cls(data["window"], data["ema_alpha"])
+        stats.samples = int(data["samples"])
+        stats._window_position = int(data["window_position"])
+        for name in _STATE_ARRAYS:
+            value = np.array(data[name.lstrip("_")], dtype=float)
+            if value.shape != getattr(stats, name).shape:
+                raise ValueError(f"Niezgodny rozmiar zapisanych statystyk: {name.lstrip('_')}")
+            setattr(stats, name, value)
+        return stats
+
+    # ------------------------------------------------------------------------------
+    # Kopiowanie między procesami (blokady nie da się przesłać)
+    # ------------------------------------------------------------------------------
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def trend_lines(snapshot):
+    """
+    Zamienia wynik snapshot() na czytelne wiersze (panel "na żywo", logi).
+
+    Emocje: średnia w oknie, EMA i odchylenie w oknie (od najsilniejszej);
+    zachowania: odsetek klatek w oknie.
+    """
+    emotions = [(channel, snapshot[channel]) for channel in EMOTIONS
+                if snapshot[channel]["window_mean"] is not None]
+    emotions.sort(key=lambda item: item[1]["window_mean"], reverse=True)
+    lines = [f"{channel}: {entry['window_mean']:.1f}% (EMA {entry['ema']:.1f}%, "
+             f"±{entry['window_std']:.1f})" for channel, entry in emotions]
+    behaviours = [f"{channel}: {snapshot[channel]['window_mean']:.0%}" for channel in BEHAVIOUR_CHANNELS
+                  if snapshot[channel]["window_mean"]]
+    if behaviours:
+        lines.append(", ".join(behaviours))
+    return lines
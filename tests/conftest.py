@@ -0,0 +1,91 @@
+# ==================================================================================
+# WSPÓLNE NARZĘDZIA TESTOWE
+# ==================================================================================
+# Plik conftest.py jest automatycznie wczytywany przez pytest.
+# Zawiera atrapy (ang. fakes) obiektów MediaPipe, aby testy mogły działać bez
+# instalowania ciężkich bibliotek (MediaPipe, DeepFace, TensorFlow).
+# ==================================================================================
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Dodaj katalog główny projektu do ścieżki importu (moduły leżą obok emo.py)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def make_landmarks(points, count):
+    """
+    Tworzy listę "count" punktów (x=0.5, y=0.5) z nadpisanymi wybranymi punktami.
+
+    points : dict
+        {indeks: (x, y)} - punkty o niestandardowych współrzędnych
+    """
+    landmarks = [SimpleNamespace(x=0.5, y=0.5, z=0.0) for _ in range(count)]
+    for index, (x, y) in points.items():
+        landmarks[index] = SimpleNamespace(x=x, y=y, z=0.0)
+    return SimpleNamespace(landmark=landmarks)
+
+
+class FakeHands:
+    """Atrapa mediapipe Hands - zwraca z góry zadane dłonie dla każdej klatki."""
+
+    def __init__(self, hands=None):
+        self.hands = hands or []
+        self.calls = 0
+
+    def process(self, frame_rgb):
+        self.calls += 1
+        return SimpleNamespace(multi_hand_landmarks=self.hands or None)
+
+
+class FakeFaceMesh:
+    """Atrapa mediapipe FaceMesh - zwraca z góry zadane twarze dla każdej klatki."""
+
+    def __init__(self, faces=None):
+        self.faces = faces or []
+        self.calls = 0
+
+    def process(self, frame_rgb):
+        self.calls += 1
+        return SimpleNamespace(multi_face_landmarks=self.faces or None)
+
+
+@pytest.fixture
+def fake_hands():
+    """Jedna rozluźniona dłoń (kciuk daleko od palca wskazującego)."""
+    return FakeHands([make_landmarks({4: (0.2, 0.2), 8: (0.6, 0.6)}, 21)])
+
+
+@pytest.fixture
+def fake_face_mesh():
+    """Jedna twarz patrząca prosto z głową w pozycji neutralnej."""
+    return FakeFaceMesh([make_landmarks({33: (0.45, 0.5), 263: (0.55, 0.5), 4: (0.5, 0.5)}, 468)])
+
+
+@pytest.fixture
+def fixed_emotion(monkeypatch):
+    """Zastępuje DeepFace stałym wynikiem (dominująca emocja: happy)."""
+    import analysis_core
+
+    scores = {"happy": 70.0, "sad": 5.0, "angry": 5.0, "surprise": 5.0,
+              "fear": 5.0, "disgust": 5.0, "neutral": 5.0}
+    monkeypatch.setattr(analysis_core, "analyze_emotion", lambda frame, **kwargs: dict(scores))
+    return scores
+
+
+@pytest.fixture
+def synthetic_video(tmp_path):
+    """Tworzy krótki plik wideo (20 klatek 64x48, 10 fps) i zwraca jego ścieżkę."""
+    import cv2
+    import numpy as np
+
+    path = tmp_path / "synthetic.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+    for i in range(20):
+        frame = np.full((48, 64, 3), i * 10, dtype=np.uint8)
+        writer.write(frame)
+    writer.release()
+    return path
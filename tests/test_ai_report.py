@@ -0,0 +1,140 @@
+# ==================================================================================
+# TESTY RAPORTU AI (ai_report.py)
+# ==================================================================================
+# Zamiast Gemini używamy LocalReportClient - testy działają bez sieci i klucza API.
+# ==================================================================================
+
+import threading
+
+import pytest
+
+import ai_report
+from ai_report import AIReportError, LocalReportClient, ReportCache
+
+STATE = {
+    "hand_gesture_count": {"tense": 2, "relaxed": 3},
+    "eye_direction_count": {"left": 1, "right": 0, "center": 9},
+    "head_movement_count": {"up": 0, "down": 1, "still": 8},
+}
+ANALYSIS = ai_report.build_analysis_text({"happy": 70.0, "sad": 30.0}, STATE)
+
+
+def test_analysis_text_lists_emotions_and_counters():
+    lines = ANALYSIS.splitlines()
+    assert lines[:2] == ["Happy: 70.00%", "Sad: 30.00%"]
+    assert "Napięte Gesty Dłoni: 2" in lines
+    assert lines[-1] == "Ruchy Głowy (Nieruchomo): 8"
+
+
+def test_parse_strips_markdown_fences():
+    report = ai_report.parse_ai_response('```json\n{"behavior": "b", "action": "a"}\n```')
+    assert report == {"behavior": "b", "action": "a"}
+
+
+@pytest.mark.parametrize("text", ["to nie jest JSON", '{"behavior": "b"}', "[1, 2]"])
+def test_parse_rejects_invalid_answers(text):
+    with pytest.raises(ValueError):
+        ai_report.parse_ai_response(text)
+
+
+def test_local_client_answer_names_dominant_emotion():
+    report = ai_report.request_report(LocalReportClient(), "Interview", ANALYSIS)
+    assert "happy" in report["behavior"].lower()
+
+
+def test_request_retries_with_growing_backoff():
+    client = LocalReportClient(failures=2)
+    sleeps = []
+    report = ai_report.request_report(client, "Interview", ANALYSIS, retries=2,
+                                      backoff=0.5, sleep=sleeps.append)
+    assert client.calls == 3
+    assert sleeps == [0.5, 1.0]
+    assert report["action"]
+
+
+def test_request_gives_up_after_timeouts():
+    client = LocalReportClient(delay=0.2)
+    with pytest.raises(AIReportError) as info:
+        ai_report.request_report(client, "Interview", ANALYSIS, timeout=0.02,
+                                 retries=1, sleep=lambda seconds: None)
+    assert isinstance(info.value.__cause__, TimeoutError)
+    assert client.calls == 2
+
+
+def test_timeout_is_passed_to_client_call():
+    """Limit czasu przerywa samo zapytanie - próby nie biegną równolegle."""
+    configs, running = [], []
+
+    class RecordingClient(LocalReportClient):
+        def generate_content(self, model, contents, config=None):
+            running.append(threading.active_count())
+            configs.append(config)
+            return super().generate_content(model, contents, config)
+
+    client = RecordingClient(failures=1)
+    ai_report.request_report(client, "Interview", ANALYSIS, timeout=1.5, retries=1,
+                             sleep=lambda seconds: None)
+    assert configs == [{"http_options": {"timeout": 1500}}] * 2
+    assert running[0] == running[1]  # Nieudana próba nie zostawiła wątku w tle
+
+
+def test_submit_uses_cache_for_repeated_analysis():
+    cache = ReportCache()
+    client = LocalReportClient()
+
+    first = ai_report.submit_report(client, "Interview", ANALYSIS, cache=cache).result(timeout=5)
+    second = ai_report.submit_report(client, "Interview", ANALYSIS, cache=cache).result(timeout=5)
+
+    assert first["source"] == "api"
+    assert second["source"] == "cache"
+    assert second["behavior"] == first["behavior"]
+    assert client.calls == 1
+    # Inny tryb to inne zapytanie
+    ai_report.submit_report(client, "Detective", ANALYSIS, cache=cache).result(timeout=5)
+    assert client.calls == 2
+
+
+def test_submit_shares_request_in_flight():
+    cache = ReportCache()
+    release = threading.Event()
+
+    class SlowClient(LocalReportClient):
+        def generate_content(self, model, contents, config=None):
+            release.wait(5)
+            return super().generate_content(model, contents, config)
+
+    client = SlowClient()
+    first = ai_report.submit_report(client, "Interview", ANALYSIS, cache=cache)
+    second = ai_report.submit_report(client, "Interview", ANALYSIS, cache=cache)
+    release.set()
+
+    assert second is first
+    assert first.result(timeout=5)["source"] == "api"
+    assert client.calls == 1
+
+
+def test_submit_reports_errors_without_raising():
+    cache = ReportCache()
+    client = LocalReportClient(failures=10)
+    report = ai_report.submit_report(client, "Interview", ANALYSIS, cache=cache, retries=1,
+                                     sleep=lambda seconds: None).result(timeout=5)
+    assert report["source"] == "error"
+    assert report["error"]
+    assert len(cache) == 0  # Błędów nie zapamiętujemy
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ReportCache(max_entries=2)
+    cache.put("a", {"behavior": "1", "action": "1"})
+    cache.put("b", {"behavior": "2", "action": "2"})
+    cache.get("a")
+    cache.put("c", {"behavior": "3", "action": "3"})
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_local_client_is_selected_by_environment(monkeypatch):
+    monkeypatch.setenv(ai_report.CLIENT_ENV, "local")
+    assert ai_report.use_local_client()
+    monkeypatch.delenv(ai_report.CLIENT_ENV)
+    assert not ai_report.use_local_client()
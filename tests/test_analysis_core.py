@@ -0,0 +1,278 @@
+# ==================================================================================
+# TESTY RDZENIA ANALIZY (analysis_core.py)
+# ==================================================================================
+# Testy korzystają z atrap MediaPipe i stałego wyniku emocji (patrz conftest.py),
+# więc nie wymagają instalacji DeepFace ani MediaPipe.
+# ==================================================================================
+
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+import model_pool
+from conftest import FakeFaceMesh, FakeHands, make_landmarks
+
+
+def test_new_analysis_state_has_all_emotions():
+    """Nowy stan zawiera wszystkie 7 emocji i wyzerowane liczniki."""
+    state = analysis_core.new_analysis_state()
+    assert set(state["emotion_totals"]) == set(analysis_core.EMOTIONS)
+    assert state["frame_count"] == 0
+    assert analysis_core.report_lines(state) == []
+
+
+def test_init_analysis_state_keeps_existing_values():
+    """init_analysis_state() nie nadpisuje danych już zebranych."""
+    state = {"frame_count": 5}
+    analysis_core.init_analysis_state(state)
+    assert state["frame_count"] == 5
+    assert "emotion_totals" in state
+
+
+def test_analyze_emotion_falls_back_to_neutral(monkeypatch):
+    """Błąd backendu emocji nie przerywa analizy - zwracane są neutralne wartości."""
+    def broken():
+        raise ImportError("brak DeepFace")
+
+    monkeypatch.setattr(analysis_core, "_emotion_backend", broken)
+    scores = analysis_core.analyze_emotion(np.zeros((48, 64, 3), dtype=np.uint8))
+    assert scores == analysis_core.neutral_emotion_scores()
+
+
+def test_analyze_hands_classifies_gestures():
+    """Palce blisko siebie to gest napięty, daleko - rozluźniony."""
+    state = analysis_core.new_analysis_state()
+    hands = FakeHands([
+        make_landmarks({4: (0.50, 0.50), 8: (0.52, 0.51)}, 21),
+        make_landmarks({4: (0.20, 0.20), 8: (0.60, 0.60)}, 21),
+    ])
+    analysis_core.analyze_hands(np.zeros((48, 64, 3), dtype=np.uint8), hands, state, draw=False)
+    assert state["hand_gesture_count"] == {"tense": 1, "relaxed": 1}
+
+
+def test_analyze_face_counts_direction_and_head():
+    """Kierunek spojrzenia i pozycja głowy trafiają do odpowiednich liczników."""
+    state = analysis_core.new_analysis_state()
+    face_mesh = FakeFaceMesh([make_landmarks({33: (0.3, 0.5), 263: (0.5, 0.5), 4: (0.5, 0.7)}, 468)])
+    analysis_core.analyze_face(np.zeros((48, 64, 3), dtype=np.uint8), face_mesh, state, draw=False)
+    assert state["eye_direction_count"]["left"] == 1
+    assert state["head_movement_count"]["down"] == 1
+
+
+def test_process_frame_updates_state(fixed_emotion, fake_hands, fake_face_mesh):
+    """Jedna klatka zwiększa licznik klatek, sumy emocji i dodaje wpis do raportu."""
+    state = analysis_core.new_analysis_state()
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    analysis_core.process_frame(frame, "Interview", fake_hands, fake_face_mesh, state, draw=False)
+
+    assert state["frame_count"] == 1
+    assert state["emotion_totals"]["happy"] == 70.0
+    assert analysis_core.report_lines(state)[0].endswith("Interview: Analiza: happy (70.00%)")
+
+
+def test_run_analysis_loop_reads_whole_video(fixed_emotion, fake_hands, fake_face_mesh, synthetic_video):
+    """Pętla analizuje wszystkie klatki pliku i kończy się na końcu wideo."""
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    processed = analysis_core.run_analysis_loop(cap, "Detective", state, fake_hands,
+                                                fake_face_mesh, draw=False)
+    cap.release()
+
+    assert processed == 20
+    assert state["frame_count"] == 20
+    assert state["hand_gesture_count"]["relaxed"] == 20
+    assert analysis_core.average_emotion_scores(state)["happy"] == 70.0
+
+
+def test_run_analysis_loop_stops_on_callback(fixed_emotion, fake_hands, fake_face_mesh, synthetic_video):
+    """Gdy on_frame zwróci False, pętla kończy się natychmiast."""
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    processed = analysis_core.run_analysis_loop(cap, "Detective", state, fake_hands, fake_face_mesh,
+                                                on_frame=lambda frame, scores: False, draw=False)
+    cap.release()
+    assert processed == 1
+
+
+def test_facemesh_localization_skips_frames_without_face(fake_hands, monkeypatch):
+    """Bez twarzy w Face Mesh emocje są pomijane - średnie liczone tylko z klatek z twarzą."""
+    calls = []
+
+    def fake_emotion(frame, skip_detection=False):
+        calls.append((frame.shape, skip_detection))
+        return {"happy": 70.0, "sad": 5.0, "angry": 5.0, "surprise": 5.0,
+                "fear": 5.0, "disgust": 5.0, "neutral": 5.0}
+
+    monkeypatch.setattr(analysis_core, "analyze_emotion", fake_emotion)
+    settings = analysis_core.AnalysisSettings(face_localization="facemesh")
+    state = analysis_core.new_analysis_state()
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    scores = analysis_core.process_frame(frame, "Detective", fake_hands, FakeFaceMesh(), state,
+                                         draw=False, settings=settings)
+    assert scores is None
+    assert calls == []
+    assert state["frame_count"] == 1
+    assert state["emotion_frame_count"] == 0
+    assert analysis_core.report_lines(state) == []
+
+    face = make_landmarks({33: (0.4, 0.4), 263: (0.6, 0.4), 4: (0.5, 0.6)}, 468)
+    scores = analysis_core.process_frame(frame, "Detective", fake_hands, FakeFaceMesh([face]), state,
+                                         draw=False, settings=settings)
+    assert scores["happy"] == 70.0
+    # DeepFace dostaje sam wycinek twarzy i nie uruchamia własnego detektora
+    assert calls[0][1] is True
+    assert calls[0][0][0] < 48 and calls[0][0][1] < 64
+    assert state["frame_count"] == 2
+    assert state["emotion_frame_count"] == 1
+    assert analysis_core.average_emotion_scores(state)["happy"] == 70.0
+
+
+def test_analysis_settings_rejects_unknown_localization():
+    """Nieznany sposób lokalizacji twarzy zgłasza ValueError."""
+    with pytest.raises(ValueError):
+        analysis_core.AnalysisSettings(face_localization="haar")
+
+
+def test_inference_resolution_downscales_model_inputs(monkeypatch):
+    """Modele dostają zmniejszoną klatkę, a emocje z Face Mesh - wycinek z niej."""
+    seen = {}
+
+    class RecordingHands(FakeHands):
+        def process(self, frame_rgb):
+            seen["hands"] = frame_rgb.shape
+            return super().process(frame_rgb)
+
+    class RecordingFaceMesh(FakeFaceMesh):
+        def process(self, frame_rgb):
+            seen["face"] = frame_rgb.shape
+            return super().process(frame_rgb)
+
+    def fake_emotion(frame, skip_detection=False):
+        seen["emotion"] = frame.shape
+        return analysis_core.neutral_emotion_scores()
+
+    monkeypatch.setattr(analysis_core, "analyze_emotion", fake_emotion)
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    state = analysis_core.new_analysis_state()
+    face = make_landmarks({33: (0.4, 0.4), 263: (0.6, 0.4), 4: (0.5, 0.6), 0: (0.3, 0.2), 1: (0.7, 0.8)}, 468)
+
+    settings = analysis_core.AnalysisSettings(hands_resolution=320, face_resolution=640,
+                                              emotion_resolution=480)
+    analysis_core.process_frame(frame, "Detective", RecordingHands(), RecordingFaceMesh([face]),
+                                state, draw=False, settings=settings)
+    assert seen == {"hands": (180, 320, 3), "face": (360, 640, 3), "emotion": (270, 480, 3)}
+
+    settings = analysis_core.AnalysisSettings(face_localization="facemesh", emotion_resolution=480)
+    analysis_core.process_frame(frame, "Detective", RecordingHands(), RecordingFaceMesh([face]),
+                                state, draw=False, settings=settings)
+    # Wycinek twarzy (40% x 60% obrazu + margines) pochodzi z obrazu 480x270
+    assert seen["emotion"][0] < 270 and seen["emotion"][1] < 480
+
+
+def test_analysis_settings_rejects_tiny_resolution():
+    with pytest.raises(ValueError):
+        analysis_core.AnalysisSettings(face_resolution=16)
+
+
+def fake_mediapipe():
+    """Atrapa modułu mediapipe do rysowania: każdy punkt to kropka na klatce."""
+    def draw_landmarks(image, landmarks, connections=None):
+        height, width = image.shape[:2]
+        for point in landmarks.landmark:
+            cv2.circle(image, (int(point.x * width), int(point.y * height)), 2, (0, 255, 0), -1)
+
+    return SimpleNamespace(solutions=SimpleNamespace(
+        drawing_utils=SimpleNamespace(draw_landmarks=draw_landmarks),
+        hands=SimpleNamespace(HAND_CONNECTIONS=None),
+        face_mesh=SimpleNamespace(FACEMESH_CONTOURS=None)))
+
+
+def brightness_emotion(frame, skip_detection=False):
+    """Emocje zależne od jasności klatki - kolejne klatki dają różne wyniki."""
+    happy = float(frame.mean()) / 255 * 100
+    return {**analysis_core.neutral_emotion_scores(), "happy": happy, "neutral": 100 - happy}
+
+
+@pytest.mark.parametrize("options", [{}, {"detect_every": 3}, {"face_localization": "facemesh", "max_faces": 2}])
+def test_concurrent_stages_match_sequential_run(options, fake_hands, fake_face_mesh, synthetic_video,
+                                                 monkeypatch):
+    """Równoległe etapy dają ten sam stan i te same nakładki co analiza po kolei."""
+    from test_checkpoint import assert_same, comparable
+
+    monkeypatch.setattr(analysis_core, "analyze_emotion", brightness_emotion)
+    results = []
+    with model_pool.overridden({"mediapipe": fake_mediapipe}):
+        for concurrent in (False, True):
+            settings = analysis_core.AnalysisSettings(concurrent_stages=concurrent, **options)
+            state = analysis_core.new_analysis_state()
+            frames = []
+            cap = cv2.VideoCapture(str(synthetic_video))
+            analysis_core.run_analysis_loop(cap, "Detective", state, fake_hands, fake_face_mesh,
+                                            on_frame=lambda frame, scores: frames.append(frame.copy()),
+                                            settings=settings,
+                                            trackers=analysis_core.create_trackers(settings))
+            cap.release()
+            results.append((comparable(state), frames))
+
+    (sequential, sequential_frames), (concurrent, concurrent_frames) = results
+    assert_same(concurrent, sequential)
+    assert len(concurrent_frames) == 20
+    assert all(np.array_equal(a, b) for a, b in zip(concurrent_frames, sequential_frames))
+
+
+def test_concurrent_stages_overlap_slow_analyzers(fake_hands, fake_face_mesh, monkeypatch):
+    """Czas klatki zbliża się do najwolniejszego etapu, a nie do sumy etapów."""
+    delay = 0.05
+
+    class SlowHands(FakeHands):
+        def process(self, frame_rgb):
+            time.sleep(delay)
+            return super().process(frame_rgb)
+
+    class SlowFaceMesh(FakeFaceMesh):
+        def process(self, frame_rgb):
+            time.sleep(delay)
+            return super().process(frame_rgb)
+
+    def slow_emotion(frame, skip_detection=False):
+        time.sleep(delay)
+        return analysis_core.neutral_emotion_scores()
+
+    monkeypatch.setattr(analysis_core, "analyze_emotion", slow_emotion)
+    settings = analysis_core.AnalysisSettings(concurrent_stages=True)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    state = analysis_core.new_analysis_state()
+    hands, face_mesh = SlowHands(fake_hands.hands), SlowFaceMesh(fake_face_mesh.faces)
+    analysis_core.process_frame(frame, "Detective", hands, face_mesh, state, draw=False,
+                                settings=settings)  # Rozgrzanie puli
+
+    start = time.perf_counter()
+    for _ in range(3):
+        analysis_core.process_frame(frame, "Detective", hands, face_mesh, state, draw=False,
+                                    settings=settings)
+    per_frame = (time.perf_counter() - start) / 3
+    assert per_frame < 2 * delay
+    assert state["hand_gesture_count"]["relaxed"] == 4 and state["frame_count"] == 4
+
+
+def test_detect_stages_leave_frame_untouched(fake_hands, fake_face_mesh):
+    """Detekcja tylko czyta klatkę - rysowanie i liczniki należą do etapu scalania."""
+    frame = np.full((48, 64, 3), 40, dtype=np.uint8)
+    ctx = analysis_core.as_frame_context(frame)
+    detected = analysis_core.detect_hands(ctx, fake_hands)
+    faces, person_ids = analysis_core.detect_faces(ctx, fake_face_mesh)
+    assert len(detected) == 1 and len(faces) == 1 and person_ids is None
+    assert (ctx.bgr == 40).all()
+
+    state = analysis_core.new_analysis_state()
+    labels = {}
+    with model_pool.overridden({"mediapipe": fake_mediapipe}):
+        analysis_core.apply_hands(ctx, detected, state, labels=labels)
+        analysis_core.apply_faces(ctx, faces, state, labels=labels)
+    assert state["hand_gesture_count"]["relaxed"] == 1
+    assert not (ctx.bgr == 40).all()
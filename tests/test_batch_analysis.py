@@ -0,0 +1,83 @@
+# ==================================================================================
+# TESTY ANALIZY WSADOWEJ (batch_analysis.py)
+# ==================================================================================
+
+import json
+
+import pytest
+
+import analysis_core
+import batch_analysis
+
+
+def test_collect_video_files_filters_extensions(tmp_path):
+    """Z katalogu wybierane są tylko pliki wideo."""
+    (tmp_path / "a.mp4").write_bytes(b"")
+    (tmp_path / "b.MOV").write_bytes(b"")
+    (tmp_path / "notes.txt").write_text("x")
+    found = batch_analysis.collect_video_files([tmp_path])
+    assert [p.name for p in found] == ["a.mp4", "b.MOV"]
+
+
+def test_collect_video_files_missing_path(tmp_path):
+    """Nieistniejąca ścieżka zgłasza FileNotFoundError."""
+    with pytest.raises(FileNotFoundError):
+        batch_analysis.collect_video_files([tmp_path / "brak"])
+
+
+def test_plan_output_paths_avoids_collisions(tmp_path):
+    """Nagrania o tej samej nazwie nie nadpisują swoich wyników."""
+    videos = [tmp_path / "x" / "clip.mp4", tmp_path / "y" / "clip.mp4"]
+    plan = batch_analysis.plan_output_paths(videos, tmp_path / "out")
+    assert [out.name for _, out in plan] == ["clip.json", "clip_2.json"]
+
+
+def test_analyze_files_writes_one_result_per_video(tmp_path, monkeypatch):
+    """Każde nagranie ma swój plik JSON; błędy nie przerywają całej partii."""
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    (videos / "ok.mp4").write_bytes(b"")
+    (videos / "broken.mp4").write_bytes(b"")
+
+    def fake_analyze(path, mode="Detective", **kwargs):
+        if "broken" in str(path):
+            raise IOError("uszkodzony plik")
+        summary = analysis_core.summarize_state(analysis_core.new_analysis_state())
+        summary.update(video=str(path), mode=mode)
+        return summary
+
+    monkeypatch.setattr(analysis_core, "analyze_video_file", fake_analyze)
+    results = batch_analysis.analyze_files([videos], tmp_path / "out", mode="Interview", workers=1)
+
+    statuses = {r["video"].rsplit("/", 1)[-1]: r["status"] for r in results}
+    assert statuses == {"broken.mp4": "error", "ok.mp4": "ok"}
+    written = json.loads((tmp_path / "out" / "ok.json").read_text(encoding="utf-8"))
+    assert written["mode"] == "Interview"
+
+
+def test_analyze_files_rejects_unknown_mode(tmp_path):
+    """Nieznany tryb analizy jest odrzucany przed rozpoczęciem pracy."""
+    with pytest.raises(ValueError):
+        batch_analysis.analyze_files([tmp_path], tmp_path / "out", mode="Nieznany")
+
+
+def test_segments_option_uses_segment_analysis(tmp_path, monkeypatch):
+    """Przy --segments nagranie trafia do analizy segmentami, pliki po kolei."""
+    import segment_analysis
+
+    (tmp_path / "long.mp4").write_bytes(b"")
+    calls = []
+
+    def fake_segments(path, mode="Detective", **kwargs):
+        calls.append(kwargs)
+        summary = analysis_core.summarize_state(analysis_core.new_analysis_state())
+        summary.update(video=str(path), mode=mode)
+        return summary
+
+    monkeypatch.setattr(segment_analysis, "analyze_video_segments", fake_segments)
+    results = batch_analysis.analyze_files([tmp_path], tmp_path / "out", workers=4, segments=3,
+                                           profile=True)
+
+    assert [r["status"] for r in results] == ["ok"]
+    assert calls[0]["segments"] == calls[0]["workers"] == 3
+    assert "profile" not in calls[0]
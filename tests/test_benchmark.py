@@ -0,0 +1,78 @@
+# ==================================================================================
+# TESTY POMIARU WYDAJNOŚCI (benchmark.py)
+# ==================================================================================
+# Przebiegi używają atrap modeli i małych nagrań - sprawdzamy poprawność
+# wyników i porównania, a nie samą szybkość.
+# ==================================================================================
+
+import json
+
+import cv2
+import pytest
+
+import benchmark
+import model_pool
+
+TINY_CASE = benchmark.BenchmarkCase("tiny", 96, 64, 12)
+
+
+def test_synthetic_video_has_requested_shape(tmp_path):
+    path = benchmark.ensure_video(tmp_path, TINY_CASE)
+    cap = cv2.VideoCapture(str(path))
+    frames = 0
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        assert frame.shape == (64, 96, 3)
+        frames += 1
+    cap.release()
+    assert frames == 12
+
+
+def test_run_benchmark_with_stub_models(tmp_path):
+    results = benchmark.run_benchmark([TINY_CASE], video_dir=tmp_path, use_stubs=True)
+
+    assert results["stub_models"] is True
+    (case,) = results["cases"]
+    assert case["case"] == "tiny"
+    assert case["analyzed"] == 12
+    assert case["fps"] > 0
+    assert case["peak_memory_mb"] > 0
+    for stage in ("decode", "color", "emotion", "hands", "face"):
+        assert case["stage_timings"][stage]["count"] >= 12, stage
+    assert case["stage_timings"]["display"]["count"] >= 1  # Podgląd jest ograniczony
+    # Nakładki tylko na klatkach wybranych do podglądu
+    assert 1 <= case["stage_timings"]["overlay"]["count"] <= 12
+    json.dumps(results)  # Wyniki muszą dać się zapisać jako JSON
+    # Atrapy nie zostają w puli modeli po pomiarze
+    assert not model_pool.is_loaded("deepface")
+
+
+def _results(fps, stub_models=True):
+    return {"stub_models": stub_models, "cases": [{"case": "a", "fps": fps}]}
+
+
+def test_find_regressions_respects_tolerance():
+    assert benchmark.find_regressions(_results(90.0), _results(100.0), tolerance=0.15) == []
+    (regression,) = benchmark.find_regressions(_results(80.0), _results(100.0), tolerance=0.15)
+    assert regression["case"] == "a"
+    assert regression["change"] == pytest.approx(-0.2)
+
+
+def test_find_regressions_rejects_mixed_models():
+    with pytest.raises(ValueError):
+        benchmark.find_regressions(_results(100.0), _results(100.0, stub_models=False))
+
+
+def test_main_fails_on_regression(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark, "DEFAULT_CASES", (TINY_CASE,))
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"stub_models": True,
+                                    "cases": [{"case": "tiny", "fps": 1e9}]}), encoding="utf-8")
+    output = tmp_path / "results.json"
+
+    code = benchmark.main(["--output", str(output), "--video-dir", str(tmp_path),
+                           "--stub-models", "--no-memory", "--baseline", str(baseline)])
+    assert code == 1
+    assert json.loads(output.read_text(encoding="utf-8"))["cases"][0]["case"] == "tiny"
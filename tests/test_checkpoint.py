@@ -0,0 +1,303 @@
+# ==================================================================================
+# TESTY PUNKTÓW KONTROLNYCH (checkpoint.py)
+# ==================================================================================
+# Analiza przerwana w połowie i wznowiona z punktu kontrolnego musi dać ten sam
+# wynik co analiza bez przerwy. Modele zastępują atrapy z conftest.py.
+# ==================================================================================
+
+import contextlib
+import json
+import os
+import shutil
+import sqlite3
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+from checkpoint import (CHECKPOINT_MB_ENV, AnalysisCheckpoint, checkpoint_key, default_checkpoint_dir,
+                        private_directory, video_fingerprint)
+from emotion_engine import BatchEmotionEngine
+from frame_sampling import FrameSampler
+from test_emotion_engine import BrightnessModel
+from threaded_pipeline import ThreadedAnalysisPipeline
+
+
+def stop_after(count):
+    """should_continue, które przerywa pętlę po "count" sprawdzeniach."""
+    calls = [0]
+
+    def should_continue():
+        calls[0] += 1
+        return calls[0] <= count
+    return should_continue
+
+
+def run_loop(video, state, checkpoint=None, should_continue=None, sampler=None, fake_hands=None,
+             fake_face_mesh=None):
+    cap = cv2.VideoCapture(str(video))
+    start = checkpoint.load(state) if checkpoint is not None else 0
+    analysis_core.run_analysis_loop(cap, "Interview", state, fake_hands, fake_face_mesh, draw=False,
+                                    sampler=sampler, should_continue=should_continue,
+                                    start_index=start, checkpoint=checkpoint)
+    cap.release()
+    return start
+
+
+def assert_same(actual, expected):
+    """Porównanie zagnieżdżonych słowników (liczby z tolerancją zaokrągleń)."""
+    if isinstance(expected, dict):
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_same(actual[key], expected[key])
+    elif isinstance(expected, float):
+        assert actual == pytest.approx(expected)
+    else:
+        assert actual == expected
+
+
+def comparable(state):
+    """Podsumowanie bez znaczników czasu (wpisy raportu zawierają godzinę)."""
+    summary = analysis_core.summarize_state(state)
+    summary.pop("behavior_report")
+    summary["frames"] = state["frame_records"].records()["frame_index"].tolist()
+    summary["weights"] = state["frame_records"].records()["weight"].tolist()
+    return summary
+
+
+@pytest.mark.parametrize("policy, value", [("all", None), ("stride", 3), ("fps", 4)])
+def test_resumed_analysis_matches_uninterrupted_run(policy, value, tmp_path, synthetic_video,
+                                                    fake_hands, fake_face_mesh, fixed_emotion):
+    full = analysis_core.new_analysis_state()
+    run_loop(synthetic_video, full, sampler=FrameSampler(policy, value, source_fps=10),
+             fake_hands=fake_hands, fake_face_mesh=fake_face_mesh)
+
+    path = tmp_path / "run.sqlite"
+    with AnalysisCheckpoint(path, batch_size=2) as checkpoint:
+        first = analysis_core.new_analysis_state()
+        run_loop(synthetic_video, first, checkpoint, should_continue=stop_after(9),
+                 sampler=FrameSampler(policy, value, source_fps=10),
+                 fake_hands=fake_hands, fake_face_mesh=fake_face_mesh)
+        assert 0 < checkpoint.next_frame < 20 and not checkpoint.complete
+
+    with AnalysisCheckpoint(path, batch_size=2) as checkpoint:
+        resumed = analysis_core.new_analysis_state()
+        start = run_loop(synthetic_video, resumed, checkpoint,
+                         sampler=FrameSampler(policy, value, source_fps=10),
+                         fake_hands=fake_hands, fake_face_mesh=fake_face_mesh)
+        assert start > 0
+        assert checkpoint.complete and checkpoint.next_frame == 20
+
+    assert_same(comparable(resumed), comparable(full))
+
+
+def test_batched_loop_resumes_after_flushed_batch(tmp_path, synthetic_video, fake_hands, fake_face_mesh):
+    """Pętla wsadowa zapisuje postęp tylko wtedy, gdy żadna klatka nie czeka na model."""
+    def run(state, checkpoint=None, should_continue=None):
+        engine = BatchEmotionEngine(model=BrightnessModel(), batch_size=4, detector=lambda frame: [frame])
+        cap = cv2.VideoCapture(str(synthetic_video))
+        start = checkpoint.load(state) if checkpoint is not None else 0
+        analysis_core.run_batched_analysis_loop(cap, "Detective", state, fake_hands, fake_face_mesh,
+                                                engine, should_continue=should_continue,
+                                                start_index=start, checkpoint=checkpoint)
+        cap.release()
+
+    full = analysis_core.new_analysis_state()
+    run(full)
+
+    path = tmp_path / "batched.sqlite"
+    with AnalysisCheckpoint(path, batch_size=1) as checkpoint:
+        run(analysis_core.new_analysis_state(), checkpoint, should_continue=stop_after(10))
+        # Zapisy po partiach 4 klatek i na końcu (po dokończeniu niepełnej partii)
+        assert checkpoint.saves == 3
+        assert checkpoint.next_frame == 10
+    with AnalysisCheckpoint(path) as checkpoint:
+        resumed = analysis_core.new_analysis_state()
+        run(resumed, checkpoint)
+        assert checkpoint.frame_count() == 20
+
+    assert_same(comparable(resumed), comparable(full))
+
+
+def test_load_respects_record_capacity(tmp_path, synthetic_video, fake_hands, fake_face_mesh, fixed_emotion):
+    path = tmp_path / "capacity.sqlite"
+    with AnalysisCheckpoint(path) as checkpoint:
+        run_loop(synthetic_video, analysis_core.new_analysis_state(), checkpoint,
+                 fake_hands=fake_hands, fake_face_mesh=fake_face_mesh)
+
+    state = analysis_core.new_analysis_state(record_capacity=5)
+    with AnalysisCheckpoint(path) as checkpoint:
+        assert checkpoint.load(state) == 20
+        assert checkpoint.frame_count() == 20  # Na dysku zostaje cały przebieg
+    records = state["frame_records"]
+    assert records.total == 20
+    assert records.records()["frame_index"].tolist() == [15, 16, 17, 18, 19]
+    assert state["frame_count"] == 20
+    assert np.allclose(records.records()["emotions"][:, 0], fixed_emotion["happy"])
+
+
+def test_missing_emotions_survive_round_trip(tmp_path):
+    state = analysis_core.new_analysis_state()
+    analysis_core.record_frame(state, "Detective", 0, None, {"gaze": "left"})
+    analysis_core.record_frame(state, "Interview", 1, analysis_core.neutral_emotion_scores())
+    with AnalysisCheckpoint(tmp_path / "rows.sqlite") as checkpoint:
+        checkpoint.save(state, 2)
+        loaded = analysis_core.new_analysis_state()
+        checkpoint.load(loaded)
+    assert analysis_core.report_lines(loaded) == analysis_core.report_lines(state)
+    assert np.isnan(loaded["frame_records"].records()["emotions"][0]).all()
+
+
+def test_aggregates_are_stored_as_json(tmp_path):
+    """Stan zbiorczy to JSON (bez pickle) - osoby zachowują liczbowe identyfikatory."""
+    state = analysis_core.new_analysis_state()
+    analysis_core.accumulate_emotions(analysis_core.person_stats(state, 3),
+                                      analysis_core.neutral_emotion_scores())
+    state["live_stats"].observe(analysis_core.neutral_emotion_scores(), {"gaze": "left"})
+    path = tmp_path / "json.sqlite"
+    with AnalysisCheckpoint(path) as checkpoint:
+        checkpoint.save(state, 1)
+    with contextlib.closing(sqlite3.connect(str(path))) as connection:
+        (text,) = connection.execute("SELECT aggregates FROM progress").fetchone()
+    assert json.loads(text)["people"][0][0] == 3
+
+    loaded = analysis_core.new_analysis_state()
+    with AnalysisCheckpoint(path) as checkpoint:
+        checkpoint.load(loaded)
+    assert loaded["people"] == state["people"]
+    assert loaded["live_stats"].snapshot() == state["live_stats"].snapshot()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="uprawnienia katalogów POSIX")
+def test_default_directory_is_private(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("EMO_CHECKPOINT_DIR", raising=False)
+    directory = default_checkpoint_dir()
+    assert directory == tmp_path / "cache" / "emo" / "checkpoints"
+    assert directory.stat().st_mode & 0o777 == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir(mode=0o777)
+    shared.chmod(0o777)
+    assert private_directory(shared).stat().st_mode & 0o777 == 0o700  # Nasz katalog - zamykamy go
+
+    monkeypatch.setattr(os, "getuid", lambda: shared.stat().st_uid + 1)
+    with pytest.raises(PermissionError):
+        private_directory(shared)  # Katalog innego użytkownika
+
+
+def test_maybe_save_waits_for_batch_or_interval(tmp_path):
+    now = [0.0]
+    state = analysis_core.new_analysis_state()
+    with AnalysisCheckpoint(tmp_path / "batch.sqlite", batch_size=3, save_interval=10.0,
+                            clock=lambda: now[0]) as checkpoint:
+        for index in range(2):
+            analysis_core.record_frame(state, "Detective", index)
+            assert not checkpoint.maybe_save(state, index + 1)
+        analysis_core.record_frame(state, "Detective", 2)
+        assert checkpoint.maybe_save(state, 3)
+
+        analysis_core.record_frame(state, "Detective", 3)
+        assert not checkpoint.maybe_save(state, 4)
+        now[0] = 11.0
+        assert checkpoint.maybe_save(state, 4)
+        assert checkpoint.frame_count() == 4
+
+
+def test_old_checkpoints_are_evicted(tmp_path, monkeypatch, synthetic_video):
+    """Katalog punktów kontrolnych nie rośnie bez końca - najdawniej używane znikają."""
+    for name, used in (("old", 1), ("recent", 2)):
+        path = tmp_path / f"{name}.sqlite"
+        path.write_bytes(bytes(1024 * 1024))
+        os.utime(path, (used, used))
+
+    monkeypatch.setenv(CHECKPOINT_MB_ENV, "1.5")
+    checkpoint = AnalysisCheckpoint.for_video(synthetic_video, "Detective", directory=tmp_path)
+    checkpoint.close()
+    assert checkpoint.path.exists()  # Otwarty punkt kontrolny zostaje
+    assert not (tmp_path / "old.sqlite").exists()
+    assert (tmp_path / "recent.sqlite").exists()
+
+    monkeypatch.setenv(CHECKPOINT_MB_ENV, "0")  # Bez limitu
+    (tmp_path / "old.sqlite").write_bytes(bytes(1024 * 1024))
+    AnalysisCheckpoint.for_video(synthetic_video, "Detective", directory=tmp_path).close()
+    assert (tmp_path / "old.sqlite").exists()
+
+
+def test_key_depends_on_content_and_settings(tmp_path, synthetic_video):
+    copy = tmp_path / "copy.avi"
+    shutil.copy(synthetic_video, copy)
+    assert video_fingerprint(copy) == video_fingerprint(synthetic_video)
+
+    key = checkpoint_key(synthetic_video, "Detective")
+    assert checkpoint_key(copy, "Detective") == key
+    assert checkpoint_key(synthetic_video, "Interview") != key
+    assert checkpoint_key(synthetic_video, "Detective",
+                          analysis_core.AnalysisSettings(emotion_resolution=320)) != key
+    assert checkpoint_key(synthetic_video, "Detective", sampler=FrameSampler("stride", 2)) != key
+    # Równoległe etapy dają te same wyniki - punkt kontrolny jest wspólny
+    assert checkpoint_key(synthetic_video, "Detective",
+                          analysis_core.AnalysisSettings(concurrent_stages=True)) == key
+
+
+def test_fingerprint_covers_middle_of_file(tmp_path):
+    """Nagrania o tym samym rozmiarze, początku i końcu różnią się skrótem."""
+    data = np.random.RandomState(0).bytes(4 * 1024 * 1024)
+    first, second = tmp_path / "a.mp4", tmp_path / "b.mp4"
+    first.write_bytes(data)
+    changed = bytearray(data)
+    changed[3 * 1024 * 1024 // 2:5 * 1024 * 1024 // 2] = bytes(1024 * 1024)
+    second.write_bytes(bytes(changed))
+    assert video_fingerprint(first) != video_fingerprint(second)
+
+
+def test_completed_video_is_not_analyzed_again(tmp_path, monkeypatch, synthetic_video, fake_hands,
+                                               fake_face_mesh, fixed_emotion):
+    opened = []
+
+    @contextlib.contextmanager
+    def fake_detectors(settings=None):
+        opened.append(settings)
+        yield fake_hands, fake_face_mesh
+
+    monkeypatch.setattr(analysis_core, "open_detectors", fake_detectors)
+    first = analysis_core.analyze_video_file(synthetic_video, checkpoint_dir=tmp_path)
+    second = analysis_core.analyze_video_file(synthetic_video, checkpoint_dir=tmp_path)
+
+    assert len(opened) == 1
+    assert second["checkpoint"]["complete"] and second["checkpoint"]["resumed_from"] == 20
+    assert second["average_emotions"] == first["average_emotions"]
+    assert second["frame_count"] == first["frame_count"] == 20
+
+
+def test_threaded_pipeline_resumes_from_checkpoint(tmp_path, synthetic_video, fake_hands, fake_face_mesh,
+                                                   fixed_emotion):
+    path = tmp_path / "pipeline.sqlite"
+    shown = [0]
+
+    def stop_early(frame, scores):
+        shown[0] += 1
+        return shown[0] < 5
+
+    with AnalysisCheckpoint(path, batch_size=2) as checkpoint:
+        cap = cv2.VideoCapture(str(synthetic_video))
+        pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh, draw=False,
+                                            checkpoint=checkpoint)
+        pipeline.run(analysis_core.new_analysis_state(), on_frame=stop_early)
+        cap.release()
+        assert not checkpoint.complete
+        assert checkpoint.next_frame == pipeline.stats["analyzed"]
+
+    state = analysis_core.new_analysis_state()
+    with AnalysisCheckpoint(path) as checkpoint:
+        cap = cv2.VideoCapture(str(synthetic_video))
+        pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh, draw=False,
+                                            checkpoint=checkpoint)
+        pipeline.run(state)
+        cap.release()
+        assert pipeline.resumed_from > 0
+        assert checkpoint.complete
+
+    assert state["frame_count"] == 20
+    assert state["frame_records"].records()["frame_index"].tolist() == list(range(20))
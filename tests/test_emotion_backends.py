@@ -0,0 +1,176 @@
+# ==================================================================================
+# TESTY BACKENDÓW MODELU EMOCJI (emotion_backends.py)
+# ==================================================================================
+# ONNX Runtime nie jest wymagany do testów - backend ONNX dostaje atrapę sesji
+# z tym samym interfejsem (get_inputs(), run()), a DeepFace zastępuje atrapa
+# zarejestrowana w puli modeli.
+# ==================================================================================
+
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import analysis_core
+import emotion_backends
+import model_pool
+from checkpoint import checkpoint_key
+from emotion_backends import DeepFaceBackend, OnnxEmotionBackend, compare_backends
+from emotion_engine import DEEPFACE_EMOTION_LABELS, BatchEmotionEngine, preprocess_face
+from test_emotion_engine import BrightnessModel
+
+
+class FakeSession:
+    """Atrapa onnxruntime.InferenceSession z modelem BrightnessModel w środku."""
+
+    def __init__(self, model=None):
+        self.model = model or BrightnessModel()
+        self.feeds = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="face")]
+
+    def run(self, output_names, feeds):
+        self.feeds.append(feeds["face"])
+        return [self.model.predict(feeds["face"])]
+
+
+class ShiftedModel(BrightnessModel):
+    """Model "po kwantyzacji": wyniki przesunięte o 0.02 z happy na neutral."""
+
+    def predict(self, batch, verbose=0):
+        out = super().predict(batch, verbose)
+        out[:, DEEPFACE_EMOTION_LABELS.index("happy")] -= 0.02
+        out[:, DEEPFACE_EMOTION_LABELS.index("neutral")] += 0.02
+        return out
+
+
+def faces(count):
+    return [preprocess_face(np.full((40, 40, 3), 255 if i % 2 else 0, dtype=np.uint8)) for i in range(count)]
+
+
+def test_onnx_backend_analyzes_first_detected_face():
+    session = FakeSession()
+    bright = np.full((30, 30, 3), 255, dtype=np.uint8)
+    backend = OnnxEmotionBackend(session=session, detector=lambda frame: [bright])
+
+    scores = backend.analyze(np.zeros((48, 64, 3), dtype=np.uint8))
+    assert list(scores) == list(DEEPFACE_EMOTION_LABELS)
+    assert max(scores, key=scores.get) == "happy"
+    assert sum(scores.values()) == pytest.approx(100.0)
+    assert session.feeds[0].shape == (1, 48, 48, 1) and session.feeds[0].dtype == np.float32
+
+
+def test_onnx_backend_skip_detection_uses_whole_frame():
+    backend = OnnxEmotionBackend(session=FakeSession(), detector=lambda frame: pytest.fail("detektor"))
+    scores = backend.analyze(np.zeros((40, 40, 3), dtype=np.uint8), skip_detection=True)
+    assert max(scores, key=scores.get) == "sad"
+
+
+def test_onnx_backend_drives_batch_engine_with_its_detector():
+    """Silnik wsadowy używa detektora backendu - bez importu DeepFace."""
+    backend = OnnxEmotionBackend(session=FakeSession(), detector=lambda frame: [frame, frame])
+    engine = BatchEmotionEngine(model=backend, batch_size=8)
+    per_frame = engine.analyze_frames([np.full((40, 40, 3), 255, dtype=np.uint8)])
+    assert len(per_frame[0]) == 2
+    assert engine.stats == {"batches": 1, "items": 2}
+
+
+def test_onnx_backend_requires_model_file():
+    with pytest.raises(ValueError):
+        OnnxEmotionBackend()
+
+
+def test_haar_detector_falls_back_to_whole_frame():
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    crops = emotion_backends.haar_face_crops(frame)
+    assert len(crops) == 1 and crops[0].shape == frame.shape
+
+
+def test_backend_config_from_environment(monkeypatch):
+    monkeypatch.delenv(emotion_backends.BACKEND_ENV, raising=False)
+    assert emotion_backends.backend_config() == {"backend": "deepface"}
+    assert isinstance(emotion_backends.create_backend(), DeepFaceBackend)
+
+    monkeypatch.setenv(emotion_backends.BACKEND_ENV, "onnx")
+    monkeypatch.setenv(emotion_backends.ONNX_MODEL_ENV, "emotion.int8.onnx")
+    monkeypatch.setenv(emotion_backends.ONNX_INTRA_THREADS_ENV, "2")
+    assert emotion_backends.backend_config() == {"backend": "onnx", "model": "emotion.int8.onnx",
+                                                 "model_sha256": None,  # Brak pliku
+                                                 "intra_op_threads": 2, "inter_op_threads": 0}
+
+    monkeypatch.setenv(emotion_backends.BACKEND_ENV, "tflite")
+    with pytest.raises(ValueError):
+        emotion_backends.backend_config()
+
+
+def test_checkpoint_key_depends_on_backend(monkeypatch, synthetic_video):
+    monkeypatch.delenv(emotion_backends.BACKEND_ENV, raising=False)
+    key = checkpoint_key(synthetic_video, "Detective")
+    monkeypatch.setenv(emotion_backends.BACKEND_ENV, "onnx")
+    monkeypatch.setenv(emotion_backends.ONNX_MODEL_ENV, "emotion.onnx")
+    assert checkpoint_key(synthetic_video, "Detective") != key
+
+
+def test_checkpoint_key_depends_on_model_content(tmp_path, monkeypatch, synthetic_video):
+    """Model nadpisany pod tą samą ścieżką (eksport, kwantyzacja) to inny klucz."""
+    model = tmp_path / "emotion.onnx"
+    model.write_bytes(b"model fp32")
+    monkeypatch.setenv(emotion_backends.BACKEND_ENV, "onnx")
+    monkeypatch.setenv(emotion_backends.ONNX_MODEL_ENV, str(model))
+    key = checkpoint_key(synthetic_video, "Detective")
+    assert checkpoint_key(synthetic_video, "Detective") == key
+
+    model.write_bytes(b"model int8")
+    os.utime(model, ns=(0, model.stat().st_mtime_ns + 1))
+    assert checkpoint_key(synthetic_video, "Detective") != key
+
+
+def test_analyze_emotion_uses_backend_from_pool():
+    class HappyBackend:
+        def analyze(self, frame, skip_detection=False):
+            return {"happy": 100.0}
+
+    with model_pool.overridden({"emotion_backend": HappyBackend}):
+        assert analysis_core.analyze_emotion(np.zeros((48, 64, 3), dtype=np.uint8)) == {"happy": 100.0}
+
+
+def test_deepface_backend_reads_first_result():
+    stub = SimpleNamespace(calls=[])
+
+    def analyze(frame, actions, enforce_detection, **options):
+        stub.calls.append(options)
+        return [{"emotion": {"happy": 90.0}}, {"emotion": {"sad": 90.0}}]
+
+    stub.analyze = analyze
+    with model_pool.overridden({"deepface": lambda: stub}):
+        backend = DeepFaceBackend()
+        assert backend.analyze(np.zeros((8, 8, 3), dtype=np.uint8)) == {"happy": 90.0}
+        backend.analyze(np.zeros((8, 8, 3), dtype=np.uint8), skip_detection=True)
+    assert stub.calls == [{}, {"detector_backend": "skip"}]
+
+
+def test_compare_backends_reports_drift_and_agreement():
+    reference = BrightnessModel()
+    candidate = OnnxEmotionBackend(session=FakeSession(ShiftedModel()))
+    report = compare_backends(reference, candidate, faces(10), batch_size=4)
+
+    assert report["samples"] == 10
+    assert reference.batch_sizes == [4, 4, 2]
+    assert report["top1_agreement"] == 1.0
+    assert report["per_emotion"]["happy"]["max_abs"] == pytest.approx(2.0, abs=0.01)
+    assert report["per_emotion"]["angry"]["max_abs"] == pytest.approx(0.0, abs=1e-6)
+    assert report["max_abs_drift"] == pytest.approx(2.0, abs=0.01)
+    assert set(report["ms_per_face"]) == {"reference", "candidate"}
+
+
+def test_compare_backends_requires_samples():
+    with pytest.raises(ValueError):
+        compare_backends(BrightnessModel(), BrightnessModel(), [])
+
+
+def test_collect_sample_faces_from_video(synthetic_video):
+    samples = emotion_backends.collect_sample_faces([synthetic_video], limit=3, frame_step=5)
+    assert len(samples) == 3
+    assert all(face.shape == (48, 48, 1) for face in samples)
@@ -0,0 +1,112 @@
+# ==================================================================================
+# TESTY PAMIĘCI PODRĘCZNEJ EMOCJI (emotion_cache.py)
+# ==================================================================================
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+from conftest import FakeFaceMesh, make_landmarks
+from emotion_cache import EmotionCache, hamming_distance, image_signature
+
+
+def gradient(width=64, height=48, reverse=False):
+    """Obraz z poziomym gradientem jasności (rosnącym lub malejącym)."""
+    row = np.linspace(0, 255, width, dtype=np.uint8)
+    if reverse:
+        row = row[::-1]
+    return np.repeat(np.tile(row, (height, 1))[..., np.newaxis], 3, axis=2)
+
+
+def test_signature_tolerates_small_changes():
+    """Lekki szum nie zmienia skrótu, odwrócony gradient zmienia wszystkie bity."""
+    image = gradient()
+    noisy = cv2.add(image, np.full_like(image, 3))
+    assert hamming_distance(image_signature(image), image_signature(noisy)) == 0
+    assert hamming_distance(image_signature(image), image_signature(gradient(reverse=True))) == 64
+
+
+def test_cache_hits_and_misses():
+    """Podobna twarz trafia w pamięć, inna wymaga ponownego wywołania modelu."""
+    cache = EmotionCache(max_entries=4, max_distance=4)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"happy": 100.0}
+
+    for image in (gradient(), gradient(), gradient(reverse=True)):
+        assert cache.get_or_compute(image, compute) == {"happy": 100.0}
+
+    assert len(calls) == 2
+    assert cache.stats == {"hits": 1, "misses": 2, "evictions": 0}
+    assert cache.hit_rate == pytest.approx(1 / 3)
+
+
+def test_cache_evicts_least_recently_used():
+    """Po przekroczeniu pojemności usuwany jest najdawniej użyty wpis."""
+    cache = EmotionCache(max_entries=2, max_distance=0)
+    cache.store(0b01, {"happy": 1.0})
+    cache.store(0b10, {"happy": 2.0})
+    assert cache.lookup(0b01) == {"happy": 1.0}   # 0b01 staje się najświeższy
+    cache.store(0b11, {"happy": 3.0})
+
+    assert len(cache) == 2
+    assert cache.stats["evictions"] == 1
+    assert cache.lookup(0b10) is None
+
+
+def test_cache_rejects_invalid_parameters():
+    """Pojemność musi być dodatnia, a próg mieścić się w 0-64 bitach."""
+    with pytest.raises(ValueError):
+        EmotionCache(max_entries=0)
+    with pytest.raises(ValueError):
+        EmotionCache(max_distance=65)
+
+
+def test_analysis_loop_reuses_scores_for_unchanged_face(fake_hands, synthetic_video, monkeypatch):
+    """Jednolite wycinki twarzy nagrania testowego mają ten sam skrót - model działa raz."""
+    calls = []
+
+    def fake_emotion(frame, **kwargs):
+        calls.append(1)
+        return analysis_core.neutral_emotion_scores()
+
+    monkeypatch.setattr(analysis_core, "analyze_emotion", fake_emotion)
+    settings = analysis_core.AnalysisSettings(face_localization="facemesh", emotion_cache_size=8)
+    cache = analysis_core.create_emotion_cache(settings)
+    face_mesh = FakeFaceMesh([make_landmarks({0: (0.3, 0.2), 1: (0.7, 0.8), 33: (0.45, 0.5),
+                                              263: (0.55, 0.5), 4: (0.5, 0.5)}, 468)])
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    analysis_core.run_analysis_loop(cap, "Detective", state, fake_hands, face_mesh,
+                                    draw=False, settings=settings, emotion_cache=cache)
+    cap.release()
+
+    assert len(calls) == 1
+    assert cache.stats["hits"] == 19
+    assert state["emotion_frame_count"] == 20
+    assert len(analysis_core.report_lines(state)) == 20
+
+
+def test_whole_frame_is_not_used_as_face_signature(fake_hands, fake_face_mesh, synthetic_video,
+                                                   monkeypatch):
+    """Przy lokalizacji "deepface" nie ma wycinka twarzy - model analizuje każdą klatkę."""
+    calls = []
+
+    def fake_emotion(frame, **kwargs):
+        calls.append(1)
+        return analysis_core.neutral_emotion_scores()
+
+    monkeypatch.setattr(analysis_core, "analyze_emotion", fake_emotion)
+    for concurrent in (False, True):
+        settings = analysis_core.AnalysisSettings(emotion_cache_size=8, concurrent_stages=concurrent)
+        cache = analysis_core.create_emotion_cache(settings)
+        cap = cv2.VideoCapture(str(synthetic_video))
+        analysis_core.run_analysis_loop(cap, "Detective", analysis_core.new_analysis_state(),
+                                        fake_hands, fake_face_mesh, draw=False, settings=settings,
+                                        emotion_cache=cache)
+        cap.release()
+        assert cache.stats["hits"] == cache.stats["misses"] == 0
+    assert len(calls) == 40
@@ -0,0 +1,168 @@
+# ==================================================================================
+# TESTY SILNIKA EMOCJI (emotion_engine.py)
+# ==================================================================================
+# Zamiast sieci DeepFace używamy prostego modelu testowego, który zapamiętuje
+# rozmiary otrzymanych partii i zwraca przewidywalne prawdopodobieństwa.
+# ==================================================================================
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+from conftest import FakeFaceMesh, make_landmarks
+from emotion_engine import (DEEPFACE_EMOTION_LABELS, BatchEmotionEngine, facemesh_face_crop,
+                            preprocess_face, probabilities_to_scores)
+
+
+class BrightnessModel:
+    """Model testowy: jasna twarz = happy, ciemna = sad."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, batch, verbose=0):
+        self.batch_sizes.append(len(batch))
+        out = np.full((len(batch), 7), 0.01, dtype=np.float32)
+        for i, face in enumerate(batch):
+            out[i, DEEPFACE_EMOTION_LABELS.index("happy" if face.mean() > 0.5 else "sad")] = 0.94
+        return out
+
+
+def test_preprocess_face_shape_and_range():
+    face = preprocess_face(np.full((90, 60, 3), 255, dtype=np.uint8))
+    assert face.shape == (48, 48, 1)
+    assert face.dtype == np.float32
+    assert face.max() <= 1.0
+
+
+def test_probabilities_to_scores_sum_to_100():
+    scores = probabilities_to_scores(np.array([1, 1, 1, 1, 1, 1, 2], dtype=np.float32))
+    assert list(scores) == list(DEEPFACE_EMOTION_LABELS)
+    assert sum(scores.values()) == pytest.approx(100.0)
+    assert scores["neutral"] == pytest.approx(25.0)
+
+
+def test_predict_uses_batches():
+    """10 twarzy przy batch_size=4 to 3 wywołania modelu: 4 + 4 + 2."""
+    model = BrightnessModel()
+    engine = BatchEmotionEngine(model=model, batch_size=4, detector=lambda frame: [frame])
+    crops = [np.full((40, 40, 3), 255 if i % 2 else 0, dtype=np.uint8) for i in range(10)]
+    scores = engine.predict(crops)
+
+    assert model.batch_sizes == [4, 4, 2]
+    assert max(scores[0], key=scores[0].get) == "sad"
+    assert max(scores[1], key=scores[1].get) == "happy"
+    assert engine.stats == {"batches": 3, "items": 10}
+
+
+def test_analyze_frames_groups_faces_per_frame():
+    """Kilka twarzy w jednej klatce i kilka klatek - jedno wywołanie modelu."""
+    model = BrightnessModel()
+    bright = np.full((40, 40, 3), 255, dtype=np.uint8)
+    dark = np.zeros((40, 40, 3), dtype=np.uint8)
+    engine = BatchEmotionEngine(model=model, batch_size=32,
+                                detector=lambda frame: [frame, dark] if frame.mean() > 100 else [frame])
+    grouped = engine.analyze_frames([bright, dark])
+
+    assert model.batch_sizes == [3]
+    assert [len(faces) for faces in grouped] == [2, 1]
+    assert max(grouped[0][0], key=grouped[0][0].get) == "happy"
+
+
+def test_batched_loop_matches_state_shape(fake_hands, fake_face_mesh, synthetic_video):
+    """Pętla wsadowa aktualizuje stan tak samo jak zwykła pętla (wszystkie klatki)."""
+    model = BrightnessModel()
+    engine = BatchEmotionEngine(model=model, batch_size=8, detector=lambda frame: [frame])
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    processed = analysis_core.run_batched_analysis_loop(cap, "Detective", state, fake_hands,
+                                                        fake_face_mesh, engine)
+    cap.release()
+
+    assert processed == 20
+    assert model.batch_sizes == [8, 8, 4]
+    assert state["frame_count"] == 20
+    assert len(analysis_core.report_lines(state)) == 20
+    assert state["hand_gesture_count"]["relaxed"] == 20
+    assert sum(analysis_core.average_emotion_scores(state).values()) == pytest.approx(100.0)
+
+
+def test_facemesh_face_crop_uses_landmark_box():
+    """Wycinek obejmuje prostokąt punktów twarzy z marginesem i mieści się w klatce."""
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    face = make_landmarks({0: (0.25, 0.2), 1: (0.75, 0.8), 33: (0.4, 0.4), 263: (0.6, 0.4)}, 468)
+    crop = facemesh_face_crop(frame, face, margin=0.0)
+    assert crop.shape == (60, 100, 3)
+
+    # Margines nie wychodzi poza klatkę
+    edge = make_landmarks({0: (0.0, 0.0), 1: (1.0, 1.0)}, 468)
+    assert facemesh_face_crop(frame, edge).shape == (100, 200, 3)
+
+
+def test_facemesh_face_crop_rejects_empty_box():
+    """Twarz zredukowana do punktu nie daje wycinka."""
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    assert facemesh_face_crop(frame, make_landmarks({}, 468)) is None
+
+
+def test_batched_loop_facemesh_skips_frames_without_face(fake_hands, synthetic_video):
+    """Przy lokalizacji "facemesh" klatki bez twarzy nie trafiają do modelu emocji."""
+    model = BrightnessModel()
+    engine = BatchEmotionEngine(model=model, batch_size=8,
+                                detector=lambda frame: pytest.fail("detektor DeepFace użyty"))
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    processed = analysis_core.run_batched_analysis_loop(
+        cap, "Detective", state, fake_hands, FakeFaceMesh(), engine,
+        settings=analysis_core.AnalysisSettings(face_localization="facemesh"))
+    cap.release()
+
+    assert processed == 20
+    assert model.batch_sizes == []
+    assert state["frame_count"] == 20
+    assert state["emotion_frame_count"] == 0
+    assert analysis_core.report_lines(state) == []
+    assert len(state["frame_records"]) == 20
+
+
+def test_batched_loop_skips_model_for_cached_faces(fake_hands, fake_face_mesh, synthetic_video):
+    """Twarze trafione w pamięci podręcznej nie trafiają do partii modelu."""
+    model = BrightnessModel()
+    engine = BatchEmotionEngine(model=model, batch_size=4, detector=lambda frame: [frame])
+    settings = analysis_core.AnalysisSettings(emotion_cache_size=8, emotion_cache_distance=0)
+    cache = analysis_core.create_emotion_cache(settings)
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    analysis_core.run_batched_analysis_loop(cap, "Detective", state, fake_hands, fake_face_mesh,
+                                            engine, settings=settings, emotion_cache=cache)
+    cap.release()
+
+    # Pierwsza partia (4 klatki) trafia do modelu, zanim wynik znajdzie się w pamięci
+    assert engine.stats["items"] == 4
+    assert cache.stats["hits"] == 16
+    assert state["emotion_frame_count"] == 20
+
+
+def test_batched_loop_keeps_emotions_of_each_person(fake_hands, synthetic_video):
+    """Przy śledzeniu osób każda twarz z partii trafia do liczników swojej osoby."""
+    def face(cx):
+        return make_landmarks({0: (cx - 0.1, 0.3), 1: (cx + 0.1, 0.7),
+                               33: (cx - 0.05, 0.5), 263: (cx + 0.05, 0.5), 4: (cx, 0.5)}, 468)
+
+    model = BrightnessModel()
+    engine = BatchEmotionEngine(model=model, batch_size=8, detector=lambda frame: [frame])
+    settings = analysis_core.AnalysisSettings(face_localization="facemesh", max_faces=2,
+                                              emotion_cache_size=8, emotion_cache_distance=64)
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    analysis_core.run_batched_analysis_loop(cap, "Detective", state, fake_hands,
+                                            FakeFaceMesh([face(0.3), face(0.7)]), engine,
+                                            settings=settings)
+    cap.release()
+
+    people = analysis_core.summarize_people(state)
+    assert [person["id"] for person in people] == [1, 2]
+    # Pierwsza twarz bierze wyniki z pamięci, druga zawsze trafia do modelu
+    assert all(person["emotion_frame_count"] == 20 for person in people)
+    assert state["emotion_frame_count"] == 20
@@ -0,0 +1,102 @@
+# ==================================================================================
+# TESTY KONTEKSTU KLATKI (frame_context.py)
+# ==================================================================================
+
+import cv2
+import numpy as np
+
+import analysis_core
+from frame_context import FrameContext, as_frame_context, fit_size
+
+
+def make_frame(value=0):
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    frame[..., 0] = value  # Kanał niebieski (B w BGR)
+    return frame
+
+
+def test_rgb_matches_cvtcolor():
+    ctx = FrameContext().reset(make_frame(200))
+    assert np.array_equal(ctx.rgb, cv2.cvtColor(ctx.bgr, cv2.COLOR_BGR2RGB))
+
+
+def test_rgb_is_converted_once_per_frame(monkeypatch):
+    """Wielokrotny dostęp do ctx.rgb nie powtarza konwersji kolorów."""
+    calls = []
+    real_cvt = cv2.cvtColor
+    monkeypatch.setattr(cv2, "cvtColor", lambda *a, **k: calls.append(1) or real_cvt(*a, **k))
+
+    ctx = FrameContext().reset(make_frame())
+    ctx.rgb
+    ctx.rgb
+    assert len(calls) == 1
+
+
+def test_buffers_are_reused_between_frames():
+    """Kolejne klatki tego samego rozmiaru nie przydzielają nowych buforów."""
+    ctx = FrameContext()
+    ctx.reset(make_frame(10))
+    first_rgb = ctx.rgb
+    first_small = ctx.resized((32, 24), "rgb")
+    allocations = ctx.allocations
+
+    ctx.reset(make_frame(20))
+    assert ctx.rgb is first_rgb
+    assert ctx.resized((32, 24), "rgb") is first_small
+    assert ctx.allocations == allocations
+    assert ctx.rgb[0, 0, 2] == 20  # Bufor zawiera już nową klatkę
+
+
+def test_read_reuses_decode_buffer(synthetic_video):
+    """cap.read() dekoduje kolejne klatki do tego samego bufora."""
+    cap = cv2.VideoCapture(str(synthetic_video))
+    ctx = FrameContext()
+    assert ctx.read(cap)
+    first = ctx.bgr
+    assert ctx.read(cap)
+    cap.release()
+    assert ctx.bgr is first
+    assert ctx.index == 1
+
+
+def test_as_frame_context_wraps_arrays():
+    frame = make_frame()
+    ctx = as_frame_context(frame)
+    assert ctx.bgr is frame
+    assert as_frame_context(ctx) is ctx
+
+
+def test_process_frame_converts_colors_once(fixed_emotion, fake_hands, fake_face_mesh, monkeypatch):
+    """Dłonie i twarz korzystają z jednej konwersji BGR -> RGB."""
+    calls = []
+    real_cvt = cv2.cvtColor
+    monkeypatch.setattr(cv2, "cvtColor", lambda *a, **k: calls.append(1) or real_cvt(*a, **k))
+
+    state = analysis_core.new_analysis_state()
+    analysis_core.process_frame(make_frame(), "Detective", fake_hands, fake_face_mesh, state, draw=False)
+    assert len(calls) == 1
+
+
+def test_fit_size_keeps_aspect_ratio():
+    assert fit_size(1920, 1080, 640) == (640, 360)
+    assert fit_size(1080, 1920, 640) == (360, 640)
+    assert fit_size(320, 240, 640) == (320, 240)  # Nie powiększamy
+    assert fit_size(1920, 1080, 0) == (1920, 1080)
+
+
+def test_scaled_shares_buffer_between_stages():
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    ctx = FrameContext().reset(frame)
+    small = ctx.scaled(640, "rgb")
+    assert small.shape == (360, 640, 3)
+    assert ctx.scaled(640, "rgb") is small  # Drugi etap o tym samym rozmiarze
+    assert ctx.scaled(0, "rgb") is ctx.rgb
+
+
+def test_gray_version_is_scaled_and_cached():
+    ctx = FrameContext().reset(make_frame(200))
+    gray = ctx.scaled(32, "gray")
+    assert gray.shape == (24, 32)
+    assert ctx.scaled(32, "gray") is gray
+    full = ctx.scaled(0, "gray")
+    assert np.array_equal(full, cv2.cvtColor(ctx.bgr, cv2.COLOR_BGR2GRAY))
@@ -0,0 +1,99 @@
+# ==================================================================================
+# TESTY REJESTRU WYNIKÓW KLATEK (frame_records.py)
+# ==================================================================================
+
+import numpy as np
+import pytest
+
+import analysis_core
+from frame_records import EMOTIONS, RECORD_DTYPE, FrameRecordStore
+
+SCORES = {"happy": 70.0, "sad": 5.0, "angry": 5.0, "surprise": 5.0,
+          "fear": 5.0, "disgust": 5.0, "neutral": 5.0}
+
+
+def test_unbounded_store_grows_and_keeps_order():
+    """Rejestr bez limitu powiększa tablicę i zachowuje wszystkie wiersze."""
+    records = FrameRecordStore()
+    for index in range(3000):
+        records.append(index, "Detective", SCORES)
+
+    table = records.records()
+    assert table.dtype == RECORD_DTYPE
+    assert len(records) == 3000
+    assert records.dropped == 0
+    assert list(table["frame_index"][:3]) == [0, 1, 2]
+    assert table["emotions"][:, EMOTIONS.index("happy")].mean() == pytest.approx(70.0)
+
+
+def test_ring_buffer_keeps_newest_rows():
+    """Po przekroczeniu pojemności najstarsze wiersze są nadpisywane."""
+    records = FrameRecordStore(capacity=4)
+    for index in range(10):
+        records.append(index, "Detective", SCORES)
+
+    assert len(records) == 4
+    assert records.total == 10
+    assert records.dropped == 6
+    assert list(records.records()["frame_index"]) == [6, 7, 8, 9]
+
+
+def test_rows_without_emotions_and_labels():
+    """Brak emocji zapisywany jest jako NaN, a etykiety jako numery ze słowników."""
+    records = FrameRecordStore()
+    records.append(5, "Interview", None, gesture="tense", gaze="left", head="still",
+                   weight=3, timestamp=100.0)
+    row = next(records.iter_rows())
+    assert np.isnan(records.records()["emotions"]).all()
+    assert row == {"frame_index": 5, "timestamp": 100.0, "weight": 3, "mode": "Interview",
+                   "emotions": None, "gesture": "tense", "gaze": "left", "head": "still"}
+
+
+def test_extend_remaps_modes_and_respects_capacity():
+    """Scalanie rejestrów tłumaczy numery trybów i zachowuje limit bufora."""
+    source = FrameRecordStore()
+    source.append(1, "Interview", SCORES)
+    source.append(2, "Detective", SCORES)
+    source.append(3, "Interview", SCORES)
+
+    target = FrameRecordStore(capacity=2)
+    target.append(0, "Detective", SCORES)
+    target.extend(source)
+
+    assert [row["mode"] for row in target.iter_rows()] == ["Detective", "Interview"]
+    assert [row["frame_index"] for row in target.iter_rows()] == [2, 3]
+    assert target.total == 4
+
+
+def test_process_frame_records_labels(fixed_emotion, fake_hands, fake_face_mesh):
+    """process_frame() zapisuje w rejestrze emocje oraz etykiety gestu, spojrzenia i głowy."""
+    state = analysis_core.new_analysis_state(record_capacity=10)
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    analysis_core.process_frame(frame, "Student Behavior", fake_hands, fake_face_mesh, state,
+                                draw=False, weight=2)
+
+    row = next(state["frame_records"].iter_rows())
+    assert (row["gesture"], row["gaze"], row["head"], row["weight"]) == ("relaxed", "center", "still", 2)
+    assert row["emotions"]["happy"] == pytest.approx(70.0)
+    assert analysis_core.report_lines(state)[0].endswith("Student Behavior: Śledzenie: happy (70.00%)")
+
+
+def test_tail_returns_last_rows_of_ring_buffer():
+    records = FrameRecordStore(capacity=3)
+    for index in range(5):
+        records.append(index, "Detective", SCORES)
+    assert records.tail(2)["frame_index"].tolist() == [3, 4]
+    assert records.tail(10)["frame_index"].tolist() == [2, 3, 4]
+    assert len(records.tail(0)) == 0
+
+
+def test_relabel_assigns_one_mode_to_all_rows():
+    records = FrameRecordStore(capacity=2)
+    records.relabel("Interview")
+    assert records.modes == []  # Pusty rejestr bez zmian
+    for index, mode in enumerate(("Detective", "Student Behavior", "Detective")):
+        records.append(index, mode, SCORES)
+    records.relabel("Interview")
+    assert [row["mode"] for row in records.iter_rows()] == ["Interview", "Interview"]
+    records.append(3, "Detective", SCORES)
+    assert [row["mode"] for row in records.iter_rows()] == ["Interview", "Detective"]
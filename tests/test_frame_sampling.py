@@ -0,0 +1,68 @@
+# ==================================================================================
+# TESTY PRÓBKOWANIA KLATEK (frame_sampling.py)
+# ==================================================================================
+
+import cv2
+import pytest
+
+import analysis_core
+from frame_sampling import FrameSampler
+
+
+def selected(sampler, count):
+    """Zwraca indeksy klatek wybranych do analizy spośród pierwszych "count"."""
+    return [i for i in range(count) if sampler.should_analyze(i)]
+
+
+def test_all_policy_selects_every_frame():
+    assert selected(FrameSampler(), 5) == [0, 1, 2, 3, 4]
+
+
+def test_stride_policy():
+    assert selected(FrameSampler("stride", 3), 10) == [0, 3, 6, 9]
+
+
+def test_fps_policy_uses_source_fps():
+    """30 fps źródła i 5 analiz na sekundę = co 6. klatka."""
+    assert selected(FrameSampler("fps", 5, source_fps=30), 30) == [0, 6, 12, 18, 24]
+
+
+def test_interval_policy_uses_frame_time():
+    """Odstęp 0.5 s przy 10 fps = co 5. klatka."""
+    assert selected(FrameSampler("interval", 0.5, source_fps=10), 12) == [0, 5, 10]
+
+
+@pytest.mark.parametrize("policy, value", [("stride", None), ("fps", 0), ("stride", 2.5), ("random", 1)])
+def test_invalid_settings_are_rejected(policy, value):
+    with pytest.raises(ValueError):
+        FrameSampler(policy, value)
+
+
+def test_sampled_loop_keeps_averages_and_counts(fixed_emotion, fake_hands, fake_face_mesh, synthetic_video):
+    """Przy co 4. klatce modele działają 5 razy, ale liczniki odpowiadają 20 klatkom."""
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    processed = analysis_core.run_analysis_loop(cap, "Detective", state, fake_hands, fake_face_mesh,
+                                                draw=False, sampler=FrameSampler("stride", 4))
+    cap.release()
+
+    assert processed == 5
+    assert fake_hands.calls == 5
+    assert state["analyzed_frame_count"] == 5
+    # Ostatnia analiza (klatka 16) obejmuje klatki 13-16; klatki 17-19 to "ogon"
+    assert state["frame_count"] == 17
+    assert state["hand_gesture_count"]["relaxed"] == 17
+    assert analysis_core.average_emotion_scores(state)["happy"] == pytest.approx(70.0)
+
+
+@pytest.mark.parametrize("policy, value", [("stride", 3), ("fps", 4), ("interval", 0.25)])
+def test_resume_after_continues_selection(policy, value):
+    """Po wznowieniu od klatki 8 wybierane są te same klatki co bez przerwy."""
+    full = FrameSampler(policy, value, source_fps=10)
+    expected = [index for index in range(30) if full.should_analyze(index)]
+
+    resumed = FrameSampler(policy, value, source_fps=10)
+    last = max(index for index in expected if index < 8)
+    resumed.resume_after(last)
+    assert [index for index in range(last + 1, 30) if resumed.should_analyze(index)] == \
+        [index for index in expected if index > last]
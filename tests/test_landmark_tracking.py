@@ -0,0 +1,180 @@
+# ==================================================================================
+# TESTY ŚLEDZENIA PUNKTÓW (landmark_tracking.py)
+# ==================================================================================
+# Klatki syntetyczne: teksturowany kwadrat przesuwający się po jednolitym tle.
+# Atrapa Face Mesh zwraca punkty leżące na kwadracie w jego pierwszym położeniu.
+# ==================================================================================
+
+import numpy as np
+import pytest
+
+import analysis_core
+from conftest import FakeFaceMesh, FakeHands, make_landmarks
+from frame_context import FrameContext
+from landmark_tracking import LandmarkTracker
+
+WIDTH, HEIGHT = 160, 120
+PATCH = 40  # Bok teksturowanego kwadratu w pikselach
+
+
+def face_at(cx, cy, size=0.2):
+    """Twarz o 468 punktach rozłożonych na siatce wokół środka (cx, cy)."""
+    grid = np.linspace(-size / 2, size / 2, 22)
+    points = {index: (cx + grid[index % 22], cy + grid[index // 22]) for index in range(468)}
+    points[33] = (cx - size / 4, cy)  # Lewe oko
+    points[263] = (cx + size / 4, cy)  # Prawe oko
+    points[4] = (cx, cy)  # Czubek nosa
+    return make_landmarks(points, 468)
+
+
+def moving_frames(count, step=3):
+    """Klatki BGR z kwadratem szumu przesuwanym o "step" pikseli w prawo."""
+    texture = np.random.default_rng(0).integers(0, 255, (PATCH, PATCH, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = np.full((HEIGHT, WIDTH, 3), 128, dtype=np.uint8)
+        x = 30 + i * step
+        frame[40:40 + PATCH, x:x + PATCH] = texture
+        frames.append(frame)
+    return frames
+
+
+def patch_face():
+    """Punkty twarzy leżące na kwadracie w pierwszej klatce (środek 50, 60 px)."""
+    return face_at(50 / WIDTH, 60 / HEIGHT, size=0.15)
+
+
+def test_detector_runs_every_k_frames_and_points_follow_motion():
+    face_mesh = FakeFaceMesh([patch_face()])
+    tracker = LandmarkTracker("multi_face_landmarks", detect_every=4)
+    ctx = FrameContext()
+    centers = []
+    for index, frame in enumerate(moving_frames(4)):
+        (track,) = tracker.update(ctx.reset(frame, index), face_mesh)
+        centers.append(track.center[0] * WIDTH)
+
+    assert face_mesh.calls == 1
+    assert tracker.stats == {"detections": 1, "tracked": 3, "recoveries": 0}
+    # Kwadrat przesuwa się o 3 px na klatkę - punkty razem z nim
+    assert np.diff(centers) == pytest.approx([3, 3, 3], abs=0.5)
+
+
+def test_tracks_keep_their_ids_between_detections():
+    left, right = face_at(0.25, 0.5), face_at(0.75, 0.5)
+    face_mesh = FakeFaceMesh([left, right])
+    tracker = LandmarkTracker("multi_face_landmarks", detect_every=1, max_objects=2)
+    ctx = FrameContext()
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+    first = {track.id: track.center[0] for track in tracker.update(ctx.reset(frame, 0), face_mesh)}
+    face_mesh.faces = [right, left]  # Detektor zwraca twarze w innej kolejności
+    second = {track.id: track.center[0] for track in tracker.update(ctx.reset(frame, 1), face_mesh)}
+
+    assert first.keys() == second.keys() == {1, 2}
+    for track_id in first:
+        assert second[track_id] == pytest.approx(first[track_id])
+
+
+def test_new_face_gets_new_id_and_limit_is_respected():
+    face_mesh = FakeFaceMesh([face_at(0.25, 0.5)])
+    tracker = LandmarkTracker("multi_face_landmarks", detect_every=1, max_objects=2)
+    ctx = FrameContext()
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    tracker.update(ctx.reset(frame, 0), face_mesh)
+
+    face_mesh.faces = [face_at(0.25, 0.5), face_at(0.75, 0.5), face_at(0.5, 0.2)]
+    tracks = tracker.update(ctx.reset(frame, 1), face_mesh)
+    assert [track.id for track in tracks] == [1, 2]
+
+
+def test_lost_tracking_triggers_detection_in_same_frame():
+    face_mesh = FakeFaceMesh([patch_face()])
+    tracker = LandmarkTracker("multi_face_landmarks", detect_every=10)
+    ctx = FrameContext()
+    frame = moving_frames(1)[0]
+    tracker.update(ctx.reset(frame, 0), face_mesh)
+
+    # Kwadrat znika - punkty nie mają czego śledzić (mniej niż 60% poprawnych)
+    blank = np.full_like(frame, 128)
+    tracker.update(ctx.reset(blank, 1), face_mesh)
+    assert tracker.stats["recoveries"] == 1
+    assert face_mesh.calls == 2
+
+
+def test_tracker_does_not_modify_detector_results():
+    face = patch_face()
+    before = [(p.x, p.y) for p in face.landmark]
+    tracker = LandmarkTracker("multi_face_landmarks", detect_every=3)
+    ctx = FrameContext()
+    for index, frame in enumerate(moving_frames(3)):
+        tracker.update(ctx.reset(frame, index), FakeFaceMesh([face]))
+    assert [(p.x, p.y) for p in face.landmark] == before
+
+
+def test_process_frame_keeps_per_person_statistics(fixed_emotion):
+    """Dwie osoby: jedna patrzy w lewo, druga w prawo - liczniki każdej osobno."""
+    looking_left = face_at(0.3, 0.5)
+    looking_left.landmark[33].x = 0.2
+    settings = analysis_core.AnalysisSettings(face_localization="facemesh", max_faces=2)
+    trackers = analysis_core.create_trackers(settings)
+    face_mesh = FakeFaceMesh([looking_left, face_at(0.7, 0.5)])
+    state = analysis_core.new_analysis_state()
+    ctx = FrameContext()
+    for index, frame in enumerate(moving_frames(3)):
+        analysis_core.process_frame(ctx.reset(frame, index), "Interview", FakeHands(), face_mesh,
+                                    state, draw=False, settings=settings, trackers=trackers)
+
+    people = analysis_core.summarize_people(state)
+    assert [person["id"] for person in people] == [1, 2]
+    assert people[0]["eye_direction_count"] == {"left": 3, "right": 0, "center": 0}
+    assert people[1]["eye_direction_count"] == {"left": 0, "right": 3, "center": 0}
+    # Emocje liczone dla każdej twarzy, do sum całej analizy trafia pierwsza
+    assert all(person["emotion_frame_count"] == 3 for person in people)
+    assert people[1]["average_emotions"]["happy"] == pytest.approx(70.0)
+    assert state["emotion_frame_count"] == 3
+    assert state["eye_direction_count"] == {"left": 3, "right": 3, "center": 0}
+
+
+def test_frame_emotions_come_from_first_scored_face(fixed_emotion, monkeypatch):
+    """Pierwsza twarz bez wycinka - emocje klatki pochodzą z kolejnej ocenionej twarzy."""
+    crop = analysis_core.facemesh_emotion_crop
+
+    def crop_right_face_only(ctx, face, resolution=0):
+        return crop(ctx, face, resolution) if face.landmark[4].x > 0.5 else None
+
+    monkeypatch.setattr(analysis_core, "facemesh_emotion_crop", crop_right_face_only)
+    settings = analysis_core.AnalysisSettings(face_localization="facemesh", max_faces=2)
+    trackers = analysis_core.create_trackers(settings)
+    face_mesh = FakeFaceMesh([face_at(0.3, 0.5), face_at(0.7, 0.5)])
+    state = analysis_core.new_analysis_state()
+    ctx = FrameContext()
+    for index, frame in enumerate(moving_frames(3)):
+        analysis_core.process_frame(ctx.reset(frame, index), "Interview", FakeHands(), face_mesh,
+                                    state, draw=False, settings=settings, trackers=trackers)
+
+    people = analysis_core.summarize_people(state)
+    assert [person["emotion_frame_count"] for person in people] == [0, 3]
+    assert state["emotion_frame_count"] == 3
+    assert state["emotion_totals"]["happy"] == pytest.approx(3 * 70.0)
+
+
+def test_trackers_are_disabled_by_default():
+    assert analysis_core.create_trackers() is None
+    assert analysis_core.create_trackers(analysis_core.AnalysisSettings(detect_every=5)) is not None
+
+
+@pytest.mark.parametrize("options", [{"max_faces": 0}, {"detect_every": 0}])
+def test_settings_reject_invalid_tracking(options):
+    with pytest.raises(ValueError):
+        analysis_core.AnalysisSettings(**options)
+
+
+def test_merge_adds_per_person_statistics():
+    target, source = analysis_core.new_analysis_state(), analysis_core.new_analysis_state()
+    analysis_core.person_stats(target, 1)["frame_count"] = 2
+    analysis_core.person_stats(source, 1)["frame_count"] = 3
+    analysis_core.person_stats(source, 2)["eye_direction_count"]["left"] = 1
+
+    analysis_core.merge_analysis_state(target, source)
+    assert target["people"][1]["frame_count"] == 5
+    assert target["people"][2]["eye_direction_count"]["left"] == 1
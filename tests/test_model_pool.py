@@ -0,0 +1,86 @@
+# ==================================================================================
+# TESTY PULI MODELI (model_pool.py)
+# ==================================================================================
+# Zamiast DeepFace i MediaPipe rejestrujemy proste funkcje wczytujące, które
+# liczą swoje wywołania.
+# ==================================================================================
+
+import threading
+import time
+
+import pytest
+
+import model_pool
+
+
+@pytest.fixture
+def fake_loaders(monkeypatch):
+    """Podmienia składniki puli na atrapy i czyści pulę przed i po teście."""
+    calls = {"slow": 0, "fast": 0}
+
+    def slow():
+        calls["slow"] += 1
+        time.sleep(0.05)
+        return "model-slow"
+
+    def fast():
+        calls["fast"] += 1
+        return "model-fast"
+
+    monkeypatch.setattr(model_pool, "_LOADERS", {"slow": slow, "fast": fast})
+    model_pool.clear()
+    yield calls
+    model_pool.clear()
+
+
+def test_get_loads_once_per_process(fake_loaders):
+    """Kolejne wywołania get() zwracają ten sam obiekt bez ponownego wczytania."""
+    assert model_pool.get("fast") == "model-fast"
+    assert model_pool.get("fast") == "model-fast"
+    assert fake_loaders["fast"] == 1
+    assert model_pool.is_loaded("fast")
+    assert not model_pool.is_loaded("slow")
+
+
+def test_concurrent_get_loads_once(fake_loaders):
+    """Wiele wątków (sesji) naraz wczytuje model tylko raz."""
+    threads = [threading.Thread(target=model_pool.get, args=("slow",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert fake_loaders["slow"] == 1
+
+
+def test_warm_up_reports_load_times(fake_loaders):
+    """warm_up() wczytuje składniki i zwraca czas wczytania każdego z nich."""
+    timings = model_pool.warm_up(("slow", "fast"))
+    assert set(timings) == {"slow", "fast"}
+    assert timings["slow"] >= 0.05
+    # Drugie wywołanie nie wczytuje ponownie - zwraca czasy pierwszego wczytania
+    assert model_pool.warm_up(("slow",)) == {"slow": timings["slow"]}
+    assert fake_loaders["slow"] == 1
+
+
+def test_unknown_component_raises(fake_loaders):
+    """Nieznany składnik zgłasza KeyError."""
+    with pytest.raises(KeyError):
+        model_pool.get("brak")
+
+
+def test_overridden_restores_loaded_component(fake_loaders):
+    """Po bloku overridden() wraca poprzednia funkcja i wczytany wcześniej obiekt."""
+    assert model_pool.get("fast") == "model-fast"
+    with model_pool.overridden({"fast": lambda: "stub", "extra": lambda: "tmp"}):
+        assert model_pool.get("fast") == "stub"
+        assert model_pool.get("extra") == "tmp"
+    assert model_pool.get("fast") == "model-fast"
+    assert fake_loaders["fast"] == 1
+    with pytest.raises(KeyError):
+        model_pool.get("extra")
+
+
+def test_loader_can_use_other_component(fake_loaders):
+    """Składnik wczytywany na bazie innego (np. backend emocji na DeepFace) nie blokuje puli."""
+    with model_pool.overridden({"wrapper": lambda: ("wrapped", model_pool.get("fast"))}):
+        assert model_pool.get("wrapper") == ("wrapped", "model-fast")
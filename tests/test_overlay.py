@@ -0,0 +1,124 @@
+# ==================================================================================
+# TESTY NAKŁADEK NA KLATKĘ (overlay.py)
+# ==================================================================================
+# Panel rysowany przyrostowo porównujemy z rysowaniem tekstu wprost na klatce.
+# Kontury twarzy i dłonie rysuje atrapa modułu mediapipe (kropki w punktach).
+# ==================================================================================
+
+import random
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+import model_pool
+from overlay import NO_OVERLAY, EmotionPanel, OverlayRenderer, as_overlay, draw_emotion_panel
+from preview import FramePreview
+from test_analysis_core import fake_mediapipe
+from threaded_pipeline import ThreadedAnalysisPipeline
+
+
+def random_scores(rng):
+    values = [rng.random() for _ in analysis_core.EMOTIONS]
+    return {emotion: value / sum(values) * 100 for emotion, value in zip(analysis_core.EMOTIONS, values)}
+
+
+def test_panel_matches_direct_drawing():
+    """Panel wygląda tak samo jak draw_emotion_panel() - także przy zmianie dominującej emocji."""
+    rng = random.Random(0)
+    panel = EmotionPanel()
+    scores = random_scores(rng)
+    for index in range(40):
+        if index % 3:
+            scores = random_scores(rng)
+        frame = np.random.RandomState(index).randint(0, 255, (240, 320, 3), dtype=np.uint8)
+        expected = frame.copy()
+        draw_emotion_panel(expected, scores)
+        panel.draw(frame, scores)
+        assert np.array_equal(frame, expected)
+
+    # Klatka mniejsza niż panel - tekst przycięty jak przy rysowaniu wprost
+    frame = np.zeros((120, 90, 3), dtype=np.uint8)
+    expected = frame.copy()
+    draw_emotion_panel(expected, scores)
+    panel.draw(frame, scores)
+    assert np.array_equal(frame, expected)
+
+
+def test_composited_panel_redraws_only_changed_values():
+    panel = EmotionPanel(composite=True)
+    scores = dict.fromkeys(analysis_core.EMOTIONS, 10.0)
+    scores["happy"] = 40.0
+
+    frame = np.zeros((320, 400, 3), dtype=np.uint8)
+    expected = frame.copy()
+    draw_emotion_panel(expected, scores)
+    panel.draw(frame, scores)
+    # Te same piksele tekstu (przy wygładzaniu OpenCV krawędzie różnią się odcieniem)
+    assert np.array_equal(frame.any(axis=2), expected.any(axis=2))
+    assert panel.stats["texts"] == 2 * len(scores) + 2  # Nazwy i wartości wszystkich wierszy
+
+    panel.draw(np.zeros_like(frame), scores)
+    assert panel.stats["texts"] == 2 * len(scores) + 2  # Nic się nie zmieniło
+
+    scores["sad"] = 12.5
+    panel.draw(np.zeros_like(frame), scores)
+    assert panel.stats["texts"] == 2 * len(scores) + 3  # Tylko nowa wartość "sad"
+
+    scores["sad"] = 60.0
+    frame = np.zeros_like(frame)
+    expected = frame.copy()
+    draw_emotion_panel(expected, scores)
+    panel.draw(frame, scores)
+    assert np.array_equal(frame.any(axis=2), expected.any(axis=2))  # Nowa dominująca emocja
+    assert panel.stats["frames"] == 4
+
+
+def test_renderer_layers():
+    with pytest.raises(ValueError):
+        OverlayRenderer(layers=("panel", "background"))
+    assert not NO_OVERLAY and OverlayRenderer()
+    assert as_overlay(False) is NO_OVERLAY and as_overlay(None) is NO_OVERLAY
+    assert as_overlay(True).layers == {"panel", "faces", "hands"}
+    renderer = OverlayRenderer(layers=("hands",))
+    assert as_overlay(renderer) is renderer
+
+
+def test_layers_are_toggled_independently(fixed_emotion, fake_hands, fake_face_mesh):
+    """Każda warstwa rysuje tylko swoje elementy; bez warstw klatka zostaje nietknięta."""
+    def drawn(layers):
+        frame = np.zeros((240, 320, 3), dtype=np.uint8)
+        state = analysis_core.new_analysis_state()
+        with model_pool.overridden({"mediapipe": fake_mediapipe}):
+            analysis_core.process_frame(frame, "Detective", fake_hands, fake_face_mesh, state,
+                                        draw=OverlayRenderer(layers))
+        assert state["hand_gesture_count"]["relaxed"] == 1  # Liczniki niezależne od rysowania
+        return frame.any(axis=2)
+
+    panel, faces, hands = drawn(("panel",)), drawn(("faces",)), drawn(("hands",))
+    assert not drawn(()).any()
+    assert panel.any() and faces.any() and hands.any()
+    assert np.array_equal(drawn(("panel", "faces", "hands")), panel | faces | hands)
+    assert hands[int(0.2 * 240), int(0.2 * 320)] and not faces[int(0.2 * 240), int(0.2 * 320)]  # Kciuk
+
+
+def test_frames_without_display_are_not_drawn(fixed_emotion, fake_hands, fake_face_mesh, synthetic_video):
+    """Klatki spoza podglądu i pętla bez on_frame nie uruchamiają rysowania."""
+    renderer = OverlayRenderer(layers=("panel",))
+    cap = cv2.VideoCapture(str(synthetic_video))
+    analysis_core.run_analysis_loop(cap, "Detective", analysis_core.new_analysis_state(),
+                                    fake_hands, fake_face_mesh, draw=renderer)
+    cap.release()
+    assert renderer.panel.stats["frames"] == 0
+
+    # Zegar podglądu stoi - do podglądu trafia tylko pierwsza klatka
+    shown = []
+    cap = cv2.VideoCapture(str(synthetic_video))
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh, draw=renderer,
+                                        preview=FramePreview(max_fps=1, clock=lambda: 0.0))
+    analyzed = pipeline.run(analysis_core.new_analysis_state(),
+                            on_frame=lambda frame, scores: shown.append(frame.any()))
+    cap.release()
+    assert analyzed == 20 and pipeline.stats["preview_skipped"] == 19
+    assert renderer.panel.stats["frames"] == 1 and shown == [True]
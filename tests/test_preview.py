@@ -0,0 +1,61 @@
+# ==================================================================================
+# TESTY PODGLĄDU (preview.py)
+# ==================================================================================
+
+import cv2
+import numpy as np
+import pytest
+
+from preview import FramePreview
+
+
+class FakeClock:
+    """Zegar przestawiany ręcznie."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_due_limits_refresh_rate():
+    clock = FakeClock()
+    preview = FramePreview(max_fps=10, clock=clock)
+    shown = 0
+    for _ in range(100):  # 100 klatek co 10 ms = 1 sekunda
+        shown += preview.due()
+        clock.now += 0.01
+    assert shown == 10
+
+
+def test_due_without_limit_accepts_every_frame():
+    preview = FramePreview(max_fps=None)
+    assert all(preview.due() for _ in range(5))
+
+
+def test_encode_downscales_and_produces_jpeg():
+    frame = np.full((1080, 1920, 3), 128, dtype=np.uint8)
+    data = FramePreview(max_width=640, jpeg_quality=50).encode(frame)
+    assert data[:2] == b"\xff\xd8"  # Nagłówek JPEG
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == (360, 640, 3)
+
+
+def test_small_frames_are_not_upscaled():
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    assert FramePreview(max_width=640).resize(frame) is frame
+
+
+def test_lower_quality_gives_smaller_image():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (240, 320, 3), dtype=np.uint8)
+    low = FramePreview(jpeg_quality=30).encode(frame)
+    high = FramePreview(jpeg_quality=95).encode(frame)
+    assert len(low) < len(high)
+
+
+@pytest.mark.parametrize("kwargs", [{"max_fps": 0}, {"max_width": 4}, {"jpeg_quality": 0}])
+def test_invalid_settings_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        FramePreview(**kwargs)
@@ -0,0 +1,157 @@
+# ==================================================================================
+# TESTY PAMIĘCI WYNIKÓW (result_cache.py)
+# ==================================================================================
+# Wyniki wczytane z pamięci w innym trybie muszą być takie same jak wyniki
+# analizy w tym trybie - różni się tylko etykieta wpisów raportu.
+# ==================================================================================
+
+import os
+import shutil
+import threading
+
+import cv2
+import pytest
+
+import analysis_core
+import result_cache
+from frame_sampling import FrameSampler
+from result_cache import ResultCache, default_result_cache_dir, result_cache_mb, result_key
+from test_checkpoint import assert_same, comparable
+from threaded_pipeline import ThreadedAnalysisPipeline
+
+
+def analyze(video, mode, fake_hands, fake_face_mesh, on_frame=None):
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(video))
+    pipeline = ThreadedAnalysisPipeline(cap, mode, fake_hands, fake_face_mesh, draw=False)
+    pipeline.run(state, on_frame=on_frame)
+    cap.release()
+    return pipeline, state
+
+
+def test_key_ignores_mode_and_file_name(tmp_path, synthetic_video):
+    key = result_key(synthetic_video)
+    copy = tmp_path / "kopia.avi"
+    shutil.copy(synthetic_video, copy)
+    assert result_key(copy) == key
+
+    # Treść ma znaczenie - także w środku pliku
+    data = bytearray(copy.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    copy.write_bytes(bytes(data))
+    assert result_key(copy) != key
+
+    assert result_key(synthetic_video, sampler=FrameSampler("stride", 2)) != key
+    assert result_key(synthetic_video, analysis_core.AnalysisSettings(emotion_cache_size=8)) != key
+    # Równoległe etapy klatki nie zmieniają wyników
+    assert result_key(synthetic_video, analysis_core.AnalysisSettings(concurrent_stages=True)) == key
+
+
+def test_cached_results_match_analysis_in_other_mode(tmp_path, synthetic_video, fake_hands,
+                                                      fake_face_mesh, fixed_emotion):
+    cache = ResultCache(tmp_path)
+    key = result_key(synthetic_video)
+    assert not cache.load(key, analysis_core.new_analysis_state(), "Interview")
+
+    pipeline, _ = analyze(synthetic_video, "Detective", fake_hands, fake_face_mesh)
+    assert pipeline.finished
+    cache.store(key, pipeline.results)
+    assert key in cache
+
+    _, expected = analyze(synthetic_video, "Interview", fake_hands, fake_face_mesh)
+    state = analysis_core.new_analysis_state()
+    assert cache.load(key, state, "Interview")
+    assert state["frame_records"].modes == ["Interview"]
+    assert_same(comparable(state), comparable(expected))
+    assert all(" - Interview: Analiza: " in line for line in analysis_core.report_lines(state))
+    assert cache.stats == {"hits": 1, "misses": 1, "stores": 1, "evictions": 0}
+
+
+def test_stopped_analysis_is_not_finished(synthetic_video, fake_hands, fake_face_mesh, fixed_emotion):
+    """Przerwana analiza nie obejmuje całego nagrania - nie trafia do pamięci."""
+    pipeline, _ = analyze(synthetic_video, "Detective", fake_hands, fake_face_mesh,
+                          on_frame=lambda frame, scores: False)
+    assert not pipeline.finished
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    state = analysis_core.new_analysis_state()
+    analysis_core.record_frame(state, "Detective", 0, analysis_core.neutral_emotion_scores())
+    cache = ResultCache(tmp_path)
+    cache.store("a", state)
+    entry_size = cache.size()
+
+    cache = ResultCache(tmp_path, max_bytes=2 * entry_size)
+    cache.store("b", state)
+    os.utime(cache.path_for("a"), (1, 1))  # "a" używany dawno temu...
+    os.utime(cache.path_for("b"), (2, 2))
+    assert cache.load("a", analysis_core.new_analysis_state(), "Interview")  # ...ale właśnie wczytany
+
+    cache.store("c", state)
+    assert "a" in cache and "b" not in cache and "c" in cache
+    assert cache.stats["evictions"] == 1 and cache.size() <= cache.max_bytes
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_disabled_cache_stores_nothing(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path, max_bytes=0)
+    assert not cache.enabled
+    cache.store("a", analysis_core.new_analysis_state())
+    assert "a" not in cache
+
+    monkeypatch.setenv("EMO_RESULT_CACHE_MB", "0")
+    assert result_cache_mb() == 0
+    monkeypatch.setenv("EMO_RESULT_CACHE_MB", "dużo")
+    assert result_cache_mb() == pytest.approx(500)
+
+
+def test_concurrent_stores_of_same_entry(tmp_path):
+    """Sesje w jednym procesie zapisujące ten sam wpis nie dzielą pliku tymczasowego."""
+    state = analysis_core.new_analysis_state()
+    for index in range(5):
+        analysis_core.record_frame(state, "Detective", index, analysis_core.neutral_emotion_scores())
+    cache = ResultCache(tmp_path)
+    errors = []
+
+    def store():
+        try:
+            cache.store("a", state)
+        except Exception as e:  # pragma: no cover - błąd testu
+            errors.append(e)
+
+    threads = [threading.Thread(target=store) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors and not list(tmp_path.glob("*.tmp"))
+
+    loaded = analysis_core.new_analysis_state()
+    assert cache.load("a", loaded, "Interview")
+    assert len(loaded["frame_records"]) == 5  # Żaden wiersz nie został zapisany dwa razy
+
+
+@pytest.mark.skipif(os.name != "posix", reason="uprawnienia katalogów POSIX")
+def test_default_directory_is_private(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.delenv("EMO_RESULT_CACHE_DIR", raising=False)
+    directory = ResultCache().directory
+    assert directory == default_result_cache_dir() == tmp_path / "cache" / "emo" / "results"
+    assert directory.stat().st_mode & 0o777 == 0o700
+
+
+def test_foreign_default_directory_disables_cache(tmp_path, monkeypatch):
+    """Katalog innego użytkownika: pamięć wyłączona zamiast wyjątku w aplikacji."""
+    def foreign(path):
+        raise PermissionError(f"Katalog {path} należy do innego użytkownika")
+
+    monkeypatch.setattr(result_cache, "private_directory", foreign)
+    monkeypatch.setenv("EMO_RESULT_CACHE_DIR", str(tmp_path))
+    state = analysis_core.new_analysis_state()
+    ResultCache(tmp_path).store("a", state)  # Wpis podłożony w katalogu
+
+    cache = ResultCache()
+    assert not cache.enabled
+    assert not cache.load("a", analysis_core.new_analysis_state(), "Interview")
+    cache.store("b", state)
+    assert "b" not in cache
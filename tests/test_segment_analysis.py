@@ -0,0 +1,111 @@
+# ==================================================================================
+# TESTY ANALIZY SEGMENTAMI (segment_analysis.py)
+# ==================================================================================
+# Segmenty analizujemy w bieżącym procesie (workers=1) z atrapami MediaPipe -
+# procesy robocze "spawn" nie widziałyby podmian z testów. Wynik scalenia
+# segmentów musi być taki sam jak analiza jednym przebiegiem.
+# ==================================================================================
+
+import contextlib
+
+import pytest
+
+import analysis_core
+import segment_analysis
+from conftest import FakeFaceMesh, make_landmarks
+from frame_sampling import FrameSampler
+from test_checkpoint import assert_same, comparable
+
+
+@pytest.fixture
+def fake_detectors(monkeypatch, fake_hands, fake_face_mesh):
+    """Podmienia open_detectors() - każdy segment dostaje atrapy MediaPipe."""
+    opened = []
+
+    @contextlib.contextmanager
+    def open_fakes(settings=None):
+        opened.append(settings)
+        yield fake_hands, fake_face_mesh
+
+    monkeypatch.setattr(analysis_core, "open_detectors", open_fakes)
+    return opened
+
+
+def single_pass(video, policy, value, settings=None):
+    import cv2
+
+    cap = cv2.VideoCapture(str(video))
+    state = analysis_core.new_analysis_state()
+    with analysis_core.open_detectors(settings) as (hands, face_mesh):
+        analysis_core.run_analysis_loop(cap, "Detective", state, hands, face_mesh, draw=False,
+                                        sampler=FrameSampler(policy, value, source_fps=10),
+                                        settings=settings)
+    cap.release()
+    return state
+
+
+def test_plan_segments_splits_evenly_without_sampling():
+    assert segment_analysis.plan_segments(20, 4) == [(0, 5), (5, 10), (10, 15), (15, None)]
+    assert segment_analysis.plan_segments(20, 1) == [(0, None)]
+
+
+def test_plan_segments_starts_after_last_selected_frame():
+    """Co 4. klatka: przed granicą 10 ostatnia wybrana to 8 - segment zaczyna się od 9."""
+    sampler = FrameSampler("stride", 4, source_fps=10)
+    assert segment_analysis.plan_segments(20, 2, sampler) == [(0, 9), (9, None)]
+
+
+@pytest.mark.parametrize("policy, value", [("all", None), ("stride", 3), ("fps", 4), ("interval", 0.35)])
+def test_segments_match_single_pass(policy, value, synthetic_video, fake_detectors, fixed_emotion):
+    expected = single_pass(synthetic_video, policy, value)
+    state, info = segment_analysis.analyze_segments(synthetic_video, segments=3, workers=1,
+                                                    sampling_policy=policy, sampling_value=value,
+                                                    min_segment_seconds=0)
+    assert len(info["segments"]) == 3
+    assert len(fake_detectors) == 4  # Pełny przebieg + własne detektory każdego segmentu
+    assert_same(comparable(state), comparable(expected))
+
+
+def test_short_video_is_one_segment(synthetic_video, fake_detectors, fixed_emotion):
+    _, info = segment_analysis.analyze_segments(synthetic_video, segments=4, workers=1)
+    assert info["segments"] == [(0, None)]
+
+
+def test_person_visible_across_boundary_keeps_one_id(monkeypatch, synthetic_video, fake_hands, fixed_emotion):
+    face = make_landmarks({33: (0.45, 0.5), 263: (0.55, 0.5), 4: (0.5, 0.5)}, 468)
+
+    @contextlib.contextmanager
+    def open_fakes(settings=None):
+        yield fake_hands, FakeFaceMesh([face])
+
+    monkeypatch.setattr(analysis_core, "open_detectors", open_fakes)
+    settings = analysis_core.AnalysisSettings(face_localization="facemesh", max_faces=2)
+    summary = segment_analysis.analyze_video_segments(synthetic_video, segments=3, workers=1,
+                                                      settings=settings, min_segment_seconds=0)
+
+    assert [person["id"] for person in summary["people"]] == [1]
+    assert summary["people"][0]["frame_count"] == 20
+    assert summary["tracking"]["face"]["detections"] == 20
+    assert summary["segments"] == [[0, 6], [6, 13], [13, None]]
+
+
+def test_link_people_matches_nearest_faces_only():
+    previous = [(1, (0.2, 0.5)), (2, (0.8, 0.5))]
+    first = [(100001, (0.79, 0.5)), (100002, (0.5, 0.1))]
+    assert segment_analysis._link_people(previous, first, 0.15) == {100001: 2}
+
+
+def test_merge_renumbers_people_of_later_segments():
+    def result(people, first, last):
+        state = analysis_core.new_analysis_state()
+        for person_id in people:
+            analysis_core.person_stats(state, person_id)["frame_count"] = 1
+        return {"state": state, "first_faces": first, "last_faces": last, "tracking": None}
+
+    results = [result([1, 2], [(1, (0.2, 0.5))], [(2, (0.8, 0.5))]),
+               result([100001, 100002], [(100001, (0.5, 0.5)), (100002, (0.8, 0.5))], [])]
+    state, tracking = segment_analysis.merge_segment_results(results)
+    assert tracking is None
+    # Osoba 100002 stoi tam, gdzie osoba 2 - ta sama; 100001 jest nowa
+    assert {person_id: stats["frame_count"] for person_id, stats in state["people"].items()} == \
+        {1: 1, 2: 2, 3: 1}
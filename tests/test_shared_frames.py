@@ -0,0 +1,121 @@
+# ==================================================================================
+# TESTY KLATEK W PAMIĘCI WSPÓŁDZIELONEJ (shared_frames.py)
+# ==================================================================================
+# Procesy robocze startują metodą "spawn" - zadania muszą być funkcjami modułu
+# (ten plik jest importowany w procesie roboczym), a podmiany z monkeypatch
+# nie są tam widoczne.
+# ==================================================================================
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+from shared_frames import FrameRingReader, ProcessFramePool, SharedFrameRing
+from threaded_pipeline import ThreadedAnalysisPipeline
+
+
+def frame_summary(frame):
+    """Zadanie procesu roboczego: mały rekord zamiast obrazu."""
+    if frame[0, 0, 0] == 99:
+        raise ValueError("zła klatka")
+    return {"mean": float(frame.mean()), "shape": frame.shape, "writeable": frame.flags.writeable}
+
+
+@pytest.fixture
+def ring():
+    with SharedFrameRing(slots=3, frame_shape=(8, 8, 3)) as shared:
+        yield shared
+
+
+def test_slot_returns_to_pool_after_last_holder(ring):
+    slot = ring.acquire()
+    ring.retain(slot)  # Np. zadanie w procesie roboczym
+    ring.release(slot)
+    assert ring.in_use == 1
+    ring.release(slot)
+    assert ring.in_use == 0
+    with pytest.raises(RuntimeError):
+        ring.release(slot)  # Podwójne zwolnienie
+
+
+def test_acquire_applies_backpressure(ring):
+    slots = [ring.acquire() for _ in range(3)]
+    assert sorted(slots) == [0, 1, 2]
+    assert ring.acquire(timeout=0.01) is None
+    assert ring.stats["waits"] == 1
+    ring.release(slots[1])
+    assert ring.acquire(timeout=0.01) == slots[1]
+    assert ring.stats["peak_in_use"] == 3
+
+
+def test_reader_sees_writes_without_copy(ring):
+    slot = ring.acquire()
+    ring.view(slot)[...] = 7
+    reader = FrameRingReader(ring.spec)
+    view = reader.view(slot)
+    assert view.mean() == 7 and not view.flags.writeable
+    ring.view(slot)[0, 0, 0] = 200
+    assert view[0, 0, 0] == 200  # Ten sam blok pamięci
+    small = reader.view(slot, (2, 4, 3))
+    assert small.shape == (2, 4, 3) and small[0, 0, 0] == 200
+    del view, small
+    reader.close()
+
+
+def test_pool_returns_small_records_and_releases_slots(ring):
+    pool = ProcessFramePool(ring, frame_summary, processes=2)
+    try:
+        for index, value in enumerate((10, 20, 30)):
+            slot = ring.acquire()
+            ring.view(slot)[...] = value
+            pool.submit(slot, index)
+            ring.release(slot)  # Strona odczytu nie potrzebuje już klatki
+        # Wyniki odbieramy w innej kolejności niż przyszły
+        assert pool.result(2, timeout=30)["mean"] == 30
+        assert pool.result(0, timeout=30) == {"mean": 10.0, "shape": (8, 8, 3), "writeable": False}
+        assert pool.result(1, timeout=30)["mean"] == 20
+        assert ring.in_use == 0
+
+        slot = ring.acquire()
+        ring.view(slot)[...] = 99
+        pool.submit(slot, 3)
+        with pytest.raises(RuntimeError, match="zła klatka"):
+            pool.result(3, timeout=30)
+        ring.release(slot)
+    finally:
+        pool.close()
+    assert ring.in_use == 0
+
+
+def test_discarded_result_frees_slot(ring):
+    pool = ProcessFramePool(ring, frame_summary, processes=1)
+    try:
+        for index in range(2):
+            slot = ring.acquire()
+            ring.view(slot)[...] = index
+            pool.submit(slot, index)
+            ring.release(slot)
+        pool.discard(0)
+        assert pool.result(1, timeout=30)["mean"] == 1
+    finally:
+        pool.close()
+    assert ring.in_use == 0
+
+
+def test_pipeline_with_emotion_processes(fake_hands, fake_face_mesh, synthetic_video):
+    """Emocje z procesów roboczych trafiają do tych samych liczników co w wątku analizy."""
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    shown = []
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh, draw=False,
+                                        emotion_processes=2)
+    analyzed = pipeline.run(state, on_frame=lambda frame, scores: shown.append((int(frame[0, 0, 0]), scores)))
+    cap.release()
+
+    assert analyzed == 20 and state["frame_count"] == 20
+    assert [brightness for brightness, _ in shown] == sorted(brightness for brightness, _ in shown)
+    emotions = state["frame_records"].records()["emotions"]
+    assert not np.isnan(emotions).any()
+    assert np.allclose(emotions.sum(axis=1), 100.0, atol=0.5)
+    assert all(set(scores) == set(analysis_core.EMOTIONS) for _, scores in shown)
@@ -0,0 +1,172 @@
+# ==================================================================================
+# TESTY TEMPA ODCZYTU KLATEK (source_pacing.py)
+# ==================================================================================
+# Kamerę udaje FakeCamera ze wspólnym sztucznym zegarem: klatka zaległa
+# w buforze jest zwracana od razu, na świeżą trzeba "poczekać" (zegar rusza).
+# ==================================================================================
+
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+from source_pacing import SourcePacing
+from threaded_pipeline import ThreadedAnalysisPipeline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCamera:
+    """Kamera z `stale` zaległymi klatkami w buforze przed każdą świeżą; frames=None - bez końca."""
+
+    def __init__(self, clock, stale=0, frames=None, interval=1 / 30):
+        self.clock = clock
+        self.stale = stale
+        self.frames = frames
+        self.interval = interval
+        self.position = 0  # Numer ostatnio pobranej klatki
+        self.backlog = stale
+        self.properties = {}
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        self.properties[prop] = value
+        return True
+
+    def grab(self):
+        if self.frames is not None and self.position >= self.frames:
+            return False
+        if self.backlog:
+            self.backlog -= 1  # Zaległa klatka - bez czekania
+        else:
+            self.clock.now += self.interval  # Czekanie na nową klatkę z sensora
+            self.backlog = self.stale
+        self.position += 1
+        return True
+
+    def retrieve(self, buffer=None):
+        frame = np.full((48, 64, 3), self.position % 256, dtype=np.uint8)
+        return True, frame
+
+    def read(self, buffer=None):
+        return self.retrieve(buffer) if self.grab() else (False, None)
+
+    def release(self):
+        pass
+
+
+def test_file_reads_are_not_paced(synthetic_video):
+    """Plik: zwykłe cap.read() - każda klatka po kolei, nic nie jest pomijane."""
+    pacing = SourcePacing.for_source("video")
+    assert not pacing.live and pacing.drop_policy == "block"
+    cap = cv2.VideoCapture(str(synthetic_video))
+    pacing.prepare(cap)
+    brightness = []
+    while True:
+        ret, frame, drained = pacing.read(cap)
+        if not ret:
+            break
+        assert drained == 0
+        brightness.append(int(frame.mean()))
+    cap.release()
+    assert len(brightness) == 20 and brightness == sorted(brightness)
+    assert pacing.stats["drained"] == 0
+
+
+def test_camera_read_returns_newest_frame():
+    """Kamera: zaległe klatki z bufora są pomijane, dekodowana jest tylko najnowsza."""
+    clock = FakeClock()
+    camera = FakeCamera(clock, stale=4)
+    pacing = SourcePacing.for_source("camera", clock=clock)
+    assert pacing.live and pacing.drop_policy == "latest"
+    pacing.prepare(camera)
+    assert camera.properties[cv2.CAP_PROP_BUFFERSIZE] == 1
+
+    camera.position, camera.backlog = 10, 4  # Analiza się spóźniła - w buforze 4 klatki
+    ret, frame, drained = pacing.read(camera)
+    assert ret and drained == 4
+    assert camera.position == 15 and frame[0, 0, 0] == 15  # Pierwsza klatka, na którą czekaliśmy
+
+    # Limit pomijania - przy stale zapełnionym buforze odczyt nie kręci się bez końca
+    pacing = SourcePacing(live=True, max_drain=2, clock=clock)
+    camera.backlog = 10
+    assert pacing.read(camera)[2] == 2
+
+
+def test_camera_read_reports_end_of_stream():
+    clock = FakeClock()
+    camera = FakeCamera(clock, stale=3, frames=2)
+    pacing = SourcePacing.for_source("camera", clock=clock)
+    assert pacing.read(camera) == (False, None, 2)
+
+
+def test_fps_is_measured_over_recent_frames():
+    clock = FakeClock()
+    pacing = SourcePacing(window=3, clock=clock)
+    assert pacing.fps == 0.0
+    for _ in range(5):
+        pacing.tick()
+        clock.now += 0.5  # 2 klatki na sekundę
+    assert pacing.fps == pytest.approx(2.0)
+    for _ in range(3):
+        pacing.tick()
+        clock.now += 0.1  # Przyspieszenie widać po jednym oknie
+    assert pacing.fps == pytest.approx(10.0)
+
+
+def test_unknown_source_is_rejected():
+    with pytest.raises(ValueError):
+        SourcePacing.for_source("screen")
+    with pytest.raises(ValueError):
+        SourcePacing(window=1)
+
+
+def test_drained_frames_keep_their_weight(fixed_emotion, fake_hands, fake_face_mesh):
+    """Pominięte zaległe klatki kamery liczą się do wyników przeanalizowanych klatek."""
+    clock = FakeClock()
+    camera = FakeCamera(clock, stale=3, frames=40)
+    pacing = SourcePacing.for_source("camera", clock=clock)
+    state = analysis_core.new_analysis_state()
+    pipeline = ThreadedAnalysisPipeline(camera, "Detective", fake_hands, fake_face_mesh, draw=False,
+                                        drop_policy="block", pacing=pacing)
+    analyzed = pipeline.run(state)
+
+    assert analyzed == 10 and pacing.stats["drained"] == 30
+    assert state["analyzed_frame_count"] == 10
+    assert state["frame_count"] == 40  # Każda klatka kamery policzona dokładnie raz
+    assert pipeline.stats["effective_fps"] > 0
+
+
+def test_cancel_event_stops_all_threads(fake_hands, fake_face_mesh, monkeypatch):
+    """Ustawienie sygnału zatrzymania kończy pracę bez końca strumienia i bez on_frame."""
+    def slow_emotion(frame, **kwargs):
+        time.sleep(0.01)
+        return analysis_core.neutral_emotion_scores()
+
+    monkeypatch.setattr(analysis_core, "analyze_emotion", slow_emotion)
+    cancel = threading.Event()
+    clock = FakeClock()
+    camera = FakeCamera(clock)  # Kamera bez końca
+    pipeline = ThreadedAnalysisPipeline(camera, "Detective", fake_hands, fake_face_mesh, draw=False,
+                                        pacing=SourcePacing.for_source("camera", clock=clock))
+    timer = threading.Timer(0.2, cancel.set)
+    timer.start()
+    started = time.monotonic()
+    try:
+        analyzed = pipeline.run(analysis_core.new_analysis_state(), cancel=cancel)
+    finally:
+        timer.cancel()
+    assert time.monotonic() - started < 5
+    assert analyzed >= 1
+    assert not any(thread.name in ("capture", "inference") for thread in threading.enumerate())
@@ -0,0 +1,108 @@
+# ==================================================================================
+# TESTY POMIARU CZASU ETAPÓW (stage_timing.py)
+# ==================================================================================
+
+import csv
+import io
+
+import cv2
+import pytest
+
+import analysis_core
+from conftest import FakeFaceMesh, FakeHands
+from stage_timing import NULL_TIMER, STAGES, LatencyHistogram, StageTimer, summary_lines
+from threaded_pipeline import ThreadedAnalysisPipeline
+
+
+def test_histogram_percentiles_are_close_to_exact_values():
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):  # 1 ms ... 100 ms
+        histogram.record(ms / 1000)
+
+    assert histogram.count == 100
+    assert histogram.mean == pytest.approx(0.0505)
+    assert histogram.percentile(50) == pytest.approx(0.050, rel=0.15)
+    assert histogram.percentile(95) == pytest.approx(0.095, rel=0.15)
+    assert histogram.percentile(100) <= histogram.max == 0.1
+
+
+def test_histogram_merge_adds_counts():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    a.record(0.001)
+    b.record(0.002)
+    b.record(0.004)
+    a.merge(b)
+    assert a.count == 3
+    assert a.max == 0.004
+    assert sum(a.counts) == 3
+
+
+def test_summary_only_lists_measured_stages():
+    timer = StageTimer()
+    timer.record("emotion", 0.040)
+    timer.mark_frame()
+    summary = timer.summary()
+
+    assert set(summary) == {"emotion", "frames", "fps"}
+    assert summary["emotion"]["count"] == 1
+    assert summary["frames"] == 1
+    assert summary_lines(summary)[-1].startswith("Klatki: 1")
+
+
+def test_raw_timings_are_exported_with_frame_index(tmp_path):
+    timer = StageTimer(keep_raw=True)
+    with timer.measure("decode"):
+        pass
+    timer.mark_frame(7)
+    timer.record("emotion", 0.5)
+
+    rows = list(csv.reader(io.StringIO(timer.raw_csv())))
+    assert rows[0] == ["stage", "frame_index", "seconds"]
+    assert [row[:2] for row in rows[1:]] == [["decode", "0"], ["emotion", "8"]]
+
+    path = tmp_path / "timings.csv"
+    timer.dump_raw(path)
+    assert path.read_bytes().decode("utf-8") == timer.raw_csv()
+
+
+def test_dump_raw_requires_keep_raw(tmp_path):
+    with pytest.raises(ValueError):
+        StageTimer().dump_raw(tmp_path / "timings.csv")
+
+
+def test_null_timer_is_a_no_op():
+    with NULL_TIMER.measure("emotion"):
+        pass
+    NULL_TIMER.record("face", 1.0)
+    NULL_TIMER.mark_frame()
+
+
+def test_analysis_loop_records_every_stage(fixed_emotion, synthetic_video):
+    """Pętla z rysowaniem mierzy wszystkie etapy (bez punktów - rysujemy tylko panel emocji)."""
+    state = analysis_core.new_analysis_state()
+    timer = StageTimer()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    analysis_core.run_analysis_loop(cap, "Detective", state, FakeHands(), FakeFaceMesh(),
+                                    on_frame=lambda frame, scores: None, timer=timer)
+    cap.release()
+
+    summary = timer.summary()
+    assert summary["frames"] == 20
+    for stage in STAGES:
+        assert summary[stage]["count"] >= 20, stage
+
+
+def test_pipeline_records_decode_and_display(fixed_emotion, fake_hands, fake_face_mesh, synthetic_video):
+    state = analysis_core.new_analysis_state()
+    timer = StageTimer()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh,
+                                        drop_policy="block", draw=False, timer=timer)
+    pipeline.run(state, on_frame=lambda frame, scores: None)
+    cap.release()
+
+    summary = timer.summary()
+    assert summary["frames"] == 20
+    assert summary["decode"]["count"] >= 20  # Również nieudany odczyt po końcu pliku
+    assert summary["display"]["count"] == 20
+    assert "overlay" not in summary  # draw=False - nic nie rysujemy
@@ -0,0 +1,164 @@
+# ==================================================================================
+# TESTY STATYSTYK STRUMIENIOWYCH (streaming_stats.py)
+# ==================================================================================
+# Wyniki porównujemy z tymi samymi statystykami liczonymi przez NumPy na pełnej
+# historii - wersja strumieniowa ma dawać to samo bez jej przechowywania.
+# ==================================================================================
+
+import json
+import pickle
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+from conftest import FakeFaceMesh, FakeHands
+from frame_records import EMOTIONS
+from streaming_stats import StreamingStats, trend_lines
+
+
+def scores(happy):
+    """Wyniki emocji: "happy" = podana wartość, reszta do 100% w "neutral"."""
+    result = {emotion: 0.0 for emotion in EMOTIONS}
+    result["happy"], result["neutral"] = happy, 100.0 - happy
+    return result
+
+
+def test_mean_and_std_match_full_history():
+    values = np.random.default_rng(1).uniform(0, 100, 1000)
+    weights = np.random.default_rng(2).integers(1, 4, 1000)
+    stats = StreamingStats(window=50)
+    for value, weight in zip(values, weights):
+        stats.observe(scores(value), weight=int(weight))
+
+    happy = stats.snapshot()["happy"]
+    mean = np.average(values, weights=weights)
+    assert happy["count"] == weights.sum()
+    assert happy["mean"] == pytest.approx(mean)
+    assert happy["std"] == pytest.approx(np.sqrt(np.average((values - mean) ** 2, weights=weights)))
+    assert happy["window_mean"] == pytest.approx(np.average(values[-50:], weights=weights[-50:]))
+    window_mean = happy["window_mean"]
+    assert happy["window_std"] == pytest.approx(
+        np.sqrt(np.average((values[-50:] - window_mean) ** 2, weights=weights[-50:])))
+
+
+def test_ema_follows_recent_values():
+    stats = StreamingStats(ema_alpha=0.5)
+    for value in (0.0, 100.0, 100.0):
+        stats.observe(scores(value))
+    assert stats.value("happy", "ema") == pytest.approx(75.0)
+    assert stats.value("happy", "mean") == pytest.approx(200 / 3)
+
+
+def test_weight_counts_as_repeated_frames_for_ema():
+    weighted, repeated = StreamingStats(ema_alpha=0.1), StreamingStats(ema_alpha=0.1)
+    weighted.observe(scores(0.0))
+    repeated.observe(scores(0.0))
+    weighted.observe(scores(100.0), weight=3)
+    for _ in range(3):
+        repeated.observe(scores(100.0))
+    assert weighted.value("happy", "ema") == pytest.approx(repeated.value("happy", "ema"))
+    assert weighted.value("happy", "mean") == pytest.approx(repeated.value("happy", "mean"))
+
+
+def test_frames_without_emotions_only_count_behaviour():
+    stats = StreamingStats()
+    stats.observe(scores(80.0), {"gaze": "left"})
+    stats.observe(None, {"gaze": "center"})
+    snapshot = stats.snapshot()
+
+    assert snapshot["happy"]["count"] == 1
+    assert snapshot["happy"]["mean"] == pytest.approx(80.0)
+    assert snapshot["gaze_left"]["mean"] == pytest.approx(0.5)
+    assert snapshot["gesture_tense"]["mean"] == 0.0
+    assert StreamingStats().snapshot()["happy"]["mean"] is None
+
+
+def test_window_stays_exact_after_many_cycles():
+    stats = StreamingStats(window=7)
+    for value in range(1000):
+        stats.observe(scores(value % 100 + 0.5))
+    expected = np.mean([value % 100 + 0.5 for value in range(993, 1000)])
+    assert stats.value("happy") == pytest.approx(expected)
+
+
+def test_merge_equals_sequential_observation():
+    values = np.random.default_rng(3).uniform(0, 100, 60)
+    sequential, first, second = StreamingStats(window=20), StreamingStats(window=20), StreamingStats(window=20)
+    for i, value in enumerate(values):
+        sequential.observe(scores(value), {"head": "up" if i % 3 else "still"})
+        (first if i < 35 else second).observe(scores(value), {"head": "up" if i % 3 else "still"})
+    first.merge(second)
+
+    merged, expected = first.snapshot(), sequential.snapshot()
+    for channel in ("happy", "head_up"):
+        for statistic in ("count", "mean", "std", "window_mean", "window_std"):
+            assert merged[channel][statistic] == pytest.approx(expected[channel][statistic])
+    assert first.samples == 60
+
+
+def test_survives_pickling():
+    stats = StreamingStats()
+    stats.observe(scores(40.0))
+    copy = pickle.loads(pickle.dumps(stats))
+    copy.observe(scores(60.0))
+    assert copy.value("happy", "mean") == pytest.approx(50.0)
+
+
+def test_json_round_trip():
+    stats = StreamingStats(window=4)
+    for happy in (10.0, 30.0, 50.0, 70.0, 90.0):
+        stats.observe(scores(happy), {"head": "up"})
+    copy = StreamingStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+    assert copy.snapshot() == stats.snapshot()
+    copy.observe(scores(10.0))
+    stats.observe(scores(10.0))
+    assert copy.value("happy", "window_mean") == pytest.approx(stats.value("happy", "window_mean"))
+
+    data = stats.to_dict()
+    data["window"] = 5
+    with pytest.raises(ValueError):
+        StreamingStats.from_dict(data)
+
+
+def test_unknown_channel_is_rejected():
+    with pytest.raises(KeyError):
+        StreamingStats().value("boredom")
+
+
+def test_trend_lines_list_strongest_emotion_first():
+    stats = StreamingStats()
+    stats.observe(scores(70.0), {"gaze": "left"})
+    lines = trend_lines(stats.snapshot())
+    assert lines[0].startswith("happy: 70.0%")
+    assert lines[-1] == "gaze_left: 100%"
+
+
+def test_analysis_loop_updates_live_stats(fixed_emotion, fake_hands, fake_face_mesh, synthetic_video):
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    analysis_core.run_analysis_loop(cap, "Detective", state, fake_hands, fake_face_mesh, draw=False)
+    cap.release()
+
+    live = state["live_stats"]
+    assert live.samples == 20
+    assert live.value("happy", "mean") == pytest.approx(70.0)
+    assert live.value("gesture_relaxed") == pytest.approx(1.0)
+    summary = analysis_core.summarize_state(state)
+    assert summary["trend"]["happy"]["window_mean"] == pytest.approx(70.0)
+    json.dumps(summary)
+
+
+def test_pipeline_exposes_live_stats_during_run(fixed_emotion, synthetic_video):
+    from threaded_pipeline import ThreadedAnalysisPipeline
+
+    cap = cv2.VideoCapture(str(synthetic_video))
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", FakeHands(), FakeFaceMesh(), draw=False)
+    seen = []
+    state = analysis_core.new_analysis_state()
+    pipeline.run(state, on_frame=lambda frame, emotion: seen.append(pipeline.live_stats.samples))
+    cap.release()
+
+    assert seen and seen[-1] >= 1
+    assert state["live_stats"].samples == 20
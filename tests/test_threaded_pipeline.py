@@ -0,0 +1,146 @@
+# ==================================================================================
+# TESTY POTOKU WIELOWĄTKOWEGO (threaded_pipeline.py)
+# ==================================================================================
+
+import queue
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import analysis_core
+from threaded_pipeline import BoundedQueue, ThreadedAnalysisPipeline
+
+
+def test_latest_policy_keeps_newest_items():
+    dropped = []
+    q = BoundedQueue(2, "latest", on_drop=lambda old, new: dropped.append(old))
+    for i in range(5):
+        assert q.put(i)
+    assert dropped == [0, 1, 2]
+    assert [q.get(timeout=0), q.get(timeout=0)] == [3, 4]
+
+
+def test_block_policy_waits_until_closed():
+    """Pełna kolejka "block" nie gubi elementów; po close() put() zwraca False."""
+    q = BoundedQueue(1, "block")
+    assert q.put("a")
+    q.close()
+    assert q.put("b") is False
+    assert q.get(timeout=0) == "a"
+    assert q.get(timeout=0) is None  # Zamknięta i pusta
+
+
+def test_get_times_out_on_empty_queue():
+    with pytest.raises(queue.Empty):
+        BoundedQueue(1).get(timeout=0.01)
+
+
+def test_invalid_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedQueue(1, "random")
+
+
+def test_lossless_pipeline_analyzes_every_frame(fixed_emotion, fake_hands, fake_face_mesh, synthetic_video):
+    """Polityka "block" (pliki) analizuje i wyświetla każdą klatkę."""
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    shown = []
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh,
+                                        drop_policy="block", draw=False)
+    analyzed = pipeline.run(state, on_frame=lambda frame, scores: shown.append(int(frame[0, 0, 0])))
+    cap.release()
+
+    assert analyzed == 20
+    assert state["frame_count"] == 20
+    assert len(shown) == 20
+    assert shown == sorted(shown)  # Klatki są coraz jaśniejsze - kolejność zachowana
+    assert pipeline.stats["dropped"] == 0
+
+
+def test_latest_pipeline_bounds_latency_under_slow_inference(fake_hands, fake_face_mesh,
+                                                              synthetic_video, monkeypatch):
+    """Przy wolnej analizie klatki są odrzucane, ale ich waga nie ginie."""
+    def slow_emotion(frame, **kwargs):
+        time.sleep(0.02)
+        return analysis_core.neutral_emotion_scores()
+
+    monkeypatch.setattr(analysis_core, "analyze_emotion", slow_emotion)
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh,
+                                        drop_policy="latest", queue_size=1, draw=False)
+    analyzed = pipeline.run(state)
+    cap.release()
+
+    assert analyzed < 20
+    assert pipeline.stats["dropped"] > 0
+    assert state["analyzed_frame_count"] == analyzed
+    # Waga odrzuconych klatek przechodzi na kolejne - suma nie przekracza długości nagrania
+    assert analyzed <= state["frame_count"] <= 20
+
+
+def test_pipeline_stops_when_requested(fixed_emotion, fake_hands, fake_face_mesh, synthetic_video):
+    """Zwrócenie False z on_frame kończy pracę wszystkich wątków."""
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh, draw=False)
+    pipeline.run(state, on_frame=lambda frame, scores: False)
+    cap.release()
+    assert pipeline.stats["rendered"] == 1
+    assert state["frame_count"] >= 1
+
+
+def test_merge_analysis_state_adds_results():
+    target = analysis_core.new_analysis_state()
+    source = analysis_core.new_analysis_state()
+    source["frame_count"] = 3
+    source["emotion_totals"]["sad"] = 30.0
+    source["hand_gesture_count"]["tense"] = 2
+    source["frame_records"].append(7, "Interview", {"sad": 60.0}, gesture="tense")
+    analysis_core.merge_analysis_state(target, source)
+    analysis_core.merge_analysis_state(target, source)
+    assert target["frame_count"] == 6
+    assert target["emotion_totals"]["sad"] == 60.0
+    assert target["hand_gesture_count"]["tense"] == 4
+    assert len(target["frame_records"]) == 2
+    assert list(target["frame_records"].records()["frame_index"]) == [7, 7]
+
+
+def test_pipeline_reports_time_to_first_frame(fixed_emotion, fake_hands, fake_face_mesh,
+                                              synthetic_video):
+    """Statystyka first_frame_s mierzy czas od uruchomienia do pierwszej klatki."""
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh, draw=False)
+    assert pipeline.stats["first_frame_s"] is None
+    pipeline.run(state)
+    cap.release()
+    assert 0 <= pipeline.stats["first_frame_s"] < 5
+
+
+def test_slow_preview_does_not_block_analysis(fixed_emotion, fake_hands, fake_face_mesh,
+                                              synthetic_video):
+    """Z podglądem wolne wyświetlanie nie zatrzymuje analizy pliku (polityka "block")."""
+    from preview import FramePreview
+
+    state = analysis_core.new_analysis_state()
+    cap = cv2.VideoCapture(str(synthetic_video))
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", fake_hands, fake_face_mesh,
+                                        drop_policy="block", draw=False,
+                                        preview=FramePreview(max_fps=None))
+
+    def slow_display(frame, scores):
+        time.sleep(0.05)
+
+    start = time.monotonic()
+    analyzed = pipeline.run(state, on_frame=slow_display)
+    elapsed = time.monotonic() - start
+    cap.release()
+
+    assert analyzed == 20
+    assert state["frame_count"] == 20  # Każda klatka przeanalizowana
+    assert pipeline.stats["dropped"] == 0
+    assert pipeline.stats["rendered"] + pipeline.stats["preview_skipped"] == 20
+    assert elapsed < 20 * 0.05  # Bez podglądu wyświetlanie trwałoby co najmniej 1 s
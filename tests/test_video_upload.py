@@ -0,0 +1,59 @@
+# ==================================================================================
+# TESTY ZAPISU PRZESŁANYCH PLIKÓW (video_upload.py)
+# ==================================================================================
+
+import io
+import os
+
+import pytest
+
+from video_upload import (DEFAULT_MAX_UPLOAD_MB, UploadTooLargeError, max_upload_mb,
+                          spool_to_temp_file)
+
+
+class ChunkRecorder(io.BytesIO):
+    """Strumień bajtów zapamiętujący rozmiary kolejnych odczytów."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.requests = []
+
+    def read(self, size=-1):
+        self.requests.append(size)
+        return super().read(size)
+
+
+def test_spool_copies_in_fixed_chunks():
+    """Dane trafiają do pliku w całości, ale odczytywane są fragmentami."""
+    data = os.urandom(10_000)
+    source = ChunkRecorder(data)
+    source.read(100)  # Częściowy odczyt sprzed zapisu - spool zaczyna od początku
+    path = spool_to_temp_file(source, suffix=".mp4", chunk_size=4096)
+    try:
+        assert path.endswith(".mp4")
+        with open(path, "rb") as f:
+            assert f.read() == data
+        assert -1 not in source.requests[1:]
+        assert max(source.requests[1:]) == 4096
+    finally:
+        os.unlink(path)
+
+
+def test_spool_rejects_too_large_upload(tmp_path, monkeypatch):
+    """Po przekroczeniu limitu zgłaszany jest błąd, a częściowy plik znika."""
+    import tempfile
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    with pytest.raises(UploadTooLargeError):
+        spool_to_temp_file(io.BytesIO(b"x" * 5000), max_bytes=4000, chunk_size=1000)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_max_upload_mb_reads_environment(monkeypatch):
+    """Limit można zmienić zmienną środowiskową; błędna wartość daje domyślny limit."""
+    monkeypatch.setenv("EMO_MAX_UPLOAD_MB", "2048")
+    assert max_upload_mb() == 2048
+    monkeypatch.setenv("EMO_MAX_UPLOAD_MB", "dużo")
+    assert max_upload_mb() == DEFAULT_MAX_UPLOAD_MB
+    monkeypatch.delenv("EMO_MAX_UPLOAD_MB")
+    assert max_upload_mb() == DEFAULT_MAX_UPLOAD_MB
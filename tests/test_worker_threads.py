@@ -0,0 +1,37 @@
+# ==================================================================================
+# TESTY LIMITU WĄTKÓW PROCESÓW ROBOCZYCH (worker_threads.py)
+# ==================================================================================
+
+import os
+import subprocess
+import sys
+
+import cv2
+
+from worker_threads import ONNX_INTRA_THREADS_ENV, init_worker
+
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS",
+                    ONNX_INTRA_THREADS_ENV)
+
+
+def test_init_worker_limits_threads(monkeypatch):
+    for name in THREAD_VARIABLES:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv(ONNX_INTRA_THREADS_ENV, "3")  # Jawnie podana liczba wątków ONNX zostaje
+    threads = cv2.getNumThreads()
+    try:
+        init_worker(2)
+        assert cv2.getNumThreads() == 2
+    finally:
+        cv2.setNumThreads(threads)
+    assert [os.environ[name] for name in THREAD_VARIABLES] == ["2", "2", "2", "3"]
+
+
+def test_core_modules_do_not_import_batch_tools():
+    """Potok i analiza segmentami nie wczytują narzędzia wsadowego ani backendów emocji."""
+    code = ("import sys, threaded_pipeline, segment_analysis; "
+            "print(sorted({'batch_analysis', 'emotion_backends'} & set(sys.modules)))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True,
+                            check=True)
+    assert result.stdout.strip() == "[]"
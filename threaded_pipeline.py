@@ -0,0 +1,608 @@
+# ==================================================================================
+# POTOK WIELOWĄTKOWY - przechwytywanie -> analiza -> wyświetlanie
+# ==================================================================================
+# W zwykłej pętli (analysis_core.run_analysis_loop) odczyt klatki, analiza
+# DeepFace/MediaPipe i wyświetlenie obrazu dzieją się jedno po drugim. Gdy analiza
+# jest wolna, kamera czeka, a klatki gromadzą się w buforze sterownika - obraz
+# w aplikacji jest opóźniony o kilka sekund.
+#
+# Tutaj każdy etap działa osobno:
+#   wątek przechwytywania  ->  kolejka  ->  wątek analizy  ->  kolejka  ->  wyświetlanie
+# Kolejki mają ograniczony rozmiar i jedną z dwóch polityk:
+# - "latest": nowa klatka wypiera najstarszą (kamera na żywo - liczy się aktualność)
+# - "block": producent czeka na miejsce w kolejce (plik - żadna klatka nie ginie)
+#
+# Z podglądem (preview.FramePreview) do wyświetlenia trafiają tylko klatki
+# wybrane do podglądu, a kolejka wyświetlania zawsze ma politykę "latest" -
+# wolne wysyłanie obrazu do przeglądarki nigdy nie zatrzymuje analizy.
+#
+# Wątek przechwytywania czyta klatki przez source_pacing.SourcePacing: plik
+# bez żadnego czekania, kamerę - zawsze najnowszą klatkę (zaległe klatki
+# z bufora sterownika są pomijane). Zatrzymanie przychodzi sygnałem
+# (run(cancel=threading.Event)), który sprawdzają wszystkie wątki.
+#
+# Wyświetlanie odbywa się w wątku wywołującym, bo Streamlit pozwala używać
+# st.* tylko z wątku skryptu. Z tego samego powodu wątek analizy zapisuje wyniki
+# do własnego stanu, który po zakończeniu scalamy ze stanem aplikacji.
+#
+# Z emotion_processes > 0 model emocji działa w osobnych procesach roboczych
+# (bez rywalizacji z MediaPipe o GIL): wątek przechwytywania dekoduje klatki
+# wprost do pierścienia pamięci współdzielonej (shared_frames.py), procesy
+# czytają je bez kopiowania i odsyłają tylko słowniki emocji. Emocje kolejnych
+# klatek liczą się równolegle, gdy wątek analizy bada dłonie i twarz.
+# ==================================================================================
+
+import collections  # deque - kolejka z szybkim dodawaniem i usuwaniem z obu końców
+import queue  # queue.Empty - wyjątek zgłaszany po upływie czasu oczekiwania
+import threading  # threading - wątki, zdarzenia i zmienne warunkowe
+import time  # time - pomiar opóźnienia klatek
+from functools import partial  # partial - zadanie procesu roboczego z parametrami
+
+from analysis_core import (analyze_emotion, create_emotion_cache, create_trackers,
+                           init_analysis_state, merge_analysis_state, new_analysis_state,
+                           next_person_id, process_frame, seek_to_frame)
+from frame_context import FrameContext
+from overlay import NO_OVERLAY, as_overlay
+from shared_frames import ProcessFramePool, SharedFrameRing
+from source_pacing import SourcePacing
+from stage_timing import NULL_TIMER
+from worker_threads import init_worker
+
+# Polityki kolejek: "latest" - najnowsza klatka wygrywa, "block" - bez strat
+DROP_POLICIES = ("latest", "block")
+
+# Co ile sekund wątki sprawdzają, czy nie należy zakończyć pracy
+_POLL_INTERVAL = 0.05
+
+# Wątki bibliotek numerycznych w każdym procesie roboczym modelu emocji
+EMOTION_PROCESS_THREADS = 1
+
+
+class BoundedQueue:
+    """
+    Kolejka o ograniczonym rozmiarze z wybieraną polityką odrzucania elementów.
+
+    Parametry:
+    ----------
+    maxsize : int
+        Maksymalna liczba elementów w kolejce
+    drop_policy : str
+        "latest" - gdy kolejka jest pełna, najstarszy element jest odrzucany;
+        "block" - put() czeka, aż zwolni się miejsce
+    on_drop : callable lub None
+        Funkcja on_drop(odrzucony, nowy) wywoływana dla każdego odrzuconego
+        elementu (np. aby przenieść jego wagę na nowy element)
+
+    Po close() kolejka nie przyjmuje nowych elementów, a get() po opróżnieniu
+    kolejki zwraca None (sygnał końca strumienia).
+    """
+
+    def __init__(self, maxsize=1, drop_policy="block", on_drop=None):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Nieznana polityka kolejki: {drop_policy}")
+        if maxsize < 1:
+            raise ValueError("Rozmiar kolejki musi być dodatni")
+        self.maxsize = maxsize
+        self.drop_policy = drop_policy
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item):
+        """
+        Dodaje element do kolejki.
+
+        Zwraca:
+        -------
+        bool
+            True jeśli element trafił do kolejki, False jeśli kolejka została
+            zamknięta (element nie zostanie przetworzony)
+        """
+        with self._cond:
+            if self.drop_policy == "block":
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait(_POLL_INTERVAL)
+            if self._closed:
+                return False
+            while len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(dropped, item)
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        Pobiera najstarszy element.
+
+        Zwraca None, gdy kolejka jest zamknięta i pusta. Zgłasza queue.Empty,
+        gdy w podanym czasie nie pojawił się żaden element.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise queue.Empty
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Zamyka kolejkę i budzi wszystkie oczekujące wątki."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def drain(self):
+        """Usuwa i zwraca wszystkie elementy pozostałe w kolejce."""
+        with self._cond:
+            items = list(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+            return items
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+def emotion_task(frame, resolution=0):
+    """Zadanie procesu roboczego: emocje klatki z pamięci współdzielonej (mały słownik)."""
+    ctx = FrameContext()
+    ctx.reset(frame)
+    return analyze_emotion(ctx.scaled(resolution))
+
+
+def init_emotion_worker(threads):
+    """Start procesu roboczego: limit wątków i wczytanie modelu emocji z góry."""
+    init_worker(threads)
+    import model_pool
+
+    try:
+        model_pool.warm_up(("emotion_backend",))
+    except Exception as e:
+        # Bez modelu analyze_emotion() zwraca wartości neutralne - jak w wątku analizy
+        print(f"Ostrzeżenie: Nie udało się wczytać modelu emocji: {e}")
+
+
+class _FrameItem:
+    """Klatka przekazywana między etapami potoku wraz z metadanymi."""
+
+    __slots__ = ("index", "frame", "weight", "captured_at", "scores", "slot")
+
+    def __init__(self, index, frame, weight, captured_at, slot=None):
+        self.index = index              # Indeks klatki w strumieniu
+        self.frame = frame              # Obraz BGR
+        self.weight = weight            # Liczba klatek źródła reprezentowanych przez tę klatkę
+        self.captured_at = captured_at  # Chwila odczytu (time.monotonic())
+        self.scores = None              # Wyniki emocji (po analizie)
+        self.slot = slot                # Slot pamięci współdzielonej (None = zwykły bufor)
+
+
+class ThreadedAnalysisPipeline:
+    """
+    Wielowątkowy potok analizy: przechwytywanie, analiza i wyświetlanie klatek.
+
+    Parametry:
+    ----------
+    cap : cv2.VideoCapture
+        Otwarte źródło wideo
+    mode : str
+        Tryb analizy
+    hands, face_mesh :
+        Zainicjalizowane obiekty MediaPipe (używane wyłącznie w wątku analizy)
+    drop_policy : str
+        "latest" dla kamery na żywo, "block" dla plików (bez utraty klatek)
+    queue_size : int
+        Rozmiar każdej z kolejek między etapami
+    draw : bool lub overlay.OverlayRenderer
+        Czy nanosić wyniki na klatki (OverlayRenderer = wybrane warstwy).
+        Rysujemy tylko na klatkach, które trafią do wyświetlenia - pominiętych
+        przez podgląd (preview.due()) i przy run() bez on_frame nie ruszamy.
+    sampler : frame_sampling.FrameSampler lub None
+        Polityka próbkowania klatek (klatki pominięte przewijane są cap.grab())
+    settings : analysis_core.AnalysisSettings lub None
+        Ustawienia modeli (None = ustawienia domyślne)
+    timer : stage_timing.StageTimer lub None
+        Pomiar czasu etapów: dekodowanie (wątek przechwytywania), analiza
+        (wątek analizy) i wyświetlanie (wątek wywołujący)
+    preview : preview.FramePreview lub None
+        Ograniczenie podglądu: on_frame dostaje tylko klatki, dla których
+        preview.due() zwróciło True, a analiza nie czeka na wyświetlanie.
+        None = każda przeanalizowana klatka trafia do wyświetlenia.
+    checkpoint : checkpoint.AnalysisCheckpoint lub None
+        Punkt kontrolny pliku: run() wczytuje zapisane wyniki, przewija
+        nagranie do zapisanej klatki, a wątek analizy zapisuje postęp partiami
+        (tylko dla plików - przy kamerze nie ma czego wznawiać)
+    emotion_processes : int
+        Liczba procesów roboczych modelu emocji (0 = model w wątku analizy).
+        Klatki trafiają do nich przez pamięć współdzieloną; tylko przy
+        lokalizacji twarzy "deepface" (przy "facemesh" emocje zależą od wyniku
+        Face Mesh). Pamięć podręczna emocji nie jest wtedy używana.
+    pacing : source_pacing.SourcePacing lub None
+        Sposób odczytu klatek: dla kamery przed odczytem pomijamy zaległe
+        klatki z bufora sterownika (ich waga przechodzi na odczytaną klatkę).
+        None = odczyt bez opróżniania bufora (plik).
+
+    Atrybuty:
+    ---------
+    stats : dict
+        Statystyki potoku: liczby klatek na każdym etapie, odrzucone klatki
+        (nieprzeanalizowane), klatki przeanalizowane, ale pominięte w podglądzie
+        ("preview_skipped"), średnie i maksymalne opóźnienie od odczytu do
+        wyświetlenia (sekundy), czas od uruchomienia do wyświetlenia
+        pierwszej klatki ("first_frame_s", None przed pierwszą klatką) oraz
+        liczba oczekiwań odczytu na wolny slot pamięci współdzielonej
+        ("slot_waits" - przeciwciśnienie procesów roboczych) oraz efektywna
+        liczba klatek analizowanych na sekundę od uruchomienia do końca pracy
+        ("effective_fps"); pominięte zaległe klatki kamery liczy pacing.stats
+    emotion_cache : emotion_cache.EmotionCache lub None
+        Pamięć podręczna emocji wątku analizy (liczniki trafień w .stats)
+    trackers : dict lub None
+        Śledzenie osób wątku analizy (patrz analysis_core.create_trackers())
+    resumed_from : int
+        Klatka, od której run() zaczął analizę (0 bez wznowienia)
+
+    Przykład użycia:
+    ----------------
+    pacing = SourcePacing.for_source("camera")
+    pipeline = ThreadedAnalysisPipeline(cap, "Detective", hands, face_mesh,
+                                        drop_policy=pacing.drop_policy, pacing=pacing)
+    pipeline.run(st.session_state, on_frame=show_frame, cancel=stop_event)
+
+    Uwaga:
+    ------
+    Przy polityce "latest" odrzucone klatki nie są analizowane, ale ich waga
+    przechodzi na następną klatkę - średnie i liczniki pozostają porównywalne
+    z analizą każdej klatki (tak samo jak przy próbkowaniu).
+    """
+
+    def __init__(self, cap, mode, hands, face_mesh, drop_policy="block", queue_size=2,
+                 draw=True, sampler=None, settings=None, timer=None, preview=None,
+                 checkpoint=None, emotion_processes=0, pacing=None):
+        self.cap = cap
+        self.mode = mode
+        self.hands = hands
+        self.face_mesh = face_mesh
+        self.overlay = as_overlay(draw)
+        self.sampler = sampler
+        self.settings = settings
+        self.emotion_processes = emotion_processes
+        if settings is not None and settings.face_localization != "deepface":
+            self.emotion_processes = 0
+        self.emotion_cache = create_emotion_cache(settings) if not self.emotion_processes else None
+        self.trackers = create_trackers(settings)
+        self.timer = timer or NULL_TIMER
+        self.preview = preview
+        self.pacing = pacing or SourcePacing()
+        self.checkpoint = checkpoint
+        self.resumed_from = 0
+        self.stats = {"captured": 0, "analyzed": 0, "rendered": 0, "dropped": 0,
+                      "preview_skipped": 0, "mean_latency_s": 0.0, "max_latency_s": 0.0,
+                      "first_frame_s": None, "slot_waits": 0, "effective_fps": 0.0}
+
+        self._state = new_analysis_state()  # Stan zapisywany przez wątek analizy
+        self._stop = threading.Event()
+        self._cancel = None  # Zewnętrzny sygnał zatrzymania (run(cancel=...))
+        self._errors = []
+        self._next_index = 0  # Pierwsza klatka nieuwzględniona w stanie wątku analizy
+        self._finished = False  # Wątek analizy doszedł do końca nagrania
+        self._display = True  # Czy klatki są wyświetlane (run() z on_frame)
+        # Bufory obrazów wracające z etapu wyświetlania - odczyt kolejnej klatki
+        # trafia do już przydzielonej pamięci zamiast do nowej tablicy
+        self._free_buffers = collections.deque()
+        # Procesy robocze emocji: pierścień slotów tworzony przy pierwszej klatce
+        # (dopiero wtedy znamy jej rozmiar)
+        self._ring = None
+        self._emotion_pool = None
+        self._capture_queue = BoundedQueue(queue_size, drop_policy, on_drop=self._merge_dropped)
+        # Podgląd pokazuje zawsze najnowszą wybraną klatkę - analiza nie czeka na wyświetlanie
+        if preview is not None:
+            self._render_queue = BoundedQueue(1, "latest", on_drop=self._recycle_dropped)
+        else:
+            self._render_queue = BoundedQueue(queue_size, drop_policy, on_drop=self._recycle_dropped)
+
+    @property
+    def live_stats(self):
+        """
+        Statystyki strumieniowe wątku analizy (streaming_stats.StreamingStats).
+
+        Można je odczytywać w trakcie pracy potoku (np. w on_frame) - do stanu
+        aplikacji trafiają dopiero po zakończeniu run().
+        """
+        return self._state["live_stats"]
+
+    @property
+    def results(self):
+        """
+        Stan analizy tego nagrania (z wynikami wczytanymi z punktu kontrolnego).
+
+        Po run() zawiera to, co zostało scalone ze stanem aplikacji - bez
+        wyników wcześniejszych analiz (np. do zapisu w result_cache.py).
+        """
+        return self._state
+
+    @property
+    def finished(self):
+        """Czy analiza dotarła do końca nagrania (bez zatrzymania i bez błędów)."""
+        return self._finished and not self._errors
+
+    # ------------------------------------------------------------------------------
+    # Obsługa odrzuconych klatek i buforów
+    # ------------------------------------------------------------------------------
+
+    def _merge_dropped(self, dropped, newest):
+        """Klatka odrzucona przed analizą przekazuje swoją wagę najnowszej klatce."""
+        newest.weight += dropped.weight
+        if self._emotion_pool is not None:
+            self._emotion_pool.discard(dropped.index)
+        self._recycle(dropped)
+
+    def _recycle_dropped(self, dropped, newest):
+        """Klatka przeanalizowana, ale niewyświetlona - zwalniamy tylko bufor."""
+        self._recycle(dropped)
+
+    def _recycle(self, item):
+        """Oddaje bufor klatki do ponownego odczytu (lub zwalnia jej slot)."""
+        if item.slot is not None:
+            self._ring.release(item.slot)
+        else:
+            self._free_buffers.append(item.frame)
+
+    def _start_emotion_workers(self, frame_shape):
+        """Tworzy pierścień slotów i procesy robocze modelu emocji."""
+        # Sloty: obie kolejki, klatka w analizie i w wyświetlaniu, zadania procesów
+        slots = 2 * (self._capture_queue.maxsize + self._render_queue.maxsize) + self.emotion_processes + 2
+        self._ring = SharedFrameRing(slots, frame_shape)
+        resolution = self.settings.emotion_resolution if self.settings is not None else 0
+        self._emotion_pool = ProcessFramePool(self._ring, partial(emotion_task, resolution=resolution),
+                                              processes=self.emotion_processes,
+                                              initializer=init_emotion_worker,
+                                              initargs=(EMOTION_PROCESS_THREADS,))
+
+    def _read_shared(self):
+        """
+        Odczyt klatki wprost do slotu pamięci współdzielonej.
+
+        Zwraca (slot, klatka, pominięte zaległe klatki) albo (None, None, 0) na
+        końcu strumienia lub po zatrzymaniu potoku. Czeka na wolny slot, gdy
+        procesy robocze nie nadążają (przeciwciśnienie).
+        """
+        if self._ring is None:
+            ret, frame, drained = self.pacing.read(self.cap)
+            if not ret:
+                return None, None, 0
+            self._start_emotion_workers(frame.shape)
+            slot = self._ring.acquire()
+            view = self._ring.view(slot)
+            view[...] = frame
+            return slot, view, drained
+
+        slot = None
+        while slot is None:
+            if self._stopping():
+                return None, None, 0
+            slot = self._ring.acquire(timeout=_POLL_INTERVAL)
+        view = self._ring.view(slot)
+        ret, frame, drained = self.pacing.read(self.cap, view)
+        if ret and frame is not view:
+            # Dekoder przydzielił nową tablicę - inny rozmiar klatki niż pierwsza
+            if frame.shape != view.shape:
+                self._ring.release(slot)
+                raise ValueError(f"Rozmiar klatki zmienił się w trakcie nagrania: {frame.shape}")
+            view[...] = frame
+        if not ret:
+            self._ring.release(slot)
+            return None, None, 0
+        return slot, view, drained
+
+    # ------------------------------------------------------------------------------
+    # Etapy potoku
+    # ------------------------------------------------------------------------------
+
+    def _stopping(self):
+        """Czy potok ma zakończyć pracę (koniec wyświetlania lub zewnętrzny sygnał)."""
+        return self._stop.is_set() or (self._cancel is not None and self._cancel.is_set())
+
+    def _capture(self):
+        """Wątek przechwytywania: odczytuje klatki i wkłada je do kolejki analizy."""
+        try:
+            index = self.resumed_from
+            pending_weight = 0  # Klatki pominięte przez sampler od ostatniej odczytanej
+            while not self._stopping() and self.cap.isOpened():
+                if self.sampler is not None and not self.sampler.should_analyze(index):
+                    if not self.cap.grab():
+                        break
+                    index += 1
+                    pending_weight += 1
+                    continue
+
+                slot = None
+                with self.timer.measure("decode"):
+                    if self.emotion_processes:
+                        slot, frame, drained = self._read_shared()
+                        ret = slot is not None
+                    else:
+                        buffer = self._free_buffers.pop() if self._free_buffers else None
+                        ret, frame, drained = self.pacing.read(self.cap, buffer)
+                if not ret:
+                    break
+                # Zaległe klatki kamery pominięte przy odczycie - jak klatki odrzucone
+                index += drained
+                pending_weight += drained
+
+                item = _FrameItem(index, frame, pending_weight + 1, time.monotonic(), slot)
+                if slot is not None:
+                    self._emotion_pool.submit(slot, index)  # Emocje liczą się już teraz
+                index += 1
+                pending_weight = 0
+                self.stats["captured"] += 1
+                if not self._capture_queue.put(item):
+                    if slot is not None:
+                        self._emotion_pool.discard(item.index)
+                        self._recycle(item)
+                    break
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            self._capture_queue.close()
+
+    def _infer(self):
+        """Wątek analizy: analizuje klatki i przekazuje je do wyświetlenia."""
+        try:
+            ctx = FrameContext()
+            while True:
+                try:
+                    item = self._capture_queue.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    if self._stopping():
+                        break
+                    continue
+                if item is None:
+                    self._finished = not self._stopping()
+                    break  # Koniec strumienia
+                if self._stopping():
+                    self._recycle(item)
+                    break
+
+                emotion_scores = None
+                if item.slot is not None:
+                    # Etap "emotion" to tu czas oczekiwania na wynik procesu roboczego
+                    with self.timer.measure("emotion"):
+                        emotion_scores = self._emotion_pool.result(item.index)
+                # Decyzja o podglądzie przed analizą - klatki, której nikt nie
+                # zobaczy, nie ma po co rysować
+                shown = self.preview is None or self.preview.due()
+                ctx.reset(item.frame, item.index)
+                item.scores = process_frame(ctx, self.mode, self.hands, self.face_mesh, self._state,
+                                            draw=self.overlay if shown and self._display else NO_OVERLAY,
+                                            weight=item.weight,
+                                            settings=self.settings,
+                                            emotion_cache=self.emotion_cache,
+                                            timer=self.timer, trackers=self.trackers,
+                                            emotion_scores=emotion_scores)
+                self.timer.mark_frame(item.index)
+                self.pacing.tick()
+                self.stats["analyzed"] += 1
+                self._next_index = item.index + 1
+                if self.checkpoint is not None:
+                    self.checkpoint.maybe_save(self._state, self._next_index)
+                if not shown:
+                    # Klatka nie trafi do podglądu - bufor od razu wraca do odczytu
+                    self.stats["preview_skipped"] += 1
+                    self._recycle(item)
+                    continue
+                if not self._render_queue.put(item):
+                    self._recycle(item)
+                    break
+        except Exception as e:
+            self._errors.append(e)
+        finally:
+            self._render_queue.close()
+
+    def run(self, state, on_frame=None, should_continue=None, cancel=None):
+        """
+        Uruchamia potok i wyświetla klatki w bieżącym wątku aż do końca strumienia.
+
+        Parametry:
+        ----------
+        state : dict lub st.session_state
+            Stan analizy, do którego zostaną dodane wyniki (po zakończeniu pracy)
+        on_frame : callable lub None
+            on_frame(frame, emotion_scores) - wyświetlenie klatki; zwrócenie
+            False kończy analizę (emotion_scores = None, gdy emocje pominięto)
+        should_continue : callable lub None
+            Funkcja bez argumentów; gdy zwróci False, analiza się kończy
+        cancel : threading.Event lub None
+            Sygnał zatrzymania ustawiany z innego wątku (wywołania bez interfejsu,
+            np. serwer lub testy). Sprawdzają go wszystkie wątki potoku - odczyt
+            i analiza kończą się bez czekania na kolejną wyświetloną klatkę.
+            W aplikacji Streamlit kliknięcie przycisku przerywa skrypt wyjątkiem
+            ponownego uruchomienia, a wątki zatrzymuje blok finally tej metody.
+
+        Zwraca:
+        -------
+        int
+            Liczba przeanalizowanych klatek
+        """
+        # Rejestr wyników wątku analizy ma ten sam limit co rejestr aplikacji
+        init_analysis_state(state)
+        self._display = on_frame is not None
+        self._cancel = cancel
+        self.pacing.prepare(self.cap)
+        self._state = new_analysis_state(state["frame_records"].capacity)
+        if self.checkpoint is not None:
+            # Wyniki sprzed przerwy trafiają do stanu wątku analizy - razem z nowymi
+            # zostaną scalone ze stanem aplikacji i zapisane w kolejnych punktach
+            self.resumed_from = self._next_index = self.checkpoint.load(self._state)
+            seek_to_frame(self.cap, self.resumed_from, self.sampler)
+            self.trackers = create_trackers(self.settings, first_id=next_person_id(self._state))
+
+        threads = [threading.Thread(target=self._capture, name="capture", daemon=True),
+                   threading.Thread(target=self._infer, name="inference", daemon=True)]
+        for thread in threads:
+            thread.start()
+
+        started_at = time.monotonic()
+        latency_sum = 0.0
+        try:
+            while not self._stopping() and (should_continue is None or should_continue()):
+                try:
+                    item = self._render_queue.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break  # Wątek analizy skończył pracę
+
+                keep_going = True
+                if on_frame is not None:
+                    with self.timer.measure("display"):
+                        keep_going = on_frame(item.frame, item.scores)
+                if self.stats["first_frame_s"] is None:
+                    self.stats["first_frame_s"] = time.monotonic() - started_at
+
+                latency = time.monotonic() - item.captured_at
+                self.stats["rendered"] += 1
+                latency_sum += latency
+                self.stats["mean_latency_s"] = latency_sum / self.stats["rendered"]
+                self.stats["max_latency_s"] = max(self.stats["max_latency_s"], latency)
+
+                self._recycle(item)
+                item = None  # Bez odwołań do slotu - pierścień można zamknąć
+                if keep_going is False:
+                    break
+        finally:
+            # Zatrzymaj wątki (również gdy Streamlit przerwał skrypt wyjątkiem)
+            self._stop.set()
+            self._capture_queue.close()
+            self._render_queue.close()
+            for thread in threads:
+                thread.join()
+            for leftover in self._capture_queue.drain() + self._render_queue.drain():
+                self._recycle(leftover)
+            if self._emotion_pool is not None:
+                self._emotion_pool.close()
+                self.stats["slot_waits"] = self._ring.stats["waits"]
+                self._ring.close()
+            self.stats["dropped"] = self._capture_queue.dropped
+            elapsed = time.monotonic() - started_at
+            self.stats["effective_fps"] = self.stats["analyzed"] / elapsed if elapsed > 0 else 0.0
+            if self.preview is not None:
+                self.stats["preview_skipped"] += self._render_queue.dropped
+            else:
+                self.stats["dropped"] += self._render_queue.dropped
+
+            if self.checkpoint is not None:
+                self.checkpoint.save(self._state, self._next_index,
+                                     complete=self._finished and not self._errors)
+
+            # Scal wyniki z wątku analizy ze stanem aplikacji (w wątku skryptu)
+            merge_analysis_state(state, self._state)
+
+        if self._errors:
+            raise self._errors[0]
+        return self.stats["analyzed"]
@@ -0,0 +1,88 @@
+# ==================================================================================
+# OBSŁUGA PRZESŁANYCH PLIKÓW WIDEO - zapis na dysk fragmentami
+# ==================================================================================
+# OpenCV potrzebuje ścieżki do pliku, więc przesłane nagranie trzeba zapisać
+# do pliku tymczasowego. Wywołanie plik.read() tworzy kopię całego nagrania
+# (do kilkuset MB) jako jeden obiekt bytes - przy kilku użytkownikach naraz
+# zużycie pamięci rośnie o setki MB.
+#
+# spool_to_temp_file() kopiuje dane fragmentami o stałym rozmiarze, więc
+# dodatkowa pamięć nie zależy od rozmiaru nagrania. Limit rozmiaru można
+# zmienić zmienną środowiskową EMO_MAX_UPLOAD_MB.
+# ==================================================================================
+
+import os  # os - zmienne środowiskowe, usuwanie plików
+import tempfile  # tempfile - pliki tymczasowe
+
+# Domyślny limit rozmiaru przesyłanego pliku (MB)
+DEFAULT_MAX_UPLOAD_MB = 200
+
+# Zmienna środowiskowa nadpisująca limit (np. EMO_MAX_UPLOAD_MB=2000)
+MAX_UPLOAD_ENV = "EMO_MAX_UPLOAD_MB"
+
+# Rozmiar fragmentu kopiowanego jednorazowo (1 MB)
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Przesłany plik przekracza dozwolony rozmiar."""
+
+
+def max_upload_mb():
+    """
+    Zwraca limit rozmiaru przesyłanego pliku w MB.
+
+    Wartość pochodzi ze zmiennej środowiskowej EMO_MAX_UPLOAD_MB, a gdy jej nie
+    ustawiono (lub jest niepoprawna) - z DEFAULT_MAX_UPLOAD_MB.
+    """
+    try:
+        value = float(os.environ.get(MAX_UPLOAD_ENV, DEFAULT_MAX_UPLOAD_MB))
+    except ValueError:
+        return DEFAULT_MAX_UPLOAD_MB
+    return value if value > 0 else DEFAULT_MAX_UPLOAD_MB
+
+
+def spool_to_temp_file(fileobj, suffix="", max_bytes=None, chunk_size=CHUNK_SIZE):
+    """
+    Kopiuje dane z obiektu plikowego do pliku tymczasowego fragmentami.
+
+    Parametry:
+    ----------
+    fileobj : obiekt z metodą read(n)
+        Źródło danych (np. UploadedFile ze Streamlit)
+    suffix : str
+        Rozszerzenie pliku tymczasowego (np. ".mp4") - OpenCV rozpoznaje po nim format
+    max_bytes : int lub None
+        Limit rozmiaru; None = bez limitu
+    chunk_size : int
+        Rozmiar kopiowanego fragmentu w bajtach
+
+    Zwraca:
+    -------
+    str
+        Ścieżka do pliku tymczasowego (usunięcie należy do wywołującego)
+
+    Wyjątki:
+    --------
+    UploadTooLargeError
+        Gdy dane przekraczają max_bytes (częściowy plik jest usuwany)
+    """
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)  # Streamlit mógł już odczytać część pliku przy poprzednim przebiegu
+    tfile = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    written = 0
+    try:
+        with tfile:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if max_bytes is not None and written > max_bytes:
+                    raise UploadTooLargeError(
+                        f"Plik przekracza limit {max_bytes / (1024 * 1024):.0f} MB")
+                tfile.write(chunk)
+    except BaseException:
+        os.unlink(tfile.name)
+        raise
+    return tfile.name
@@ -0,0 +1,34 @@
+# ==================================================================================
+# LIMIT WĄTKÓW PROCESÓW ROBOCZYCH - wspólny dla wszystkich pul procesów
+# ==================================================================================
+# Analiza wsadowa (batch_analysis.py), analiza segmentami (segment_analysis.py)
+# i procesy robocze modelu emocji (threaded_pipeline.py) uruchamiają kilka
+# procesów naraz. Każdy z nich musi dostać swoją część rdzeni - inaczej
+# TensorFlow, ONNX Runtime i OpenCV w każdym procesie próbują zająć wszystkie.
+#
+# Moduł nie importuje niczego poza biblioteką standardową (OpenCV - dopiero
+# w init_worker()), więc rdzeń analizy może z niego korzystać bez wczytywania
+# narzędzi wiersza poleceń ani backendów emocji.
+# ==================================================================================
+
+import os  # os - zmienne środowiskowe z liczbą wątków
+
+# Zmienna środowiskowa z liczbą wątków ONNX Runtime (patrz emotion_backends.py)
+ONNX_INTRA_THREADS_ENV = "EMO_ONNX_INTRA_THREADS"
+
+
+def init_worker(threads_per_worker):
+    """
+    Ogranicza liczbę wątków bibliotek numerycznych w procesie roboczym.
+
+    Bez tego każdy proces TensorFlow/OpenCV próbuje zająć wszystkie rdzenie,
+    a procesy wzajemnie się spowalniają. Zmienne ustawiamy przed pierwszym
+    importem TensorFlow (DeepFace jest importowany leniwie). Backend ONNX
+    dostaje ten sam limit, chyba że liczbę wątków podano jawnie.
+    """
+    value = str(threads_per_worker)
+    for name in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[name] = value
+    os.environ.setdefault(ONNX_INTRA_THREADS_ENV, value)
+    import cv2
+    cv2.setNumThreads(threads_per_worker)